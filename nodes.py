@@ -3,11 +3,52 @@ ComfyUI节点 - 徽章图案工具
 Badge Pattern Tool Nodes for ComfyUI
 """
 
+import os
+import sys
 import torch
 import numpy as np
 from PIL import Image, ImageDraw
 import math
 
+# 共享桌面端的纯几何模块（core.packing / core.layout_cache / core.capacity / core.page_spec 只依赖标准库和common.constants）。
+# 追加到路径末尾，避免遮蔽ComfyUI自身的同名模块
+_SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
+
+from core.layout_cache import get_page_layout
+from core.capacity import capacity_table, max_diameter_for_count, float_range, format_capacity_table
+from core.page_spec import PageSpec
+from core.job_planner import plan_uniform
+from core.overlay import CUT_FILE_WRITERS, iter_cut_files
+from common.constants import PAGE_SIZES_MM, DEFAULT_PAGE_SIZE
+
+# 纸张选项：预设纸张 + 自定义（如卷筒纸，使用page_width_mm/page_height_mm）
+CUSTOM_PAGE_SIZE = "自定义"
+PAGE_SIZE_CHOICES = list(PAGE_SIZES_MM) + [CUSTOM_PAGE_SIZE]
+PAGE_SIZE_INPUTS = {
+    "page_size": (PAGE_SIZE_CHOICES, {"default": DEFAULT_PAGE_SIZE}),
+    "page_width_mm": ("FLOAT", {
+        "default": 320.0,
+        "min": 50.0,
+        "max": 2000.0,
+        "step": 1.0
+    }),
+    "page_height_mm": ("FLOAT", {
+        "default": 450.0,
+        "min": 50.0,
+        "max": 5000.0,
+        "step": 1.0
+    }),
+}
+
+
+def page_spec_from_inputs(dpi, page_size=DEFAULT_PAGE_SIZE, page_width_mm=320.0, page_height_mm=450.0):
+    """由节点输入构造页面规格（未连接可选输入时为A4）"""
+    if page_size == CUSTOM_PAGE_SIZE:
+        return PageSpec.custom(page_width_mm, page_height_mm, dpi)
+    return PageSpec.preset(page_size, dpi)
+
 
 def tensor2pil(image):
     """将ComfyUI的tensor图片转换为PIL Image"""
@@ -156,7 +197,7 @@ class CircularCropNode:
 
 
 class BadgeLayoutNode:
-    """徽章排版节点 - 在A4纸上智能排版多个圆形徽章"""
+    """徽章排版节点 - 在A4（或其他纸张）上智能排版多个圆形徽章"""
     
     @classmethod
     def INPUT_TYPES(cls):
@@ -189,6 +230,7 @@ class BadgeLayoutNode:
                     "step": 1
                 }),
             },
+            "optional": dict(PAGE_SIZE_INPUTS),
         }
     
     RETURN_TYPES = ("IMAGE",)
@@ -196,7 +238,7 @@ class BadgeLayoutNode:
     FUNCTION = "create_layout"
     CATEGORY = "徽章工具"
     
-    def create_layout(self, images, diameter_mm, layout_type, spacing_mm, margin_mm, dpi):
+    def create_layout(self, images, diameter_mm, layout_type, spacing_mm, margin_mm, dpi, **page_inputs):
         """
         在A4纸上排版圆形徽章
         
@@ -207,30 +249,22 @@ class BadgeLayoutNode:
             spacing_mm: 间距（毫米）
             margin_mm: 页边距（毫米）
             dpi: 分辨率
+            page_inputs: 可选的纸张规格（page_size / page_width_mm / page_height_mm），默认A4
         """
-        # A4纸尺寸（像素）
-        a4_width_px = int(210 / 25.4 * dpi)
-        a4_height_px = int(297 / 25.4 * dpi)
+        spec = page_spec_from_inputs(dpi, **page_inputs)
+        a4_width_px, a4_height_px = spec.size_px
         
         # 计算徽章尺寸（像素）
-        badge_diameter_px = int(diameter_mm / 25.4 * dpi)
+        badge_diameter_px = spec.mm_to_px(diameter_mm)
         badge_radius_px = badge_diameter_px // 2
-        spacing_px = int(spacing_mm / 25.4 * dpi)
-        margin_px = int(margin_mm / 25.4 * dpi)
-        
-        # 计算布局
-        if layout_type == "网格":
-            layout = self._calculate_grid_layout(
-                a4_width_px, a4_height_px, badge_diameter_px, 
-                badge_radius_px, spacing_px, margin_px
-            )
-        else:
-            layout = self._calculate_compact_layout(
-                a4_width_px, a4_height_px, badge_diameter_px, 
-                badge_radius_px, spacing_px, margin_px
-            )
+        margin_px = spec.mm_to_px(margin_mm)
+        
+        # 计算布局（与桌面端共享排版结果缓存，缓存键包含页面尺寸和分辨率）
+        layout = get_page_layout(
+            "grid" if layout_type == "网格" else "compact", spec, diameter_mm, spacing_mm, margin_mm
+        )
         
-        # 创建A4画布
+        # 创建页面画布
         canvas = Image.new('RGB', (a4_width_px, a4_height_px), (255, 255, 255))
         
         # 绘制页边距线（辅助线）
@@ -241,7 +275,7 @@ class BadgeLayoutNode:
         ], outline=(200, 200, 200), width=2)
         
         # 放置图片
-        positions = layout['positions']
+        positions = layout.positions
         batch_size = images.shape[0] if len(images.shape) == 4 else 1
         
         for i in range(min(batch_size, len(positions))):
@@ -276,90 +310,6 @@ class BadgeLayoutNode:
         
         # 转换回tensor
         return (pil2tensor(canvas),)
-    
-    def _calculate_grid_layout(self, a4_width, a4_height, diameter, radius, spacing, margin):
-        """计算网格排列布局"""
-        available_width = a4_width - 2 * margin
-        available_height = a4_height - 2 * margin
-        
-        # 圆心之间的距离
-        center_distance = diameter + spacing
-        
-        # 计算每行和每列可放置的圆形数量
-        cols = max(1, int(available_width // center_distance))
-        rows = max(1, int(available_height // center_distance))
-        
-        # 计算起始位置（居中）
-        total_width = cols * center_distance
-        total_height = rows * center_distance
-        start_x = margin + (available_width - total_width) / 2
-        start_y = margin + (available_height - total_height) / 2
-        
-        # 生成位置列表
-        positions = []
-        for row in range(rows):
-            for col in range(cols):
-                x = start_x + col * center_distance + radius
-                y = start_y + row * center_distance + radius
-                positions.append((int(x), int(y)))
-        
-        return {
-            'type': 'grid',
-            'positions': positions,
-            'rows': rows,
-            'cols': cols,
-            'max_count': rows * cols
-        }
-    
-    def _calculate_compact_layout(self, a4_width, a4_height, diameter, radius, spacing, margin):
-        """计算紧凑排列布局（六边形蜂巢）"""
-        available_width = a4_width - 2 * margin
-        available_height = a4_height - 2 * margin
-        
-        # 圆心之间的最小距离
-        min_center_distance = diameter + spacing
-        
-        # 六边形网格的水平间距
-        hex_horizontal_factor = math.sqrt(3) / 2
-        horizontal_spacing = diameter * hex_horizontal_factor + spacing
-        
-        # 计算列数
-        max_cols = max(1, int((available_width + horizontal_spacing) // horizontal_spacing))
-        
-        # 垂直间距
-        vertical_spacing = max(horizontal_spacing * math.sqrt(3) / 2, min_center_distance)
-        middle_col_offset = vertical_spacing / 2
-        
-        # 起始位置
-        start_x = margin + radius
-        
-        # 生成位置列表
-        positions = []
-        for col in range(max_cols):
-            # 计算列的X位置
-            x = start_x + col * horizontal_spacing
-            
-            # 边界检查
-            if x - radius < margin or x + radius > a4_width - margin:
-                continue
-            
-            # 计算当前列的Y起始位置
-            if col % 2 == 0:  # 偶数列
-                y_start = margin + radius
-            else:  # 奇数列 - 向下偏移
-                y_start = margin + radius + middle_col_offset
-            
-            # 在当前列中放置圆形
-            y = y_start
-            while y + radius <= a4_height - margin:
-                positions.append((int(x), int(y)))
-                y += vertical_spacing
-        
-        return {
-            'type': 'compact',
-            'positions': positions,
-            'max_count': len(positions)
-        }
 
 
 class AutoOptimizeBadgeNode:
@@ -856,6 +806,185 @@ class InteractiveImageEditorNode:
         return (result[0], scale, offset_x, offset_y, instructions)
 
 
+class BadgeCapacityNode:
+    """排版容量表节点 - 计算不同直径下每页可放置的徽章数量，并反查指定数量时的最大直径"""
+
+    LAYOUT_TYPES = {"网格": ("grid",), "紧凑": ("compact",), "全部": ("grid", "compact")}
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "diameter_min_mm": ("FLOAT", {
+                    "default": 25.0,
+                    "min": 10.0,
+                    "max": 200.0,
+                    "step": 1.0
+                }),
+                "diameter_max_mm": ("FLOAT", {
+                    "default": 80.0,
+                    "min": 10.0,
+                    "max": 200.0,
+                    "step": 1.0
+                }),
+                "diameter_step_mm": ("FLOAT", {
+                    "default": 1.0,
+                    "min": 0.1,
+                    "max": 50.0,
+                    "step": 0.1
+                }),
+                "layout_type": (["全部", "网格", "紧凑"],),
+                "spacing_mm": ("FLOAT", {
+                    "default": 5.0,
+                    "min": 0.0,
+                    "max": 20.0,
+                    "step": 0.5
+                }),
+                "margin_mm": ("FLOAT", {
+                    "default": 10.0,
+                    "min": 0.0,
+                    "max": 50.0,
+                    "step": 1.0
+                }),
+                "target_count": ("INT", {
+                    "default": 12,
+                    "min": 0,
+                    "max": 1000,
+                    "step": 1
+                }),
+                "dpi": ("INT", {
+                    "default": 300,
+                    "min": 72,
+                    "max": 600,
+                    "step": 1
+                }),
+            },
+            "optional": dict(PAGE_SIZE_INPUTS),
+        }
+
+    RETURN_TYPES = ("STRING", "FLOAT")
+    RETURN_NAMES = ("容量表", "目标数量最大直径")
+    FUNCTION = "calculate"
+    CATEGORY = "徽章工具"
+
+    def calculate(self, diameter_min_mm, diameter_max_mm, diameter_step_mm, layout_type,
+                  spacing_mm, margin_mm, target_count, dpi, **page_inputs):
+        """
+        只用几何模型计算（不渲染），直径与徽章A4排版节点的diameter_mm含义相同，
+        纸张规格同徽章A4排版节点（默认A4）
+
+        返回:
+            容量表文本；每页放target_count个时的最大直径（target_count为0或放不下时为0）
+        """
+        layout_types = self.LAYOUT_TYPES[layout_type]
+        spec = page_spec_from_inputs(dpi, **page_inputs)
+        diameters = float_range(diameter_min_mm, max(diameter_min_mm, diameter_max_mm), diameter_step_mm)
+        entries = capacity_table(diameters, (spacing_mm,), (margin_mm,), layout_types,
+                                 dpi=spec.dpi, page_size_mm=spec.size_mm)
+        report = format_capacity_table(entries)
+
+        max_diameter = 0.0
+        if target_count > 0:
+            lines = []
+            for layout in layout_types:
+                entry = max_diameter_for_count(target_count, spacing_mm, margin_mm, layout,
+                                               dpi=spec.dpi, page_size_mm=spec.size_mm)
+                if entry is not None and entry.diameter_mm > max_diameter:
+                    max_diameter = entry.diameter_mm
+                result = f"{entry.diameter_mm:g}mm" if entry else "放不下"
+                lines.append(f"每页{target_count}个（{'网格' if layout == 'grid' else '紧凑'}）: {result}")
+            report += "\n\n" + "\n".join(lines)
+
+        return (report, max_diameter)
+
+
+class BadgeCutFileNode:
+    """切割机裁切文件节点 - 按排版为每页生成SVG/DXF裁切文件（与徽章A4排版节点的点阵一致）"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "diameter_mm": ("FLOAT", {
+                    "default": 58.0,
+                    "min": 10.0,
+                    "max": 200.0,
+                    "step": 1.0
+                }),
+                "bleed_mm": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 20.0,
+                    "step": 0.5
+                }),
+                "layout_type": (["网格", "紧凑"],),
+                "spacing_mm": ("FLOAT", {
+                    "default": 5.0,
+                    "min": 0.0,
+                    "max": 20.0,
+                    "step": 0.5
+                }),
+                "margin_mm": ("FLOAT", {
+                    "default": 10.0,
+                    "min": 0.0,
+                    "max": 50.0,
+                    "step": 1.0
+                }),
+                "badge_count": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 100000,
+                    "step": 1
+                }),
+                "file_format": (list(CUT_FILE_WRITERS),),
+                "filename_prefix": ("STRING", {"default": "badge"}),
+                "dpi": ("INT", {
+                    "default": 300,
+                    "min": 72,
+                    "max": 600,
+                    "step": 1
+                }),
+            },
+            "optional": dict(PAGE_SIZE_INPUTS),
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("文件路径", "页数")
+    FUNCTION = "generate"
+    OUTPUT_NODE = True
+    CATEGORY = "徽章工具"
+
+    def generate(self, diameter_mm, bleed_mm, layout_type, spacing_mm, margin_mm, badge_count,
+                 file_format, filename_prefix, dpi, **page_inputs):
+        """
+        逐页写出裁切文件到ComfyUI的输出目录（边计算边写入，不在内存中构建文档）
+
+        参数:
+            diameter_mm: 印刷圆直径（含出血，与徽章A4排版节点相同）
+            bleed_mm: 出血宽度，裁切线直径 = diameter_mm - 2×bleed_mm
+            badge_count: 徽章数量，0为一整页
+        返回:
+            各页文件路径（每行一个）；页数
+        """
+        spec = page_spec_from_inputs(dpi, **page_inputs)
+        layout = get_page_layout(
+            "grid" if layout_type == "网格" else "compact", spec, diameter_mm, spacing_mm, margin_mm
+        )
+        count = badge_count or layout.max_count
+        multi_layout = plan_uniform(layout, count, spec, spacing_mm, margin_mm, diameter_mm).to_dict()
+
+        try:
+            import folder_paths
+            output_dir = folder_paths.get_output_directory()
+        except ImportError:
+            output_dir = os.path.join(os.getcwd(), "output")
+        os.makedirs(output_dir, exist_ok=True)
+
+        output_path = os.path.join(output_dir, f"{filename_prefix}.{file_format}")
+        paths = list(iter_cut_files(multi_layout, output_path, diameter_mm, bleed_mm, file_format))
+        return ("\n".join(paths), len(paths))
+
+
 # 节点映射字典
 NODE_CLASS_MAPPINGS = {
     "CircularCropNode": CircularCropNode,
@@ -865,6 +994,8 @@ NODE_CLASS_MAPPINGS = {
     "ParameterAdjustNode": ParameterAdjustNode,
     "VisualGuideCropNode": VisualGuideCropNode,
     "InteractiveImageEditorNode": InteractiveImageEditorNode,
+    "BadgeCapacityNode": BadgeCapacityNode,
+    "BadgeCutFileNode": BadgeCutFileNode,
 }
 
 # 节点显示名称映射
@@ -876,6 +1007,8 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "ParameterAdjustNode": "参数微调",
     "VisualGuideCropNode": "可视化引导裁剪",
     "InteractiveImageEditorNode": "🎮 交互式拖拽编辑器",
+    "BadgeCapacityNode": "徽章排版容量表",
+    "BadgeCutFileNode": "切割机裁切文件",
 }
 
 # Web目录配置（告诉ComfyUI加载前端文件）
@@ -0,0 +1,370 @@
+"""
+BadgePatternTool 命令行入口
+无需图形界面的批量排版导出工具，适用于构建服务器上的定时任务
+
+用法:
+    python -m src.cli export <文件夹或清单> -o <输出路径> [选项]
+    python src/cli.py export <文件夹或清单> -o <输出路径> [--page SRA3@600] [选项]
+    python -m src.cli cutfile [<文件夹或清单>] -o <输出路径> [-n 数量] [-f svg|dxf] [选项]
+    python -m src.cli capacity [-d 25:80:1] [-n 12] [--page A3] [选项]
+"""
+
+import argparse
+import os
+import signal
+import sys
+import time
+
+# 确保可以导入src下的模块（支持 python -m src.cli 与 python src/cli.py 两种方式）
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+
+from common.constants import (
+    APP_NAME, APP_VERSION, DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM, DEFAULT_LAYOUT, DEFAULT_PAGE_SIZE,
+    PAGE_SIZES_MM, DEFAULT_PDF_MODE, PDF_EXPORT_MODES, mm_to_pixels
+)
+from common.error_handler import logger, BadgeToolError
+from utils.config import app_config
+from utils.manifest import load_entries
+from core.project_model import BadgeProject
+from core.page_spec import parse_page_spec
+from core.overlay import OverlayOptions, CUT_FILE_WRITERS
+from core.export_job import ExportJob
+from core.raster_writers import TIFF_COMPRESSIONS, DEFAULT_TIFF_COMPRESSION
+from core.color_management import COLOR_MODES, DEFAULT_COLOR_MODE, SRGB_PROFILE, ColorSettings
+
+
+def _progress_printer(quiet):
+    """创建输出到stderr的导出任务进度回调（每完成一页输出一行，含写入大小和剩余时间）"""
+    last_pages = [0]
+
+    def report(progress):
+        if quiet or progress.pages_done == last_pages[0]:
+            return
+        last_pages[0] = progress.pages_done
+        print(f"[{progress.pages_done}/{progress.total_pages}] {progress.describe()}", file=sys.stderr, flush=True)
+
+    return report
+
+
+def _apply_badge_config(args):
+    """将命令行中的徽章尺寸写入全局配置"""
+    if args.badge_size is not None:
+        app_config.badge_size_mm = args.badge_size
+    if args.bleed is not None:
+        app_config.bleed_size_mm = args.bleed
+
+
+def _output_path(output, format_type):
+    """输出文件路径：扩展名由输出格式决定（-f png -o x.pdf 写出 x.png）"""
+    return f"{os.path.splitext(output)[0]}.{format_type.lower()}"
+
+
+def _auto_scale_entries(entries, image_processor, mixed=False):
+    """
+    为未指定缩放的条目计算最佳缩放（与界面的自动处理逻辑一致）
+    mixed为True时按条目自己的徽章尺寸计算（混合尺寸排版）
+    """
+    for entry in entries:
+        if entry.scale is None:
+            diameter_px = None
+            if mixed and entry.badge_size_mm:
+                diameter_px = mm_to_pixels(entry.badge_size_mm + 2 * app_config.bleed_size_mm)
+            entry.scale = image_processor.get_optimal_scale(entry.file_path, diameter_px=diameter_px)
+
+
+def run_export(args):
+    """执行批量导出子命令"""
+    from core.export_manager import ExportManager
+
+    _apply_badge_config(args)
+
+    entries = load_entries(args.source)
+    missing = [entry.file_path for entry in entries if not os.path.isfile(entry.file_path)]
+    if missing:
+        for path in missing:
+            print(f"文件不存在: {path}", file=sys.stderr)
+        return 1
+
+    page_spec = parse_page_spec(args.page, args.dpi)
+    export_manager = ExportManager()
+    _auto_scale_entries(entries, export_manager.image_processor, args.layout == 'mixed')
+
+    # 列式项目数据：按页切片时才构建对应区间的徽章
+    expanded = BadgeProject.from_items(entries).expanded()
+    if not expanded:
+        print("没有可导出的图片", file=sys.stderr)
+        return 1
+
+    # 扩展名由输出格式决定，报告的路径即实际写出的文件
+    args.output = _output_path(args.output, args.format)
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+
+    format_type = args.format.upper()
+    print(f"导出 {len(expanded)} 个徽章（{len(entries)} 种），格式 {format_type}，"
+          f"页面 {page_spec.label}，线程数 {args.workers}", file=sys.stderr)
+
+    plan = export_manager.layout_engine.plan_job(
+        expanded, args.layout, args.spacing, args.margin, page_spec, args.group
+    )
+    print(f"排版规划: {plan.total_pages} 页，面积利用率 {plan.utilization:.1%}", file=sys.stderr)
+
+    # Ctrl+C 请求协作式取消：当前徽章处理完后停止（PDF不会写出不完整的文件）
+    job = ExportJob(progress_callback=_progress_printer(args.quiet))
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: job.cancel())
+    start_time = time.time()
+    try:
+        success, count = _export(export_manager, expanded, format_type, page_spec, plan, job, args)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    if job.cancelled:
+        print(f"导出已取消: 已处理 {count} 个徽章", file=sys.stderr)
+        return 130
+    if not success:
+        print("导出失败", file=sys.stderr)
+        return 1
+
+    # 写出的文件逐行输出到stdout，便于脚本处理
+    paths = export_manager.last_image_paths if format_type in ('PNG', 'JPEG') else [args.output]
+    print(f"导出完成: {count} 个徽章，用时 {time.time() - start_time:.1f}s，写出 {len(paths)} 个文件",
+          file=sys.stderr)
+    for path in paths:
+        print(path)
+    return 0
+
+
+def _export(export_manager, expanded, format_type, page_spec, plan, job, args):
+    """按格式执行导出，返回 (是否成功, 数量)"""
+    if format_type == 'PDF':
+        overlay = None
+        if args.cut_lines or args.marks:
+            overlay = OverlayOptions(cut=args.cut_lines, bleed=args.cut_lines, registration=args.marks)
+        success, count = export_manager.export_multi_page_to_pdf(
+            expanded, args.output, args.layout, args.spacing, args.margin,
+            workers=args.workers, page_spec=page_spec, plan=plan, pdf_mode=args.pdf_mode,
+            overlay=overlay, cut_file=args.cut_file, target_dpi=args.target_dpi, job=job,
+            color=_color_settings(args)
+        )
+        report = export_manager.last_pdf_report
+        if success and report:
+            print(f"源图片嵌入: {report['sources']} 个（JPEG直接嵌入 {report['passthrough']}，"
+                  f"缩小到{report['target_dpi']}dpi {report['downsampled']}，无损 {report['decoded']}），"
+                  f"节省 {report['saved_bytes'] / 1024 / 1024:.1f}MB", file=sys.stderr)
+    elif format_type == 'TIFF':
+        success, count = export_manager.export_raster_document(
+            expanded, args.output, 'tiff', args.layout, args.spacing, args.margin,
+            workers=args.workers, page_spec=page_spec, plan=plan, job=job, compression=args.tiff_compression,
+            color=_color_settings(args), cut_file=args.cut_file
+        )
+    else:
+        base_path = os.path.splitext(args.output)[0]
+        success, count = export_manager.export_multi_page_to_images(
+            expanded, base_path, format_type, args.layout, args.spacing, args.margin,
+            workers=args.workers, page_spec=page_spec, plan=plan, job=job, incremental=args.incremental,
+            color=_color_settings(args)
+        )
+        report = export_manager.last_incremental_report
+        if success and report:
+            print(f"增量导出: 跳过未变化的页面 {report['skipped']} 页，重新写入 {report['written']} 页", file=sys.stderr)
+        if success and args.cut_file:
+            export_manager.export_cut_files(plan, args.output, args.cut_file)
+    return success, count
+
+
+def _color_settings(args):
+    """色彩阶段设置：未指定色彩参数时为None（不经过色彩管理的RGB）"""
+    color_mode = args.color_mode.upper()
+    if color_mode == DEFAULT_COLOR_MODE and args.output_profile is None and args.source_profile is None:
+        return None
+    return ColorSettings(color_mode, args.output_profile, args.source_profile or SRGB_PROFILE)
+
+
+def run_cutfile(args):
+    """执行裁切文件子命令：只按排版生成切割机使用的SVG/DXF（每页一个），不读取图片内容"""
+    from core.layout_engine import LayoutEngine
+    from core.overlay import iter_cut_files
+
+    _apply_badge_config(args)
+
+    if args.count is not None:
+        # 不提供图片时按数量排版（网格/紧凑）
+        if args.layout == 'mixed':
+            print("混合尺寸排版需要提供图片清单", file=sys.stderr)
+            return 1
+        items = None
+    else:
+        if args.source is None:
+            print("请提供图片文件夹/清单，或用 -n 指定徽章数量", file=sys.stderr)
+            return 1
+        items = BadgeProject.from_items(load_entries(args.source)).expanded()
+
+    page_spec = parse_page_spec(args.page, args.dpi)
+    layout_engine = LayoutEngine(page_spec)
+    if items is None:
+        multi_layout = layout_engine.calculate_multi_page_layout(args.count, args.layout, args.spacing, args.margin)
+    else:
+        multi_layout = layout_engine.plan_job(items, args.layout, args.spacing, args.margin,
+                                              group_designs=args.group).to_dict()
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+
+    total_pages = multi_layout['total_pages']
+    paths = iter_cut_files(multi_layout, args.output, app_config.badge_diameter_mm, app_config.bleed_size_mm,
+                           args.format)
+    for pages_done, path in enumerate(paths, 1):
+        if not args.quiet:
+            print(f"[{pages_done}/{total_pages}] {path}", file=sys.stderr, flush=True)
+
+    print(f"裁切文件已生成: {total_pages} 页，{multi_layout['total_images']} 个徽章", file=sys.stderr)
+    return 0
+
+
+def run_capacity(args):
+    """执行容量表子命令：只用几何模型计算，不读取图片"""
+    from core.capacity import (
+        capacity_table, max_diameter_for_count, parse_range, format_capacity_table, LAYOUT_NAMES
+    )
+
+    bleed = args.bleed if args.bleed is not None else app_config.bleed_size_mm
+    page_spec = parse_page_spec(args.page, args.dpi)
+    spacings = parse_range(args.spacing)
+    margins = parse_range(args.margin)
+
+    if args.count is not None:
+        # 反向查询：每页至少放N个时的最大直径
+        for layout_type in args.layout:
+            for spacing in spacings:
+                for margin in margins:
+                    entry = max_diameter_for_count(args.count, spacing, margin, layout_type, bleed,
+                                                   page_spec.dpi, page_spec.size_mm)
+                    label = f"{LAYOUT_NAMES[layout_type]} 间距{spacing:g}mm 边距{margin:g}mm"
+                    if entry is None:
+                        print(f"{label}: 无法每页放下{args.count}个")
+                    else:
+                        print(f"{label}: 每页{args.count}个时最大直径 {entry.diameter_mm:g}mm"
+                              f"（实际可放{entry.count}个，{entry.arrangement}）")
+        return 0
+
+    entries = capacity_table(parse_range(args.diameter), spacings, margins, args.layout, bleed,
+                             page_spec.dpi, page_spec.size_mm)
+    if args.csv:
+        print("layout,diameter_mm,bleed_mm,spacing_mm,margin_mm,count,arrangement,utilization")
+        for entry in entries:
+            print(f"{entry.layout_type},{entry.diameter_mm:g},{entry.bleed_mm:g},{entry.spacing_mm:g},"
+                  f"{entry.margin_mm:g},{entry.count},{entry.arrangement},{entry.utilization:.4f}")
+    else:
+        print(format_capacity_table(entries))
+    return 0
+
+
+def _add_page_arguments(parser):
+    """添加页面规格参数（纸张尺寸、分辨率）"""
+    parser.add_argument("--page", default=DEFAULT_PAGE_SIZE,
+                        help=f"纸张规格：{'/'.join(PAGE_SIZES_MM)}，或自定义 宽x高（毫米，如卷筒纸 330x1000），"
+                             f"可附加 @DPI（如 SRA3@600），默认{DEFAULT_PAGE_SIZE}")
+    parser.add_argument("--dpi", type=int, default=None, help="输出分辨率（默认300，--page中写了@DPI时以其为准）")
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="badgepattern",
+        description=f"{APP_NAME} {APP_VERSION} 命令行批量排版工具"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="批量排版并导出PDF/PNG/JPEG/多页TIFF")
+    export_parser.add_argument("source", help="图片文件夹，或CSV/JSON清单（path, quantity, scale, offset_x, offset_y, rotation, badge_size_mm）")
+    export_parser.add_argument("-o", "--output", required=True, help="输出文件路径（扩展名由输出格式决定，多页图片会自动添加页码后缀）")
+    export_parser.add_argument("-f", "--format", choices=["pdf", "png", "jpeg", "tiff"], default="pdf",
+                               help="输出格式（默认pdf；tiff为所有页面写入同一个多页TIFF）")
+    export_parser.add_argument("-l", "--layout", choices=["grid", "compact", "mixed"], default=DEFAULT_LAYOUT,
+                               help="排版模式（mixed按清单中每个徽章的badge_size_mm混合排版）")
+    export_parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING_MM, help="徽章间距（毫米）")
+    export_parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN_MM, help="页边距（毫米）")
+    export_parser.add_argument("--badge-size", type=float, default=None, help="徽章直径（毫米）")
+    export_parser.add_argument("--bleed", type=float, default=None, help="出血半径（毫米）")
+    export_parser.add_argument("--group", action="store_true", help="相同图案集中排放（便于裁切后分拣，不增加页数）")
+    export_parser.add_argument("--pdf-mode", choices=list(PDF_EXPORT_MODES), default=DEFAULT_PDF_MODE,
+                               help="PDF导出模式：vector 源图片只嵌入一次并用圆形剪切路径裁切（默认），raster 逐个嵌入裁剪好的图块，"
+                                    "page 每页一张整页位图（供印刷RIP使用）")
+    export_parser.add_argument("--cut-lines", action="store_true", help="在PDF中绘制矢量裁切线（专色CutContour）和出血线")
+    export_parser.add_argument("--marks", action="store_true", help="在PDF中绘制四角套准标记")
+    export_parser.add_argument("--cut-file", choices=list(CUT_FILE_WRITERS), default=None,
+                               help="另存切割机使用的裁切文件（PDF和图片格式均可，每页一个，<输出>_cut[_第N页].svg/.dxf）")
+    export_parser.add_argument("--target-dpi", type=int, default=None,
+                               help="矢量PDF中源图片的目标有效分辨率（超出时缩小一次，不超出的JPEG原样嵌入），默认为页面分辨率")
+    export_parser.add_argument("--tiff-compression", choices=list(TIFF_COMPRESSIONS), default=DEFAULT_TIFF_COMPRESSION,
+                               help="多页TIFF的压缩方式（默认lzw）")
+    export_parser.add_argument("--color-mode", choices=[mode.lower() for mode in COLOR_MODES],
+                               default=DEFAULT_COLOR_MODE.lower(),
+                               help="输出色彩模式（默认rgb；cmyk支持tiff、jpeg和整页位图PDF）")
+    export_parser.add_argument("--output-profile", default=None,
+                               help="输出（印刷机）ICC配置文件：每个不同的徽章图块经色彩管理转换一次，配置文件嵌入输出文件")
+    export_parser.add_argument("--source-profile", default=None,
+                               help="源图片未嵌入ICC配置文件时使用的源配置文件（默认sRGB）")
+    export_parser.add_argument("--incremental", action="store_true",
+                               help="增量导出图片：按页面清单（<输出>.pages.json）跳过内容未变化的页面，中断后再次执行可继续")
+    _add_page_arguments(export_parser)
+    export_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="并行线程数")
+    export_parser.add_argument("-q", "--quiet", action="store_true", help="不输出逐页进度")
+    export_parser.set_defaults(handler=run_export)
+
+    cutfile_parser = subparsers.add_parser("cutfile", help="按排版为切割机生成SVG/DXF裁切文件（每页一个）")
+    cutfile_parser.add_argument("source", nargs="?", default=None,
+                                help="图片文件夹或CSV/JSON清单（与export相同，决定数量和混合尺寸）")
+    cutfile_parser.add_argument("-o", "--output", required=True,
+                                help="输出路径（生成 <输出>_cut.svg，多页时为 <输出>_cut_第N页.svg）")
+    cutfile_parser.add_argument("-f", "--format", choices=list(CUT_FILE_WRITERS), default="svg",
+                                help="裁切文件格式（默认svg）")
+    cutfile_parser.add_argument("-n", "--count", type=int, default=None, help="不提供图片时按徽章数量排版")
+    cutfile_parser.add_argument("-l", "--layout", choices=["grid", "compact", "mixed"], default=DEFAULT_LAYOUT,
+                                help="排版模式（须与导出时一致）")
+    cutfile_parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING_MM, help="徽章间距（毫米）")
+    cutfile_parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN_MM, help="页边距（毫米）")
+    cutfile_parser.add_argument("--badge-size", type=float, default=None, help="徽章直径（毫米）")
+    cutfile_parser.add_argument("--bleed", type=float, default=None, help="出血半径（毫米）")
+    cutfile_parser.add_argument("--group", action="store_true", help="相同图案集中排放（须与导出时一致）")
+    _add_page_arguments(cutfile_parser)
+    cutfile_parser.add_argument("-q", "--quiet", action="store_true", help="不输出逐页进度")
+    cutfile_parser.set_defaults(handler=run_cutfile)
+
+    capacity_parser = subparsers.add_parser("capacity", help="计算每页可放置的徽章数量（容量表/最大直径反查）")
+    capacity_parser.add_argument("-d", "--diameter", default="25:80:1",
+                                 help="徽章直径（毫米，不含出血）：单值、逗号列表或 起点:终点:步长（默认25:80:1）")
+    capacity_parser.add_argument("--spacing", default=str(DEFAULT_SPACING_MM), help="间距（毫米），格式同--diameter")
+    capacity_parser.add_argument("--margin", default=str(DEFAULT_MARGIN_MM), help="页边距（毫米），格式同--diameter")
+    capacity_parser.add_argument("-l", "--layout", nargs="+", choices=["grid", "compact"],
+                                 default=["grid", "compact"], help="排版模式（可多选）")
+    capacity_parser.add_argument("--bleed", type=float, default=None, help="出血半径（毫米），默认使用当前配置")
+    _add_page_arguments(capacity_parser)
+    capacity_parser.add_argument("-n", "--count", type=int, default=None,
+                                 help="反向查询：每页至少放N个时的最大徽章直径")
+    capacity_parser.add_argument("--csv", action="store_true", help="以CSV格式输出容量表")
+    capacity_parser.set_defaults(handler=run_capacity)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行主入口"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if getattr(args, "workers", 1) < 1:
+        parser.error("--workers 必须大于0")
+
+    try:
+        return args.handler(args)
+    except (BadgeToolError, OSError, ValueError) as e:
+        logger.error(f"命令执行失败: {e}")
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
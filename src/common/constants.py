@@ -14,6 +14,15 @@ DEFAULT_BLEED_SIZE_MM = 5       # 默认出血半径：5mm
 A4_WIDTH_MM = 210               # A4纸宽度
 A4_HEIGHT_MM = 297              # A4纸高度
 
+# 纸张规格（宽, 高，单位：mm），自定义尺寸（如卷筒纸）见 core.page_spec
+PAGE_SIZES_MM = {
+    "A4": (210, 297),
+    "A3": (297, 420),
+    "Letter": (215.9, 279.4),
+    "SRA3": (320, 450),
+}
+DEFAULT_PAGE_SIZE = "A4"        # 默认纸张
+
 # 布局配置（根据打印机测试结果调整）
 DEFAULT_SPACING_MM = 3          # 默认间距：3mm
 DEFAULT_MARGIN_MM = 6           # 默认页边距：6mm
@@ -27,6 +36,9 @@ DEFAULT_BLEED_OPACITY = 24      # 出血区不透明度（%）
 # DPI配置
 PRINT_DPI = 300                 # 打印分辨率
 SCREEN_DPI = 96                 # 屏幕显示分辨率
+PAGE_DPI_OPTIONS = (150, 300, 600)  # 界面提供的输出分辨率（150用于快速打样）
+MIN_PAGE_DPI = 72               # 输出分辨率下限
+MAX_PAGE_DPI = 1200             # 输出分辨率上限
 
 # 界面配置
 WINDOW_WIDTH = 1420             # 主窗口宽度
@@ -44,6 +56,9 @@ SUPPORTED_IMAGE_FORMATS = [
     ("所有文件", "*.*")
 ]
 
+# 支持导入的图片扩展名
+SUPPORTED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff']
+
 EXPORT_FORMATS = [
     ("PDF文件", "*.pdf"),
     ("PNG文件", "*.png"),
@@ -52,7 +67,18 @@ EXPORT_FORMATS = [
 
 # 默认设置
 DEFAULT_LAYOUT = "compact"      # 默认布局模式
+LAYOUT_MODE_NAMES = {            # 布局模式的显示名称（mixed为按每个徽章自己的直径混合排版）
+    'grid': '网格排列',
+    'compact': '紧密排列',
+    'mixed': '混合尺寸',
+}
 DEFAULT_EXPORT_FORMAT = "PNG"  # 默认导出格式
+PDF_EXPORT_MODES = {             # PDF导出模式：vector为源图片只嵌入一次+圆形剪切路径，raster为逐个嵌入裁剪好的图块，
+    'vector': '矢量',               # page为每页一张整页位图（供印刷RIP使用）
+    'raster': '位图',
+    'page': '整页位图',
+}
+DEFAULT_PDF_MODE = "vector"
 
 # 颜色配置
 COLORS = {
@@ -68,10 +94,12 @@ COLORS = {
 }
 
 # 性能配置
-MAX_IMAGE_COUNT = 50            # 最大图片数量
 MAX_IMAGE_SIZE_MB = 10          # 单张图片最大大小（MB）
 PREVIEW_UPDATE_DELAY = 100      # 预览更新延迟（毫秒）
 MAX_CACHE_SIZE = 50             # 最大缓存数量
+DISK_CACHE_MAX_MB = 200         # 磁盘缩略图缓存上限（MB）
+DISK_CACHE_FILENAME = "thumbnails.sqlite3"  # 磁盘缓存文件名
+PYRAMID_LEVELS = (512, 256)     # 磁盘缓存中保存的缩小图层级（长边像素）
 
 # 预设徽章尺寸（直径mm + 出血半径mm）
 PRESET_BADGE_SIZES = [
@@ -4,19 +4,15 @@
 """
 
 import sys
+import importlib.util
 import traceback
 import logging
 from typing import Optional, Callable, Any
 from contextlib import contextmanager
 from functools import wraps
 
-# 尝试导入PySide6，如果不可用则使用None
-try:
-    from PySide6.QtWidgets import QMessageBox
-    PYSIDE6_AVAILABLE = True
-except ImportError:
-    QMessageBox = None
-    PYSIDE6_AVAILABLE = False
+# 只检测PySide6是否安装，消息框在需要时才导入，避免无界面环境加载Qt
+PYSIDE6_AVAILABLE = importlib.util.find_spec("PySide6") is not None
 
 
 class BadgeToolError(Exception):
@@ -39,6 +35,11 @@ class ExportError(BadgeToolError):
     pass
 
 
+class ExportCancelled(ExportError):
+    """导出被用户取消"""
+    pass
+
+
 class ConfigError(BadgeToolError):
     """配置相关错误"""
     pass
@@ -59,26 +60,40 @@ def setup_logging(log_level=logging.INFO):
 logger = setup_logging()
 
 
+def _get_message_box():
+    """
+    获取可用的QMessageBox
+    只有界面已经加载Qt并创建了QApplication时才返回，命令行等无界面环境返回None
+    """
+    if not PYSIDE6_AVAILABLE or 'PySide6.QtWidgets' not in sys.modules:
+        return None
+    from PySide6.QtWidgets import QApplication, QMessageBox
+    return QMessageBox if QApplication.instance() else None
+
+
 def show_error_message(title: str, message: str, parent=None):
     """显示错误消息框"""
-    if PYSIDE6_AVAILABLE and QMessageBox:
-        QMessageBox.critical(parent, title, message)
+    message_box = _get_message_box()
+    if message_box:
+        message_box.critical(parent, title, message)
     else:
         print(f"ERROR - {title}: {message}")
 
 
 def show_warning_message(title: str, message: str, parent=None):
     """显示警告消息框"""
-    if PYSIDE6_AVAILABLE and QMessageBox:
-        QMessageBox.warning(parent, title, message)
+    message_box = _get_message_box()
+    if message_box:
+        message_box.warning(parent, title, message)
     else:
         print(f"WARNING - {title}: {message}")
 
 
 def show_info_message(title: str, message: str, parent=None):
     """显示信息消息框"""
-    if PYSIDE6_AVAILABLE and QMessageBox:
-        QMessageBox.information(parent, title, message)
+    message_box = _get_message_box()
+    if message_box:
+        message_box.information(parent, title, message)
     else:
         print(f"INFO - {title}: {message}")
 
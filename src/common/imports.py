@@ -4,36 +4,46 @@
 """
 
 import sys
+import importlib
+import importlib.util
 from typing import Optional, Any
 
 
 class OptionalImport:
-    """可选导入类，用于处理可能不存在的依赖"""
+    """可选导入类，用于处理可能不存在的依赖（第一次使用时才真正导入）"""
     
     def __init__(self, module_name: str, package: Optional[str] = None):
         self.module_name = module_name
         self.package = package
         self.module = None
-        self.available = False
+        self._attempted = False
         self._import_error = None
-        
-        self._try_import()
     
     def _try_import(self):
-        """尝试导入模块"""
+        """尝试导入模块（只执行一次）"""
+        if self._attempted:
+            return
+        self._attempted = True
         try:
             if self.package:
                 self.module = __import__(self.package, fromlist=[self.module_name])
                 self.module = getattr(self.module, self.module_name)
             else:
-                self.module = __import__(self.module_name)
-            self.available = True
+                self.module = importlib.import_module(self.module_name)
         except ImportError as e:
+            self.module = None
             self._import_error = e
-            self.available = False
+    
+    @property
+    def available(self) -> bool:
+        """模块是否可用（首次访问时触发导入）"""
+        self._try_import()
+        return self.module is not None
     
     def __getattr__(self, name: str) -> Any:
         """获取模块属性"""
+        if name.startswith('__'):
+            raise AttributeError(name)
         if not self.available:
             raise ImportError(f"Module '{self.module_name}' is not available: {self._import_error}")
         return getattr(self.module, name)
@@ -44,35 +54,55 @@ class OptionalImport:
 
 
 # 常用的可选导入
-PYSIDE6_AVAILABLE = False
+# PySide6和reportlab只检测是否安装，不在导入时加载：核心模块（排版、裁剪、导出）可以在无GUI环境下使用，
+# 启动时也不必为从未使用的PDF导出付出导入时间。这些符号在第一次被访问时才真正导入（见模块级 __getattr__）
+PYSIDE6_AVAILABLE = importlib.util.find_spec("PySide6") is not None
+REPORTLAB_AVAILABLE = importlib.util.find_spec("reportlab") is not None
 PIL_AVAILABLE = False
-REPORTLAB_AVAILABLE = False
 
-try:
+# 延迟导入的符号 -> 所属模块
+_LAZY_SYMBOLS = {
     # QtWidgets
-    from PySide6.QtWidgets import (
-        QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-        QLabel, QPushButton, QListWidget, QListWidgetItem,
-        QSlider, QRadioButton, QComboBox, QButtonGroup, QSpinBox,
-        QMessageBox, QStatusBar, QSplitter, QGroupBox,
-        QSpacerItem, QSizePolicy
-    )
+    **dict.fromkeys([
+        'QApplication', 'QMainWindow', 'QWidget', 'QVBoxLayout', 'QHBoxLayout',
+        'QLabel', 'QPushButton', 'QListWidget', 'QListWidgetItem',
+        'QSlider', 'QRadioButton', 'QComboBox', 'QButtonGroup', 'QSpinBox',
+        'QMessageBox', 'QStatusBar', 'QSplitter', 'QGroupBox',
+        'QSpacerItem', 'QSizePolicy'
+    ], 'PySide6.QtWidgets'),
     # QtCore
-    from PySide6.QtCore import Qt, QTimer, QSize, QPoint
+    **dict.fromkeys(['Qt', 'QTimer', 'QSize', 'QPoint'], 'PySide6.QtCore'),
     # QtGui
-    from PySide6.QtGui import QPixmap, QIcon, QAction, QPainter
+    **dict.fromkeys(['QPixmap', 'QIcon', 'QAction', 'QPainter'], 'PySide6.QtGui'),
     # QtPrintSupport
-    from PySide6.QtPrintSupport import QPrinter
-    PYSIDE6_AVAILABLE = True
-except ImportError:
-    # 如果导入失败，设置为None
-    QApplication = QMainWindow = QWidget = QVBoxLayout = QHBoxLayout = None
-    QLabel = QPushButton = QListWidget = QListWidgetItem = None
-    QSlider = QRadioButton = QComboBox = QButtonGroup = QSpinBox = None
-    QMessageBox = QStatusBar = QSplitter = QGroupBox = None
-    QSpacerItem = QSizePolicy = Qt = QTimer = QSize = QPoint = None
-    QPixmap = QIcon = QAction = QPainter = QPrinter = None
-    PYSIDE6_AVAILABLE = False
+    'QPrinter': 'PySide6.QtPrintSupport',
+    # reportlab
+    'canvas': 'reportlab.pdfgen',
+    'A4': 'reportlab.lib.pagesizes',
+}
+
+_PACKAGE_AVAILABLE = {
+    'PySide6': PYSIDE6_AVAILABLE,
+    'reportlab': REPORTLAB_AVAILABLE,
+}
+
+
+def __getattr__(name: str) -> Any:
+    """按需导入可选依赖的符号（PEP 562），不可用时返回None以保持旧接口行为"""
+    module_name = _LAZY_SYMBOLS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    value = None
+    if _PACKAGE_AVAILABLE[module_name.split('.')[0]]:
+        try:
+            value = getattr(importlib.import_module(module_name), name)
+        except (ImportError, AttributeError):
+            value = None
+
+    globals()[name] = value
+    return value
+
 
 try:
     from PIL import Image, ImageDraw
@@ -80,13 +110,6 @@ try:
 except ImportError:
     Image = ImageDraw = None
 
-try:
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    canvas = A4 = None
-
 
 def check_required_dependencies():
     """检查必需的依赖是否可用"""
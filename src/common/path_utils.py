@@ -48,5 +48,25 @@ def get_icon_path(icon_name="icon.ico"):
     return icon_path
 
 
+def get_cache_dir():
+    """
+    获取用户缓存目录（可通过环境变量 BADGEPATTERN_CACHE_DIR 覆盖）
+    Windows: %LOCALAPPDATA%/BadgePatternTool/cache
+    macOS: ~/Library/Caches/BadgePatternTool
+    Linux: $XDG_CACHE_HOME/BadgePatternTool（默认 ~/.cache）
+    """
+    override = os.environ.get("BADGEPATTERN_CACHE_DIR")
+    if override:
+        return Path(override)
+
+    home = Path.home()
+    if sys.platform.startswith("win"):
+        base = Path(os.environ.get("LOCALAPPDATA", home / "AppData" / "Local"))
+        return base / "BadgePatternTool" / "cache"
+    if sys.platform == "darwin":
+        return home / "Library" / "Caches" / "BadgePatternTool"
+    return Path(os.environ.get("XDG_CACHE_HOME", home / ".cache")) / "BadgePatternTool"
+
+
 # 自动设置路径（导入时执行）
 setup_project_paths()
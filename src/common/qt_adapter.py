@@ -0,0 +1,51 @@
+"""
+Qt适配模块
+PIL图像与Qt图像之间的转换集中在这里，核心模块只处理PIL图像，
+需要QPixmap时才通过本模块导入PySide6
+"""
+
+
+def pil_to_qpixmap(pil_image):
+    """
+    将PIL图片转换为QPixmap（直接拷贝像素数据，不经过PNG编码）
+    参数:
+        pil_image: PIL.Image对象
+    返回: QPixmap
+    """
+    from PySide6.QtGui import QPixmap
+
+    return QPixmap.fromImage(pil_to_qimage(pil_image))
+
+
+def pil_to_qimage(pil_image):
+    """
+    将PIL图片转换为QImage
+    与QPixmap不同，QImage可以在工作线程中创建，再交给界面线程显示
+    参数:
+        pil_image: PIL.Image对象
+    返回: QImage
+    """
+    from PySide6.QtGui import QImage
+
+    if pil_image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in pil_image.getbands() or 'transparency' in pil_image.info
+        pil_image = pil_image.convert('RGBA' if has_alpha else 'RGB')
+
+    if pil_image.mode == 'RGBA':
+        image_format, channels = QImage.Format.Format_RGBA8888, 4
+    else:
+        image_format, channels = QImage.Format.Format_RGB888, 3
+
+    width, height = pil_image.size
+    data = pil_image.tobytes()
+    # copy() 让QImage持有自己的缓冲区，避免引用已释放的bytes
+    return QImage(data, width, height, width * channels, image_format).copy()
+
+
+def create_blank_pixmap(width, height):
+    """创建白色空白QPixmap"""
+    from PySide6.QtGui import QPixmap
+
+    pixmap = QPixmap(width, height)
+    pixmap.fill()
+    return pixmap
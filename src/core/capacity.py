@@ -0,0 +1,155 @@
+"""
+排版容量计算模块
+只用几何模型（不渲染）批量计算不同徽章直径、间距、页边距和排版模式下每页可放置的数量，
+并支持反向查询“每页放N个时徽章最大能做多大”。
+只依赖 common.constants 和 core.packing，桌面端、命令行和ComfyUI节点共用
+"""
+
+import math
+from dataclasses import dataclass
+from itertools import product
+
+from common.constants import (
+    A4_WIDTH_MM, A4_HEIGHT_MM, PRINT_DPI, DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM, mm_to_pixels
+)
+from core.packing import packing_capacity, best_arrangement
+
+LAYOUT_TYPES = ('grid', 'compact')
+LAYOUT_NAMES = {'grid': '网格', 'compact': '紧凑'}
+
+# 反向查询的默认直径范围和精度（毫米）
+MIN_DIAMETER_MM = 10.0
+MAX_DIAMETER_MM = 200.0
+DIAMETER_PRECISION_MM = 0.1
+
+
+@dataclass(frozen=True)
+class CapacityEntry:
+    """容量表中的一行"""
+    layout_type: str
+    diameter_mm: float      # 徽章直径（不含出血）
+    bleed_mm: float         # 出血半径
+    spacing_mm: float
+    margin_mm: float
+    count: int              # 每页可放置数量
+    arrangement: str        # 紧凑模式选中的排列方式（网格模式为'grid'）
+    utilization: float      # 徽章（含出血）占页面面积的比例
+
+
+def grid_capacity(page_width, page_height, diameter, spacing, margin):
+    """网格排列每页数量（像素参数，与网格排版结果一致；徽章放不下时为0）"""
+    available_width = page_width - 2 * margin
+    available_height = page_height - 2 * margin
+    if available_width < diameter or available_height < diameter:
+        return 0
+    center_distance = diameter + spacing
+    return max(1, available_width // center_distance) * max(1, available_height // center_distance)
+
+
+def page_capacity(layout_type, diameter_mm, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                  bleed_mm=0.0, dpi=PRINT_DPI, page_size_mm=(A4_WIDTH_MM, A4_HEIGHT_MM)):
+    """
+    计算单个参数组合的每页数量
+    参数:
+        layout_type: 'grid' 或 'compact'
+        diameter_mm: 徽章直径（毫米，不含出血）
+        spacing_mm, margin_mm: 间距、页边距（毫米）
+        bleed_mm: 出血半径（毫米），印刷圆直径 = 徽章直径 + 2×出血
+        dpi: 计算使用的分辨率
+        page_size_mm: (页面宽, 页面高)（毫米）
+    返回: CapacityEntry
+    """
+    page_width = mm_to_pixels(page_size_mm[0], dpi)
+    page_height = mm_to_pixels(page_size_mm[1], dpi)
+    diameter = mm_to_pixels(diameter_mm + 2 * bleed_mm, dpi)
+    spacing = mm_to_pixels(spacing_mm, dpi)
+    margin = mm_to_pixels(margin_mm, dpi)
+
+    if layout_type == 'grid':
+        arrangement = 'grid'
+        count = grid_capacity(page_width, page_height, diameter, spacing, margin)
+    else:
+        arrangement, count = best_arrangement(
+            packing_capacity(page_width, page_height, diameter, spacing, margin)
+        )
+
+    circle_area = math.pi * ((diameter_mm + 2 * bleed_mm) / 2) ** 2
+    utilization = count * circle_area / (page_size_mm[0] * page_size_mm[1])
+    return CapacityEntry(layout_type, diameter_mm, bleed_mm, spacing_mm, margin_mm,
+                         count, arrangement, utilization)
+
+
+def capacity_table(diameters_mm, spacings_mm=(DEFAULT_SPACING_MM,), margins_mm=(DEFAULT_MARGIN_MM,),
+                   layout_types=LAYOUT_TYPES, bleed_mm=0.0, dpi=PRINT_DPI,
+                   page_size_mm=(A4_WIDTH_MM, A4_HEIGHT_MM)):
+    """
+    参数扫描：对所有组合计算每页数量
+    返回: list[CapacityEntry] - 按 排版模式、直径、间距、页边距 的顺序
+    """
+    return [
+        page_capacity(layout_type, diameter, spacing, margin, bleed_mm, dpi, page_size_mm)
+        for layout_type, diameter, spacing, margin
+        in product(layout_types, diameters_mm, spacings_mm, margins_mm)
+    ]
+
+
+def max_diameter_for_count(count, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                           layout_type='compact', bleed_mm=0.0, dpi=PRINT_DPI,
+                           page_size_mm=(A4_WIDTH_MM, A4_HEIGHT_MM),
+                           min_diameter_mm=MIN_DIAMETER_MM, max_diameter_mm=MAX_DIAMETER_MM,
+                           precision_mm=DIAMETER_PRECISION_MM):
+    """
+    反向查询：每页至少放count个时，徽章直径最大是多少
+    每页数量随直径增大而不增，按precision_mm的步长二分查找
+    返回: CapacityEntry（对应最大直径），最小直径也放不下时返回None
+    """
+    def entry(step):
+        diameter = round(min_diameter_mm + step * precision_mm, 6)
+        return page_capacity(layout_type, diameter, spacing_mm, margin_mm, bleed_mm, dpi, page_size_mm)
+
+    low, high = 0, int(round((max_diameter_mm - min_diameter_mm) / precision_mm))
+    best = entry(low)
+    if best.count < count:
+        return None
+
+    while low < high:
+        middle = (low + high + 1) // 2
+        candidate = entry(middle)
+        if candidate.count >= count:
+            low, best = middle, candidate
+        else:
+            high = middle - 1
+    return best
+
+
+def float_range(start, stop, step):
+    """包含终点的浮点等差序列（消除累积误差）"""
+    if step <= 0:
+        raise ValueError("步长必须大于0")
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + i * step, 6) for i in range(max(0, count))]
+
+
+def parse_range(text):
+    """
+    解析范围参数："25"、"25,32,58" 或 "25:80:5"（起点:终点:步长，包含终点）
+    返回: list[float]
+    """
+    if ':' in text:
+        parts = [float(part) for part in text.split(':')]
+        if len(parts) != 3:
+            raise ValueError(f"范围格式应为 起点:终点:步长 - {text}")
+        return float_range(*parts)
+    return [float(part) for part in text.split(',') if part.strip()]
+
+
+def format_capacity_table(entries):
+    """将容量表格式化为对齐的文本"""
+    lines = [f"{'模式':<4}  {'直径mm':>7}  {'间距mm':>6}  {'边距mm':>6}  {'每页':>4}  {'利用率':>6}  排列"]
+    for entry in entries:
+        lines.append(
+            f"{LAYOUT_NAMES.get(entry.layout_type, entry.layout_type):<4}  {entry.diameter_mm:>7g}  "
+            f"{entry.spacing_mm:>6g}  {entry.margin_mm:>6g}  {entry.count:>4}  "
+            f"{entry.utilization:>6.1%}  {entry.arrangement}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,141 @@
+"""
+色彩管理模块
+导出流程中可选的色彩阶段：按ICC配置文件把徽章图块从源配置文件（源图片嵌入的配置文件，没有时为sRGB）
+转换到输出（印刷机）配置文件，输出RGB或CMYK。
+转换在图块级进行：每个不同的图块只转换一次（结果与原图块一起缓存在共享图块缓存中），
+同一图块的多个副本和各页共用转换结果，不再逐页转换整页位图。
+ImageCms的配置文件读取和颜色变换的构建开销较大（每次几十毫秒），按 (源配置文件, 输出配置文件, 模式, 渲染意图) 缓存，
+整批任务只构建一次。未提供输出配置文件时：RGB输出sRGB，CMYK使用PIL的简单转换（不经过色彩管理）
+"""
+
+import io
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+from common.imports import Image, OptionalImport
+
+ImageCms = OptionalImport('ImageCms', 'PIL')
+
+# 输出色彩模式
+COLOR_MODES = ('RGB', 'CMYK')
+DEFAULT_COLOR_MODE = 'RGB'
+# 内置的源配置文件名称
+SRGB_PROFILE = 'sRGB'
+# 渲染意图：感知（照片类图像的常用选择）
+DEFAULT_INTENT = 0
+# 缓存的颜色变换数量
+TRANSFORM_CACHE_SIZE = 16
+# ICC配置文件头中色彩空间字段的位置
+ICC_COLOR_SPACE_FIELD = slice(16, 20)
+# 页面背景（纸白）
+PAPER_WHITE = (255, 255, 255)
+
+
+@dataclass(frozen=True)
+class ColorSettings:
+    """导出的色彩阶段设置（作为共享图块缓存键的一部分）"""
+    color_mode: str = DEFAULT_COLOR_MODE
+    output_profile: str = None      # 输出（印刷机）ICC配置文件路径，None为sRGB（RGB）或简单转换（CMYK）
+    source_profile: str = SRGB_PROFILE      # 源图片未嵌入配置文件时使用的源配置文件
+    intent: int = DEFAULT_INTENT
+
+    def __post_init__(self):
+        if self.color_mode not in COLOR_MODES:
+            raise ValueError(f"未知的输出色彩模式: {self.color_mode}")
+
+    def profile_bytes(self):
+        """嵌入输出文件的配置文件字节；没有输出配置文件时为None"""
+        return profile_bytes(self.output_profile)
+
+
+@lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def load_profile(profile):
+    """
+    读取ICC配置文件（按路径或内容缓存）
+    参数:
+        profile: 配置文件路径、内置名称 'sRGB'，或配置文件字节（源图片嵌入的配置文件）
+    返回: ImageCms.ImageCmsProfile
+    """
+    if isinstance(profile, bytes):
+        return ImageCms.ImageCmsProfile(io.BytesIO(profile))
+    if profile == SRGB_PROFILE:
+        return ImageCms.ImageCmsProfile(ImageCms.createProfile(SRGB_PROFILE))
+    if not os.path.isfile(profile):
+        raise ValueError(f"ICC配置文件不存在: {profile}")
+    return ImageCms.ImageCmsProfile(profile)
+
+
+@lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def get_transform(source_profile, output_profile, input_mode, output_mode, intent=DEFAULT_INTENT):
+    """
+    颜色变换（按参数缓存，同一批任务的所有图块共用）
+    参数:
+        source_profile / output_profile: 配置文件路径、'sRGB' 或配置文件字节
+        input_mode / output_mode: PIL色彩模式
+        intent: 渲染意图
+    返回: ImageCms.ImageCmsTransform
+    """
+    return ImageCms.buildTransform(load_profile(source_profile), load_profile(output_profile),
+                                   input_mode, output_mode, intent)
+
+
+def profile_bytes(profile):
+    """配置文件的原始字节（嵌入到输出文件中）；profile为None时返回None"""
+    if profile is None:
+        return None
+    return load_profile(profile).tobytes()
+
+
+def tile_source_profile(image, settings):
+    """
+    图块的源配置文件：源图片嵌入的RGB配置文件（ImageProcessor保存在 image.info['icc_profile']），
+    没有或不是RGB配置文件（如CMYK源图片转换为RGB后）时使用 settings.source_profile
+    """
+    embedded = image.info.get('icc_profile')
+    if embedded and embedded[ICC_COLOR_SPACE_FIELD] == b'RGB ':
+        return embedded
+    return settings.source_profile
+
+
+def convert_tile(tile, settings):
+    """
+    将图块转换到输出色彩空间（每个不同的图块只调用一次，由共享图块缓存保存结果）
+    参数:
+        tile: RGB或RGBA图块
+        settings: ColorSettings
+    返回: PIL.Image - RGB输出保留透明通道（RGBA）；CMYK输出没有透明通道，合成时以原图块的透明通道作为遮罩
+    """
+    source = tile_source_profile(tile, settings)
+    if settings.output_profile is None and settings.color_mode == 'RGB' and source == SRGB_PROFILE:
+        return tile
+
+    alpha = tile.getchannel('A') if tile.mode == 'RGBA' else None
+    rgb = tile.convert('RGB') if tile.mode != 'RGB' else tile
+
+    if settings.output_profile is not None:
+        converted = ImageCms.applyTransform(
+            rgb, get_transform(source, settings.output_profile, 'RGB', settings.color_mode, settings.intent))
+    else:
+        if source != SRGB_PROFILE:
+            rgb = ImageCms.applyTransform(rgb, get_transform(source, SRGB_PROFILE, 'RGB', 'RGB', settings.intent))
+        converted = rgb if settings.color_mode == 'RGB' else rgb.convert(settings.color_mode)
+
+    if alpha is not None and converted.mode == 'RGB':
+        converted.putalpha(alpha)
+    return converted
+
+
+@lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def page_background(settings):
+    """页面背景（纸白）在输出色彩空间中的颜色"""
+    white = Image.new('RGB', (1, 1), PAPER_WHITE)
+    converted = convert_tile(white, settings)
+    return converted.getpixel((0, 0))
+
+
+def color_cache_info():
+    """色彩管理缓存统计信息"""
+    info = get_transform.cache_info()
+    return {'transforms': info.currsize, 'hits': info.hits, 'misses': info.misses,
+            'profiles': load_profile.cache_info().currsize}
@@ -0,0 +1,177 @@
+"""
+导出任务模块
+ExportJob 记录一次导出的进度（页数、徽章数、写入字节数），按最近的吞吐量估算剩余时间，
+并提供协作式取消：导出过程每放置一个徽章检查一次，取消后抛出 ExportCancelled。
+进度回调可能在工作线程中调用（多线程渲染、界面的导出线程），回调内不要直接操作界面控件。
+不依赖Qt，桌面端（ui.export_worker）和命令行共用
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from common.error_handler import ExportCancelled
+
+# 徽章级进度回调的最小间隔（秒），页完成、开始和结束时总会回调
+PROGRESS_INTERVAL = 0.1
+# 估算吞吐量使用的最近采样数（按徽章完成数采样，跟得上缓存命中、源图片大小变化引起的速度变化）
+THROUGHPUT_WINDOW = 50
+
+
+@dataclass(frozen=True)
+class ExportProgress:
+    """导出进度快照"""
+    pages_done: int
+    total_pages: int
+    badges_done: int
+    total_badges: int
+    bytes_written: int
+    elapsed: float              # 已用时间（秒）
+    eta: float = None           # 预计剩余时间（秒），尚无法估算时为None
+
+    @property
+    def fraction(self):
+        """完成比例（0~1，按徽章数计算；没有徽章时按页数）"""
+        if self.total_badges:
+            return min(1.0, self.badges_done / self.total_badges)
+        if self.total_pages:
+            return min(1.0, self.pages_done / self.total_pages)
+        return 0.0
+
+    def describe(self):
+        """进度说明文本"""
+        text = (f"第 {self.pages_done}/{self.total_pages} 页，{self.badges_done}/{self.total_badges} 个徽章，"
+                f"已写入 {self.bytes_written / 1024 / 1024:.1f}MB，用时 {format_duration(self.elapsed)}")
+        if self.eta is not None:
+            text += f"，剩余约 {format_duration(self.eta)}"
+        return text
+
+
+def format_duration(seconds):
+    """时长文本（如 1:05、1:02:03）"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class ExportJob:
+    """
+    一次导出任务的进度、剩余时间和取消状态（线程安全）
+    由 ExportManager 的导出方法驱动：开始时 start()，每放置一个徽章 badge_done()，每写完一页 page_done()
+    """
+
+    def __init__(self, progress_callback=None, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        """
+        参数:
+            progress_callback: 进度回调 callback(ExportProgress)
+            interval: 徽章级回调的最小间隔（秒）
+            clock: 计时函数（测试时可替换）
+        """
+        self.progress_callback = progress_callback
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self.total_pages = 0
+        self.total_badges = 0
+        self.pages_done = 0
+        self.badges_done = 0
+        self.bytes_written = 0
+        self.finished = False
+        self._start_time = None
+        self._last_report = 0.0
+        self._samples = deque(maxlen=THROUGHPUT_WINDOW)     # (时间, 已完成徽章数)
+
+    def start(self, total_pages, total_badges):
+        """开始计时（导出方法得到渲染计划后调用）"""
+        self.check_cancelled()
+        with self._lock:
+            self.total_pages = total_pages
+            self.total_badges = total_badges
+            self.pages_done = self.badges_done = self.bytes_written = 0
+            self.finished = False
+            self._start_time = self._clock()
+            self._samples.clear()
+            self._samples.append((self._start_time, 0))
+        self._report()
+
+    def cancel(self):
+        """请求取消（可从任意线程调用），导出在处理下一个徽章时停止"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """已请求取消时抛出 ExportCancelled"""
+        if self._cancel_event.is_set():
+            raise ExportCancelled("导出已取消")
+
+    def badge_done(self, count=1):
+        """完成count个徽章（先检查取消）"""
+        self.check_cancelled()
+        with self._lock:
+            self.badges_done += count
+            now = self._clock()
+            self._samples.append((now, self.badges_done))
+            due = now - self._last_report >= self.interval
+        if due:
+            self._report()
+
+    def page_done(self, bytes_written=0):
+        """完成一页，bytes_written为本页写入磁盘的字节数"""
+        with self._lock:
+            self.pages_done += 1
+            self.bytes_written += bytes_written
+        self._report()
+
+    def add_bytes(self, bytes_written):
+        """记录不按页写入的字节数（如PDF在最后统一写入）"""
+        with self._lock:
+            self.bytes_written += bytes_written
+
+    def finish(self):
+        """导出结束"""
+        with self._lock:
+            self.finished = True
+        self._report()
+
+    def eta(self):
+        """
+        预计剩余时间（秒）：按最近 THROUGHPUT_WINDOW 个徽章的吞吐量估算
+        返回: float，尚未完成任何徽章时返回None
+        """
+        with self._lock:
+            return self._eta_locked()
+
+    def _eta_locked(self):
+        remaining = self.total_badges - self.badges_done
+        if self.finished or remaining <= 0:
+            return 0.0
+        if len(self._samples) < 2:
+            return None
+        (first_time, first_done), (last_time, last_done) = self._samples[0], self._samples[-1]
+        # 采样到现在仍未完成新徽章时，把等待的时间也计入
+        elapsed = max(last_time, self._clock()) - first_time
+        if last_done <= first_done or elapsed <= 0:
+            return None
+        return remaining * elapsed / (last_done - first_done)
+
+    def progress(self):
+        """当前进度快照（ExportProgress）"""
+        with self._lock:
+            elapsed = self._clock() - self._start_time if self._start_time is not None else 0.0
+            return ExportProgress(self.pages_done, self.total_pages, self.badges_done, self.total_badges,
+                                  self.bytes_written, elapsed, self._eta_locked())
+
+    def _report(self):
+        if self.progress_callback is None:
+            return
+        with self._lock:
+            self._last_report = self._clock()
+        self.progress_callback(self.progress())
@@ -5,16 +5,25 @@
 
 import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dataclasses import dataclass
 
-from PIL import Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from common.constants import DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM, PRINT_DPI
+from common.constants import DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM, DEFAULT_PDF_MODE, PDF_EXPORT_MODES
+from common.imports import OptionalImport
+from common.error_handler import logger, ExportCancelled
+from core.page_spec import PageSpec
+
+# reportlab只在第一次导出PDF时加载
+reportlab_canvas = OptionalImport('canvas', 'reportlab.pdfgen')
+reportlab_utils = OptionalImport('utils', 'reportlab.lib')
+
+# JPEG页面的保存质量
+JPEG_EXPORT_QUALITY = 95
 
 @dataclass
 class ExportConfig:
@@ -23,8 +32,19 @@ class ExportConfig:
     spacing_mm: float = DEFAULT_SPACING_MM
     margin_mm: float = DEFAULT_MARGIN_MM
     format_type: str = 'PNG'
+    page_spec: PageSpec = None      # 页面规格，None表示使用排版引擎当前的规格
+    group_designs: bool = False     # 相同图案集中排放
+    plan: object = None             # 已有的排版规划（JobPlan，如预览时得到的），提供时直接复用
+    incremental: bool = False       # 增量导出：跳过内容未变化的页面
+    color: object = None            # 色彩阶段（ColorSettings：输出色彩模式和ICC配置文件），None为不经过色彩管理的RGB
 from core.layout_engine import LayoutEngine
 from core.image_processor import ImageProcessor
+from core.vector_pdf import VectorBadgePainter, max_source_scales
+from core.export_job import ExportJob
+from core.page_manifest import PageManifest, manifest_path, page_hash
+from core.overlay import OverlayOptions, CUT_FILE_WRITERS, page_overlay, write_cut_files
+from core.raster_writers import RASTER_DOCUMENT_WRITERS, DEFAULT_TIFF_COMPRESSION
+from utils.config import app_config
 
 class ExportManager:
     """导出管理器类"""
@@ -32,9 +52,14 @@ class ExportManager:
     def __init__(self):
         self.layout_engine = LayoutEngine()
         self.image_processor = ImageProcessor()
+        self.last_pdf_report = None     # 最近一次矢量PDF导出的源图片嵌入统计
+        self.last_incremental_report = None     # 最近一次增量图片导出跳过/重新写入的页数
+        self.last_image_paths = []      # 最近一次多页图片导出的页面文件
         
     def export_to_pdf(self, image_items, output_path, layout_type='grid',
-                     spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+                     spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM, page_spec=None,
+                     group_designs=False, plan=None, pdf_mode=DEFAULT_PDF_MODE, overlay=None, cut_file=None,
+                     target_dpi=None, job=None, color=None):
         """
         导出为PDF文件（自动支持多页面）
         参数:
@@ -43,10 +68,22 @@ class ExportManager:
             layout_type: 布局类型
             spacing_mm: 间距
             margin_mm: 页边距
+            page_spec: 页面规格，默认使用排版引擎当前的规格
+            group_designs: 相同图案集中排放
+            plan: 已有的排版规划（JobPlan），提供时直接复用
+            pdf_mode: 'vector'（矢量剪切路径）、'raster'（位图图块）或 'page'（整页位图，供RIP使用）
+            overlay: 叠加层（True或OverlayOptions：裁切线、出血线、套准标记），None为不绘制
+            cut_file: 为切割机另存的裁切文件格式（'svg'或'dxf'），None为不生成
+            target_dpi: 源图片的目标有效分辨率，默认为页面分辨率
+            job: ExportJob（进度、剩余时间、取消）
+            color: 整页位图模式的色彩阶段（ColorSettings），见 export_raster_document
         返回: (bool, int) - (是否成功, 处理的图片数量)
         """
         # 直接使用多页面导出功能
-        return self.export_multi_page_to_pdf(image_items, output_path, layout_type, spacing_mm, margin_mm)
+        return self.export_multi_page_to_pdf(image_items, output_path, layout_type, spacing_mm, margin_mm,
+                                             page_spec=page_spec, group_designs=group_designs, plan=plan,
+                                             pdf_mode=pdf_mode, overlay=overlay, cut_file=cut_file,
+                                             target_dpi=target_dpi, job=job, color=color)
     
     def export_to_image(self, image_items, output_path, config=None, **kwargs):
         """
@@ -55,7 +92,8 @@ class ExportManager:
             image_items: 图片项目列表
             output_path: 输出文件路径
             config: ExportConfig对象（推荐使用）
-            **kwargs: 兼容旧接口的参数（format_type, layout_type, spacing_mm, margin_mm）
+            **kwargs: 兼容旧接口的参数（format_type, layout_type, spacing_mm, margin_mm, page_spec,
+                group_designs, plan, incremental, color），以及 job（ExportJob：进度、剩余时间、取消）
         返回: tuple - (是否成功, 处理数量)
         """
         # 处理配置参数
@@ -67,7 +105,12 @@ class ExportManager:
                 layout_type=kwargs.get('layout_type', 'grid'),
                 spacing_mm=kwargs.get('spacing_mm', DEFAULT_SPACING_MM),
                 margin_mm=kwargs.get('margin_mm', DEFAULT_MARGIN_MM),
-                format_type=kwargs.get('format_type', 'PNG')
+                format_type=kwargs.get('format_type', 'PNG'),
+                page_spec=kwargs.get('page_spec'),
+                group_designs=kwargs.get('group_designs', False),
+                plan=kwargs.get('plan'),
+                incremental=kwargs.get('incremental', False),
+                color=kwargs.get('color')
             )
 
         # 移除文件扩展名以便多页面导出
@@ -78,7 +121,10 @@ class ExportManager:
         # 使用多页面导出功能
         return self.export_multi_page_to_images(
             image_items, base_path, export_config.format_type,
-            export_config.layout_type, export_config.spacing_mm, export_config.margin_mm
+            export_config.layout_type, export_config.spacing_mm, export_config.margin_mm,
+            page_spec=export_config.page_spec, group_designs=export_config.group_designs,
+            plan=export_config.plan, job=kwargs.get('job'), incremental=export_config.incremental,
+            color=export_config.color
         )
     
     def _add_page_info(self, canvas_obj, image_count, layout_type, spacing_mm, margin_mm):
@@ -104,7 +150,7 @@ class ExportManager:
             canvas_obj.drawString(20, 20, info_text)
             
         except Exception as e:
-            print(f"添加页面信息失败: {e}")
+            logger.error(f"添加页面信息失败: {e}")
     
     def get_suggested_filename(self, format_type='PDF', layout_type='grid'):
         """
@@ -115,7 +161,7 @@ class ExportManager:
         返回: str - 建议的文件名
         """
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        layout_name = '网格' if layout_type == 'grid' else '紧密'
+        layout_name = {'grid': '网格', 'mixed': '混合'}.get(layout_type, '紧密')
         
         filename = f"徽章排版_{layout_name}_{timestamp}.{format_type.lower()}"
         return filename
@@ -133,8 +179,7 @@ class ExportManager:
             return False, "没有可导出的图片"
         
         # 检查是否有已处理的图片
-        processed_items = [item for item in image_items if item.is_processed]
-        if not processed_items:
+        if not any(item.is_processed for item in image_items):
             return False, "没有已处理的图片，请先编辑图片或使用自动排版"
         
         # 检查输出路径
@@ -162,7 +207,10 @@ class ExportManager:
         return True, ""
 
     def export_multi_page_to_pdf(self, image_items, output_path, layout_type='grid',
-                                spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+                                spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                                workers=1, progress_callback=None, page_spec=None, group_designs=False, plan=None,
+                                pdf_mode=DEFAULT_PDF_MODE, overlay=None, cut_file=None, target_dpi=None, job=None,
+                                color=None):
         """
         导出多页面PDF文件
         参数:
@@ -171,95 +219,259 @@ class ExportManager:
             layout_type: 布局类型
             spacing_mm: 间距
             margin_mm: 页边距
+            workers: 并行裁剪的线程数（1为串行）
+            progress_callback: 进度回调 callback(已完成页数, 总页数)
+            page_spec: 页面规格（纸张尺寸和分辨率），默认使用排版引擎当前的规格
+            group_designs: 相同图案集中排放（不增加页数）
+            plan: 已有的排版规划（JobPlan，需由同一批image_items得到），提供时不再重新规划
+            pdf_mode: 'vector' 源图片只嵌入一次、用圆形剪切路径裁切；'raster' 逐个徽章嵌入裁剪好的图块；
+                'page' 每页一张整页位图（流式写入，见 export_raster_document）
+            overlay: 以矢量图层绘制的叠加层（True或OverlayOptions：裁切线、出血线、套准标记），None为不绘制；
+                整页位图模式不支持
+            cut_file: 为切割机另存的裁切文件格式（'svg'或'dxf'，每页一个，文件名为 <输出>_cut[_第N页].svg），
+                None为不生成
+            target_dpi: 矢量模式下源图片的目标有效分辨率（超出时只缩小一次），默认为页面分辨率；
+                嵌入统计（直接嵌入/缩小的数量、节省的字节数）保存在 self.last_pdf_report
+            job: ExportJob，每放置一个徽章更新进度并检查取消；PDF在最后统一写入，写入字节数在保存后计入。
+                取消后不生成PDF，返回 (False, 已处理数量)，job.cancelled 为True
+            color: 色彩阶段（ColorSettings），只用于整页位图模式（矢量和位图图块模式不经过色彩阶段）
         返回: (bool, int) - (是否成功, 处理的图片数量)
         """
-        try:
-            # 计算多页面布局
-            multi_layout = self.layout_engine.calculate_multi_page_layout(
-                len(image_items), layout_type, spacing_mm, margin_mm
+        if pdf_mode == 'page':
+            if overlay:
+                logger.warning("整页位图PDF不支持叠加层，已忽略")
+            return self.export_raster_document(
+                image_items, output_path, 'pdf', layout_type, spacing_mm, margin_mm, workers=workers,
+                progress_callback=progress_callback, page_spec=page_spec, group_designs=group_designs, plan=plan,
+                job=job, color=color, cut_file=cut_file
             )
 
-            # 创建PDF文档
-            c = canvas.Canvas(output_path, pagesize=A4)
+        if color is not None:
+            logger.warning(f"PDF模式 {pdf_mode} 不经过色彩阶段，需要色彩管理时请使用整页位图模式")
+        if job is None:
+            job = ExportJob()
+        total_processed = 0
+        try:
+            if pdf_mode not in PDF_EXPORT_MODES:
+                raise ValueError(f"未知的PDF导出模式: {pdf_mode}")
+            if cut_file is not None and cut_file not in CUT_FILE_WRITERS:
+                raise ValueError(f"未知的裁切文件格式: {cut_file}")
+            if overlay is True:
+                overlay = OverlayOptions()
+
+            # 渲染计划（页 -> 位置 -> 图块键）
+            render_plan = self._build_render_plan(image_items, layout_type, spacing_mm, margin_mm,
+                                                  page_spec, group_designs, plan)
+            spec = render_plan.page_spec
+            compositor = self.layout_engine.compositor
+
+            # 创建PDF文档（页面大小与页面规格一致）
+            c = reportlab_canvas.Canvas(output_path, pagesize=spec.size_pt)
 
             # 计算坐标转换比例
-            pixel_to_point = 72.0 / PRINT_DPI
-
-            total_processed = 0
-            image_index = 0
-
-            # 为每个页面生成内容
-            for page_info in multi_layout['pages']:
-                # 获取当前页面的图片
-                page_images = image_items[image_index:image_index + page_info['images_on_page']]
-                positions = page_info['positions']
-
-                # 处理当前页面的每个图片
-                for i, image_item in enumerate(page_images):
-                    if i >= len(positions):
-                        break  # 超出当前页面可放置数量
+            pixel_to_point = 72.0 / spec.dpi
+            diameter_mm = app_config.badge_diameter_mm
+
+            total_pages = render_plan.total_pages
+            job.start(total_pages, render_plan.total_items)
+            painter = VectorBadgePainter(c, spec, target_dpi, max_source_scales(render_plan))
+            bleed_mm = app_config.bleed_size_mm
+
+            if pdf_mode == 'vector':
+                # 矢量模式不需要裁剪图块，源图片在第一次用到时嵌入
+                page_results = ((page, None) for page in render_plan.pages)
+            else:
+                # 图块可在工作线程中并行生成（共享图块缓存），PDF绘制按页顺序在当前线程进行
+                page_results = self._map_pages(lambda page: (page, compositor.page_tiles(page, job.badge_done)),
+                                               render_plan.pages, workers)
+
+            for page, tiles in page_results:
+                if tiles is None:
+                    tiles = []
+                    for slot in page.filled_slots:
+                        if painter.draw_badge(slot):
+                            total_processed += 1
+                        else:
+                            # 源图片无法嵌入时改用位图图块
+                            tiles.append((slot, compositor.slot_tile(slot)))
+                        job.badge_done()
 
+                for i, (slot, tile) in enumerate(tiles):
+                    if tile is None:
+                        logger.error(f"绘制图片失败 (第{page.page_index + 1}页 #{i + 1}): 图块生成失败")
+                        continue
                     try:
-                        # 获取圆形图片
-                        circle_img = self.image_processor.create_circular_crop(
-                            image_item.file_path,
-                            image_item.scale,
-                            image_item.offset_x,
-                            image_item.offset_y,
-                            image_item.rotation
-                        )
-
-                        # 保存临时图片文件
-                        temp_img_path = f"temp_circle_p{page_info['page_index']}_{i}.png"
-                        circle_img.save(temp_img_path, "PNG", dpi=(PRINT_DPI, PRINT_DPI))
-
-                        # 计算在PDF中的位置
-                        center_x_px, center_y_px = positions[i]
-
                         # 转换坐标系（PDF坐标系原点在左下角）
-                        center_x_pt = center_x_px * pixel_to_point
-                        center_y_pt = (self.layout_engine.a4_height_px - center_y_px) * pixel_to_point
+                        center_x_pt, center_y_pt = painter.slot_center_pt(slot)
 
                         # 计算图片左下角位置
-                        img_size_pt = self.layout_engine.badge_diameter_px * pixel_to_point
+                        img_size_pt = tile.size[0] * pixel_to_point
                         x_pt = center_x_pt - img_size_pt / 2
                         y_pt = center_y_pt - img_size_pt / 2
 
-                        # 在PDF中绘制图片
-                        c.drawImage(temp_img_path, x_pt, y_pt,
-                                  width=img_size_pt, height=img_size_pt)
-
-                        # 删除临时文件
-                        if os.path.exists(temp_img_path):
-                            os.remove(temp_img_path)
+                        # 在PDF中绘制图片（内容相同的图块在PDF中只保存一份）
+                        c.drawImage(reportlab_utils.ImageReader(tile), x_pt, y_pt,
+                                    width=img_size_pt, height=img_size_pt)
 
                         total_processed += 1
 
                     except Exception as e:
-                        print(f"处理图片失败 {image_item.filename}: {e}")
+                        logger.error(f"绘制图片失败 (第{page.page_index + 1}页 #{i + 1}): {e}")
                         continue
 
-                # 添加页面信息
-                self._add_multi_page_info(c, page_info, multi_layout, layout_type, spacing_mm, margin_mm)
+                # 叠加层几何按排版缓存，网格/紧凑的各页共用（切割机文件同样命中这份缓存）
+                planned_page = render_plan.job_plan.pages[page.page_index]
+                if overlay:
+                    painter.draw_overlay(page_overlay(planned_page, spec, diameter_mm, bleed_mm, overlay))
 
-                # 更新图片索引
-                image_index += page_info['images_on_page']
+                # 添加页面信息
+                self._add_multi_page_info(c, page, render_plan, layout_type, spacing_mm, margin_mm)
 
                 # 如果不是最后一页，添加新页面
-                if page_info['page_index'] < multi_layout['total_pages'] - 1:
+                if page.page_index < total_pages - 1:
                     c.showPage()
 
+                job.page_done()
+                if progress_callback:
+                    progress_callback(page.page_index + 1, total_pages)
+
             # 保存PDF
+            job.check_cancelled()
             c.save()
+            job.add_bytes(os.path.getsize(output_path))
+            self.last_pdf_report = painter.report() if pdf_mode == 'vector' else None
+
+            if cut_file:
+                self.export_cut_files(render_plan.job_plan, output_path, cut_file)
 
+            job.finish()
             return True, total_processed
 
+        except ExportCancelled:
+            logger.info(f"导出多页面PDF已取消: 已处理 {total_processed} 个徽章")
+            return False, total_processed
         except Exception as e:
-            print(f"导出多页面PDF失败: {e}")
+            logger.error(f"导出多页面PDF失败: {e}")
             return False, 0
 
+    def export_raster_document(self, image_items, output_path, document_format='tiff', layout_type='grid',
+                               spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM, workers=1,
+                               progress_callback=None, page_spec=None, group_designs=False, plan=None, job=None,
+                               compression=DEFAULT_TIFF_COMPRESSION, color=None, cut_file=None):
+        """
+        导出单个多页文档，每页一张整页位图（供印刷RIP使用）
+        页面渲染好后立即追加写入文件（多页TIFF的下一个IFD / PDF的下一页），写完即释放，
+        内存中最多只有渲染线程在途的几页
+        参数:
+            image_items: 图片项目列表
+            output_path: 输出文件路径
+            document_format: 'tiff'（多页TIFF）或 'pdf'（整页位图PDF，Flate无损压缩）
+            layout_type, spacing_mm, margin_mm: 排版参数
+            workers: 并行渲染页面的线程数（1为串行），写入始终按页顺序在当前线程进行
+            progress_callback: 进度回调 callback(已完成页数, 总页数)
+            page_spec: 页面规格（纸张尺寸和分辨率），默认使用排版引擎当前的规格
+            group_designs: 相同图案集中排放（不增加页数）
+            plan: 已有的排版规划（JobPlan，需由同一批image_items得到），提供时不再重新规划
+            job: ExportJob，每放置一个徽章更新进度并检查取消，每写完一页计入写入的字节数；
+                取消或失败时删除未写完的文件，返回 (False, 已处理数量)
+            compression: 多页TIFF的压缩方式，'lzw' 或 'none'
+            color: 色彩阶段（ColorSettings：RGB或CMYK、源/输出ICC配置文件），每个不同的图块只转换一次，
+                输出配置文件嵌入到文件中；None为不经过色彩管理的RGB
+            cut_file: 为切割机另存的裁切文件格式（'svg'或'dxf'），None为不生成
+        返回: (bool, int) - (是否成功, 处理的图片数量)
+        """
+        if job is None:
+            job = ExportJob()
+        total_processed = 0
+        writer = None
+        try:
+            if document_format not in RASTER_DOCUMENT_WRITERS:
+                raise ValueError(f"未知的整页位图文档格式: {document_format}")
+            if cut_file is not None and cut_file not in CUT_FILE_WRITERS:
+                raise ValueError(f"未知的裁切文件格式: {cut_file}")
+
+            render_plan = self._build_render_plan(image_items, layout_type, spacing_mm, margin_mm,
+                                                  page_spec, group_designs, plan)
+            dpi = render_plan.page_spec.dpi
+            compositor = self.layout_engine.compositor
+            icc_profile = color.profile_bytes() if color is not None else None
+            if document_format == 'tiff':
+                writer = RASTER_DOCUMENT_WRITERS['tiff'](output_path, compression, icc_profile)
+            else:
+                writer = RASTER_DOCUMENT_WRITERS['pdf'](output_path, icc_profile)
+
+            total_pages = render_plan.total_pages
+            job.start(total_pages, render_plan.total_items)
+
+            def render_page(page):
+                """合成页面（可在工作线程中执行）；色彩阶段在图块级进行，页面已是输出色彩模式"""
+                canvas_img, processed = compositor.compose(page, on_badge=job.badge_done, color=color)
+                return page, canvas_img, processed
+
+            written = 0
+            for page, page_img, processed in self._map_pages(render_page, render_plan.pages, workers):
+                job.check_cancelled()
+                size = writer.add_page(page_img, dpi)
+                del page_img
+                total_processed += processed
+                job.page_done(size - written)
+                written = size
+                if progress_callback:
+                    progress_callback(page.page_index + 1, total_pages)
+
+            writer.close()
+            job.add_bytes(os.path.getsize(output_path) - written)
+
+            if cut_file:
+                self.export_cut_files(render_plan.job_plan, output_path, cut_file)
+
+            job.finish()
+            return True, total_processed
+
+        except ExportCancelled:
+            logger.info(f"导出整页位图文档已取消: 已处理 {total_processed} 个徽章")
+            self._discard_partial(writer, output_path)
+            return False, total_processed
+        except Exception as e:
+            logger.error(f"导出整页位图文档失败: {e}")
+            self._discard_partial(writer, output_path)
+            return False, 0
+
+    def _discard_partial(self, writer, output_path):
+        """关闭并删除未写完的文档"""
+        if writer is None:
+            return
+        try:
+            writer.close()
+        except Exception:
+            pass
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+
+    def export_cut_files(self, layout, output_path, file_format='svg', diameter_mm=None, bleed_mm=None):
+        """
+        为切割机逐页生成裁切文件（每页一个SVG/DXF，只含裁切线和套准标记，逐页写入磁盘）
+        参数:
+            layout: JobPlan，或 LayoutEngine.calculate_multi_page_layout 等得到的多页面布局字典
+            output_path: 输出路径，文件名为 <去掉扩展名>_cut[_第N页].svg/.dxf
+            file_format: 'svg' 或 'dxf'
+            diameter_mm: 网格/紧凑页面的印刷圆直径（含出血，毫米），默认使用当前配置
+            bleed_mm: 出血宽度（毫米），默认使用当前配置
+        返回: list[str] - 生成的文件路径
+        """
+        multi_layout = layout.to_dict() if hasattr(layout, 'to_dict') else layout
+        if diameter_mm is None:
+            diameter_mm = app_config.badge_diameter_mm
+        if bleed_mm is None:
+            bleed_mm = app_config.bleed_size_mm
+        return write_cut_files(multi_layout, output_path, diameter_mm, bleed_mm, file_format)
+
     def export_multi_page_to_images(self, image_items, output_path, format_type='PNG',
-                                   layout_type='grid', spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+                                   layout_type='grid', spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                                   workers=1, progress_callback=None, page_spec=None, group_designs=False,
+                                   plan=None, job=None, incremental=False, color=None):
         """
         导出多页面图片文件
         参数:
@@ -269,80 +481,132 @@ class ExportManager:
             layout_type: 布局类型
             spacing_mm: 间距
             margin_mm: 页边距
-        返回: (bool, int) - (是否成功, 处理的图片数量)
+            workers: 并行渲染页面的线程数（1为串行）
+            progress_callback: 进度回调 callback(已完成页数, 总页数)
+            page_spec: 页面规格（纸张尺寸和分辨率），默认使用排版引擎当前的规格
+            group_designs: 相同图案集中排放（不增加页数）
+            plan: 已有的排版规划（JobPlan，需由同一批image_items得到），提供时不再重新规划
+            job: ExportJob，每放置一个徽章更新进度并检查取消，每写完一页计入文件大小；
+                取消后已写入的页面保留，返回 (False, 已处理数量)，job.cancelled 为True
+            incremental: 增量导出：在输出文件旁保存页面清单（<输出路径>.pages.json，每页的内容哈希），
+                内容未变化且文件仍在的页面直接跳过；中断的导出再次执行时从未完成的页面继续。
+                跳过/重新写入的页数保存在 self.last_incremental_report
+            color: 色彩阶段（ColorSettings），每个不同的图块只转换一次，输出配置文件嵌入到图片中；
+                CMYK只支持JPEG；None为不经过色彩管理的RGB
+        返回: (bool, int) - (是否成功, 处理的图片数量（含跳过页面上的徽章）)
         """
+        if job is None:
+            job = ExportJob()
+        total_processed = 0
+        self.last_incremental_report = None
+        self.last_image_paths = []
         try:
-            # 计算多页面布局
-            multi_layout = self.layout_engine.calculate_multi_page_layout(
-                len(image_items), layout_type, spacing_mm, margin_mm
-            )
-
-            total_processed = 0
-            image_index = 0
-
-            # 为每个页面生成图片文件
-            for page_info in multi_layout['pages']:
-                # 获取当前页面的图片
-                page_images = image_items[image_index:image_index + page_info['images_on_page']]
-
-                # 创建A4画布
-                canvas_img = Image.new('RGB', (self.layout_engine.a4_width_px, self.layout_engine.a4_height_px), (255, 255, 255))
-
-                # 处理当前页面的每个图片
-                positions = page_info['positions']
-                for i, image_item in enumerate(page_images):
-                    if i >= len(positions):
-                        break
-
-                    try:
-                        # 获取圆形图片
-                        circle_img = self.image_processor.create_circular_crop(
-                            image_item.file_path,
-                            image_item.scale,
-                            image_item.offset_x,
-                            image_item.offset_y,
-                            image_item.rotation
-                        )
-
-                        # 计算粘贴位置
-                        center_x, center_y = positions[i]
-                        paste_x = center_x - self.layout_engine.badge_radius_px
-                        paste_y = center_y - self.layout_engine.badge_radius_px
-
-                        # 粘贴到画布
-                        if circle_img.mode == 'RGBA':
-                            canvas_img.paste(circle_img, (paste_x, paste_y), circle_img)
-                        else:
-                            canvas_img.paste(circle_img, (paste_x, paste_y))
-
-                        total_processed += 1
-
-                    except Exception as e:
-                        print(f"处理图片失败 {image_item.filename}: {e}")
-                        continue
-
-                # 生成页面文件名
-                if multi_layout['total_pages'] == 1:
-                    page_output_path = f"{output_path}.{format_type.lower()}"
-                else:
-                    page_output_path = f"{output_path}_第{page_info['page_index'] + 1}页.{format_type.lower()}"
-
-                # 保存页面图片
-                if format_type.upper() == 'JPEG':
-                    canvas_img.save(page_output_path, "JPEG", quality=95, dpi=(PRINT_DPI, PRINT_DPI))
-                else:
-                    canvas_img.save(page_output_path, "PNG", dpi=(PRINT_DPI, PRINT_DPI))
-
-                # 更新图片索引
-                image_index += page_info['images_on_page']
-
+            # 渲染计划（页 -> 位置 -> 图块键）
+            render_plan = self._build_render_plan(image_items, layout_type, spacing_mm, margin_mm,
+                                                  page_spec, group_designs, plan)
+            dpi = render_plan.page_spec.dpi
+            compositor = self.layout_engine.compositor
+            image_format = 'JPEG' if format_type.upper() in ('JPG', 'JPEG') else 'PNG'
+            save_options = {'quality': JPEG_EXPORT_QUALITY} if image_format == 'JPEG' else {}
+            render_params = (image_format, sorted(save_options.items()), color)
+            if color is not None:
+                if color.color_mode == 'CMYK' and image_format != 'JPEG':
+                    raise ValueError(f"{image_format} 不支持CMYK输出")
+                icc_profile = color.profile_bytes()
+                if icc_profile:
+                    save_options['icc_profile'] = icc_profile
+
+            total_pages = render_plan.total_pages
+            job.start(total_pages, render_plan.total_items)
+
+            def page_output_path(page):
+                """页面文件名"""
+                if total_pages == 1:
+                    return f"{output_path}.{format_type.lower()}"
+                return f"{output_path}_第{page.page_index + 1}页.{format_type.lower()}"
+
+            manifest = None
+            if incremental:
+                manifest = PageManifest.load(manifest_path(output_path))
+                if manifest.retain(page_output_path(page) for page in render_plan.pages):
+                    manifest.save()
+
+            def render_and_save(page):
+                """渲染并保存单个页面（可在工作线程中执行）；增量导出时内容未变化的页面直接跳过"""
+                path = page_output_path(page)
+                digest = page_hash(page, render_params) if manifest is not None else None
+                if manifest is not None and manifest.is_current(path, digest):
+                    job.badge_done(page.count)
+                    return page, page.count, 0, path, None
+
+                canvas_img, processed = compositor.compose(page, on_badge=job.badge_done, color=color)
+
+                # 先写临时文件再替换：中断时不会留下与清单记录不一致的半个文件
+                temp_path = f"{path}.tmp"
+                canvas_img.save(temp_path, image_format, dpi=(dpi, dpi), **save_options)
+                os.replace(temp_path, path)
+                return page, processed, os.path.getsize(path), path, digest
+
+            for page, processed, page_bytes, path, digest in self._map_pages(render_and_save, render_plan.pages,
+                                                                             workers):
+                total_processed += processed
+                self.last_image_paths.append(path)
+                if manifest is not None:
+                    if digest is None:
+                        manifest.skip()
+                    else:
+                        manifest.record(path, digest)
+                job.page_done(page_bytes)
+                if progress_callback:
+                    progress_callback(page.page_index + 1, total_pages)
+
+            if manifest is not None:
+                self.last_incremental_report = manifest.report()
+            job.finish()
             return True, total_processed
 
+        except ExportCancelled:
+            logger.info(f"导出多页面图片已取消: 已处理 {total_processed} 个徽章")
+            return False, total_processed
         except Exception as e:
-            print(f"导出多页面图片失败: {e}")
+            logger.error(f"导出多页面图片失败: {e}")
             return False, 0
 
-    def _add_multi_page_info(self, canvas_obj, page_info, multi_layout, layout_type, spacing_mm, margin_mm):
+    def _build_render_plan(self, image_items, layout_type, spacing_mm, margin_mm, page_spec, group_designs,
+                           plan=None):
+        """渲染计划：提供plan时直接复用已有的排版规划"""
+        if plan is None:
+            plan = self.layout_engine.plan_job(
+                image_items, layout_type, spacing_mm, margin_mm, page_spec, group_designs
+            )
+        return self.layout_engine.build_render_plan(plan, image_items)
+
+    def _map_pages(self, page_func, pages, workers=1):
+        """
+        按页顺序执行渲染任务
+        workers > 1 时使用线程池并行（PIL解码和缩放会释放GIL，图块缓存线程安全），
+        在途任务数限制为workers的两倍以控制内存
+        参数:
+            page_func: 任务函数 page_func(page)
+            pages: RenderPage 序列
+            workers: 线程数
+        返回: 生成器，按页顺序产出page_func的结果
+        """
+        if workers <= 1:
+            for page in pages:
+                yield page_func(page)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for page in pages:
+                pending.append(executor.submit(page_func, page))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _add_multi_page_info(self, canvas_obj, page, render_plan, layout_type, spacing_mm, margin_mm):
         """
         在多页面PDF中添加页面信息
         """
@@ -351,13 +615,15 @@ class ExportManager:
             canvas_obj.setFont("Helvetica", 8)
 
             # 页面信息
-            page_text = f"第 {page_info['page_index'] + 1} 页 / 共 {multi_layout['total_pages']} 页"
-            info_text = f"BadgePatternTool | {page_text} | 本页图片: {page_info['images_on_page']} | " \
+            utilization = render_plan.job_plan.pages[page.page_index].utilization
+            page_text = f"第 {page.page_index + 1} 页 / 共 {render_plan.total_pages} 页"
+            info_text = f"BadgePatternTool | {page_text} | 本页图片: {page.count} | " \
                        f"Layout: {layout_type} | Spacing: {spacing_mm}mm | Margin: {margin_mm}mm | " \
+                       f"Page: {render_plan.page_spec.label} | Fill: {utilization:.1%} | " \
                        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
 
             # 在页面底部绘制信息
             canvas_obj.drawString(20, 20, info_text)
 
         except Exception as e:
-            print(f"添加多页面信息失败: {e}")
+            logger.error(f"添加多页面信息失败: {e}")
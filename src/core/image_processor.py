@@ -3,13 +3,15 @@
 实现圆形裁剪、缩放、移动等图片处理功能
 """
 
-from io import BytesIO
 from dataclasses import dataclass
 
-# 导入公共模块
-from common.imports import PIL_AVAILABLE, PYSIDE6_AVAILABLE, Image, ImageDraw, QPixmap
-from common.error_handler import error_handler, resource_manager, logger, ImageProcessingError
+# 导入公共模块（Qt只在生成QPixmap时通过qt_adapter按需加载）
+from common.imports import PIL_AVAILABLE, PYSIDE6_AVAILABLE, Image, ImageDraw
+from common.qt_adapter import pil_to_qpixmap, create_blank_pixmap
+from common.constants import PRINT_DPI, mm_to_pixels
+from common.error_handler import error_handler, logger, ImageProcessingError
 from utils.config import app_config
+from core.source_cache import shared_source_cache, source_size
 
 @dataclass
 class ImageProcessParams:
@@ -19,10 +21,13 @@ class ImageProcessParams:
     offset_x: int = 0
     offset_y: int = 0
     rotation: int = 0
+    dpi: int = PRINT_DPI    # 输出分辨率（缩放和偏移以 PRINT_DPI 像素记录）
+    diameter_mm: float = None  # 圆形直径（含出血），None表示使用全局设置
 
     def to_cache_key(self, extra=""):
         """生成缓存键"""
-        return f"{self.image_path}:{self.scale}:{self.offset_x}:{self.offset_y}:{self.rotation}:{extra}"
+        return (f"{self.image_path}:{self.scale}:{self.offset_x}:{self.offset_y}:{self.rotation}:{self.dpi}:"
+                f"{self.diameter_mm}:{extra}")
 
 
 
@@ -146,10 +151,11 @@ class ImageProcessor:
         else:
             # 兼容旧接口
             image_path, scale, offset_x, offset_y, rotation = params
-            return f"{image_path}:{scale}:{offset_x}:{offset_y}:{rotation}:{extra}"
+            return f"{image_path}:{scale}:{offset_x}:{offset_y}:{rotation}:{PRINT_DPI}:None:{extra}"
 
     @error_handler("圆形裁剪失败", show_error=False)
-    def create_circular_crop(self, image_path=None, scale=1.0, offset_x=0, offset_y=0, rotation=0, params=None):
+    def create_circular_crop(self, image_path=None, scale=1.0, offset_x=0, offset_y=0, rotation=0, params=None,
+                             dpi=PRINT_DPI, diameter_mm=None, use_cache=True):
         """
         创建圆形裁剪（带缓存优化）
         参数:
@@ -159,7 +165,10 @@ class ImageProcessor:
             offset_y: Y轴偏移 (像素)
             rotation: 旋转角度 (度)
             params: ImageProcessParams对象（推荐使用）
-        返回: PIL.Image - 裁剪后的圆形图片
+            dpi: 输出分辨率；缩放和偏移按 PRINT_DPI 记录，其他分辨率下按比例换算
+            diameter_mm: 圆形直径（含出血，毫米），None表示使用全局设置
+            use_cache: 是否使用本处理器的裁剪缓存（由调用方缓存时关闭，如共享图块缓存）
+        返回: PIL.Image - 裁剪后的圆形图片（边长为该分辨率下的圆形直径）
         """
         # 处理参数
         if params is not None:
@@ -167,63 +176,75 @@ class ImageProcessor:
         else:
             if image_path is None:
                 raise ImageProcessingError("必须提供image_path或params参数")
-            process_params = ImageProcessParams(image_path, scale, offset_x, offset_y, rotation)
+            process_params = ImageProcessParams(image_path, scale, offset_x, offset_y, rotation, dpi, diameter_mm)
+
+        # 编辑参数以 PRINT_DPI 像素记录，换算到输出分辨率
+        dpi_scale = process_params.dpi / PRINT_DPI
+        circle_size = mm_to_pixels(process_params.diameter_mm or app_config.badge_diameter_mm, process_params.dpi)
+        scale = process_params.scale * dpi_scale
+        offset_x = round(process_params.offset_x * dpi_scale)
+        offset_y = round(process_params.offset_y * dpi_scale)
 
         # 检查缓存
         cache_key = process_params.to_cache_key()
-        if cache_key in self._crop_cache:
+        if use_cache and cache_key in self._crop_cache:
             self._update_cache_access(cache_key)  # 更新访问时间
             return self._crop_cache[cache_key].copy()  # 返回副本避免修改缓存
 
         try:
-            # 打开原始图片
-            with Image.open(process_params.image_path) as original_img:
-                # 转换为RGB模式
-                if original_img.mode != 'RGB':
-                    original_img = original_img.convert('RGB')
-
-                # 应用旋转
-                if process_params.rotation != 0:
-                    original_img = original_img.rotate(process_params.rotation, expand=True, fillcolor=(255, 255, 255))
-
-                # 计算缩放后的尺寸
-                orig_width, orig_height = original_img.size
-                new_width = int(orig_width * process_params.scale)
-                new_height = int(orig_height * process_params.scale)
-
-                # 应用缩放
-                if process_params.scale != 1.0:
-                    original_img = original_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            # 共享源图片缓存：已解码为RGB并按EXIF方向摆正（只读，后续操作都生成新图片）
+            original_img = shared_source_cache.get(process_params.image_path)
+            # 源图片嵌入的ICC配置文件随图块保留（导出的色彩阶段以它作为源配置文件）
+            icc_profile = original_img.info.get('icc_profile')
+
+            # 应用旋转（只有用户设置的旋转，EXIF方向已在解码时处理）
+            if process_params.rotation != 0:
+                original_img = original_img.rotate(process_params.rotation, expand=True, fillcolor=(255, 255, 255))
+
+            # 计算缩放后的尺寸
+            orig_width, orig_height = original_img.size
+            new_width = int(orig_width * scale)
+            new_height = int(orig_height * scale)
+
+            # 应用缩放
+            if scale != 1.0:
+                original_img = original_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+            # 创建圆形裁剪区域
+            circle_img = self._crop_to_circle(original_img, offset_x, offset_y, circle_size)
+            if icc_profile:
+                circle_img.info['icc_profile'] = icc_profile
+            if not use_cache:
+                return circle_img
 
-                # 创建圆形裁剪区域
-                circle_img = self._crop_to_circle(original_img, process_params.offset_x, process_params.offset_y)
+            # 缓存结果
+            self._manage_cache(self._crop_cache)
+            cached_img = circle_img.copy()
+            self._crop_cache[cache_key] = cached_img
 
-                # 缓存结果
-                self._manage_cache(self._crop_cache)
-                cached_img = circle_img.copy()
-                self._crop_cache[cache_key] = cached_img
+            # 估算内存使用
+            estimated_size = cached_img.size[0] * cached_img.size[1] * 4  # RGBA
+            self._current_memory_usage += estimated_size
 
-                # 估算内存使用
-                estimated_size = cached_img.size[0] * cached_img.size[1] * 4  # RGBA
-                self._current_memory_usage += estimated_size
+            return circle_img
 
-                return circle_img
-                
         except Exception as e:
             logger.error(f"圆形裁剪失败: {e}", exc_info=True)
             # 返回空白圆形图片
-            return self._create_blank_circle()
+            return self._create_blank_circle(circle_size)
     
-    def _crop_to_circle(self, img, offset_x=0, offset_y=0):
+    def _crop_to_circle(self, img, offset_x=0, offset_y=0, circle_size=None):
         """
         将图片裁剪为圆形（优化版本）
         参数:
             img: PIL.Image对象
             offset_x: X轴偏移
             offset_y: Y轴偏移
+            circle_size: 圆形直径（像素），默认为 PRINT_DPI 下的直径
         返回: PIL.Image - 圆形图片
         """
-        circle_size = self.badge_diameter_px
+        if circle_size is None:
+            circle_size = self.badge_diameter_px
         img_width, img_height = img.size
 
         # 计算粘贴位置
@@ -266,9 +287,10 @@ class ImageProcessor:
 
         return self._mask_cache[mask_key]
     
-    def _create_blank_circle(self):
+    def _create_blank_circle(self, circle_size=None):
         """创建空白圆形图片"""
-        circle_size = self.badge_diameter_px
+        if circle_size is None:
+            circle_size = self.badge_diameter_px
         img = Image.new('RGB', (circle_size, circle_size), (240, 240, 240))
         
         # 绘制圆形边框
@@ -317,12 +339,7 @@ class ImageProcessor:
                 circle_img = circle_img.resize((preview_size, preview_size), Image.Resampling.LANCZOS)
 
             # 转换为QPixmap
-            with resource_manager(BytesIO()) as buffer:
-                circle_img.save(buffer, format='PNG')
-                buffer.seek(0)
-
-                pixmap = QPixmap()
-                pixmap.loadFromData(buffer.getvalue())
+            pixmap = pil_to_qpixmap(circle_img)
 
             # 缓存预览结果
             self._manage_cache(self._preview_cache, is_preview_cache=True)
@@ -337,31 +354,33 @@ class ImageProcessor:
         except Exception as e:
             logger.error(f"创建预览图片失败: {e}", exc_info=True)
             # 返回空白预览
-            blank_pixmap = QPixmap(preview_size, preview_size)
-            blank_pixmap.fill()  # 填充为白色
-            return blank_pixmap
+            return create_blank_pixmap(preview_size, preview_size)
     
-    def get_optimal_scale(self, image_path):
+    def get_optimal_scale(self, image_path, image_size=None, diameter_px=None):
         """
         获取最佳缩放比例（使图片刚好填满圆形）
         参数:
             image_path: 图片路径
+            image_size: 已知的图片尺寸 (宽, 高)，提供时不再打开文件
+            diameter_px: 圆形直径（PRINT_DPI 像素），默认为全局设置的直径
         返回: float - 最佳缩放比例
         """
         try:
-            with Image.open(image_path) as img:
-                img_width, img_height = img.size
-                
-                # 计算使图片完全填满圆形所需的缩放比例
-                # 取较小边的缩放比例，确保图片完全覆盖圆形
-                scale_x = self.badge_diameter_px / img_width
-                scale_y = self.badge_diameter_px / img_height
-                
-                # 使用较大的缩放比例确保完全覆盖
-                optimal_scale = max(scale_x, scale_y)
-                
-                return optimal_scale
-                
+            if image_size is None:
+                image_size = source_size(image_path)
+            img_width, img_height = image_size
+
+            # 计算使图片完全填满圆形所需的缩放比例
+            # 取较小边的缩放比例，确保图片完全覆盖圆形
+            diameter_px = diameter_px or self.badge_diameter_px
+            scale_x = diameter_px / img_width
+            scale_y = diameter_px / img_height
+
+            # 使用较大的缩放比例确保完全覆盖
+            optimal_scale = max(scale_x, scale_y)
+
+            return optimal_scale
+
         except Exception as e:
             logger.error(f"计算最佳缩放比例失败: {e}", exc_info=True)
             return 1.0
@@ -375,19 +394,18 @@ class ImageProcessor:
         返回: tuple - (max_offset_x, max_offset_y)
         """
         try:
-            with Image.open(image_path) as img:
-                img_width, img_height = img.size
-                
-                # 计算缩放后的尺寸
-                scaled_width = int(img_width * scale)
-                scaled_height = int(img_height * scale)
-                
-                # 计算最大偏移（图片边缘刚好接触圆形边缘）
-                max_offset_x = max(0, (scaled_width - self.badge_diameter_px) // 2)
-                max_offset_y = max(0, (scaled_height - self.badge_diameter_px) // 2)
-                
-                return max_offset_x, max_offset_y
-                
+            img_width, img_height = source_size(image_path)
+
+            # 计算缩放后的尺寸
+            scaled_width = int(img_width * scale)
+            scaled_height = int(img_height * scale)
+
+            # 计算最大偏移（图片边缘刚好接触圆形边缘）
+            max_offset_x = max(0, (scaled_width - self.badge_diameter_px) // 2)
+            max_offset_y = max(0, (scaled_height - self.badge_diameter_px) // 2)
+
+            return max_offset_x, max_offset_y
+
         except Exception as e:
             logger.error(f"计算最大偏移范围失败: {e}", exc_info=True)
             return 0, 0
@@ -0,0 +1,240 @@
+"""
+整批任务排版规划模块
+把一批（按数量展开后的）徽章分配到各页，得到不可变的JobPlan，预览、打印和导出共用同一份规划：
+- 网格/紧凑：所有页共用同一个点阵，页数为 ceil(总数 / 每页容量)，已是最少页数；
+- 混合尺寸：每页大圆优先填满，放不下的留到下一页，见 core.mixed_packing；
+- 相同图案集中（group_designs）：同一图案尽量放在同一页的相邻位置，便于裁切后分拣，
+  只在不增加页数的前提下调整分配（网格/紧凑按图案分组做最佳适应递减装箱，必要时拆分）。
+只依赖标准库和 core 下的排版模块，桌面端、命令行和ComfyUI节点共用
+"""
+
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from core.mixed_packing import pack_pages
+
+
+@dataclass(frozen=True)
+class PlannedPage:
+    """规划中的一页"""
+    page_index: int
+    item_indices: tuple     # 各位置对应的徽章序号（展开序列中的序号；按顺序填充时为range）
+    positions: tuple        # 圆心坐标（网格/紧凑为整页点阵，可能多于徽章数）
+    diameters_mm: tuple     # 混合尺寸页面各位置的直径（毫米），网格/紧凑为None
+    utilization: float      # 圆形面积占页面面积的比例
+    mixed_page: object = None  # 混合尺寸页面的 MixedPage（用于校验）
+
+    @property
+    def count(self):
+        return len(self.item_indices)
+
+
+@dataclass(frozen=True)
+class JobPlan:
+    """整批任务的排版规划（不可变，可在预览、打印和导出之间直接复用）"""
+    layout_type: str
+    page_spec: object           # PageSpec
+    spacing_mm: float
+    margin_mm: float
+    total_items: int
+    pages: tuple                # PlannedPage
+    layout: object = None       # 网格/紧凑所用的 LayoutResult
+    group_designs: bool = False
+
+    @property
+    def total_pages(self):
+        return len(self.pages)
+
+    @property
+    def max_per_page(self):
+        """每页最多放置的数量（网格/紧凑为点阵容量）"""
+        if self.layout is not None:
+            return self.layout.max_count
+        return max((page.count for page in self.pages), default=0)
+
+    @property
+    def utilization(self):
+        """各页面积利用率的平均值"""
+        return sum(page.utilization for page in self.pages) / len(self.pages)
+
+    def to_dict(self):
+        """
+        转换为 calculate_multi_page_layout 结构的布局字典（每次返回新的字典）
+        每页另含 item_indices、utilization；混合尺寸页面另含 diameters / diameters_mm
+        """
+        spec = self.page_spec
+        spacing = spec.mm_to_px(self.spacing_mm)
+        margin = spec.mm_to_px(self.margin_mm)
+        base = self.layout.to_dict() if self.layout is not None else {}
+        pages = []
+        for page in self.pages:
+            page_info = dict(base)
+            page_info.update(
+                page_index=page.page_index,
+                images_on_page=page.count,
+                total_pages=self.total_pages,
+                positions=page.positions,
+                item_indices=page.item_indices,
+                utilization=page.utilization,
+                page_width=spec.width_px,
+                page_height=spec.height_px,
+                dpi=spec.dpi,
+                margin=margin,
+            )
+            if isinstance(page.item_indices, range):
+                page_info['first_index'] = page.item_indices.start
+            if page.diameters_mm is not None:
+                diameters = tuple(spec.mm_to_px(d) for d in page.diameters_mm)
+                page_info.update(
+                    type='mixed',
+                    diameters=diameters,
+                    diameters_mm=page.diameters_mm,
+                    diameter=max(diameters, default=0),
+                    max_count=page.count,
+                    spacing=spacing,
+                    mixed_page=page.mixed_page,
+                )
+            pages.append(page_info)
+
+        return {
+            'type': self.layout_type,
+            'total_pages': self.total_pages,
+            'max_per_page': self.max_per_page,
+            'total_images': self.total_items,
+            'pages': pages,
+            'spacing_mm': self.spacing_mm,
+            'margin_mm': self.margin_mm,
+            'page_spec': spec,
+            'utilization': self.utilization,
+            'plan': self,
+        }
+
+
+def select_items(image_items, item_indices):
+    """按序号取出徽章（连续区间直接切片，ExpandedBadges只构建该区间）"""
+    if isinstance(item_indices, range) and item_indices.step == 1:
+        return image_items[item_indices.start:item_indices.stop]
+    return [image_items[i] for i in item_indices]
+
+
+def design_key(item):
+    """图案标识：源文件和编辑参数都相同的徽章视为同一图案"""
+    return (item.file_path, item.scale, item.offset_x, item.offset_y, item.rotation,
+            getattr(item, 'badge_size_mm', None))
+
+
+def group_by_design(image_items):
+    """
+    按图案分组
+    返回: list[list[int]] - 各组的徽章序号，组按首次出现的顺序排列
+    """
+    groups = OrderedDict()
+    for index, item in enumerate(image_items):
+        groups.setdefault(design_key(item), []).append(index)
+    return list(groups.values())
+
+
+def _pack_groups(groups, capacity, total_pages):
+    """
+    将图案分组装入total_pages页（每页capacity个）
+    先为数量不少于一页的图案整页分配，余下部分按数量从大到小放入剩余空间最小且放得下的页；
+    放不下且页数已用完时拆分到剩余空间最大的页（总数不超过 total_pages×capacity，一定放得下）
+    返回: list[list[int]] - 各页的徽章序号
+    """
+    full_pages = []
+    remainders = []
+    for group in groups:
+        whole = len(group) // capacity * capacity
+        full_pages.extend(group[start:start + capacity] for start in range(0, whole, capacity))
+        if whole < len(group):
+            remainders.append(group[whole:])
+
+    open_limit = total_pages - len(full_pages)
+    bins = []
+    for group in sorted(remainders, key=len, reverse=True):
+        fitting = [page for page in bins if capacity - len(page) >= len(group)]
+        if fitting:
+            max(fitting, key=len).extend(group)
+        elif len(bins) < open_limit:
+            bins.append(list(group))
+        else:
+            rest = group
+            for page in sorted(bins, key=len):
+                if not rest:
+                    break
+                free = capacity - len(page)
+                page.extend(rest[:free])
+                rest = rest[free:]
+
+    pages = full_pages + bins
+    pages.sort(key=lambda page: page[0])
+    return pages
+
+
+def plan_uniform(layout, item_count, page_spec, spacing_mm, margin_mm, diameter_mm, groups=None):
+    """
+    网格/紧凑排版的规划
+    参数:
+        layout: 单页的 LayoutResult
+        item_count: 徽章总数
+        diameter_mm: 印刷圆直径（含出血，毫米），用于计算利用率
+        groups: group_by_design 的结果；为None时按顺序逐页填充
+    返回: JobPlan
+    """
+    capacity = layout.max_count
+    total_pages = max(1, math.ceil(item_count / capacity)) if capacity else 1
+
+    if capacity == 0:
+        page_items = [range(0)]
+    elif groups is None:
+        page_items = [range(start, min(start + capacity, item_count))
+                      for start in range(0, item_count, capacity)] or [range(0)]
+    else:
+        page_items = [tuple(page) for page in _pack_groups(groups, capacity, total_pages)] or [()]
+
+    circle_area = math.pi * (page_spec.mm_to_px(diameter_mm) / 2) ** 2
+    page_area = page_spec.width_px * page_spec.height_px
+    pages = tuple(
+        PlannedPage(page_index, items, layout.positions, None, len(items) * circle_area / page_area)
+        for page_index, items in enumerate(page_items)
+    )
+    return JobPlan(layout.key.layout_type, page_spec, spacing_mm, margin_mm, item_count, pages, layout,
+                   groups is not None)
+
+
+def plan_mixed(diameters_mm, page_spec, spacing_mm, margin_mm, groups=None):
+    """
+    混合尺寸排版的规划
+    参数:
+        diameters_mm: 每个徽章的印刷圆直径（含出血，毫米），按展开顺序
+        groups: group_by_design 的结果；提供时同一图案按组连续放入（同尺寸的位置按放入顺序相邻）
+    返回: JobPlan
+    异常: ValueError - 有徽章大于页面可用区域
+    """
+    order = [index for group in groups for index in group] if groups is not None \
+        else range(len(diameters_mm))
+
+    # 同一像素直径的徽章共用排版位置
+    px_to_mm = {}
+    diameters = []
+    for index in order:
+        diameter = page_spec.mm_to_px(diameters_mm[index])
+        px_to_mm.setdefault(diameter, diameters_mm[index])
+        diameters.append(diameter)
+
+    mixed = pack_pages(diameters, page_spec.width_px, page_spec.height_px,
+                       page_spec.mm_to_px(spacing_mm), page_spec.mm_to_px(margin_mm))
+
+    pages = tuple(
+        PlannedPage(
+            page_index,
+            tuple(order[i] for i in page.indices),
+            page.positions,
+            tuple(px_to_mm[d] for d in page.diameters),
+            page.utilization,
+            page,
+        )
+        for page_index, page in enumerate(mixed.pages)
+    ) or (PlannedPage(0, (), (), (), 0.0),)
+    return JobPlan('mixed', page_spec, spacing_mm, margin_mm, len(diameters), pages, None, groups is not None)
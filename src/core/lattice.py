@@ -0,0 +1,169 @@
+"""
+点阵坐标生成与校验模块
+排列统一描述为若干“等距点行”(起点x, 起点y, 步长x, 步长y, 点数)，
+展开成 (N, 2) 整数坐标数组；校验通过网格哈希检查圆心最小距离和页边距约束。
+NumPy可用时全部为数组运算（适合参数扫描），否则退化为纯Python实现
+（桌面版打包时排除了NumPy，结果一致）
+"""
+
+import math
+from dataclasses import dataclass
+
+from common.imports import OptionalImport
+
+np = OptionalImport('numpy')
+
+# 校验时允许的取整误差（像素）：坐标取整后圆心距最多缩短约√2像素
+DEFAULT_TOLERANCE = 1.5
+
+
+@dataclass(frozen=True)
+class LayoutValidation:
+    """布局校验结果"""
+    valid: bool
+    min_distance: float     # 实际的最小圆心距（少于2个点时为inf）
+    overlap_count: int      # 圆心距小于要求的点对数
+    outside_count: int      # 超出页边距的圆形数
+
+
+def expand_runs(runs, offset_x=0.0, offset_y=0.0):
+    """
+    展开等距点行并取整
+    参数:
+        runs: [(起点x, 起点y, 步长x, 步长y, 点数), ...]
+        offset_x, offset_y: 整体平移量
+    返回: NumPy可用时为 (N, 2) int64数组，否则为 [(x, y), ...]
+    """
+    if np:
+        if not runs:
+            return np.empty((0, 2), dtype=np.int64)
+        table = np.asarray(runs, dtype=np.float64)
+        counts = table[:, 4].astype(np.int64)
+        total = int(counts.sum())
+        # 每个点在所属行内的序号
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        index = (np.arange(total) - first)[:, None]
+        points = np.repeat(table[:, 0:2], counts, axis=0) + index * np.repeat(table[:, 2:4], counts, axis=0)
+        points += (offset_x, offset_y)
+        return np.rint(points).astype(np.int64)
+
+    return [
+        (int(round(x + i * dx + offset_x)), int(round(y + i * dy + offset_y)))
+        for x, y, dx, dy, n in runs
+        for i in range(int(n))
+    ]
+
+
+def runs_bounds(runs):
+    """点行的包围盒 (min_x, min_y, max_x, max_y)，没有点时返回None"""
+    xs, ys = [], []
+    for x, y, dx, dy, n in runs:
+        if n > 0:
+            xs += (x, x + (n - 1) * dx)
+            ys += (y, y + (n - 1) * dy)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def to_position_list(points):
+    """(N, 2) 数组或点列表 -> [(x, y), ...]（布局字典使用的格式）"""
+    if np and isinstance(points, np.ndarray):
+        return list(map(tuple, points.tolist()))
+    return list(points)
+
+
+def _min_pair_distance_numpy(points, min_distance, tolerance):
+    """网格哈希求最小点距和过近的点对数（NumPy实现）"""
+    cell = max(float(min_distance), 1.0)
+    cells = np.floor(points / cell).astype(np.int64)
+    cells -= cells.min(axis=0)
+    width = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * width + (cells[:, 1] + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    limit = min_distance - tolerance
+    best = math.inf
+    overlaps = 0
+    index = np.arange(len(points))
+    # 每个点只与自身及8个相邻格子中的点比较
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbour = keys + dx * width + dy
+            low = np.searchsorted(sorted_keys, neighbour, side='left')
+            high = np.searchsorted(sorted_keys, neighbour, side='right')
+            k = 0
+            while True:
+                active = low + k < high
+                if not active.any():
+                    break
+                i = index[active]
+                j = order[low[active] + k]
+                # 每个点对只统计一次
+                pair = i < j
+                if pair.any():
+                    delta = points[i[pair]] - points[j[pair]]
+                    distance = np.sqrt((delta.astype(np.float64) ** 2).sum(axis=1))
+                    best = min(best, float(distance.min()))
+                    overlaps += int((distance < limit).sum())
+                k += 1
+    return best, overlaps
+
+
+def _min_pair_distance_python(points, min_distance, tolerance):
+    """网格哈希求最小点距和过近的点对数（纯Python实现）"""
+    cell = max(float(min_distance), 1.0)
+    buckets = {}
+    for index, (x, y) in enumerate(points):
+        buckets.setdefault((math.floor(x / cell), math.floor(y / cell)), []).append(index)
+
+    limit = min_distance - tolerance
+    best = math.inf
+    overlaps = 0
+    for (cx, cy), members in buckets.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in buckets.get((cx + dx, cy + dy), ()):
+                    for i in members:
+                        if i < j:
+                            distance = math.dist(points[i], points[j])
+                            best = min(best, distance)
+                            if distance < limit:
+                                overlaps += 1
+    return best, overlaps
+
+
+def validate_positions(positions, diameter, min_distance, page_size, margin,
+                       tolerance=DEFAULT_TOLERANCE):
+    """
+    校验圆心坐标：任意两圆心距不小于min_distance，圆形不超出页边距
+    参数:
+        positions: (N, 2) 数组或 [(x, y), ...]
+        diameter: 圆形直径（像素）
+        min_distance: 要求的最小圆心距（像素，通常为直径+间距）
+        page_size: (页面宽, 页面高)（像素）
+        margin: 页边距（像素）
+        tolerance: 允许的取整误差（像素）
+    返回: LayoutValidation
+    """
+    page_width, page_height = page_size
+    radius = diameter / 2
+    low = margin + radius - tolerance
+    high_x = page_width - margin - radius + tolerance
+    high_y = page_height - margin - radius + tolerance
+
+    if np:
+        points = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        outside = int(((x < low) | (y < low) | (x > high_x) | (y > high_y)).sum())
+        if len(points) > 1:
+            best, overlaps = _min_pair_distance_numpy(points, min_distance, tolerance)
+        else:
+            best, overlaps = math.inf, 0
+    else:
+        points = [tuple(p) for p in positions]
+        outside = sum(1 for x, y in points if x < low or y < low or x > high_x or y > high_y)
+        best, overlaps = _min_pair_distance_python(points, min_distance, tolerance)
+
+    return LayoutValidation(overlaps == 0 and outside == 0, best, overlaps, outside)
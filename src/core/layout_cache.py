@@ -0,0 +1,193 @@
+"""
+排版结果缓存模块
+排版结果只由 (排版模式, 页面尺寸, DPI, 直径, 间距, 页边距) 决定：
+以不可变的LayoutKey为键、不可变的LayoutResult为值，进程内按LRU共享，
+桌面端LayoutEngine与ComfyUI节点使用同一份缓存
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from common.constants import PRINT_DPI
+from core.lattice import expand_runs, to_position_list
+from core.packing import optimize_packing
+
+# 共享缓存的容量（每项只有坐标元组，几十KB以内）
+LAYOUT_CACHE_SIZE = 128
+
+
+@dataclass(frozen=True)
+class LayoutKey:
+    """排版参数（像素），可哈希"""
+    layout_type: str        # 'grid' 或 'compact'
+    page_width: int
+    page_height: int
+    dpi: int
+    diameter: int
+    spacing: int
+    margin: int
+
+
+@dataclass(frozen=True)
+class LayoutResult:
+    """单页排版结果（不可变，可在调用方之间直接共享）"""
+    key: LayoutKey
+    positions: tuple        # 圆心坐标 ((x, y), ...)
+    runs: tuple             # 等距点行描述（页面坐标），见 core.lattice
+    center_distance: float
+    arrangement: str        # 网格为'grid'，紧凑为 core.packing 选中的排列
+    rows: int = 0           # 仅网格排列
+    cols: int = 0           # 仅网格排列
+
+    @property
+    def max_count(self):
+        return len(self.positions)
+
+    def to_dict(self):
+        """
+        转换为旧接口的布局字典
+        每次调用返回新的字典和坐标列表，调用方修改不会影响缓存
+        """
+        key = self.key
+        layout = {
+            'type': key.layout_type,
+            'positions': list(self.positions),
+            'runs': self.runs,
+            'max_count': self.max_count,
+            'center_distance': self.center_distance,
+            'margin': key.margin,
+            'diameter': key.diameter,
+            'page_width': key.page_width,
+            'page_height': key.page_height,
+            'dpi': key.dpi,
+        }
+        if key.layout_type == 'grid':
+            layout.update(rows=self.rows, cols=self.cols, spacing_x=key.spacing, spacing_y=key.spacing)
+        else:
+            layout.update(arrangement=self.arrangement, spacing=key.spacing)
+        return layout
+
+
+def compute_layout(key):
+    """
+    计算排版结果（不经过缓存）
+    参数:
+        key: LayoutKey
+    返回: LayoutResult
+    """
+    if key.layout_type == 'grid':
+        return _compute_grid_layout(key)
+
+    packing = optimize_packing(key.page_width, key.page_height, key.diameter, key.spacing, key.margin)
+    shift_x, shift_y = packing.shift
+    runs = tuple((x + shift_x, y + shift_y, dx, dy, n) for x, y, dx, dy, n in packing.runs)
+    return LayoutResult(key, packing.positions, runs, packing.center_distance, packing.arrangement)
+
+
+def _compute_grid_layout(key):
+    """网格排列：行列数按可用区域整除圆心距，整体居中；徽章放不下时没有位置（与 capacity.grid_capacity 一致）"""
+    available_width = key.page_width - 2 * key.margin
+    available_height = key.page_height - 2 * key.margin
+    radius = key.diameter // 2
+
+    # 使用固定间距计算，与密集排版保持一致
+    center_distance = key.diameter + key.spacing
+    if available_width < key.diameter or available_height < key.diameter:
+        cols = rows = 0
+    else:
+        cols = max(1, available_width // center_distance)
+        rows = max(1, available_height // center_distance)
+
+    # 计算起始位置（居中）
+    start_x = key.margin + (available_width - cols * center_distance) / 2
+    start_y = key.margin + (available_height - rows * center_distance) / 2
+
+    # 每行为一组等距点，整体展开为坐标数组
+    runs = tuple(
+        (start_x + radius, start_y + row * center_distance + radius, center_distance, 0, cols)
+        for row in range(rows)
+    )
+    positions = tuple(to_position_list(expand_runs(runs)))
+    return LayoutResult(key, positions, runs, center_distance, 'grid', rows, cols)
+
+
+class LayoutCache:
+    """线程安全的LRU排版结果缓存"""
+
+    def __init__(self, max_size=LAYOUT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """读取排版结果，未命中时计算并缓存"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        # 计算放在锁外：结果只由键决定，并发重复计算也只是覆盖为相同的值
+        result = compute_layout(key)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self):
+        """缓存统计信息"""
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# 进程内共享的缓存实例
+shared_layout_cache = LayoutCache()
+
+
+def get_layout(layout_type, page_width, page_height, diameter, spacing, margin, dpi=PRINT_DPI):
+    """
+    从共享缓存读取排版结果
+    参数（像素）: 排版模式、页面宽高、直径、间距、页边距；dpi仅用于区分不同分辨率的结果
+    （按毫米和页面规格读取见 get_page_layout）
+    返回: LayoutResult
+    """
+    layout_type = 'grid' if layout_type == 'grid' else 'compact'
+    key = LayoutKey(layout_type, int(page_width), int(page_height), int(dpi),
+                    int(diameter), int(spacing), int(margin))
+    return shared_layout_cache.get(key)
+
+
+def get_page_layout(layout_type, page_spec, diameter_mm, spacing_mm, margin_mm):
+    """
+    按页面规格读取排版结果（毫米参数按页面分辨率换算为像素）
+    参数:
+        layout_type: 'grid' 或 'compact'
+        page_spec: PageSpec
+        diameter_mm, spacing_mm, margin_mm: 圆形直径（含出血）、间距、页边距（毫米）
+    返回: LayoutResult
+    """
+    return get_layout(
+        layout_type, page_spec.width_px, page_spec.height_px,
+        page_spec.mm_to_px(diameter_mm), page_spec.mm_to_px(spacing_mm),
+        page_spec.mm_to_px(margin_mm), page_spec.dpi
+    )
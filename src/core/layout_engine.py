@@ -1,299 +1,199 @@
 """
-A4排版引擎模块
-实现圆形图片在A4纸上的自动排版算法
+排版引擎模块
+实现圆形图片在页面上的自动排版算法（纸张尺寸和分辨率由 PageSpec 决定，默认A4@300dpi）
+网格/紧凑模式所有徽章使用全局直径；混合尺寸模式（'mixed'）按每个徽章自己的直径排版，见 core.mixed_packing；
+整批徽章的分页规划（JobPlan）见 core.job_planner，渲染计划和页面合成见 core.render_plan
 """
 
-import math
-from io import BytesIO
-
-# 导入公共模块
-from common.imports import PIL_AVAILABLE, PYSIDE6_AVAILABLE, Image, ImageDraw, QPixmap
-from common.constants import (
-    A4_WIDTH_PX, A4_HEIGHT_PX, DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM,
-    mm_to_pixels
-)
+# 导入公共模块（Qt只在生成QPixmap时通过qt_adapter按需加载）
+from common.imports import PIL_AVAILABLE, PYSIDE6_AVAILABLE
+from common.qt_adapter import pil_to_qpixmap, create_blank_pixmap
+from common.constants import DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM
 from common.error_handler import error_handler, resource_manager, logger, LayoutError
+from core.packing import optimize_packing, packing_capacity
+from core.lattice import expand_runs, validate_positions
+from core.layout_cache import shared_layout_cache, get_page_layout
+from core.mixed_packing import validate_page
+from core.job_planner import plan_uniform, plan_mixed, group_by_design, select_items
+from core.render_plan import build_render_plan, PageCompositor
+from core.overlay import layout_overlay
+from core import capacity
 from utils.config import app_config
 
 class LayoutEngine:
-    """A4排版引擎类"""
+    """排版引擎类"""
     
-    def __init__(self):
-        self.a4_width_px = A4_WIDTH_PX
-        self.a4_height_px = A4_HEIGHT_PX
+    def __init__(self, page_spec=None):
+        """
+        参数:
+            page_spec: 固定使用的页面规格；为None时跟随全局配置 app_config.page_spec
+        """
+        self._page_spec = page_spec
 
-        # 布局缓存
-        self._layout_cache = {}
-        self._max_layout_cache = 20
+        # 布局结果缓存：进程内共享（ComfyUI节点也使用同一份），按完整参数的LRU淘汰
+        self._layout_cache = shared_layout_cache
 
-    def _manage_layout_cache(self):
-        """管理布局缓存大小"""
-        if len(self._layout_cache) >= self._max_layout_cache:
-            # 删除最旧的缓存项
-            oldest_key = next(iter(self._layout_cache))
-            del self._layout_cache[oldest_key]
+        # 页面合成器：图块缓存进程内共享（预览、打印和导出共用）
+        self.compositor = PageCompositor()
 
     def clear_cache(self):
         """清空所有缓存，释放内存"""
         self._layout_cache.clear()
+        optimize_packing.cache_clear()
+        packing_capacity.cache_clear()
+        layout_overlay.cache_clear()
+        self.compositor.tile_cache.clear()
         logger.info("布局引擎缓存已清空")
 
     def get_cache_info(self):
         """获取缓存信息"""
+        info = self._layout_cache.info()
+        tile_info = self.compositor.tile_cache.info()
         return {
-            'layout_cache_size': len(self._layout_cache),
-            'max_cache_size': self._max_layout_cache
+            'layout_cache_size': info['size'],
+            'max_cache_size': info['max_size'],
+            'layout_cache_hits': info['hits'],
+            'layout_cache_misses': info['misses'],
+            'packing_cache_size': optimize_packing.cache_info().currsize,
+            'overlay_cache_size': layout_overlay.cache_info().currsize,
+            'tile_cache_size': tile_info['tiles'],
+            'tile_cache_bytes': tile_info['bytes'],
         }
 
+    @property
+    def page_spec(self):
+        """当前页面规格（PageSpec）"""
+        return self._page_spec or app_config.page_spec
+
+    @page_spec.setter
+    def page_spec(self, value):
+        """固定页面规格（None表示跟随全局配置）"""
+        self._page_spec = value
+
+    @property
+    def a4_width_px(self):
+        """页面宽度（像素，沿用旧名称，实际为当前页面规格）"""
+        return self.page_spec.width_px
+
+    @property
+    def a4_height_px(self):
+        """页面高度（像素，沿用旧名称，实际为当前页面规格）"""
+        return self.page_spec.height_px
+
     @property
     def badge_diameter_px(self):
-        """获取当前圆形直径（像素）"""
-        return app_config.badge_diameter_px
+        """获取当前圆形直径（页面分辨率下的像素）"""
+        return self.page_spec.mm_to_px(app_config.badge_diameter_mm)
 
     @property
     def badge_radius_px(self):
-        """获取当前圆形半径（像素）"""
-        return app_config.badge_radius_px
-        
-    def calculate_grid_layout(self, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+        """获取当前圆形半径（页面分辨率下的像素）"""
+        return self.badge_diameter_px // 2
+
+    def get_item_diameter_mm(self, image_item):
+        """徽章的印刷圆直径（含出血，毫米）：有单独尺寸时使用单独尺寸，否则使用全局设置"""
+        badge_size_mm = getattr(image_item, 'badge_size_mm', None) or app_config.badge_size_mm
+        return badge_size_mm + 2 * app_config.bleed_size_mm
+
+    def get_layout_result(self, layout_type, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                          page_spec=None):
         """
-        计算网格排列布局（带缓存优化）
+        获取不可变的排版结果（经过共享缓存，缓存键包含页面尺寸和分辨率）
         参数:
+            layout_type: 'grid' 或 'compact'
             spacing_mm: 圆形间距（毫米）
             margin_mm: 页边距（毫米）
-        返回: dict - 布局信息
+            page_spec: 页面规格，默认使用 self.page_spec
+        返回: LayoutResult
         """
-        # 检查缓存
-        cache_key = f"grid_{spacing_mm}_{margin_mm}_{app_config.badge_diameter_mm}"
-        if cache_key in self._layout_cache:
-            return self._layout_cache[cache_key].copy()
-
-        # 转换为像素
-        spacing_px = mm_to_pixels(spacing_mm)
-        margin_px = mm_to_pixels(margin_mm)
-        
-        # 计算可用区域
-        available_width = self.a4_width_px - 2 * margin_px
-        available_height = self.a4_height_px - 2 * margin_px
-        
-        # 使用固定间距计算，与密集排版保持一致
-        # 圆心之间的距离（圆形直径 + 用户设定的间距）
-        center_distance = self.badge_diameter_px + spacing_px
-
-        # 计算每行和每列可放置的圆形数量
-        cols = max(1, available_width // center_distance)
-        rows = max(1, available_height // center_distance)
-
-        # 计算起始位置（居中）
-        total_width = cols * center_distance
-        total_height = rows * center_distance
-
-        start_x = margin_px + (available_width - total_width) / 2
-        start_y = margin_px + (available_height - total_height) / 2
-
-        # 生成位置列表
-        positions = []
-        for row in range(rows):
-            for col in range(cols):
-                x = start_x + col * center_distance + self.badge_radius_px
-                y = start_y + row * center_distance + self.badge_radius_px
-                positions.append((int(x), int(y)))
-        
-        result = {
-            'type': 'grid',
-            'positions': positions,
-            'rows': rows,
-            'cols': cols,
-            'max_count': rows * cols,
-            'spacing_x': spacing_px,
-            'spacing_y': spacing_px,
-            'center_distance': center_distance,
-            'margin': margin_px
-        }
-
-        # 缓存结果
-        self._manage_layout_cache()
-        self._layout_cache[cache_key] = result.copy()
+        return get_page_layout(
+            layout_type, page_spec or self.page_spec, app_config.badge_diameter_mm, spacing_mm, margin_mm
+        )
 
-        return result
-    
-    def calculate_compact_layout(self, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+    def calculate_grid_layout(self, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM, page_spec=None):
         """
-        计算紧密排列布局（六边形蜂巢密排）
-        优化算法：实现4-3-4模式的紧凑排列，最大化利用A4空间
+        计算网格排列布局
         参数:
             spacing_mm: 圆形间距（毫米）
             margin_mm: 页边距（毫米）
-        返回: dict - 布局信息
+            page_spec: 页面规格，默认使用 self.page_spec
+        返回: dict - 布局信息（每次返回新的字典，可自由修改）
         """
-        # 检查缓存
-        cache_key = f"compact_{spacing_mm}_{margin_mm}_{app_config.badge_diameter_mm}"
-        if cache_key in self._layout_cache:
-            return self._layout_cache[cache_key].copy()
-
-        # 转换为像素
-        spacing_px = mm_to_pixels(spacing_mm)
-        margin_px = mm_to_pixels(margin_mm)
+        return self.get_layout_result('grid', spacing_mm, margin_mm, page_spec).to_dict()
 
-        # 计算可用区域
-        available_width = self.a4_width_px - 2 * margin_px
-        available_height = self.a4_height_px - 2 * margin_px
+    def calculate_compact_layout(self, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM, page_spec=None):
+        """
+        计算紧密排列布局
+        在六边形（行/列）、方格与六边形混合、拉伸节距交错和旋转点阵中
+        选出可放置数量最多的排列，见 core.packing
+        参数:
+            spacing_mm: 圆形间距（毫米）
+            margin_mm: 页边距（毫米）
+            page_spec: 页面规格，默认使用 self.page_spec
+        返回: dict - 布局信息（每次返回新的字典，可自由修改）
+        """
+        return self.get_layout_result('compact', spacing_mm, margin_mm, page_spec).to_dict()
 
-        # 圆心之间的最小距离
-        min_center_distance = self.badge_diameter_px + spacing_px
+    def capacity_table(self, diameters_mm, spacings_mm=(DEFAULT_SPACING_MM,), margins_mm=(DEFAULT_MARGIN_MM,),
+                       layout_types=('grid', 'compact'), bleed_mm=None):
+        """
+        参数扫描：计算各直径、间距、页边距和排版模式组合的每页数量（只用几何模型，不渲染）
+        参数:
+            diameters_mm: 徽章直径列表（毫米，不含出血）
+            spacings_mm, margins_mm: 间距、页边距列表（毫米）
+            layout_types: 排版模式列表
+            bleed_mm: 出血半径，默认使用当前配置
+        返回: list[CapacityEntry]
+        """
+        if bleed_mm is None:
+            bleed_mm = app_config.bleed_size_mm
+        spec = self.page_spec
+        return capacity.capacity_table(diameters_mm, spacings_mm, margins_mm, layout_types, bleed_mm,
+                                       spec.dpi, spec.size_mm)
+
+    def max_diameter_for_count(self, count, layout_type='compact', spacing_mm=DEFAULT_SPACING_MM,
+                               margin_mm=DEFAULT_MARGIN_MM, bleed_mm=None):
+        """
+        反向查询：每页至少放count个徽章时的最大徽章直径
+        返回: CapacityEntry，放不下时返回None
+        """
+        if bleed_mm is None:
+            bleed_mm = app_config.bleed_size_mm
+        spec = self.page_spec
+        return capacity.max_diameter_for_count(count, spacing_mm, margin_mm, layout_type, bleed_mm,
+                                               spec.dpi, spec.size_mm)
 
-        # 计算最优列数和间距
-        max_cols, horizontal_spacing, start_x = self._calculate_compact_columns(
-            available_width, margin_px, spacing_px, min_center_distance
-        )
+    def get_positions_array(self, layout):
+        """
+        布局的圆心坐标数组
+        参数:
+            layout: calculate_grid_layout / calculate_compact_layout 的结果
+        返回: (N, 2) 整数数组（NumPy不可用时为坐标列表）
+        """
+        return expand_runs(layout['runs'])
 
-        # 计算垂直间距和偏移
-        vertical_spacing, middle_col_offset = self._calculate_compact_vertical_spacing(
-            horizontal_spacing, min_center_distance
+    def validate_layout(self, layout):
+        """
+        校验布局：圆心距不小于直径+间距，圆形不超出页边距
+        参数:
+            layout: calculate_grid_layout / calculate_compact_layout 的结果
+        返回: LayoutValidation
+        """
+        if layout.get('type') == 'mixed':
+            return validate_page(layout['mixed_page'], layout['spacing'],
+                                 (layout['page_width'], layout['page_height']), layout['margin'])
+
+        # 布局字典自带页面尺寸，按生成它的页面规格校验
+        return validate_positions(
+            self.get_positions_array(layout),
+            layout['diameter'],
+            layout['center_distance'],
+            (layout['page_width'], layout['page_height']),
+            layout['margin']
         )
 
-        # 生成所有位置
-        layout_params = {
-            'max_cols': max_cols,
-            'start_x': start_x,
-            'horizontal_spacing': horizontal_spacing,
-            'margin_px': margin_px,
-            'vertical_spacing': vertical_spacing,
-            'middle_col_offset': middle_col_offset
-        }
-        positions = self._generate_compact_positions(layout_params)
-
-        result = {
-            'type': 'compact',
-            'positions': positions,
-            'max_count': len(positions),
-            'vertical_spacing': vertical_spacing,
-            'horizontal_spacing': horizontal_spacing,
-            'middle_col_offset': middle_col_offset,
-            'center_distance': min_center_distance,
-            'spacing': spacing_px,
-            'margin': margin_px,
-            'columns': max_cols
-        }
-
-        # 缓存结果
-        self._manage_layout_cache()
-        self._layout_cache[cache_key] = result.copy()
-
-        return result
-
-    def _calculate_compact_columns(self, available_width, margin_px, spacing_px, min_center_distance):
-        """计算紧凑布局的列数和水平间距"""
-        # 第一步：计算可以放置的列数（保守估计）
-        max_cols = self._find_max_columns(available_width, spacing_px)
-
-        # 第二步：尝试使用六边形网格间距
-        hex_horizontal_factor = math.sqrt(3) / 2  # ≈ 0.866
-        theoretical_hex_spacing = self.badge_diameter_px * hex_horizontal_factor + spacing_px
-
-        # 基于六边形间距重新计算列数
-        max_cols_hex = int((available_width + theoretical_hex_spacing) // theoretical_hex_spacing)
-        max_cols_hex = max(1, max_cols_hex)
-
-        # 选择最优方案
-        if max_cols_hex > max_cols:
-            # 六边形间距可以放下更多列
-            max_cols = max_cols_hex
-            horizontal_spacing = theoretical_hex_spacing
-            start_x = margin_px + self.badge_radius_px
-        else:
-            # 使用均匀分布方式
-            horizontal_spacing, start_x = self._calculate_uniform_spacing(
-                max_cols, available_width, margin_px, min_center_distance
-            )
-
-        return max_cols, horizontal_spacing, start_x
-
-    def _find_max_columns(self, available_width, spacing_px):
-        """查找可以放置的最大列数"""
-        max_cols = 1
-
-        for test_cols in range(1, 5):  # 最多测试4列
-            if test_cols == 1:
-                total_width_needed = self.badge_diameter_px
-            else:
-                # 计算实际可用的水平空间
-                available_for_spacing = available_width - test_cols * self.badge_diameter_px
-                if available_for_spacing < 0:
-                    break
-
-                # 计算间距
-                actual_spacing = available_for_spacing / (test_cols - 1)
-                min_required_spacing = max(0, spacing_px * 0.5)  # 允许间距减半
-                if actual_spacing < min_required_spacing:
-                    break
-
-                total_width_needed = test_cols * self.badge_diameter_px + (test_cols - 1) * actual_spacing
-
-            if total_width_needed <= available_width:
-                max_cols = test_cols
-            else:
-                break
-
-        return max_cols
-
-    def _calculate_uniform_spacing(self, max_cols, available_width, margin_px, min_center_distance):
-        """计算均匀分布的间距和起始位置"""
-        if max_cols == 1:
-            horizontal_spacing = min_center_distance
-            start_x = margin_px + available_width / 2  # 居中
-        else:
-            # 计算实际间距
-            available_for_spacing = available_width - max_cols * self.badge_diameter_px
-            actual_spacing = available_for_spacing / (max_cols - 1)
-            horizontal_spacing = self.badge_diameter_px + actual_spacing
-            start_x = margin_px + self.badge_radius_px
-
-        return horizontal_spacing, start_x
-
-    def _calculate_compact_vertical_spacing(self, horizontal_spacing, min_center_distance):
-        """计算紧凑布局的垂直间距"""
-        # 六边形网格的垂直间距 = 水平间距 * √3/2
-        theoretical_vertical = horizontal_spacing * math.sqrt(3) / 2
-        # 使用理论值和最小距离的较大者，确保不重叠
-        vertical_spacing = max(theoretical_vertical, min_center_distance)
-        # 中间列的垂直偏移
-        middle_col_offset = vertical_spacing / 2
-
-        return vertical_spacing, middle_col_offset
-
-    def _generate_compact_positions(self, layout_params):
-        """生成紧凑布局的所有位置"""
-        positions = []
-
-        for col in range(layout_params['max_cols']):
-            # 计算列的X位置
-            if layout_params['max_cols'] == 1:
-                x = layout_params['start_x']
-            else:
-                x = layout_params['start_x'] + col * layout_params['horizontal_spacing']
-
-            # 边界检查
-            if (x - self.badge_radius_px < layout_params['margin_px'] or
-                x + self.badge_radius_px > self.a4_width_px - layout_params['margin_px']):
-                continue
-
-            # 计算当前列的Y起始位置
-            if col % 2 == 0:  # 偶数列
-                y_start = layout_params['margin_px'] + self.badge_radius_px
-            else:  # 奇数列 - 向下偏移
-                y_start = layout_params['margin_px'] + self.badge_radius_px + layout_params['middle_col_offset']
-
-            # 在当前列中放置圆形
-            y = y_start
-            while y + self.badge_radius_px <= self.a4_height_px - layout_params['margin_px']:
-                positions.append((int(x), int(y)))
-                y += layout_params['vertical_spacing']
-
-        return positions
-    
     def create_layout_preview(self, image_items, layout_type='grid', spacing_mm=DEFAULT_SPACING_MM,
-                            margin_mm=DEFAULT_MARGIN_MM, preview_scale=0.5):
+                            margin_mm=DEFAULT_MARGIN_MM, preview_scale=0.5, page_spec=None):
         """
         创建排版预览图片
         参数:
@@ -302,6 +202,7 @@ class LayoutEngine:
             spacing_mm: 间距（毫米）
             margin_mm: 页边距（毫米）
             preview_scale: 预览缩放比例
+            page_spec: 页面规格，默认使用 self.page_spec
         返回: QPixmap - 预览图片
         """
         if not PYSIDE6_AVAILABLE:
@@ -309,136 +210,63 @@ class LayoutEngine:
             return None
 
         try:
-            # 计算布局
-            layout = self._get_layout(layout_type, spacing_mm, margin_mm)
-
-            # 创建画布和绘制对象
-            canvas, draw = self._create_preview_canvas(margin_mm)
-
-            # 放置图片
-            self._place_images_on_canvas(canvas, draw, image_items, layout['positions'])
-
-            # 绘制占位符
-            self._draw_placeholders(draw, image_items, layout['positions'])
-
-            # 转换为QPixmap
-            return self._canvas_to_pixmap(canvas, preview_scale)
+            preview_img = self.render_layout_image(
+                image_items, layout_type, spacing_mm, margin_mm, preview_scale, page_spec
+            )
+            return pil_to_qpixmap(preview_img)
 
         except Exception as e:
             print(f"创建排版预览失败: {e}")
             return self._create_blank_preview()
 
-    def _get_layout(self, layout_type, spacing_mm, margin_mm):
-        """获取布局信息"""
-        if layout_type == 'grid':
-            return self.calculate_grid_layout(spacing_mm, margin_mm)
-        else:
-            return self.calculate_compact_layout(spacing_mm, margin_mm)
-
-    def _create_preview_canvas(self, margin_mm):
-        """创建预览画布"""
-        # 创建A4画布
-        canvas = Image.new('RGB', (self.a4_width_px, self.a4_height_px), (255, 255, 255))
-
-        # 绘制页边距线
-        draw = ImageDraw.Draw(canvas)
-        margin_px = mm_to_pixels(margin_mm)
-        draw.rectangle([
-            margin_px, margin_px,
-            self.a4_width_px - margin_px, self.a4_height_px - margin_px
-        ], outline=(200, 200, 200), width=2)
-
-        return canvas, draw
+    def render_layout_image(self, image_items, layout_type='grid', spacing_mm=DEFAULT_SPACING_MM,
+                            margin_mm=DEFAULT_MARGIN_MM, preview_scale=1.0, page_spec=None):
+        """
+        渲染单页排版图片（纯PIL实现，不依赖Qt）
+        布局按页面规格的分辨率计算；preview_scale < 1 时直接在缩小后的分辨率上合成
+        （坐标按比例换算、图块由输出分辨率的共享图块缩小），不再先渲染整页再缩小
+        参数同 create_layout_preview
+        返回: PIL.Image - 缩放后的页面图片（混合尺寸时为第一页）
+        """
+        # 计算布局（按输出分辨率，与导出的数量和位置一致）
+        job_plan = self.plan_job(image_items, layout_type, spacing_mm, margin_mm, page_spec)
+        render_plan = self.build_render_plan(job_plan, image_items)
+        return self.render_page_image(render_plan.pages[0], preview_scale)
 
-    def _place_images_on_canvas(self, canvas, draw, image_items, positions):
-        """在画布上放置图片"""
-        from core.image_processor import ImageProcessor
-        processor = ImageProcessor()
-        image_cache = {}
+    def build_render_plan(self, job_plan, image_items):
+        """
+        由排版规划生成渲染计划（页 -> 位置 -> 图块键），预览、打印和导出共用
+        参数:
+            job_plan: plan_job 的结果
+            image_items: 生成规划时使用的（展开后的）图片项目序列
+        返回: RenderPlan，见 core.render_plan
+        """
+        return build_render_plan(job_plan, image_items, app_config.badge_diameter_mm)
 
-        for i, image_item in enumerate(image_items):
-            if i >= len(positions):
-                break
+    def render_page_image(self, render_page, preview_scale=1.0):
+        """
+        渲染预览页面（绘制页边距线和空位占位符），图块来自共享图块缓存
+        参数:
+            render_page: RenderPlan 中的一页
+            preview_scale: 预览缩放比例
+        返回: PIL.Image
+        """
+        canvas, _ = self.compositor.compose(render_page, preview_scale, preview=True)
+        return canvas
 
-            try:
-                # 获取或创建圆形图片
-                circle_img = self._get_cached_circle_image(
-                    processor, image_cache, image_item
-                )
-
-                # 计算粘贴位置
-                center_x, center_y = positions[i]
-                paste_x = center_x - self.badge_radius_px
-                paste_y = center_y - self.badge_radius_px
-
-                # 粘贴到画布
-                if circle_img.mode == 'RGBA':
-                    canvas.paste(circle_img, (paste_x, paste_y), circle_img)
-                else:
-                    canvas.paste(circle_img, (paste_x, paste_y))
-
-            except Exception as e:
-                print(f"放置图片失败 {image_item.filename}: {e}")
-                self._draw_error_placeholder(draw, positions[i])
-
-    def _get_cached_circle_image(self, processor, image_cache, image_item):
-        """获取缓存的圆形图片"""
-        cache_key = f"{image_item.file_path}:{image_item.scale}:{image_item.offset_x}:{image_item.offset_y}:{image_item.rotation}"
-
-        if cache_key in image_cache:
-            return image_cache[cache_key]
-
-        circle_img = processor.create_circular_crop(
-            image_item.file_path,
-            image_item.scale,
-            image_item.offset_x,
-            image_item.offset_y,
-            image_item.rotation
-        )
-        image_cache[cache_key] = circle_img
-        return circle_img
-
-    def _draw_error_placeholder(self, draw, position):
-        """绘制错误占位符"""
-        center_x, center_y = position
-        draw.ellipse([
-            center_x - self.badge_radius_px, center_y - self.badge_radius_px,
-            center_x + self.badge_radius_px, center_y + self.badge_radius_px
-        ], fill=(200, 200, 200), outline=(180, 180, 180), width=1)
-
-    def _draw_placeholders(self, draw, image_items, positions):
-        """绘制剩余位置的占位符"""
-        for i in range(len(image_items), len(positions)):
-            center_x, center_y = positions[i]
-            draw.ellipse([
-                center_x - self.badge_radius_px, center_y - self.badge_radius_px,
-                center_x + self.badge_radius_px, center_y + self.badge_radius_px
-            ], fill=(220, 220, 220), outline=(200, 200, 200), width=1)
-
-    def _canvas_to_pixmap(self, canvas, preview_scale):
-        """将画布转换为QPixmap"""
-        # 缩放到预览大小
-        preview_width = int(self.a4_width_px * preview_scale)
-        preview_height = int(self.a4_height_px * preview_scale)
-        preview_img = canvas.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
-
-        # 转换为QPixmap
-        buffer = BytesIO()
-        preview_img.save(buffer, format='PNG')
-        buffer.seek(0)
-
-        pixmap = QPixmap()
-        pixmap.loadFromData(buffer.getvalue())
-        return pixmap
+    def _get_layout(self, layout_type, spacing_mm, margin_mm, page_spec=None):
+        """获取布局信息"""
+        if layout_type == 'grid':
+            return self.calculate_grid_layout(spacing_mm, margin_mm, page_spec)
+        else:
+            return self.calculate_compact_layout(spacing_mm, margin_mm, page_spec)
 
     def _create_blank_preview(self):
         """创建空白预览"""
-        blank_pixmap = QPixmap(400, 566)
-        blank_pixmap.fill()
-        return blank_pixmap
+        return create_blank_pixmap(400, int(400 * self.page_spec.aspect_ratio))
     
     def calculate_multi_page_layout(self, image_count, layout_type='grid',
-                                   spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+                                   spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM, page_spec=None):
         """
         计算多页面布局
         参数:
@@ -446,18 +274,20 @@ class LayoutEngine:
             layout_type: 布局类型 ('grid' 或 'compact')
             spacing_mm: 间距（毫米）
             margin_mm: 页边距（毫米）
+            page_spec: 页面规格，默认使用 self.page_spec
         返回: dict - 多页面布局信息
         """
-        # 获取单页布局信息
-        if layout_type == 'grid':
-            single_page_layout = self.calculate_grid_layout(spacing_mm, margin_mm)
-        else:
-            single_page_layout = self.calculate_compact_layout(spacing_mm, margin_mm)
+        spec = page_spec or self.page_spec
+
+        # 获取单页布局信息；各页共享同一份不可变的坐标元组
+        layout_result = self.get_layout_result(layout_type, spacing_mm, margin_mm, spec)
+        single_page_layout = layout_result.to_dict()
+        single_page_layout['positions'] = layout_result.positions
 
         max_per_page = single_page_layout['max_count']
 
-        # 计算需要的页面数
-        total_pages = max(1, (image_count + max_per_page - 1) // max_per_page)
+        # 计算需要的页面数（徽章放不下时只有一个空白页）
+        total_pages = max(1, (image_count + max_per_page - 1) // max_per_page) if max_per_page else 1
 
         # 为每个页面生成布局信息
         pages = []
@@ -483,22 +313,86 @@ class LayoutEngine:
             'total_images': image_count,
             'pages': pages,
             'spacing_mm': spacing_mm,
-            'margin_mm': margin_mm
+            'margin_mm': margin_mm,
+            'page_spec': spec
         }
 
-    def get_layout_info(self, layout_type='grid', spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM):
+    def calculate_mixed_layout(self, diameters_mm, spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                               page_spec=None):
+        """
+        计算混合尺寸的多页面布局（每个徽章使用自己的直径，大圆优先，放不下的留到下一页）
+        参数:
+            diameters_mm: 每个徽章的印刷圆直径（含出血，毫米），按图片顺序
+            spacing_mm: 间距（毫米）
+            margin_mm: 页边距（毫米）
+            page_spec: 页面规格，默认使用 self.page_spec
+        返回: dict - 与 calculate_multi_page_layout 结构相同；每页另含
+            item_indices（本页各位置对应的图片序号）、diameters / diameters_mm（各位置直径）、utilization
+        """
+        try:
+            plan = plan_mixed(diameters_mm, page_spec or self.page_spec, spacing_mm, margin_mm)
+        except ValueError as e:
+            raise LayoutError(str(e))
+        return plan.to_dict()
+
+    def plan_job(self, image_items, layout_type='grid', spacing_mm=DEFAULT_SPACING_MM,
+                 margin_mm=DEFAULT_MARGIN_MM, page_spec=None, group_designs=False):
+        """
+        规划一批徽章的分页（预览、打印和导出共用同一份规划）
+        layout_type为'mixed'时按每个徽章自己的直径排版，否则所有徽章使用全局直径
+        参数:
+            image_items: 按数量展开后的图片项目列表
+            layout_type: 'grid'、'compact' 或 'mixed'
+            spacing_mm: 间距（毫米）
+            margin_mm: 页边距（毫米）
+            page_spec: 页面规格，默认使用 self.page_spec
+            group_designs: 是否将相同图案集中排放（不增加页数）
+        返回: JobPlan（不可变），见 core.job_planner
+        """
+        spec = page_spec or self.page_spec
+        groups = group_by_design(image_items) if group_designs else None
+
+        if layout_type == 'mixed':
+            diameters_mm = [self.get_item_diameter_mm(item) for item in image_items]
+            try:
+                return plan_mixed(diameters_mm, spec, spacing_mm, margin_mm, groups)
+            except ValueError as e:
+                raise LayoutError(str(e))
+
+        layout = self.get_layout_result(layout_type, spacing_mm, margin_mm, spec)
+        return plan_uniform(layout, len(image_items), spec, spacing_mm, margin_mm,
+                            app_config.badge_diameter_mm, groups)
+
+    def calculate_job_layout(self, image_items, layout_type='grid', spacing_mm=DEFAULT_SPACING_MM,
+                             margin_mm=DEFAULT_MARGIN_MM, page_spec=None, group_designs=False):
+        """
+        计算一批徽章的多页面布局（参数同 plan_job）
+        返回: dict - calculate_multi_page_layout 结构的布局信息，另含整体面积利用率 utilization
+            和规划对象 plan；每页的图片用 page_images(image_items, page_info) 取得
+        """
+        return self.plan_job(image_items, layout_type, spacing_mm, margin_mm, page_spec, group_designs).to_dict()
+
+    @staticmethod
+    def page_images(image_items, page_info):
+        """calculate_job_layout 结果中一页对应的图片项目列表（按页面位置顺序）"""
+        item_indices = page_info.get('item_indices')
+        if item_indices is not None:
+            return select_items(image_items, item_indices)
+        first_index = page_info.get('first_index', 0)
+        return image_items[first_index:first_index + page_info['images_on_page']]
+
+    def get_layout_info(self, layout_type='grid', spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
+                        page_spec=None):
         """
         获取布局信息
         参数:
             layout_type: 布局类型
             spacing_mm: 间距
             margin_mm: 页边距
+            page_spec: 页面规格，默认使用 self.page_spec
         返回: dict - 布局信息
         """
-        if layout_type == 'grid':
-            layout = self.calculate_grid_layout(spacing_mm, margin_mm)
-        else:
-            layout = self.calculate_compact_layout(spacing_mm, margin_mm)
+        layout = self._get_layout(layout_type, spacing_mm, margin_mm, page_spec)
 
         return {
             'type': layout_type,
@@ -510,7 +404,7 @@ class LayoutEngine:
 
     def create_multi_page_preview(self, image_items, layout_type='grid',
                                  spacing_mm=DEFAULT_SPACING_MM, margin_mm=DEFAULT_MARGIN_MM,
-                                 preview_scale=0.5):
+                                 preview_scale=0.5, page_spec=None):
         """
         创建多页面排版预览图片列表
         参数:
@@ -519,6 +413,7 @@ class LayoutEngine:
             spacing_mm: 间距（毫米）
             margin_mm: 页边距（毫米）
             preview_scale: 预览缩放比例
+            page_spec: 页面规格，默认使用 self.page_spec
         返回: list[QPixmap] - 每页的预览图片列表
         """
         if not PYSIDE6_AVAILABLE:
@@ -526,28 +421,12 @@ class LayoutEngine:
             return []
 
         try:
-            # 计算多页面布局
-            multi_layout = self.calculate_multi_page_layout(
-                len(image_items), layout_type, spacing_mm, margin_mm
-            )
-
-            page_previews = []
-            image_index = 0
+            # 计算多页面布局和渲染计划
+            job_plan = self.plan_job(image_items, layout_type, spacing_mm, margin_mm, page_spec)
+            render_plan = self.build_render_plan(job_plan, image_items)
 
             # 为每个页面生成预览
-            for page_info in multi_layout['pages']:
-                # 获取当前页面的图片
-                page_images = image_items[image_index:image_index + page_info['images_on_page']]
-
-                # 创建单页预览
-                page_preview = self.create_layout_preview(
-                    page_images, layout_type, spacing_mm, margin_mm, preview_scale
-                )
-
-                page_previews.append(page_preview)
-                image_index += page_info['images_on_page']
-
-            return page_previews
+            return [pil_to_qpixmap(self.render_page_image(page, preview_scale)) for page in render_plan.pages]
 
         except Exception as e:
             print(f"创建多页面排版预览失败: {e}")
@@ -0,0 +1,340 @@
+"""
+混合尺寸排版模块
+同一页面上排列不同直径的圆形：按直径从大到小逐个放入，
+每个圆放在所有可行位置中最靠上、其次最靠左的位置（页面坐标系下的 bottom-left fill）。
+候选位置为：页面左上角、与一个已放圆及页面边界相切的位置、与两个已放圆同时相切的位置；
+碰撞检测使用均匀网格空间索引，只检查相邻格子中的圆。
+最大直径的圆也可以先按 core.packing 的紧凑点阵放置，两种放法取面积利用率较高者。
+只依赖标准库、core.lattice 和 core.packing，桌面端、命令行和ComfyUI节点共用
+"""
+
+import math
+from collections import Counter
+from dataclasses import dataclass
+
+from core.lattice import LayoutValidation, DEFAULT_TOLERANCE
+from core.packing import optimize_packing
+
+# 坐标取整后圆心距最多缩短约√2像素、圆心最多偏移0.5像素，计算时预留余量
+ROUNDING_SLACK = 1.5
+EDGE_SLACK = 0.5
+EPSILON = 1e-6
+
+
+@dataclass(frozen=True)
+class MixedPlacement:
+    """页面上的一个圆"""
+    index: int              # 输入直径序列中的序号
+    x: int                  # 圆心（像素）
+    y: int
+    diameter: int           # 直径（像素）
+
+
+@dataclass(frozen=True)
+class MixedPage:
+    """混合尺寸的单页排版结果"""
+    placements: tuple       # MixedPlacement，按放入顺序
+    utilization: float      # 圆形面积占页面面积的比例
+
+    @property
+    def count(self):
+        return len(self.placements)
+
+    @property
+    def indices(self):
+        return tuple(p.index for p in self.placements)
+
+    @property
+    def positions(self):
+        return tuple((p.x, p.y) for p in self.placements)
+
+    @property
+    def diameters(self):
+        return tuple(p.diameter for p in self.placements)
+
+
+@dataclass(frozen=True)
+class MixedLayout:
+    """混合尺寸的多页排版结果"""
+    pages: tuple            # MixedPage
+    page_width: int
+    page_height: int
+    spacing: int
+    margin: int
+
+    @property
+    def total_pages(self):
+        return len(self.pages)
+
+    @property
+    def utilization(self):
+        """所有页面的总体面积利用率"""
+        if not self.pages:
+            return 0.0
+        return sum(page.utilization for page in self.pages) / len(self.pages)
+
+
+class CircleIndex:
+    """均匀网格空间索引：按圆心所在格子分桶，查询只访问覆盖查询范围的格子"""
+
+    def __init__(self, cell_size):
+        self.cell_size = max(float(cell_size), 1.0)
+        self.circles = []       # (x, y, 半径)
+        self._buckets = {}
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def add(self, x, y, radius):
+        """加入一个圆，返回其序号"""
+        self.circles.append((x, y, radius))
+        self._buckets.setdefault(self._cell(x, y), []).append(len(self.circles) - 1)
+        return len(self.circles) - 1
+
+    def near(self, x, y, reach):
+        """圆心可能在 (x, y) 的reach范围内的圆的序号"""
+        cx, cy = self._cell(x, y)
+        steps = int(math.ceil(reach / self.cell_size))
+        for gx in range(cx - steps, cx + steps + 1):
+            for gy in range(cy - steps, cy + steps + 1):
+                yield from self._buckets.get((gx, gy), ())
+
+    def collides(self, x, y, radius, gap, max_radius):
+        """半径为radius的圆放在 (x, y) 时，是否与已有圆的间距小于gap"""
+        circles = self.circles
+        for i in self.near(x, y, radius + max_radius + gap):
+            cx, cy, cr = circles[i]
+            limit = radius + cr + gap - EPSILON
+            dx = x - cx
+            dy = y - cy
+            if dx * dx + dy * dy < limit * limit:
+                return True
+        return False
+
+
+def _candidates(index, radius, gap, bounds, max_radius):
+    """生成候选圆心（未去除越界和碰撞）"""
+    x_min, y_min, x_max, y_max = bounds
+    circles = index.circles
+    yield x_min, y_min
+
+    for i, (cx, cy, cr) in enumerate(circles):
+        reach = cr + radius + gap
+
+        # 与该圆及页面边界相切
+        for wall_x in (x_min, x_max):
+            dx = wall_x - cx
+            if abs(dx) <= reach:
+                dy = math.sqrt(reach * reach - dx * dx)
+                yield wall_x, cy - dy
+                yield wall_x, cy + dy
+        dy = y_min - cy
+        if abs(dy) <= reach:
+            dx = math.sqrt(reach * reach - dy * dy)
+            yield cx - dx, y_min
+            yield cx + dx, y_min
+        yield cx, cy + reach
+
+        # 与两个已放圆同时相切（两个以 reach 为半径的圆的交点）
+        for j in index.near(cx, cy, reach + max_radius + radius + gap):
+            if j <= i:
+                continue
+            ox, oy, other_r = circles[j]
+            other_reach = other_r + radius + gap
+            dx = ox - cx
+            dy = oy - cy
+            distance = math.hypot(dx, dy)
+            if distance < EPSILON or distance > reach + other_reach:
+                continue
+            along = (reach * reach - other_reach * other_reach + distance * distance) / (2 * distance)
+            height = reach * reach - along * along
+            if height < 0:
+                continue
+            height = math.sqrt(height)
+            mx = cx + along * dx / distance
+            my = cy + along * dy / distance
+            yield mx - height * dy / distance, my + height * dx / distance
+            yield mx + height * dy / distance, my - height * dx / distance
+
+
+def _find_position(index, radius, gap, bounds, max_radius):
+    """最靠上（其次最靠左）的可行圆心，放不下时返回None"""
+    x_min, y_min, x_max, y_max = bounds
+    if x_min > x_max + EPSILON or y_min > y_max + EPSILON:
+        return None
+
+    feasible = [
+        (y, x) for x, y in _candidates(index, radius, gap, bounds, max_radius)
+        if x_min - EPSILON <= x <= x_max + EPSILON and y_min - EPSILON <= y <= y_max + EPSILON
+    ]
+    feasible.sort()
+    for y, x in feasible:
+        if not index.collides(x, y, radius, gap, max_radius):
+            return x, y
+    return None
+
+
+def _fill(counts, page_width, page_height, spacing, margin, seed_lattice):
+    """
+    按各直径的数量上限在一页上放圆（大圆优先）
+    seed_lattice为True时，最大直径的圆先按 core.packing 的紧凑点阵放置（自上而下取前若干个），
+    其余的圆再逐个寻找位置
+    返回: [(直径, x, y), ...] - 按放入顺序，坐标已取整
+    """
+    gap = spacing + ROUNDING_SLACK
+    max_radius = max(counts, default=0) / 2
+    index = CircleIndex(2 * max_radius + gap)
+    slots = []
+
+    diameters = sorted(counts, reverse=True)
+    if seed_lattice and diameters:
+        largest = diameters[0]
+        positions = sorted(optimize_packing(page_width, page_height, largest, spacing, margin).positions,
+                           key=lambda p: (p[1], p[0]))
+        for x, y in positions[:counts[largest]]:
+            index.add(x, y, largest / 2)
+            slots.append((largest, x, y))
+        diameters = diameters[1:]
+
+    for diameter in diameters:
+        radius = diameter / 2
+        bounds = (margin + radius + EDGE_SLACK, margin + radius + EDGE_SLACK,
+                  page_width - margin - radius - EDGE_SLACK, page_height - margin - radius - EDGE_SLACK)
+        # 空间只会越来越少：某个直径放不下后，同直径的其余圆也放不下
+        for _ in range(counts[diameter]):
+            position = _find_position(index, radius, gap, bounds, max_radius)
+            if position is None:
+                break
+            index.add(position[0], position[1], radius)
+            slots.append((diameter, int(round(position[0])), int(round(position[1]))))
+    return slots
+
+
+def _pack_counts(counts, page_width, page_height, spacing, margin):
+    """
+    一页的最佳放法：分别尝试“最大直径先按紧凑点阵放置”和“全部逐个寻找位置”，
+    取放入面积较大的结果（面积相同时取前者）
+    参数:
+        counts: {直径: 最多放入的数量}
+    返回: [(直径, x, y), ...]
+    """
+    best, best_area = None, -1
+    for seed_lattice in (True, False):
+        slots = _fill(counts, page_width, page_height, spacing, margin, seed_lattice)
+        area = sum(diameter * diameter for diameter, _, _ in slots)
+        if area > best_area:
+            best, best_area = slots, area
+    return best
+
+
+def _same_fill(counts, used, remaining):
+    """
+    数量上限由counts变为remaining时放法是否不变（大量同尺寸徽章时各页相同，只需计算一次）
+    放法按直径从大到小确定：某直径在counts下已放不满（used < counts），数量上限只要仍大于used
+    就会在同一位置停止；已放满的直径则要求数量上限不变
+    """
+    if remaining.keys() != counts.keys():
+        return False
+    for diameter, count in remaining.items():
+        placed = used[diameter]
+        if placed < counts[diameter]:
+            if count <= placed:
+                return False
+        elif count != counts[diameter]:
+            return False
+    return True
+
+
+def _make_page(slots, queues, taken, page_width, page_height):
+    """将页内位置按输入顺序分配给各直径的待放序号"""
+    placements = []
+    for diameter, x, y in slots:
+        placements.append(MixedPlacement(queues[diameter][taken[diameter]], x, y, diameter))
+        taken[diameter] += 1
+    area = sum(math.pi * (p.diameter / 2) ** 2 for p in placements)
+    return MixedPage(tuple(placements), area / (page_width * page_height))
+
+
+def _queues(diameters):
+    """每种直径的序号列表（保持输入顺序）"""
+    queues = {}
+    for i, diameter in enumerate(diameters):
+        queues.setdefault(int(diameter), []).append(i)
+    return queues
+
+
+def pack_page(diameters, page_width, page_height, spacing, margin):
+    """
+    在一页上放入尽可能多的圆（大圆优先，同直径按输入顺序）
+    参数（像素）:
+        diameters: 直径序列
+        page_width, page_height: 页面尺寸
+        spacing: 圆之间的最小间距
+        margin: 页边距
+    返回: MixedPage - placements的index为输入序列中的序号，放不下的圆不在其中
+    """
+    queues = _queues(diameters)
+    counts = {d: len(queue) for d, queue in queues.items()}
+    slots = _pack_counts(counts, page_width, page_height, spacing, margin)
+    return _make_page(slots, queues, Counter(), page_width, page_height)
+
+
+def pack_pages(diameters, page_width, page_height, spacing, margin):
+    """
+    将所有圆依次装入若干页（每页大圆优先，放不下的留到下一页）
+    参数同 pack_page
+    返回: MixedLayout - 各页placements的index为输入序列中的序号
+    """
+    queues = _queues(diameters)
+    largest = max(queues, default=0)
+    if largest > min(page_width, page_height) - 2 * margin:
+        raise ValueError(f"直径 {largest}px 超出页面可用区域")
+
+    taken = Counter()
+    pages = []
+    previous = None     # (上一页的数量上限, 各直径实际放入数, 位置)
+    while True:
+        remaining = {d: len(queue) - taken[d] for d, queue in queues.items() if taken[d] < len(queue)}
+        if not remaining:
+            break
+        if previous is not None and _same_fill(previous[0], previous[1], remaining):
+            slots = previous[2]
+        else:
+            slots = _pack_counts(remaining, page_width, page_height, spacing, margin)
+            previous = (remaining, Counter(diameter for diameter, _, _ in slots), slots)
+        pages.append(_make_page(slots, queues, taken, page_width, page_height))
+
+    return MixedLayout(tuple(pages), page_width, page_height, spacing, margin)
+
+
+def validate_page(page, spacing, page_size, margin, tolerance=DEFAULT_TOLERANCE):
+    """
+    校验混合尺寸页面：任意两圆间距不小于spacing，圆形不超出页边距
+    参数:
+        tolerance: 允许的取整误差（像素，与 core.lattice.validate_positions 相同）
+    返回: LayoutValidation（min_distance为最小的边缘间距）
+    """
+    page_width, page_height = page_size
+    placements = page.placements
+    outside = sum(
+        1 for p in placements
+        if p.x - p.diameter / 2 < margin - tolerance or p.y - p.diameter / 2 < margin - tolerance
+        or p.x + p.diameter / 2 > page_width - margin + tolerance
+        or p.y + p.diameter / 2 > page_height - margin + tolerance
+    )
+
+    max_radius = max((p.diameter / 2 for p in placements), default=0)
+    index = CircleIndex(2 * max_radius + spacing)
+    best = math.inf
+    overlaps = 0
+    for p in placements:
+        radius = p.diameter / 2
+        for i in index.near(p.x, p.y, radius + max_radius + spacing):
+            cx, cy, cr = index.circles[i]
+            gap = math.hypot(p.x - cx, p.y - cy) - radius - cr
+            best = min(best, gap)
+            if gap < spacing - tolerance:
+                overlaps += 1
+        index.add(p.x, p.y, radius)
+
+    return LayoutValidation(overlaps == 0 and outside == 0, best, overlaps, outside)
@@ -0,0 +1,281 @@
+"""
+裁切叠加层模块
+由页面上的圆心坐标生成裁切线（徽章直径）、出血线（含出血的印刷圆直径）和四角套准标记，
+几何数据以毫米为单位（页面左上角为原点，y轴向下），每个排版只计算一次并缓存：
+网格/紧凑排版所有页共用同一个点阵，直接命中同一条缓存；未放满的页面只取前几个圆。
+PDF中以矢量图层绘制（见 core.vector_pdf），并可由多页面布局为切割机逐页生成SVG/DXF文件
+（write_cut_files，逐行写入文件，不在内存中构建文档树）。
+只依赖标准库，桌面端、命令行和ComfyUI节点共用
+"""
+
+import os
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+MM_PER_INCH = 25.4
+
+# 套准标记：边长（毫米）和距页面边缘的距离（毫米）
+REG_MARK_SIZE_MM = 5.0
+REG_MARK_INSET_MM = 5.0
+
+# 缓存的排版数量（每项只有坐标元组）
+OVERLAY_CACHE_SIZE = 128
+
+# 图层名称（SVG分组id、DXF图层名）
+LAYER_CUT = "CUT"
+LAYER_BLEED = "BLEED"
+LAYER_REGISTRATION = "REGISTRATION"
+
+# SVG中各图层的描边颜色
+SVG_COLORS = {
+    LAYER_CUT: "#ff00ff",
+    LAYER_BLEED: "#999999",
+    LAYER_REGISTRATION: "#000000",
+}
+# DXF中各图层的颜色号（AutoCAD颜色索引）
+DXF_COLORS = {
+    LAYER_CUT: 6,
+    LAYER_BLEED: 8,
+    LAYER_REGISTRATION: 7,
+}
+
+
+@dataclass(frozen=True)
+class OverlayOptions:
+    """叠加层包含的内容（可哈希，作为缓存键的一部分）"""
+    cut: bool = True                # 裁切线
+    bleed: bool = True              # 出血线
+    registration: bool = True       # 四角套准标记
+    mark_size_mm: float = REG_MARK_SIZE_MM
+    mark_inset_mm: float = REG_MARK_INSET_MM
+
+
+# 切割机文件只需要裁切线和套准标记
+CUTTER_OVERLAY = OverlayOptions(bleed=False)
+
+
+@dataclass(frozen=True)
+class OverlayGeometry:
+    """一页的叠加层几何数据（毫米，左上角为原点）"""
+    width_mm: float
+    height_mm: float
+    cut_circles: tuple          # ((cx, cy, r), ...)
+    bleed_circles: tuple        # ((cx, cy, r), ...)
+    registration_marks: tuple   # ((cx, cy, size), ...)
+
+    def limit(self, count):
+        """只保留前count个位置的圆（未放满的页面）"""
+        if count >= max(len(self.cut_circles), len(self.bleed_circles)):
+            return self
+        return replace(self, cut_circles=self.cut_circles[:count], bleed_circles=self.bleed_circles[:count])
+
+    def mark_lines(self):
+        """
+        套准标记的线段（十字线）
+        返回: list[((x1, y1), (x2, y2))]
+        """
+        lines = []
+        for cx, cy, size in self.registration_marks:
+            half = size / 2
+            lines.append(((cx - half, cy), (cx + half, cy)))
+            lines.append(((cx, cy - half), (cx, cy + half)))
+        return lines
+
+    def mark_circles(self):
+        """套准标记的圆环 ((cx, cy, r), ...)"""
+        return tuple((cx, cy, size / 4) for cx, cy, size in self.registration_marks)
+
+
+def registration_marks(width_mm, height_mm, options):
+    """四角套准标记的中心和边长"""
+    offset = options.mark_inset_mm + options.mark_size_mm / 2
+    return tuple(
+        (x, y, options.mark_size_mm)
+        for y in (offset, height_mm - offset)
+        for x in (offset, width_mm - offset)
+    )
+
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def layout_overlay(page_spec, positions, diameters_mm, bleed_mm, options=OverlayOptions()):
+    """
+    计算一个排版（整页点阵）的叠加层几何（按参数缓存）
+    参数:
+        page_spec: PageSpec（圆心坐标为该分辨率下的像素）
+        positions: 圆心坐标元组 ((x, y), ...)
+        diameters_mm: 印刷圆直径（含出血，毫米）；单个数值表示所有位置相同，元组为逐个位置的直径
+        bleed_mm: 出血宽度（毫米），裁切线直径 = 印刷圆直径 - 2×出血
+        options: OverlayOptions
+    返回: OverlayGeometry
+    """
+    px_to_mm = MM_PER_INCH / page_spec.dpi
+    if isinstance(diameters_mm, tuple):
+        radii = [diameter / 2 for diameter in diameters_mm]
+    else:
+        radii = [diameters_mm / 2] * len(positions)
+    centers = [(x * px_to_mm, y * px_to_mm) for x, y in positions]
+
+    cut_circles = tuple(
+        (cx, cy, radius - bleed_mm) for (cx, cy), radius in zip(centers, radii)
+    ) if options.cut else ()
+    bleed_circles = tuple(
+        (cx, cy, radius) for (cx, cy), radius in zip(centers, radii)
+    ) if options.bleed and bleed_mm > 0 else ()
+    marks = registration_marks(page_spec.width_mm, page_spec.height_mm, options) if options.registration else ()
+    return OverlayGeometry(page_spec.width_mm, page_spec.height_mm, cut_circles, bleed_circles, marks)
+
+
+def page_overlay(planned_page, page_spec, diameter_mm, bleed_mm, options=OverlayOptions()):
+    """
+    规划中一页（core.job_planner.PlannedPage）的叠加层：只包含放有徽章的位置
+    参数:
+        diameter_mm: 网格/紧凑页面的印刷圆直径（含出血，毫米）；混合尺寸页面使用逐个位置的直径
+    """
+    diameters = planned_page.diameters_mm if planned_page.diameters_mm is not None else float(diameter_mm)
+    geometry = layout_overlay(page_spec, tuple(planned_page.positions), diameters, float(bleed_mm), options)
+    return geometry.limit(planned_page.count)
+
+
+def overlay_cache_info():
+    """叠加层缓存统计信息"""
+    info = layout_overlay.cache_info()
+    return {'size': info.currsize, 'max_size': info.maxsize, 'hits': info.hits, 'misses': info.misses}
+
+
+def cut_file_path(output_path, page_index, total_pages, file_format):
+    """裁切文件路径：<输出路径去掉扩展名>_cut.svg，多页时为 _cut_第N页.svg"""
+    base_path = os.path.splitext(output_path)[0]
+    if total_pages == 1:
+        return f"{base_path}_cut.{file_format}"
+    return f"{base_path}_cut_第{page_index + 1}页.{file_format}"
+
+
+def multi_layout_overlays(multi_layout, diameter_mm=None, bleed_mm=0.0, options=CUTTER_OVERLAY):
+    """
+    逐页生成多页面布局的叠加层几何（只包含放有徽章的位置）
+    参数:
+        multi_layout: LayoutEngine.calculate_multi_page_layout / calculate_mixed_layout 或 JobPlan.to_dict 的结果
+        diameter_mm: 网格/紧凑页面的印刷圆直径（含出血，毫米）；混合尺寸页面使用各自的 diameters_mm
+        bleed_mm: 出血宽度（毫米）
+        options: OverlayOptions，默认只含裁切线和套准标记
+    返回: 生成器，逐页产生 (页序号, OverlayGeometry)
+    """
+    page_spec = multi_layout['page_spec']
+    for page in multi_layout['pages']:
+        diameters = page.get('diameters_mm')
+        if diameters is not None:
+            diameters = tuple(diameters)
+        elif diameter_mm is None:
+            raise ValueError("网格/紧凑排版需要提供印刷圆直径")
+        else:
+            diameters = float(diameter_mm)
+        geometry = layout_overlay(page_spec, tuple(page['positions']), diameters, float(bleed_mm), options)
+        yield page['page_index'], geometry.limit(page['images_on_page'])
+
+
+def iter_cut_files(multi_layout, output_path, diameter_mm=None, bleed_mm=0.0, file_format='svg',
+                   options=CUTTER_OVERLAY):
+    """
+    为切割机逐页写出裁切文件（每页一个SVG/DXF，边计算边写入磁盘，大批量任务也只占用一页的内存）
+    参数:
+        multi_layout: 多页面布局字典，见 multi_layout_overlays
+        output_path: 输出路径，文件名见 cut_file_path
+        diameter_mm, bleed_mm, options: 见 multi_layout_overlays
+        file_format: 'svg' 或 'dxf'
+    返回: 生成器，每写完一页产生该页的文件路径
+    """
+    writer = CUT_FILE_WRITERS.get(file_format)
+    if writer is None:
+        raise ValueError(f"未知的裁切文件格式: {file_format}")
+
+    total_pages = len(multi_layout['pages'])
+    for page_index, geometry in multi_layout_overlays(multi_layout, diameter_mm, bleed_mm, options):
+        path = cut_file_path(output_path, page_index, total_pages, file_format)
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            writer(geometry, f)
+        yield path
+
+
+def write_cut_files(multi_layout, output_path, diameter_mm=None, bleed_mm=0.0, file_format='svg',
+                    options=CUTTER_OVERLAY):
+    """
+    写出所有页的裁切文件（参数同 iter_cut_files）
+    返回: list[str] - 各页的文件路径
+    """
+    return list(iter_cut_files(multi_layout, output_path, diameter_mm, bleed_mm, file_format, options))
+
+
+def _fmt(value):
+    """坐标格式化（0.001毫米精度，去掉多余的0）"""
+    return f"{value:.3f}".rstrip('0').rstrip('.')
+
+
+def write_svg(geometry, fp):
+    """
+    以SVG格式写出一页叠加层（毫米单位，逐行写入）
+    参数:
+        geometry: OverlayGeometry
+        fp: 文本文件对象
+    """
+    width, height = _fmt(geometry.width_mm), _fmt(geometry.height_mm)
+    fp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    fp.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}mm" height="{height}mm" '
+             f'viewBox="0 0 {width} {height}">\n')
+
+    layers = (
+        (LAYER_BLEED, geometry.bleed_circles, ()),
+        (LAYER_CUT, geometry.cut_circles, ()),
+        (LAYER_REGISTRATION, geometry.mark_circles(), geometry.mark_lines()),
+    )
+    for layer, circles, lines in layers:
+        if not circles and not lines:
+            continue
+        fp.write(f'<g id="{layer}" fill="none" stroke="{SVG_COLORS[layer]}" stroke-width="0.1">\n')
+        for cx, cy, r in circles:
+            fp.write(f'<circle cx="{_fmt(cx)}" cy="{_fmt(cy)}" r="{_fmt(r)}"/>\n')
+        for (x1, y1), (x2, y2) in lines:
+            fp.write(f'<line x1="{_fmt(x1)}" y1="{_fmt(y1)}" x2="{_fmt(x2)}" y2="{_fmt(y2)}"/>\n')
+        fp.write('</g>\n')
+    fp.write('</svg>\n')
+
+
+def write_dxf(geometry, fp):
+    """
+    以DXF（R12 ASCII）格式写出一页叠加层（毫米单位，逐行写入）
+    DXF的y轴向上，原点在页面左下角
+    参数:
+        geometry: OverlayGeometry
+        fp: 文本文件对象
+    """
+    height = geometry.height_mm
+
+    def pairs(*items):
+        fp.write(''.join(f"{code}\n{value}\n" for code, value in items))
+
+    # 单位：毫米（$INSUNITS=4）
+    pairs((0, "SECTION"), (2, "HEADER"), (9, "$INSUNITS"), (70, 4), (0, "ENDSEC"))
+
+    layers = (
+        (LAYER_BLEED, geometry.bleed_circles, ()),
+        (LAYER_CUT, geometry.cut_circles, ()),
+        (LAYER_REGISTRATION, geometry.mark_circles(), geometry.mark_lines()),
+    )
+    pairs((0, "SECTION"), (2, "TABLES"), (0, "TABLE"), (2, "LAYER"), (70, len(layers)))
+    for layer, _, _ in layers:
+        pairs((0, "LAYER"), (2, layer), (70, 0), (62, DXF_COLORS[layer]), (6, "CONTINUOUS"))
+    pairs((0, "ENDTAB"), (0, "ENDSEC"))
+
+    pairs((0, "SECTION"), (2, "ENTITIES"))
+    for layer, circles, lines in layers:
+        for cx, cy, r in circles:
+            pairs((0, "CIRCLE"), (8, layer), (10, _fmt(cx)), (20, _fmt(height - cy)), (30, 0), (40, _fmt(r)))
+        for (x1, y1), (x2, y2) in lines:
+            pairs((0, "LINE"), (8, layer), (10, _fmt(x1)), (20, _fmt(height - y1)), (30, 0),
+                  (11, _fmt(x2)), (21, _fmt(height - y2)), (31, 0))
+    pairs((0, "ENDSEC"), (0, "EOF"))
+
+
+CUT_FILE_WRITERS = {
+    'svg': write_svg,
+    'dxf': write_dxf,
+}
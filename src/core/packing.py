@@ -0,0 +1,309 @@
+"""
+圆形密排优化模块
+在给定页面（像素）上评估一组点阵排列方式，选出可放置圆形最多的一种：
+- 行/列方向的六边形排列，以及与方格混合的排列（方格块 + 六边形块）
+- 拉伸节距的交错排列（让交错行也放满，或压缩行距多放一行）
+- 旋转的六边形点阵（在若干角度和相位上搜索）
+纯几何计算，不依赖Qt/PIL；各排列只计数，坐标仅为选中的排列展开（见 core.lattice），结果按参数缓存
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+
+from core.lattice import np, expand_runs, runs_bounds, to_position_list
+
+# 旋转点阵的搜索角度（六边形点阵关于30°对称，只需搜索0°~30°）
+ROTATION_STEP_DEG = 2.5
+# 每个基向量方向上采样的相位数
+PHASE_SAMPLES = 6
+# 浮点比较容差（像素）
+EPSILON = 1e-6
+
+
+@dataclass(frozen=True)
+class PackingResult:
+    """密排结果（不可变，可安全地在多个调用方之间共享）"""
+    arrangement: str        # 选中的排列方式名称
+    positions: tuple        # 圆心坐标 ((x, y), ...)，整数像素
+    center_distance: float  # 圆心最小距离（直径 + 间距）
+    candidates: tuple       # 各排列方式的数量 ((名称, 数量), ...)，便于诊断
+    runs: tuple = ()        # 等距点行描述，见 core.lattice.expand_runs
+    shift: tuple = (0.0, 0.0)  # 点行坐标到页面坐标的平移量
+
+    @property
+    def count(self):
+        return len(self.positions)
+
+    def as_array(self):
+        """圆心坐标的 (N, 2) 整数数组（NumPy不可用时为坐标列表）"""
+        return expand_runs(self.runs, *self.shift)
+
+
+# ---- 行方向的排列（列方向通过交换宽高复用） ----
+
+def _row_count(length, pitch):
+    """长度length内按节距pitch可放置的点数"""
+    if length < -EPSILON:
+        return 0
+    return int(math.floor(length / pitch + EPSILON)) + 1
+
+
+def _hybrid_rows(span_x, span_y, pitch):
+    """
+    方格 + 六边形混合排列
+    行分为A（不偏移）和B（偏移半个节距）两类：同类相邻行距为pitch，异类相邻行距为pitch·√3/2。
+    枚举类型切换次数u，其余高度全部用同类行填充（方格块），取数量最多的组合。
+    u=0即纯方格，同类行为0即纯六边形
+    返回: (数量, 生成函数)
+    """
+    hex_step = pitch * math.sqrt(3) / 2
+    count_a = _row_count(span_x, pitch)
+    count_b = _row_count(span_x - pitch / 2, pitch)
+    if count_a == 0 or span_y < -EPSILON:
+        return 0, None
+
+    best = (0, 0, 0)  # (数量, 同类行数t, 切换次数u)
+    max_switches = int(math.floor(span_y / hex_step + EPSILON)) if count_b else 0
+    for switches in range(max_switches + 1):
+        same_rows = int(math.floor((span_y - switches * hex_step) / pitch + EPSILON))
+        runs_a = (switches + 2) // 2
+        runs_b = (switches + 1) // 2
+        count = (runs_a + same_rows) * count_a + runs_b * count_b
+        if count > best[0]:
+            best = (count, same_rows, switches)
+
+    count, same_rows, switches = best
+
+    def generate():
+        # 第一段：同类行组成的方格块
+        runs = [(0.0, row * pitch, pitch, 0.0, count_a) for row in range(same_rows + 1)]
+        # 之后每行切换类型，组成六边形块
+        y = same_rows * pitch
+        for switch in range(1, switches + 1):
+            y += hex_step
+            if switch % 2:
+                runs.append((pitch / 2, y, pitch, 0.0, count_b))
+            else:
+                runs.append((0.0, y, pitch, 0.0, count_a))
+        return runs
+
+    return count, generate
+
+
+def _stretched_rows(span_x, span_y, pitch):
+    """
+    拉伸节距的交错排列
+    加大行内节距可以缩小交错行之间的行距；分别尝试“交错行与普通行数量相同”
+    和“普通行恰好放满宽度”两种节距，取数量最多的一种
+    返回: (数量, 生成函数)
+    """
+    if span_x < pitch - EPSILON or span_y < -EPSILON:
+        return 0, None
+
+    best = (0, None)
+    max_cols = _row_count(span_x, pitch)
+    for cols in range(2, max_cols + 1):
+        for short_cols, step_x in ((cols, span_x / (cols - 0.5)), (cols - 1, span_x / (cols - 1))):
+            if step_x < pitch - EPSILON:
+                continue
+            # 交错行之间的行距：保证斜向距离不小于pitch，同类行之间不小于pitch
+            step_y = max(math.sqrt(max(pitch * pitch - step_x * step_x / 4, 0.0)), pitch / 2)
+            rows = _row_count(span_y, step_y)
+            count = (rows + 1) // 2 * cols + rows // 2 * short_cols
+            if count > best[0]:
+                best = (count, (cols, short_cols, step_x, step_y, rows))
+
+    count, params = best
+    if params is None:
+        return 0, None
+
+    def generate():
+        cols, short_cols, step_x, step_y, rows = params
+        return [
+            (step_x / 2, row * step_y, step_x, 0.0, short_cols) if row % 2
+            else (0.0, row * step_y, step_x, 0.0, cols)
+            for row in range(rows)
+        ]
+
+    return count, generate
+
+
+def _rotated_hex(span_x, span_y, pitch):
+    """
+    旋转的六边形点阵
+    对每个角度和相位，逐行求点阵行与矩形的交集区间来计数，不生成坐标
+    返回: (数量, 生成函数)
+    """
+    if span_x < -EPSILON or span_y < -EPSILON:
+        return 0, None
+
+    row_height = pitch * math.sqrt(3) / 2
+    corners = ((0.0, 0.0), (span_x, 0.0), (0.0, span_y), (span_x, span_y))
+
+    def lattice_rows(angle, phase_u, phase_v):
+        """产出每一行点阵的 (起点x, 起点y, 起始序号, 结束序号)"""
+        a1 = (pitch * math.cos(angle), pitch * math.sin(angle))
+        a2 = (pitch * math.cos(angle + math.pi / 3), pitch * math.sin(angle + math.pi / 3))
+        origin = (phase_u * a1[0] + phase_v * a2[0], phase_u * a1[1] + phase_v * a2[1])
+        normal = (-math.sin(angle), math.cos(angle))
+        base = origin[0] * normal[0] + origin[1] * normal[1]
+        heights = [x * normal[0] + y * normal[1] - base for x, y in corners]
+        first_row = math.ceil(min(heights) / row_height - EPSILON)
+        last_row = math.floor(max(heights) / row_height + EPSILON)
+
+        for j in range(first_row, last_row + 1):
+            start_x = origin[0] + j * a2[0]
+            start_y = origin[1] + j * a2[1]
+            low = math.ceil((-start_x) / a1[0] - EPSILON)
+            high = math.floor((span_x - start_x) / a1[0] + EPSILON)
+            if a1[1] > EPSILON:
+                low = max(low, math.ceil((-start_y) / a1[1] - EPSILON))
+                high = min(high, math.floor((span_y - start_y) / a1[1] + EPSILON))
+            elif not -EPSILON <= start_y <= span_y + EPSILON:
+                continue
+            if high >= low:
+                yield start_x, start_y, low, high, a1
+
+    steps = int(round(30 / ROTATION_STEP_DEG))
+    search = [
+        (math.radians(step * ROTATION_STEP_DEG), u / PHASE_SAMPLES, v / PHASE_SAMPLES)
+        for step in range(1, steps)
+        for u in range(PHASE_SAMPLES)
+        for v in range(PHASE_SAMPLES)
+    ]
+    if np:
+        counts = _rotated_counts_numpy(span_x, span_y, pitch, search)
+        index = int(np.argmax(counts))
+        count, params = int(counts[index]), search[index]
+    else:
+        count, params = 0, None
+        for candidate in search:
+            candidate_count = sum(high - low + 1 for _, _, low, high, _ in lattice_rows(*candidate))
+            if candidate_count > count:
+                count, params = candidate_count, candidate
+
+    if count == 0:
+        return 0, None
+
+    def generate():
+        return [
+            (start_x + low * a1[0], start_y + low * a1[1], a1[0], a1[1], high - low + 1)
+            for start_x, start_y, low, high, a1 in lattice_rows(*params)
+        ]
+
+    return count, generate
+
+
+def _rotated_counts_numpy(span_x, span_y, pitch, search):
+    """
+    一次性计算所有 (角度, 相位) 组合的旋转点阵数量（与 lattice_rows 的逐行计数等价）
+    返回: 一维数组，与search一一对应
+    """
+    params = np.asarray(search, dtype=np.float64)
+    angle, phase_u, phase_v = params[:, 0:1], params[:, 1:2], params[:, 2:3]
+    a1_x, a1_y = pitch * np.cos(angle), pitch * np.sin(angle)
+    a2_x, a2_y = pitch * np.cos(angle + math.pi / 3), pitch * np.sin(angle + math.pi / 3)
+    origin_x = phase_u * a1_x + phase_v * a2_x
+    origin_y = phase_u * a1_y + phase_v * a2_y
+
+    # 每个组合与矩形相交的点阵行范围
+    row_height = pitch * math.sqrt(3) / 2
+    normal_x, normal_y = -np.sin(angle), np.cos(angle)
+    corners = np.array([[0.0, span_x, 0.0, span_x], [0.0, 0.0, span_y, span_y]])
+    heights = corners[0] * normal_x + corners[1] * normal_y - (origin_x * normal_x + origin_y * normal_y)
+    first_row = np.ceil(heights.min(axis=1, keepdims=True) / row_height - EPSILON)
+    last_row = np.floor(heights.max(axis=1, keepdims=True) / row_height + EPSILON)
+
+    rows = np.arange(first_row.min(), last_row.max() + 1)[None, :]
+    start_x = origin_x + rows * a2_x
+    start_y = origin_y + rows * a2_y
+    # 搜索角度均在(0°, 30°)内，a1的x、y分量都为正
+    low = np.maximum(np.ceil(-start_x / a1_x - EPSILON), np.ceil(-start_y / a1_y - EPSILON))
+    high = np.minimum(np.floor((span_x - start_x) / a1_x + EPSILON),
+                      np.floor((span_y - start_y) / a1_y + EPSILON))
+    counts = np.clip(high - low + 1, 0, None)
+    counts[(rows < first_row) | (rows > last_row)] = 0
+    return counts.sum(axis=1)
+
+
+def _transposed(arrangement):
+    """将行方向的排列用于列方向（交换宽高和坐标）"""
+    def evaluate(span_x, span_y, pitch):
+        count, generate = arrangement(span_y, span_x, pitch)
+        if generate is None:
+            return count, None
+        return count, lambda: [(y, x, dy, dx, n) for x, y, dx, dy, n in generate()]
+    return evaluate
+
+
+# 候选排列（数量相同时取靠前的，越靠前越规整）
+ARRANGEMENTS = (
+    ('hex_rows', _hybrid_rows),
+    ('hex_cols', _transposed(_hybrid_rows)),
+    ('stretched_rows', _stretched_rows),
+    ('stretched_cols', _transposed(_stretched_rows)),
+    ('rotated_hex', _rotated_hex),
+)
+
+
+def _centering_offset(runs, span_x, span_y, offset_x, offset_y):
+    """将点行整体居中到可用区域所需的平移量"""
+    min_x, min_y, max_x, max_y = runs_bounds(runs)
+    return (offset_x + (span_x - (max_x - min_x)) / 2 - min_x,
+            offset_y + (span_y - (max_y - min_y)) / 2 - min_y)
+
+
+def _spans(page_width, page_height, diameter, margin):
+    """圆心可取值区域的宽高"""
+    return page_width - 2 * margin - diameter, page_height - 2 * margin - diameter
+
+
+@lru_cache(maxsize=4096)
+def packing_capacity(page_width, page_height, diameter, spacing, margin):
+    """
+    只计算各排列方式的数量，不生成坐标（供参数扫描批量调用）
+    参数同 optimize_packing
+    返回: ((名称, 数量), ...) - 按 ARRANGEMENTS 的顺序
+    """
+    span_x, span_y = _spans(page_width, page_height, diameter, margin)
+    pitch = diameter + spacing
+    return tuple((name, arrangement(span_x, span_y, pitch)[0]) for name, arrangement in ARRANGEMENTS)
+
+
+def best_arrangement(candidates):
+    """从候选计数中选出数量最多的排列（数量相同取靠前的），返回 (名称, 数量)"""
+    best_name, best_count = 'none', 0
+    for name, count in candidates:
+        if count > best_count:
+            best_name, best_count = name, count
+    return best_name, best_count
+
+
+@lru_cache(maxsize=256)
+def optimize_packing(page_width, page_height, diameter, spacing, margin):
+    """
+    求页面上可放置圆形最多的排列
+    参数（均为像素）:
+        page_width, page_height: 页面尺寸
+        diameter: 圆形直径
+        spacing: 圆形之间的最小间距
+        margin: 页边距（圆形不得超出）
+    返回: PackingResult
+    """
+    pitch = diameter + spacing
+    span_x, span_y = _spans(page_width, page_height, diameter, margin)
+    offset = margin + diameter / 2
+
+    candidates = packing_capacity(page_width, page_height, diameter, spacing, margin)
+    best_name, best_count = best_arrangement(candidates)
+
+    runs, shift = (), (0.0, 0.0)
+    if best_count:
+        # 只为选中的排列重新求一次生成函数
+        _, generate = dict(ARRANGEMENTS)[best_name](span_x, span_y, pitch)
+        runs = tuple(generate())
+        shift = _centering_offset(runs, span_x, span_y, offset, offset)
+
+    positions = tuple(to_position_list(expand_runs(runs, *shift)))
+    return PackingResult(best_name, positions, pitch, candidates, runs, shift)
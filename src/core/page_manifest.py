@@ -0,0 +1,144 @@
+"""
+增量导出的页面清单模块
+多页图片导出时在输出文件旁保存清单（<输出路径>.pages.json），记录每页文件的内容哈希。
+页面哈希覆盖决定页面像素的全部输入：页面规格、输出格式参数、各位置的坐标/直径/图块参数，
+以及源图片文件内容的哈希。再次导出时哈希相同且文件仍在的页面直接跳过，只重新渲染和写入有变化的页面；
+清单在每页写完后立即保存，中断（取消、崩溃）的导出再次执行时从未完成的页面继续。
+页面结构（RenderPlan）由排版规划确定性地得到，同样的输入总是得到同样的哈希。
+只依赖标准库
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+# 清单格式版本；页面渲染方式变化时提升版本号，旧清单中的页面全部重新导出
+# （2：源图片按EXIF方向摆正）
+MANIFEST_VERSION = 2
+MANIFEST_SUFFIX = ".pages.json"
+# 计算源文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 源文件哈希缓存：(路径, 文件大小, 修改时间) -> 内容哈希，文件不变时不重复读取
+_source_digests = {}
+_source_lock = threading.Lock()
+
+
+def source_digest(file_path):
+    """
+    源文件内容的SHA-256（按路径、大小和修改时间缓存）
+    文件不存在时返回 'missing'（页面改用失败占位，同样参与哈希）
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return 'missing'
+
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    with _source_lock:
+        digest = _source_digests.get(key)
+    if digest is not None:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _source_lock:
+        _source_digests[key] = digest
+    return digest
+
+
+def page_hash(page, render_params=()):
+    """
+    页面内容哈希
+    参数:
+        page: RenderPage
+        render_params: 影响输出文件的其他参数（如格式、JPEG质量），需可稳定地转换为repr
+    返回: str - 十六进制摘要
+    """
+    spec = page.page_spec
+    sha = hashlib.sha256()
+    sha.update(repr((MANIFEST_VERSION, spec.size_px, spec.dpi, tuple(render_params))).encode('utf-8'))
+    for slot in page.slots:
+        key = slot.tile
+        if key is None:
+            sha.update(repr((slot.x, slot.y, slot.diameter_mm)).encode('utf-8'))
+            continue
+        sha.update(repr((slot.x, slot.y, slot.diameter_mm, key.scale, key.offset_x, key.offset_y,
+                         key.rotation, key.diameter_mm, key.dpi)).encode('utf-8'))
+        sha.update(source_digest(key.file_path).encode('ascii'))
+    return sha.hexdigest()
+
+
+def manifest_path(base_path):
+    """清单文件路径：<输出路径（不含扩展名、页码）>.pages.json"""
+    return f"{base_path}{MANIFEST_SUFFIX}"
+
+
+class PageManifest:
+    """增量导出的页面清单：页面文件名 -> (内容哈希, 文件大小)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.skipped = 0
+        self.written = 0
+
+    @classmethod
+    def load(cls, path):
+        """读取清单；不存在、损坏或版本不同时返回空清单"""
+        manifest = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                manifest.pages = {name: (entry['hash'], entry['size']) for name, entry in data['pages'].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        return manifest
+
+    def is_current(self, file_path, digest):
+        """页面文件是否已是该哈希对应的内容（清单记录一致且文件大小未变）"""
+        entry = self.pages.get(os.path.basename(file_path))
+        if entry is None or entry[0] != digest:
+            return False
+        try:
+            return os.path.getsize(file_path) == entry[1]
+        except OSError:
+            return False
+
+    def skip(self):
+        """记录一页未变化而跳过"""
+        self.skipped += 1
+
+    def record(self, file_path, digest):
+        """记录写好的页面并立即保存清单（中断后可从下一页继续）"""
+        self.pages[os.path.basename(file_path)] = (digest, os.path.getsize(file_path))
+        self.written += 1
+        self.save()
+
+    def retain(self, file_paths):
+        """只保留本次导出的页面（页数减少或文件名变化后的旧记录不再有效）"""
+        names = {os.path.basename(path) for path in file_paths}
+        stale = set(self.pages) - names
+        for name in stale:
+            del self.pages[name]
+        return bool(stale)
+
+    def save(self):
+        """写入清单（先写临时文件再替换，不会留下不完整的清单）"""
+        data = {
+            'version': MANIFEST_VERSION,
+            'pages': {name: {'hash': digest, 'size': size} for name, (digest, size) in sorted(self.pages.items())},
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def report(self):
+        """本次导出的统计：跳过/重新写入的页数"""
+        return {'skipped': self.skipped, 'written': self.written}
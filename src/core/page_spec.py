@@ -0,0 +1,123 @@
+"""
+页面规格模块
+PageSpec 描述输出页面的物理尺寸（毫米）和分辨率（DPI），
+排版、预览、导出和ComfyUI节点都以它换算像素尺寸；
+它不可变、可哈希，可直接作为缓存键的一部分。
+只依赖 common.constants，桌面端、命令行和ComfyUI节点共用
+"""
+
+import re
+from dataclasses import dataclass
+
+from common.constants import (
+    PAGE_SIZES_MM, DEFAULT_PAGE_SIZE, PRINT_DPI, MIN_PAGE_DPI, MAX_PAGE_DPI
+)
+
+POINTS_PER_INCH = 72.0
+MM_PER_INCH = 25.4
+
+# 自定义尺寸的写法："330x1000"、"330x1000mm"、"330*1000"
+_CUSTOM_SIZE_PATTERN = re.compile(r'^\s*([\d.]+)\s*[x×*]\s*([\d.]+)\s*(mm)?\s*$', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PageSpec:
+    """输出页面规格（不可变）"""
+    width_mm: float
+    height_mm: float
+    dpi: int = PRINT_DPI
+    name: str = DEFAULT_PAGE_SIZE
+
+    def __post_init__(self):
+        if self.width_mm <= 0 or self.height_mm <= 0:
+            raise ValueError(f"页面尺寸必须大于0 - {self.width_mm}x{self.height_mm}mm")
+        if self.dpi <= 0:
+            raise ValueError(f"分辨率必须大于0 - {self.dpi}")
+
+    @classmethod
+    def preset(cls, name=DEFAULT_PAGE_SIZE, dpi=PRINT_DPI):
+        """按纸张名称创建（A4、A3、Letter、SRA3，不区分大小写）"""
+        for preset_name, (width_mm, height_mm) in PAGE_SIZES_MM.items():
+            if preset_name.lower() == name.strip().lower():
+                return cls(width_mm, height_mm, int(dpi), preset_name)
+        raise ValueError(f"未知的纸张规格: {name}（可选: {', '.join(PAGE_SIZES_MM)}）")
+
+    @classmethod
+    def custom(cls, width_mm, height_mm, dpi=PRINT_DPI):
+        """自定义尺寸（如卷筒纸截取的长度）"""
+        return cls(float(width_mm), float(height_mm), int(dpi), f"{width_mm:g}x{height_mm:g}mm")
+
+    def with_dpi(self, dpi):
+        """相同纸张、不同分辨率"""
+        return PageSpec(self.width_mm, self.height_mm, int(dpi), self.name)
+
+    def mm_to_px(self, mm):
+        """毫米 -> 本页分辨率下的像素（与 mm_to_pixels 的取整方式一致）"""
+        return int(mm * self.dpi / MM_PER_INCH)
+
+    def px_to_pt(self, px):
+        """本页像素 -> PDF点"""
+        return px * POINTS_PER_INCH / self.dpi
+
+    @property
+    def width_px(self):
+        return self.mm_to_px(self.width_mm)
+
+    @property
+    def height_px(self):
+        return self.mm_to_px(self.height_mm)
+
+    @property
+    def size_px(self):
+        """(宽, 高)（像素）"""
+        return self.width_px, self.height_px
+
+    @property
+    def size_mm(self):
+        """(宽, 高)（毫米）"""
+        return self.width_mm, self.height_mm
+
+    @property
+    def size_pt(self):
+        """(宽, 高)（PDF点，1英寸=72点）"""
+        return (self.width_mm * POINTS_PER_INCH / MM_PER_INCH,
+                self.height_mm * POINTS_PER_INCH / MM_PER_INCH)
+
+    @property
+    def scale(self):
+        """相对 PRINT_DPI 的像素比例（编辑参数以 PRINT_DPI 像素记录）"""
+        return self.dpi / PRINT_DPI
+
+    @property
+    def aspect_ratio(self):
+        """高宽比"""
+        return self.height_mm / self.width_mm
+
+    @property
+    def label(self):
+        """界面和日志中显示的名称，如 "SRA3 @ 600dpi" """
+        return f"{self.name} @ {self.dpi}dpi"
+
+
+DEFAULT_PAGE_SPEC = PageSpec.preset(DEFAULT_PAGE_SIZE)
+
+
+def parse_page_spec(text, dpi=None):
+    """
+    解析页面规格文本
+    支持 "A4"、"SRA3@600"、"330x1000"、"330x1000mm@300"；
+    文本中没有写分辨率时使用dpi参数（默认 PRINT_DPI）
+    返回: PageSpec
+    """
+    size_text, _, dpi_text = text.partition('@')
+    if dpi_text.strip():
+        dpi = int(dpi_text.strip().lower().replace('dpi', ''))
+    if dpi is None:
+        dpi = PRINT_DPI
+    if not MIN_PAGE_DPI <= dpi <= MAX_PAGE_DPI:
+        raise ValueError(f"分辨率应在 {MIN_PAGE_DPI}-{MAX_PAGE_DPI} DPI 之间 - {dpi}")
+
+    match = _CUSTOM_SIZE_PATTERN.match(size_text)
+    if match:
+        return PageSpec.custom(float(match.group(1)), float(match.group(2)), dpi)
+    return PageSpec.preset(size_text, dpi)
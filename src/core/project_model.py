@@ -0,0 +1,296 @@
+"""
+项目数据模型
+以列式数组保存大量徽章条目的编辑参数（缩放、偏移、旋转、数量），
+每个源文件的元数据按需加载并在条目间共享；
+排版、预览和导出通过索引区间访问展开后的徽章，不需要一次性构建完整列表
+"""
+
+import hashlib
+import os
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from collections.abc import Sequence
+
+from common.error_handler import logger
+
+
+class BadgeRow:
+    """
+    项目中一行的轻量视图
+    与ImageItem提供相同的编辑参数属性，可直接交给排版和导出代码使用
+    """
+
+    __slots__ = ('project', 'index')
+
+    def __init__(self, project, index):
+        self.project = project
+        self.index = index
+
+    @property
+    def file_path(self):
+        return self.project.sources[self.project.source_ids[self.index]]
+
+    @property
+    def filename(self):
+        return self.project.source_filename(self.project.source_ids[self.index])
+
+    @property
+    def scale(self):
+        return self.project.scale[self.index]
+
+    @property
+    def offset_x(self):
+        return self.project.offset_x[self.index]
+
+    @property
+    def offset_y(self):
+        return self.project.offset_y[self.index]
+
+    @property
+    def rotation(self):
+        return self.project.rotation[self.index]
+
+    @property
+    def quantity(self):
+        return self.project.quantity[self.index]
+
+    @property
+    def badge_size_mm(self):
+        """单独的徽章直径（不含出血），None表示使用全局设置"""
+        return self.project.badge_size[self.index] or None
+
+    @property
+    def is_processed(self):
+        return bool(self.project.processed[self.index])
+
+    @property
+    def info(self):
+        """源文件元数据（首次访问时加载）"""
+        return self.project.source_info(self.project.source_ids[self.index])
+
+    def __repr__(self):
+        return f"BadgeRow({self.index}, {self.filename!r}, ×{self.quantity})"
+
+
+class ExpandedBadges(Sequence):
+    """
+    按数量展开后的徽章序列（只读视图）
+    通过数量的前缀和定位行，切片时只构建所需区间的元素
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self._ends = project.cumulative_quantities()
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def _row_at(self, slot):
+        """展开序号 -> 行号"""
+        return bisect_right(self._ends, slot)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.iter_range(start, stop))
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("徽章序号超出范围")
+        return BadgeRow(self.project, self._row_at(key))
+
+    def iter_range(self, start, stop):
+        """依次产出展开序号 [start, stop) 的徽章（同一行的多个副本共用一个视图对象）"""
+        stop = min(stop, len(self))
+        if start >= stop:
+            return
+        row = self._row_at(start)
+        slot = start
+        while slot < stop:
+            row_end = min(self._ends[row], stop)
+            badge = BadgeRow(self.project, row)
+            for _ in range(row_end - slot):
+                yield badge
+            slot = row_end
+            row += 1
+
+    def __iter__(self):
+        return self.iter_range(0, len(self))
+
+    def page(self, page_index, per_page):
+        """第page_index页的徽章列表（每页per_page个）"""
+        start = page_index * per_page
+        return self[start:start + per_page]
+
+
+class BadgeProject:
+    """列式存储的徽章项目（适合上万个条目）"""
+
+    def __init__(self):
+        # 源文件表：同一文件的多个条目共享一份路径和元数据
+        self.sources = []
+        self._source_ids = {}
+        self._source_info = {}
+
+        # 参数列（每行一个元素）
+        self.source_ids = array('l')
+        self.scale = array('d')
+        self.offset_x = array('l')
+        self.offset_y = array('l')
+        self.rotation = array('l')
+        self.quantity = array('l')
+        self.processed = array('b')
+        self.badge_size = array('d')    # 单独的徽章直径（毫米），0表示使用全局设置
+
+        self._cumulative = None  # 数量前缀和缓存
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        从具有编辑参数属性的对象（ImageItem、BadgeEntry等）构建项目
+        """
+        project = cls()
+        for item in items:
+            project.add(
+                item.file_path,
+                quantity=item.quantity,
+                scale=item.scale if item.scale is not None else 1.0,
+                offset_x=item.offset_x,
+                offset_y=item.offset_y,
+                rotation=item.rotation,
+                is_processed=item.is_processed,
+                badge_size_mm=getattr(item, 'badge_size_mm', None),
+            )
+            info = getattr(item, 'info', None)
+            if info and 'size' in info:
+                project.set_source_info(item.file_path, info)
+        return project
+
+    def _source_id(self, file_path):
+        """获取（必要时登记）源文件编号"""
+        source_id = self._source_ids.get(file_path)
+        if source_id is None:
+            source_id = len(self.sources)
+            self.sources.append(file_path)
+            self._source_ids[file_path] = source_id
+        return source_id
+
+    def add(self, file_path, quantity=1, scale=1.0, offset_x=0, offset_y=0, rotation=0,
+            is_processed=False, badge_size_mm=None):
+        """
+        添加一行
+        返回: int - 新行号
+        """
+        self.source_ids.append(self._source_id(file_path))
+        self.scale.append(scale)
+        self.offset_x.append(int(offset_x))
+        self.offset_y.append(int(offset_y))
+        self.rotation.append(int(rotation))
+        self.quantity.append(max(0, int(quantity)))
+        self.processed.append(1 if is_processed else 0)
+        self.badge_size.append(badge_size_mm or 0.0)
+        self._cumulative = None
+        return len(self.source_ids) - 1
+
+    def set_params(self, row, **params):
+        """更新一行的参数（scale/offset_x/offset_y/rotation/quantity/is_processed/badge_size_mm）"""
+        for name, value in params.items():
+            if name == 'is_processed':
+                self.processed[row] = 1 if value else 0
+            elif name == 'badge_size_mm':
+                self.badge_size[row] = value or 0.0
+            elif name in ('scale', 'offset_x', 'offset_y', 'rotation', 'quantity'):
+                getattr(self, name)[row] = value
+                if name == 'quantity':
+                    self._cumulative = None
+            else:
+                raise AttributeError(f"未知的参数: {name}")
+
+    def remove(self, row):
+        """删除一行（源文件表保留，便于撤销和重复导入）"""
+        for column in self._columns():
+            column.pop(row)
+        self._cumulative = None
+
+    def _columns(self):
+        return (self.source_ids, self.scale, self.offset_x, self.offset_y,
+                self.rotation, self.quantity, self.processed, self.badge_size)
+
+    def __len__(self):
+        return len(self.source_ids)
+
+    def row(self, index):
+        """第index行的视图"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("行号超出范围")
+        return BadgeRow(self, index)
+
+    def __iter__(self):
+        return (BadgeRow(self, i) for i in range(len(self)))
+
+    # ---- 源文件元数据（延迟加载） ----
+
+    def source_filename(self, source_id):
+        """源文件名"""
+        return os.path.basename(self.sources[source_id])
+
+    def set_source_info(self, file_path, info):
+        """登记已知的源文件元数据（如导入探测得到的信息）"""
+        self._source_info[self._source_id(file_path)] = info
+
+    def source_info(self, source_id):
+        """读取源文件元数据，首次访问时从磁盘缓存或文件头加载"""
+        info = self._source_info.get(source_id)
+        if info is None:
+            from utils.file_handler import FileHandler
+            try:
+                info = FileHandler().get_image_info(self.sources[source_id]) or {}
+            except Exception as e:
+                logger.warning(f"加载图片信息失败 {self.sources[source_id]}: {e}")
+                info = {}
+            self._source_info[source_id] = info
+        return info
+
+    # ---- 展开与区间访问 ----
+
+    def cumulative_quantities(self):
+        """数量的前缀和（第i个元素为前i+1行的数量之和）"""
+        if self._cumulative is None:
+            self._cumulative = array('q', accumulate(self.quantity))
+        return self._cumulative
+
+    @property
+    def total_badges(self):
+        """展开后的徽章总数"""
+        cumulative = self.cumulative_quantities()
+        return cumulative[-1] if cumulative else 0
+
+    def expanded(self):
+        """按数量展开后的只读序列视图"""
+        return ExpandedBadges(self)
+
+    def fingerprint(self):
+        """
+        内容指纹：参数列直接按字节参与哈希，不需要逐项格式化字符串；
+        源文件的大小和修改时间也参与哈希，磁盘上的图片被修改后指纹随之变化
+        返回: str - 十六进制摘要
+        """
+        digest = hashlib.md5()
+        digest.update("\n".join(self.sources).encode('utf-8'))
+        identities = array('q')
+        for file_path in self.sources:
+            try:
+                stat = os.stat(file_path)
+                identities.extend((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                identities.extend((-1, -1))
+        digest.update(identities.tobytes())
+        for column in self._columns():
+            digest.update(column.tobytes())
+        return digest.hexdigest()
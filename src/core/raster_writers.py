@@ -0,0 +1,217 @@
+"""
+整页位图文档写入模块
+供印刷RIP使用的单文件多页输出：多页TIFF（LZW压缩或不压缩）和由整页位图组成的PDF。
+两种写入器都是流式的：每渲染好一页就追加写入文件，写完即可释放该页，不会把所有页面同时保存在内存中。
+页面可以是 L / RGB / CMYK 模式，提供ICC配置文件时一并嵌入（TIFF标签 / PDF的ICCBased色彩空间）
+"""
+
+import os
+import zlib
+
+# 多页TIFF的压缩方式 -> PIL的compression参数
+TIFF_COMPRESSIONS = {
+    'lzw': 'tiff_lzw',
+    'none': 'raw',
+}
+DEFAULT_TIFF_COMPRESSION = 'lzw'
+
+# PDF中的色彩空间和通道数
+PDF_COLOR_SPACES = {
+    'L': ('/DeviceGray', 1),
+    'RGB': ('/DeviceRGB', 3),
+    'CMYK': ('/DeviceCMYK', 4),
+}
+# 流长度占位的宽度（回填的十进制长度，不足时以空格补齐）
+LENGTH_FIELD_WIDTH = 12
+# 压缩图像数据时每次送入zlib的字节数
+PDF_COMPRESS_CHUNK = 4 * 1024 * 1024
+POINTS_PER_INCH = 72.0
+
+
+class MultiPageTiffWriter:
+    """
+    流式多页TIFF写入器（每页一个IFD，依次追加到文件末尾）
+    用法:
+        with MultiPageTiffWriter(path) as writer:
+            writer.add_page(image, dpi)
+    """
+
+    def __init__(self, path, compression=DEFAULT_TIFF_COMPRESSION, icc_profile=None):
+        """
+        参数:
+            path: 输出文件路径
+            compression: 'lzw' 或 'none'
+            icc_profile: 嵌入的ICC配置文件字节（如CMYK输出使用的印刷配置文件）
+        """
+        if compression not in TIFF_COMPRESSIONS:
+            raise ValueError(f"未知的TIFF压缩方式: {compression}")
+        from PIL import TiffImagePlugin
+
+        self.path = path
+        self.compression = TIFF_COMPRESSIONS[compression]
+        self.icc_profile = icc_profile
+        self.page_count = 0
+        self._writer = TiffImagePlugin.AppendingTiffWriter(path, new=True)
+
+    def add_page(self, image, dpi):
+        """追加一页；返回写入后的文件大小"""
+        options = {'compression': self.compression, 'dpi': (dpi, dpi)}
+        if self.icc_profile:
+            options['icc_profile'] = self.icc_profile
+        if self.page_count:
+            self._writer.newFrame()
+        image.save(self._writer, format='TIFF', **options)
+        self.page_count += 1
+        # AppendingTiffWriter.tell() 从当前页的起点计算，文件大小取文件末尾的绝对位置
+        # （下一页开始前 newFrame 会重新定位，移动文件位置不影响写入）
+        return self._writer.f.seek(0, os.SEEK_END)
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RasterPdfWriter:
+    """
+    流式整页位图PDF写入器
+    每页的图像（Flate无损压缩，边压缩边写入）、内容流和页面对象写完即落盘，只在内存中保留各对象的偏移量；
+    页面树、目录和交叉引用表在关闭时写出
+    """
+
+    def __init__(self, path, icc_profile=None):
+        """
+        参数:
+            path: 输出文件路径
+            icc_profile: 嵌入的ICC配置文件字节，页面使用对应的ICCBased色彩空间
+        """
+        self.path = path
+        self.page_count = 0
+        self._file = open(path, 'wb')
+        self._offsets = {}          # 对象号 -> 文件偏移
+        self._page_ids = []
+        self._next_id = 3           # 1: 目录，2: 页面树
+        self._icc_id = None
+        self._icc_channels = None
+
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        if icc_profile:
+            self._icc_id = self._write_icc(icc_profile)
+
+    def _new_id(self):
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _begin_object(self, object_id):
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(f"{object_id} 0 obj\n".encode('ascii'))
+
+    def _write_object(self, object_id, body):
+        self._begin_object(object_id)
+        self._file.write(body.encode('ascii') + b"\nendobj\n")
+
+    def _write_stream(self, object_id, header, chunks):
+        """写出压缩流对象：长度先写占位，流写完后回填（边压缩边写入，不缓存压缩结果）"""
+        self._begin_object(object_id)
+        self._file.write(f"<< {header} /Filter /FlateDecode /Length ".encode('ascii'))
+        length_offset = self._file.tell()
+        self._file.write(b" " * LENGTH_FIELD_WIDTH + b" >>\nstream\n")
+
+        compressor = zlib.compressobj()
+        length = 0
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            self._file.write(data)
+            length += len(data)
+        data = compressor.flush()
+        self._file.write(data)
+        length += len(data)
+        self._file.write(b"\nendstream\nendobj\n")
+
+        end_offset = self._file.tell()
+        self._file.seek(length_offset)
+        self._file.write(str(length).ljust(LENGTH_FIELD_WIDTH).encode('ascii'))
+        self._file.seek(end_offset)
+
+    def _write_icc(self, icc_profile):
+        """写出ICC配置文件流（通道数由配置文件的色彩空间决定）"""
+        color_space = icc_profile[16:20]
+        channels = {b'GRAY': 1, b'RGB ': 3, b'CMYK': 4}.get(color_space)
+        if channels is None:
+            raise ValueError(f"不支持的ICC配置文件色彩空间: {color_space!r}")
+        self._icc_channels = channels
+        icc_id = self._new_id()
+        self._write_stream(icc_id, f"/N {channels}", [icc_profile])
+        return icc_id
+
+    def add_page(self, image, dpi):
+        """追加一页（页面大小由像素尺寸和分辨率决定）；返回写入后的文件大小"""
+        if image.mode not in PDF_COLOR_SPACES:
+            image = image.convert('RGB')
+        color_space, channels = PDF_COLOR_SPACES[image.mode]
+        if self._icc_id is not None and channels == self._icc_channels:
+            color_space = f"[/ICCBased {self._icc_id} 0 R]"
+
+        width, height = image.size
+        width_pt = width * POINTS_PER_INCH / dpi
+        height_pt = height * POINTS_PER_INCH / dpi
+
+        # 图像数据分块压缩写入
+        data = memoryview(image.tobytes())
+        image_id = self._new_id()
+        self._write_stream(
+            image_id,
+            f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {color_space} /BitsPerComponent 8",
+            (data[start:start + PDF_COMPRESS_CHUNK] for start in range(0, len(data), PDF_COMPRESS_CHUNK))
+        )
+        del data
+
+        content_id = self._new_id()
+        content = f"q {width_pt:.4f} 0 0 {height_pt:.4f} 0 0 cm /Im0 Do Q".encode('ascii')
+        self._write_stream(content_id, "", [content])
+
+        page_id = self._new_id()
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.4f} {height_pt:.4f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        self._page_ids.append(page_id)
+        self.page_count += 1
+        return self._file.tell()
+
+    def close(self):
+        """写出页面树、目录、交叉引用表并关闭文件"""
+        if self._file.closed:
+            return
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            lines.append(f"{self._offsets[object_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._file.write("".join(lines).encode('ascii'))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# 整页位图文档格式 -> 写入器
+RASTER_DOCUMENT_WRITERS = {
+    'tiff': MultiPageTiffWriter,
+    'pdf': RasterPdfWriter,
+}
@@ -0,0 +1,360 @@
+"""
+渲染计划与页面合成模块
+RenderPlan 把排版规划（JobPlan）展开为不可变的 页 -> 位置 -> 图块键 结构；
+PageCompositor 按渲染计划合成页面，圆形裁剪结果（图块）存放在进程内共享的 TileCache 中。
+预览、打印和导出使用同一个合成器和同一份图块缓存：预览时裁剪的图块导出时直接复用，
+缩小的预览图块由输出分辨率的图块缩小得到（同样缓存），不再各自重新打开和缩放原图。
+导出可选的色彩阶段（core.color_management）同样按图块缓存：每个不同的图块只做一次ICC转换
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from common.imports import Image, ImageDraw
+from common.constants import mm_to_pixels
+from common.error_handler import logger
+from core.image_processor import ImageProcessor
+from core.job_planner import select_items
+from core.color_management import convert_tile, page_background
+
+# 共享图块缓存的内存上限（字节）：300dpi下68mm的RGBA图块约2.6MB
+TILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# 预览绘制颜色
+MARGIN_LINE_COLOR = (200, 200, 200)
+PLACEHOLDER_FILL = (220, 220, 220)
+PLACEHOLDER_OUTLINE = (200, 200, 200)
+ERROR_FILL = (200, 200, 200)
+ERROR_OUTLINE = (180, 180, 180)
+
+
+def source_identity(file_path):
+    """
+    源文件的身份（文件大小, 修改时间），与 SourceCache 的有效性判断一致；
+    文件修改后图块键随之变化，进程内共享的图块缓存不会再返回旧内容。文件不存在时为 (0, 0)
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+@dataclass(frozen=True)
+class TileKey:
+    """图块键：源文件（路径和内容身份）、编辑参数、印刷圆直径和分辨率完全决定裁剪结果"""
+    file_path: str
+    scale: float
+    offset_x: int
+    offset_y: int
+    rotation: int
+    diameter_mm: float      # 印刷圆直径（含出血）
+    dpi: int
+    source_size: int = 0            # 源文件大小（字节）
+    source_mtime_ns: int = 0        # 源文件修改时间
+
+    @classmethod
+    def for_item(cls, item, diameter_mm, dpi, identity=None):
+        """
+        由图片项目（ImageItem、BadgeRow、BadgeEntry）生成图块键
+        identity: 已知的源文件身份 (文件大小, 修改时间)，None时读取文件状态
+        """
+        if identity is None:
+            identity = source_identity(item.file_path)
+        return cls(item.file_path, item.scale, item.offset_x, item.offset_y, item.rotation,
+                   float(diameter_mm), int(dpi), *identity)
+
+    def with_dpi(self, dpi):
+        """同一图块在另一分辨率下的键"""
+        return TileKey(self.file_path, self.scale, self.offset_x, self.offset_y, self.rotation,
+                       self.diameter_mm, int(dpi), self.source_size, self.source_mtime_ns)
+
+    @property
+    def size_px(self):
+        """图块边长（像素，与 ImageProcessor.create_circular_crop 一致）"""
+        return mm_to_pixels(self.diameter_mm, self.dpi)
+
+
+@dataclass(frozen=True)
+class RenderSlot:
+    """页面上的一个位置"""
+    x: int                  # 圆心（页面分辨率下的像素）
+    y: int
+    diameter_mm: float
+    tile: TileKey = None    # 空位为None（预览时绘制占位符）
+    item_index: int = -1    # 对应的徽章序号（展开序列中的序号）
+
+
+@dataclass(frozen=True)
+class RenderPage:
+    """渲染计划中的一页"""
+    page_index: int
+    page_spec: object       # PageSpec
+    margin_mm: float
+    slots: tuple            # RenderSlot
+
+    @property
+    def filled_slots(self):
+        """放有徽章的位置"""
+        return tuple(slot for slot in self.slots if slot.tile is not None)
+
+    @property
+    def count(self):
+        return sum(1 for slot in self.slots if slot.tile is not None)
+
+
+@dataclass(frozen=True)
+class RenderPlan:
+    """整批任务的渲染计划（不可变）"""
+    job_plan: object        # JobPlan
+    pages: tuple            # RenderPage
+
+    @property
+    def page_spec(self):
+        return self.job_plan.page_spec
+
+    @property
+    def total_pages(self):
+        return len(self.pages)
+
+    @property
+    def total_items(self):
+        return self.job_plan.total_items
+
+    def unique_tiles(self):
+        """计划中用到的不同图块"""
+        return {slot.tile for page in self.pages for slot in page.slots if slot.tile is not None}
+
+
+def build_render_plan(job_plan, image_items, default_diameter_mm):
+    """
+    由排版规划生成渲染计划
+    参数:
+        job_plan: JobPlan
+        image_items: 生成规划时使用的（展开后的）图片项目序列
+        default_diameter_mm: 网格/紧凑页面使用的印刷圆直径（含出血，毫米）
+    返回: RenderPlan
+    """
+    spec = job_plan.page_spec
+    identities = {}     # 源文件身份每个文件只读取一次
+    pages = []
+    for page in job_plan.pages:
+        items = select_items(image_items, page.item_indices)
+        slots = []
+        for i, (x, y) in enumerate(page.positions):
+            diameter_mm = page.diameters_mm[i] if page.diameters_mm is not None else default_diameter_mm
+            if i < len(items):
+                file_path = items[i].file_path
+                identity = identities.get(file_path)
+                if identity is None:
+                    identity = identities[file_path] = source_identity(file_path)
+                slots.append(RenderSlot(x, y, diameter_mm,
+                                        TileKey.for_item(items[i], diameter_mm, spec.dpi, identity),
+                                        page.item_indices[i]))
+            else:
+                slots.append(RenderSlot(x, y, diameter_mm))
+        pages.append(RenderPage(page.page_index, spec, job_plan.margin_mm, tuple(slots)))
+    return RenderPlan(job_plan, tuple(pages))
+
+
+class TileCache:
+    """
+    线程安全的圆形图块LRU缓存（按图块内存大小淘汰）
+    缓存中的图块在调用方之间直接共享，只能读取（粘贴、保存），不能修改
+    """
+
+    def __init__(self, max_bytes=TILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._tiles = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()     # 每个线程独立的ImageProcessor
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, source_dpi=None, color=None):
+        """
+        读取图块，未命中时生成并缓存
+        参数:
+            key: TileKey
+            source_dpi: 输出分辨率；高于key.dpi时先取得该分辨率的图块再缩小（预览使用）
+            color: ColorSettings，提供时返回转换到输出色彩空间的图块（由原图块转换一次后以 (key, color) 缓存）
+        返回: PIL.Image，生成失败时返回None
+        """
+        cache_key = key if color is None else (key, color)
+        with self._lock:
+            tile = self._tiles.get(cache_key)
+            if tile is not None:
+                self._tiles.move_to_end(cache_key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+
+        # 生成放在锁外：图块只由键决定，并发重复生成也只是覆盖为相同的结果
+        if color is not None:
+            source = self.get(key, source_dpi)
+            if source is None:
+                return None
+            tile = convert_tile(source, color)
+            if tile is source:
+                # 不需要转换（sRGB源、RGB输出）：不重复占用缓存
+                return tile
+        elif source_dpi is not None and source_dpi > key.dpi:
+            source = self.get(key.with_dpi(source_dpi))
+            if source is None:
+                return None
+            size = key.size_px
+            tile = source.resize((size, size), Image.Resampling.LANCZOS)
+        else:
+            tile = self._processor().create_circular_crop(
+                key.file_path, key.scale, key.offset_x, key.offset_y, key.rotation,
+                dpi=key.dpi, diameter_mm=key.diameter_mm, use_cache=False
+            )
+            if tile is None:
+                return None
+
+        self._store(cache_key, tile)
+        return tile
+
+    def _processor(self):
+        processor = getattr(self._local, 'processor', None)
+        if processor is None:
+            processor = self._local.processor = ImageProcessor()
+        return processor
+
+    def _store(self, key, tile):
+        size = tile.size[0] * tile.size[1] * len(tile.getbands())
+        with self._lock:
+            previous = self._tiles.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size[0] * previous.size[1] * len(previous.getbands())
+            self._tiles[key] = tile
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._tiles) > 1:
+                _, evicted = self._tiles.popitem(last=False)
+                self._bytes -= evicted.size[0] * evicted.size[1] * len(evicted.getbands())
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._tiles.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def info(self):
+        """缓存统计信息"""
+        return {
+            'tiles': len(self._tiles),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# 进程内共享的图块缓存
+shared_tile_cache = TileCache()
+
+
+class PageCompositor:
+    """页面合成器：按渲染计划把图块合成到页面（预览、打印和导出共用）"""
+
+    def __init__(self, tile_cache=None):
+        self.tile_cache = tile_cache if tile_cache is not None else shared_tile_cache
+
+    def page_tiles(self, page, on_badge=None):
+        """
+        本页各位置的图块（输出分辨率）
+        参数:
+            on_badge: 每取得一个图块后调用（导出任务用于进度和取消检查）
+        返回: list[(RenderSlot, PIL.Image或None)] - 只含放有徽章的位置
+        """
+        tiles = []
+        for slot in page.filled_slots:
+            tiles.append((slot, self.slot_tile(slot)))
+            if on_badge is not None:
+                on_badge()
+        return tiles
+
+    def slot_tile(self, slot):
+        """位置的图块（输出分辨率），生成失败时返回None"""
+        try:
+            return self.tile_cache.get(slot.tile)
+        except Exception as e:
+            logger.error(f"生成图块失败 {slot.tile.file_path}: {e}")
+            return None
+
+    def compose(self, page, scale=1.0, preview=False, on_badge=None, color=None):
+        """
+        合成一页
+        参数:
+            page: RenderPage
+            scale: 缩放比例，< 1 时直接在缩小后的分辨率上合成（图块由输出分辨率的图块缩小）
+            preview: 是否绘制页边距线、空位占位符和失败占位符
+            on_badge: 每处理完一个徽章后调用（导出任务用于进度和取消检查）
+            color: ColorSettings，导出的色彩阶段；提供时页面为输出色彩模式（RGB或CMYK），
+                粘贴的是按图块缓存的转换结果，None时为不经过色彩管理的RGB页面
+        返回: (PIL.Image, 成功放置的徽章数量)
+        """
+        spec = page.page_spec
+        render_spec = spec if scale == 1.0 else spec.with_dpi(max(1, round(spec.dpi * scale)))
+        ratio = render_spec.dpi / spec.dpi
+        width, height = render_spec.size_px
+
+        if color is None:
+            canvas = Image.new('RGB', (width, height), (255, 255, 255))
+        else:
+            canvas = Image.new(color.color_mode, (width, height), page_background(color))
+        draw = ImageDraw.Draw(canvas) if preview else None
+        if preview:
+            margin_px = render_spec.mm_to_px(page.margin_mm)
+            draw.rectangle([margin_px, margin_px, width - margin_px, height - margin_px],
+                           outline=MARGIN_LINE_COLOR, width=2)
+
+        placed = 0
+        for slot in page.slots:
+            center_x, center_y = (slot.x, slot.y) if ratio == 1.0 else (round(slot.x * ratio), round(slot.y * ratio))
+            radius = render_spec.mm_to_px(slot.diameter_mm) // 2
+
+            if slot.tile is None:
+                if preview:
+                    draw.ellipse([center_x - radius, center_y - radius, center_x + radius, center_y + radius],
+                                 fill=PLACEHOLDER_FILL, outline=PLACEHOLDER_OUTLINE, width=1)
+                continue
+
+            try:
+                tile_key = slot.tile.with_dpi(render_spec.dpi)
+                tile = mask = self.tile_cache.get(tile_key, spec.dpi)
+                if tile is not None and color is not None:
+                    # 转换后的CMYK图块没有透明通道，以原图块的透明通道作为遮罩
+                    tile = self.tile_cache.get(tile_key, spec.dpi, color)
+            except Exception as e:
+                logger.error(f"生成图块失败 {slot.tile.file_path}: {e}")
+                tile = None
+
+            if tile is None:
+                if preview:
+                    draw.ellipse([center_x - radius, center_y - radius, center_x + radius, center_y + radius],
+                                 fill=ERROR_FILL, outline=ERROR_OUTLINE, width=1)
+            else:
+                # 以图块的实际尺寸居中粘贴
+                paste_x = center_x - tile.size[0] // 2
+                paste_y = center_y - tile.size[1] // 2
+                if mask.mode == 'RGBA':
+                    canvas.paste(tile, (paste_x, paste_y), mask)
+                else:
+                    canvas.paste(tile, (paste_x, paste_y))
+                placed += 1
+
+            if on_badge is not None:
+                on_badge()
+
+        return canvas, placed
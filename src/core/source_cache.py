@@ -0,0 +1,150 @@
+"""
+源图片解码与共享源图片缓存模块
+所有按原图处理的路径（圆形裁剪、交互编辑器、缩略图、矢量PDF）都在解码时统一按EXIF方向摆正图片：
+只使用转置/90度旋转（无重采样、无画质损失），之后的 rotation 只表示用户设置的旋转，常见情况下为0，
+不再需要额外的整图 rotate(expand=True)。
+SourceCache 按 (路径, 文件大小, 修改时间) 缓存解码并摆正后的RGB原图（按内存上限LRU淘汰、线程安全），
+同一源图片的多个图块（不同编辑参数、不同分辨率）和编辑器只解码一次
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from common.imports import Image
+
+EXIF_ORIENTATION_TAG = 0x0112  # EXIF方向标签
+# EXIF方向 -> 摆正所需的转置操作（与 PIL.ImageOps.exif_transpose 一致）
+ORIENTATION_TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+# 宽高互换的方向
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+
+# 共享源图片缓存的内存上限（字节）：1200万像素的RGB原图约36MB
+SOURCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def exif_orientation(img):
+    """已打开图片的EXIF方向（1为正常，没有EXIF或取值无效时为1），只读取文件头不解码"""
+    try:
+        orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    except Exception:
+        return 1
+    return orientation if orientation in ORIENTATION_TRANSPOSES else 1
+
+
+def oriented_size(size, orientation):
+    """按EXIF方向摆正后的尺寸 (宽, 高)"""
+    if orientation in SWAPPED_ORIENTATIONS:
+        return size[1], size[0]
+    return tuple(size)
+
+
+def normalize_orientation(img, orientation=None):
+    """
+    按EXIF方向摆正图片（只做转置，不重采样）
+    参数:
+        img: PIL图片
+        orientation: 已知的EXIF方向，None时从图片读取（缩略图等draft解码后的图片需在解码前读取）
+    返回: PIL.Image - 方向正常时返回原对象
+    """
+    if orientation is None:
+        orientation = exif_orientation(img)
+    method = ORIENTATION_TRANSPOSES.get(orientation)
+    return img if method is None else img.transpose(method)
+
+
+def source_size(file_path):
+    """源图片摆正后的尺寸（只读取文件头）"""
+    with Image.open(file_path) as img:
+        return oriented_size(img.size, exif_orientation(img))
+
+
+def decode_source(file_path):
+    """
+    解码源图片：RGB、按EXIF方向摆正，保留嵌入的ICC配置文件（info['icc_profile']）
+    返回: PIL.Image
+    """
+    with Image.open(file_path) as img:
+        orientation = exif_orientation(img)
+        image = img.convert('RGB') if img.mode != 'RGB' else img.copy()
+        icc_profile = img.info.get('icc_profile')
+    image = normalize_orientation(image, orientation)
+    if icc_profile:
+        image.info['icc_profile'] = icc_profile
+    return image
+
+
+class SourceCache:
+    """
+    线程安全的源图片LRU缓存（按图片内存大小淘汰）
+    缓存中的图片在调用方之间直接共享，只能读取（缩放、旋转、粘贴会生成新图片），不能修改
+    """
+
+    def __init__(self, max_bytes=SOURCE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path):
+        """
+        读取摆正后的RGB源图片，未命中时解码并缓存（文件大小或修改时间变化后重新解码）
+        返回: PIL.Image；文件无法打开时抛出异常
+        """
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        # 解码放在锁外：并发重复解码也只是覆盖为相同的结果
+        image = decode_source(file_path)
+        size = image.size[0] * image.size[1] * len(image.getbands())
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size[0] * previous.size[1] * len(previous.getbands())
+            self._images[key] = image
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.size[0] * evicted.size[1] * len(evicted.getbands())
+        return image
+
+    def __len__(self):
+        return len(self._images)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def info(self):
+        """缓存统计信息"""
+        return {
+            'sources': len(self._images),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# 进程内共享的源图片缓存
+shared_source_cache = SourceCache()
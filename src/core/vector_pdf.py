@@ -0,0 +1,251 @@
+"""
+矢量PDF绘制模块
+每个源图片只嵌入一次（作为PDF表单XObject），每个徽章在内容流中用仿射变换（平移、旋转、缩放）
+放置源图片，再用圆形剪切路径裁成圆形；裁切线、出血线和套准标记（core.overlay）是矢量描边。
+与位图模式（逐个徽章裁剪成带遮罩的方形图块）相比，文件更小、导出更快，清晰度不受 PRINT_DPI 限制。
+几何关系与 ImageProcessor.create_circular_crop 一致：源图片以圆心为中心、按编辑参数偏移、
+逆时针旋转、缩放（缩放和偏移以 PRINT_DPI 像素记录）。
+
+源图片的嵌入方式按整批任务中的最大放大倍数逐个决定（有效分辨率 = PRINT_DPI / 缩放比例）：
+- 有效分辨率不超过目标分辨率的JPEG：原始字节直接嵌入（DCT直通，不解码、不重新编码）；
+- 超过目标分辨率：只缩小一次到目标有效分辨率（JPEG源重新编码为JPEG，其他格式无损嵌入）；
+- 其他格式：解码后无损嵌入。
+带EXIF方向（非1）的JPEG不直接嵌入：与圆形裁剪一样解码后按方向转置摆正再嵌入（reportlab不识别EXIF方向）
+"""
+
+import os
+from io import BytesIO
+
+from common.imports import Image, OptionalImport
+from common.constants import PRINT_DPI
+from common.error_handler import logger
+from core.source_cache import exif_orientation, normalize_orientation
+
+reportlab_utils = OptionalImport('utils', 'reportlab.lib')
+reportlab_colors = OptionalImport('colors', 'reportlab.lib')
+
+POINTS_PER_INCH = 72.0
+MM_PER_INCH = 25.4
+
+# 叠加层：裁切线（专色CutContour）、出血线（灰色虚线）、套准标记（All分色）
+CUT_SPOT_NAME = 'CutContour'
+CUT_LINE_CMYK = (0, 1, 0, 0)
+CUT_LINE_WIDTH_PT = 0.25
+BLEED_LINE_COLOR = (0.6, 0.6, 0.6)
+BLEED_LINE_WIDTH_PT = 0.25
+BLEED_LINE_DASH = (2, 2)
+REGISTRATION_SPOT_NAME = 'All'
+REGISTRATION_CMYK = (1, 1, 1, 1)
+REGISTRATION_LINE_WIDTH_PT = 0.5
+
+# 有效分辨率超出目标不到该比例时不缩小（收益很小，不值得重新编码）
+DOWNSAMPLE_TOLERANCE = 1.1
+# 缩小后的JPEG源重新编码的质量
+DOWNSAMPLE_JPEG_QUALITY = 92
+# 可以直接嵌入的JPEG颜色模式
+PASSTHROUGH_MODES = ('RGB', 'L', 'CMYK')
+
+
+def mm_to_pt(mm):
+    """毫米 -> PDF点"""
+    return mm * POINTS_PER_INCH / MM_PER_INCH
+
+
+def max_source_scales(render_plan):
+    """
+    各源图片在整批任务中的最大缩放比例（决定需要保留的源图片分辨率）
+    返回: dict - {file_path: 最大缩放比例}
+    """
+    scales = {}
+    for key in render_plan.unique_tiles():
+        scales[key.file_path] = max(scales.get(key.file_path, 0.0), key.scale)
+    return scales
+
+
+def effective_dpi(scale):
+    """缩放比例下源图片的有效分辨率（每英寸的源图片像素数）"""
+    return PRINT_DPI / scale if scale > 0 else float('inf')
+
+
+class VectorBadgePainter:
+    """
+    在reportlab画布上以矢量方式绘制徽章（一次导出使用一个实例）
+    源图片按文件路径只嵌入一次，打不开的源图片记为失败，由调用方改用位图图块绘制
+    """
+
+    def __init__(self, canvas, page_spec, target_dpi=None, source_scales=None):
+        """
+        参数:
+            canvas: reportlab画布
+            page_spec: 页面规格
+            target_dpi: 源图片的目标有效分辨率，默认为页面分辨率
+            source_scales: max_source_scales 的结果；未提供的源图片按实际用到的缩放比例计算
+        """
+        self.canvas = canvas
+        self.page_spec = page_spec
+        self.target_dpi = target_dpi or page_spec.dpi
+        self.source_scales = source_scales or {}
+        self._forms = {}        # file_path -> (表单名, 源图片宽, 源图片高) 或 None（嵌入失败）
+        self._report = {
+            'sources': 0,
+            'passthrough': 0,       # 原始JPEG字节直接嵌入
+            'downsampled': 0,       # 缩小到目标有效分辨率
+            'decoded': 0,           # 解码后无损嵌入
+            'source_bytes': 0,      # 以JPEG嵌入的源图片的原始文件大小
+            'embedded_bytes': 0,    # 以上源图片实际嵌入的JPEG数据大小
+        }
+
+    def report(self):
+        """
+        源图片嵌入统计
+        返回: dict - 各嵌入方式的数量、JPEG源的原始/嵌入字节数和节省的字节数
+        """
+        report = dict(self._report)
+        report['saved_bytes'] = report['source_bytes'] - report['embedded_bytes']
+        report['target_dpi'] = self.target_dpi
+        return report
+
+    def _downsample_factor(self, file_path, scale):
+        """源图片需要缩小的比例；不需要缩小时返回None"""
+        scale = self.source_scales.get(file_path, scale)
+        factor = self.target_dpi / effective_dpi(scale)
+        return factor if factor * DOWNSAMPLE_TOLERANCE < 1 else None
+
+    def _prepare_source(self, file_path, scale):
+        """
+        决定源图片的嵌入方式（每个源图片只执行一次）
+        返回: (drawImage可用的图片, 源图片宽, 源图片高)
+        """
+        file_size = os.path.getsize(file_path)
+        with Image.open(file_path) as source:
+            width, height = source.size
+            orientation = exif_orientation(source)
+            is_jpeg = source.format == 'JPEG' and source.mode in PASSTHROUGH_MODES
+            factor = self._downsample_factor(file_path, scale)
+
+            if factor is None and is_jpeg and orientation == 1:
+                # DCT直通：reportlab按扩展名识别JPEG文件并原样嵌入，其他扩展名从内存读取
+                self._report['passthrough'] += 1
+                self._report['source_bytes'] += file_size
+                self._report['embedded_bytes'] += file_size
+                if os.path.splitext(file_path)[1].lower() in ('.jpg', '.jpeg'):
+                    return file_path, width, height
+                with open(file_path, 'rb') as f:
+                    return reportlab_utils.ImageReader(BytesIO(f.read())), width, height
+
+            image = source.convert('RGB') if source.mode not in ('RGB', 'L') else source.copy()
+
+        # 按EXIF方向摆正（只做转置），表单按摆正后的尺寸放置
+        image = normalize_orientation(image, orientation)
+        width, height = image.size
+
+        if factor is None:
+            self._report['decoded'] += 1
+            return reportlab_utils.ImageReader(image), width, height
+
+        # 只缩小一次到目标有效分辨率；表单仍按原始尺寸放置，几何关系不变
+        size = (max(1, round(width * factor)), max(1, round(height * factor)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+        self._report['downsampled'] += 1
+        if not is_jpeg:
+            return reportlab_utils.ImageReader(image), width, height
+
+        data = BytesIO()
+        image.save(data, 'JPEG', quality=DOWNSAMPLE_JPEG_QUALITY)
+        self._report['source_bytes'] += file_size
+        self._report['embedded_bytes'] += data.tell()
+        data.seek(0)
+        return reportlab_utils.ImageReader(data), width, height
+
+    def _source_form(self, file_path, scale=1.0):
+        """源图片对应的表单XObject（第一次使用时嵌入）"""
+        if file_path in self._forms:
+            return self._forms[file_path]
+
+        form = None
+        try:
+            image, width, height = self._prepare_source(file_path, scale)
+
+            # 表单内源图片占据单位正方形，放置时再缩放到实际尺寸
+            name = f"badge_source_{len(self._forms)}"
+            self.canvas.beginForm(name, 0, 0, 1, 1)
+            self.canvas.drawImage(image, 0, 0, width=1, height=1)
+            self.canvas.endForm()
+            form = (name, width, height)
+            self._report['sources'] += 1
+        except Exception as e:
+            logger.error(f"嵌入源图片失败 {file_path}: {e}")
+
+        self._forms[file_path] = form
+        return form
+
+    def slot_center_pt(self, slot):
+        """位置的圆心（PDF坐标系，原点在左下角；与叠加层一样从页面上边缘换算）"""
+        px_to_pt = POINTS_PER_INCH / self.page_spec.dpi
+        return slot.x * px_to_pt, self.page_spec.size_pt[1] - slot.y * px_to_pt
+
+    def draw_badge(self, slot):
+        """
+        绘制一个徽章
+        参数:
+            slot: RenderSlot（slot.tile 提供源文件和编辑参数）
+        返回: bool - 是否成功（源图片无法嵌入时返回False）
+        """
+        key = slot.tile
+        form = self._source_form(key.file_path, key.scale)
+        if form is None:
+            return False
+        name, width, height = form
+
+        c = self.canvas
+        center_x, center_y = self.slot_center_pt(slot)
+        radius = mm_to_pt(slot.diameter_mm) / 2
+        edit_px_to_pt = POINTS_PER_INCH / PRINT_DPI
+
+        c.saveState()
+        clip = c.beginPath()
+        clip.circle(center_x, center_y, radius)
+        c.clipPath(clip, stroke=0, fill=0)
+
+        # 源图片中心 = 圆心 + 偏移（PDF的y轴向上），绕中心逆时针旋转后缩放到实际尺寸
+        c.translate(center_x + key.offset_x * edit_px_to_pt, center_y - key.offset_y * edit_px_to_pt)
+        if key.rotation:
+            c.rotate(key.rotation)
+        c.scale(width * key.scale * edit_px_to_pt, height * key.scale * edit_px_to_pt)
+        c.translate(-0.5, -0.5)
+        c.doForm(name)
+        c.restoreState()
+        return True
+
+    def draw_overlay(self, geometry):
+        """
+        以矢量图层绘制叠加层（core.overlay.OverlayGeometry，毫米，左上角为原点）
+        裁切线使用专色 CutContour（印切一体机的RIP按此识别切割路径），套准标记使用 All 分色（印在所有色版上）
+        """
+        c = self.canvas
+        page_height = self.page_spec.size_pt[1]
+
+        def circles(items):
+            for cx, cy, r in items:
+                c.circle(mm_to_pt(cx), page_height - mm_to_pt(cy), mm_to_pt(r), stroke=1, fill=0)
+
+        c.saveState()
+        if geometry.bleed_circles:
+            c.setStrokeColorRGB(*BLEED_LINE_COLOR)
+            c.setLineWidth(BLEED_LINE_WIDTH_PT)
+            c.setDash(*BLEED_LINE_DASH)
+            circles(geometry.bleed_circles)
+            c.setDash()
+
+        if geometry.cut_circles:
+            c.setStrokeColor(reportlab_colors.CMYKColorSep(*CUT_LINE_CMYK, spotName=CUT_SPOT_NAME))
+            c.setLineWidth(CUT_LINE_WIDTH_PT)
+            circles(geometry.cut_circles)
+
+        if geometry.registration_marks:
+            c.setStrokeColor(reportlab_colors.CMYKColorSep(*REGISTRATION_CMYK, spotName=REGISTRATION_SPOT_NAME))
+            c.setLineWidth(REGISTRATION_LINE_WIDTH_PT)
+            circles(geometry.mark_circles())
+            for (x1, y1), (x2, y2) in geometry.mark_lines():
+                c.line(mm_to_pt(x1), page_height - mm_to_pt(y1), mm_to_pt(x2), page_height - mm_to_pt(y2))
+        c.restoreState()
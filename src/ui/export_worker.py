@@ -0,0 +1,86 @@
+"""
+导出工作线程模块
+在工作线程中执行导出（ExportManager的导出方法），主线程显示进度对话框：
+进度、写入大小和剩余时间来自 core.export_job.ExportJob，点击取消时请求协作式取消
+"""
+
+from PySide6.QtCore import Qt, QThread, QEventLoop, Signal
+from PySide6.QtWidgets import QProgressDialog
+
+from common.error_handler import logger
+from core.export_job import ExportJob
+
+# 进度条刻度数（按徽章数的完成比例换算）
+PROGRESS_STEPS = 1000
+
+
+class ExportWorker(QThread):
+    """执行一次导出的工作线程；进度通过信号送回主线程"""
+
+    progress_changed = Signal(object)      # ExportProgress
+
+    def __init__(self, export_func, args=(), kwargs=None, parent=None):
+        """
+        参数:
+            export_func: 导出方法（接受 job 关键字参数，返回 (是否成功, 数量)）
+            args, kwargs: 导出方法的参数
+        """
+        super().__init__(parent)
+        self.export_func = export_func
+        self.args = args
+        self.kwargs = dict(kwargs or {})
+        # 回调在工作线程中调用，经信号排队到主线程
+        self.job = ExportJob(progress_callback=self.progress_changed.emit)
+        self.result = (False, 0)
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.export_func(*self.args, job=self.job, **self.kwargs)
+        except Exception as e:
+            logger.error(f"导出线程出错: {e}")
+            self.error = e
+
+
+def run_export_with_progress(parent, title, export_func, *args, **kwargs):
+    """
+    在工作线程中执行导出，同时显示可取消的进度对话框（阻塞到导出结束，期间界面保持响应）
+    参数:
+        parent: 对话框的父窗口
+        title: 对话框标题
+        export_func: 导出方法，见 ExportWorker
+    返回: (bool, int, ExportJob) - (是否成功, 数量, 导出任务)；出错时异常在主线程重新抛出
+    """
+    dialog = QProgressDialog(title, "取消", 0, PROGRESS_STEPS, parent)
+    dialog.setWindowTitle(title)
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    worker = ExportWorker(export_func, args, kwargs, parent)
+
+    def on_progress(progress):
+        dialog.setValue(round(progress.fraction * PROGRESS_STEPS))
+        dialog.setLabelText(progress.describe())
+
+    def on_cancel():
+        dialog.setLabelText("正在取消...")
+        worker.job.cancel()
+
+    worker.progress_changed.connect(on_progress)
+    dialog.canceled.connect(on_cancel)
+
+    loop = QEventLoop()
+    worker.finished.connect(loop.quit)
+    worker.start()
+    dialog.show()
+    if not worker.isFinished():
+        loop.exec()
+    worker.wait()
+    dialog.close()
+
+    if worker.error is not None:
+        raise worker.error
+    success, count = worker.result
+    return success, count, worker.job
@@ -0,0 +1,201 @@
+"""
+图片列表模型
+基于QAbstractListModel的虚拟化图片列表：视图只为可见行请求图标，
+缩略图在线程池中生成，生成前显示占位图标，完成后通过信号送回界面线程
+"""
+
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QIcon, QImage, QPixmap, QColor
+from PIL import Image
+
+from common.error_handler import logger
+from common.qt_adapter import pil_to_qimage
+from utils.file_handler import FileHandler
+
+# 缩略图生成线程数（解码为主，过多线程只会争抢磁盘）
+THUMBNAIL_WORKERS = max(2, min(4, os.cpu_count() or 1))
+# 内存中保留的图标数量（按文件去重，超出后淘汰最久未使用的）
+MAX_CACHED_ICONS = 2000
+
+
+class _ThumbnailTask(QRunnable):
+    """在线程池中生成单个文件的缩略图"""
+
+    def __init__(self, loader, file_path, source_image, size):
+        super().__init__()
+        self.loader = loader
+        self.file_path = file_path
+        self.source_image = source_image
+        self.size = size
+
+    def run(self):
+        try:
+            if self.source_image is not None:
+                # 导入时已生成的缩略图，直接缩小即可
+                image = self.source_image.resize(self.size, Image.Resampling.LANCZOS)
+            else:
+                image = self.loader.file_handler.create_thumbnail_image(self.file_path, self.size)
+            qimage = pil_to_qimage(image)
+        except Exception as e:
+            logger.warning(f"生成列表缩略图失败 {os.path.basename(self.file_path)}: {e}")
+            qimage = QImage()
+        # 跨线程发射信号，由Qt排队到界面线程处理
+        self.loader.thumbnail_ready.emit(self.file_path, qimage)
+
+
+class ThumbnailLoader(QObject):
+    """异步缩略图加载器"""
+
+    thumbnail_ready = Signal(str, QImage)  # (文件路径, 缩略图)，失败时为空QImage
+
+    def __init__(self, size=(48, 48), workers=THUMBNAIL_WORKERS, parent=None):
+        super().__init__(parent)
+        self.size = tuple(size)
+        self.file_handler = FileHandler()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(workers)
+        self._priority = 0
+
+    def request(self, file_path, source_image=None):
+        """请求生成缩略图（后请求的先执行，优先处理当前滚动到的行）"""
+        self._priority += 1
+        self._pool.start(_ThumbnailTask(self, file_path, source_image, self.size), self._priority)
+
+    def cancel_pending(self):
+        """取消尚未开始的任务"""
+        self._pool.clear()
+
+    def wait_for_done(self, msecs=-1):
+        """等待所有任务完成"""
+        return self._pool.waitForDone(msecs)
+
+
+class ImageListModel(QAbstractListModel):
+    """图片列表模型，直接包装MainWindow.image_items列表"""
+
+    ImageItemRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, image_items, icon_size=48, parent=None):
+        super().__init__(parent)
+        self._items = image_items
+        self._icons = OrderedDict()  # 文件路径 -> QIcon
+        self._pending = set()
+        self._placeholder = self._create_placeholder_icon(icon_size)
+
+        self.loader = ThumbnailLoader((icon_size, icon_size), parent=self)
+        self.loader.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    @staticmethod
+    def _create_placeholder_icon(icon_size):
+        """创建缩略图生成前显示的占位图标"""
+        pixmap = QPixmap(icon_size, icon_size)
+        pixmap.fill(QColor(240, 240, 240))
+        return QIcon(pixmap)
+
+    # ---- Qt模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._items):
+            return None
+
+        image_item = self._items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{image_item.get_display_name()}\n({image_item.get_size_text()}) [×{image_item.quantity}]"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._icon_for(image_item)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return image_item.file_path
+        if role == self.ImageItemRole:
+            return image_item
+        return None
+
+    # ---- 缩略图 ----
+
+    def _icon_for(self, image_item):
+        """返回缓存的图标；尚未生成时提交任务并返回占位图标"""
+        key = image_item.file_path
+        icon = self._icons.get(key)
+        if icon is not None:
+            self._icons.move_to_end(key)
+            return icon
+
+        if key not in self._pending:
+            self._pending.add(key)
+            self.loader.request(key, getattr(image_item, 'thumbnail_image', None))
+        return self._placeholder
+
+    def _on_thumbnail_ready(self, file_path, qimage):
+        """缩略图生成完成（界面线程）"""
+        self._pending.discard(file_path)
+        if qimage.isNull():
+            # 保留占位图标，避免反复尝试解码损坏的文件
+            self._icons[file_path] = self._placeholder
+        else:
+            self._icons[file_path] = QIcon(QPixmap.fromImage(qimage))
+
+        while len(self._icons) > MAX_CACHED_ICONS:
+            self._icons.popitem(last=False)
+
+        # 同一文件可能对应多行；视图只会重绘可见区域，整体通知开销很小
+        if self._items:
+            self.dataChanged.emit(self.index(0), self.index(len(self._items) - 1),
+                                  [Qt.ItemDataRole.DecorationRole])
+
+    # ---- 数据修改（同时维护视图通知） ----
+
+    def set_items(self, image_items):
+        """替换整个列表（模型直接引用传入的列表）"""
+        self.loader.cancel_pending()
+        self.beginResetModel()
+        self._items = image_items
+        self._pending.clear()
+        self.endResetModel()
+
+    def append_items(self, image_items):
+        """在末尾批量添加图片项"""
+        if not image_items:
+            return
+        first = len(self._items)
+        self.beginInsertRows(QModelIndex(), first, first + len(image_items) - 1)
+        self._items.extend(image_items)
+        self.endInsertRows()
+
+    def insert_item(self, row, image_item):
+        """在指定位置插入图片项"""
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._items.insert(row, image_item)
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        """删除指定行，返回被删除的图片项"""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        image_item = self._items.pop(row)
+        self.endRemoveRows()
+        return image_item
+
+    def clear(self):
+        """清空列表"""
+        self.loader.cancel_pending()
+        self.beginResetModel()
+        self._items.clear()
+        self._icons.clear()
+        self._pending.clear()
+        self.endResetModel()
+
+    def refresh_row(self, row):
+        """刷新单行的文本显示"""
+        if 0 <= row < len(self._items):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def refresh_all(self):
+        """刷新所有行的文本显示（如同一文件的实例序号变化后）"""
+        if self._items:
+            self.dataChanged.emit(self.index(0), self.index(len(self._items) - 1),
+                                  [Qt.ItemDataRole.DisplayRole])
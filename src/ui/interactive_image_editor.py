@@ -15,6 +15,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.config import app_config
 from common.error_handler import logger, show_error_message, error_handler, resource_manager, ImageProcessingError
+from core.source_cache import shared_source_cache
 
 
 class InteractiveImageEditor(QLabel):
@@ -112,13 +113,8 @@ class InteractiveImageEditor(QLabel):
         with resource_manager(None) as _:
             self.image_path = image_path
 
-            # 使用资源管理器安全打开图片
-            with resource_manager(Image.open(image_path)) as img:
-                self.original_image = img.copy()
-
-            # 转换为RGB模式
-            if self.original_image.mode != 'RGB':
-                self.original_image = self.original_image.convert('RGB')
+            # 从共享源图片缓存取得原图（已转换为RGB并按EXIF方向摆正，与导出的图块一致；只读，不能修改）
+            self.original_image = shared_source_cache.get(image_path)
 
             # 创建预览分辨率的图片
             self._create_preview_image()
@@ -3,27 +3,27 @@
 实现BadgePatternTool的主界面布局
 """
 
+import os
 import traceback
 from io import BytesIO
 
 # PySide6 GUI组件导入
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QListWidget, QListWidgetItem,
-    QSlider, QRadioButton, QComboBox, QButtonGroup, QSpinBox,
+    QLabel, QPushButton, QListView,
+    QSlider, QRadioButton, QComboBox, QButtonGroup, QSpinBox, QCheckBox,
     QMessageBox, QStatusBar, QSplitter, QGroupBox,
     QSpacerItem, QSizePolicy
 )
-from PySide6.QtCore import Qt, QTimer, QSize, QPoint, QMarginsF, QRect
-from PySide6.QtGui import QAction, QIcon, QPixmap, QPainter, QPageLayout, QBitmap
-from PySide6.QtPrintSupport import QPrinter
+from PySide6.QtCore import Qt, QTimer, QSize, QPoint, QMarginsF, QRect, QSizeF
+from PySide6.QtGui import QAction, QIcon, QPixmap, QPainter, QPageLayout, QPageSize, QBitmap
 from PIL import Image
 
 # 导入公共模块
 from common.constants import (
     APP_TITLE, APP_VERSION, WINDOW_WIDTH, WINDOW_HEIGHT,
     DEFAULT_SPACING_MM, DEFAULT_MARGIN_MM, DEFAULT_LAYOUT, DEFAULT_EXPORT_FORMAT,
-    MAX_IMAGE_COUNT, COLUMN_WIDTHS
+    COLUMN_WIDTHS, PAGE_SIZES_MM, PAGE_DPI_OPTIONS, LAYOUT_MODE_NAMES
 )
 from common.path_utils import get_icon_path
 from common.error_handler import logger, show_error_message, show_info_message
@@ -34,11 +34,21 @@ from utils.file_handler import FileHandler, ImageItem
 from core.image_processor import ImageProcessor, CircleEditor
 from core.layout_engine import LayoutEngine
 from core.export_manager import ExportManager
+from core.project_model import BadgeProject
+from core.page_spec import PageSpec
+from core.overlay import CUT_FILE_WRITERS
+from core.color_management import COLOR_MODES, ColorSettings, load_profile
+from ui.export_worker import run_export_with_progress
 from ui.interactive_image_editor import InteractiveImageEditor
 from ui.multi_page_preview_widget import MultiPagePreviewWidget
+from ui.image_list_model import ImageListModel
 
 class MainWindow(QMainWindow):
     """主窗口类"""
+
+    # 经过色彩阶段的导出格式，以及其中支持CMYK输出的格式
+    COLOR_STAGE_FORMATS = ('png', 'jpg', 'tiff')
+    CMYK_FORMATS = ('jpg', 'tiff')
     
     def __init__(self):
         super().__init__()
@@ -55,9 +65,11 @@ class MainWindow(QMainWindow):
 
             # 初始化界面变量
             self.layout_mode = DEFAULT_LAYOUT
+            self.group_designs = False  # 相同图案集中排放
             self.spacing_value = DEFAULT_SPACING_MM
             self.margin_value = DEFAULT_MARGIN_MM
             self.export_format = DEFAULT_EXPORT_FORMAT.lower()
+            self.output_profile_path = None  # 输出（印刷机）ICC配置文件，None为不使用
             self.scale_value = 1.0
             self.offset_x_value = 0
             self.offset_y_value = 0
@@ -70,8 +82,10 @@ class MainWindow(QMainWindow):
             self._last_preview_hash = None
             self._preview_cache_valid = False
 
-            # 打印页面缓存（高分辨率版本）
-            self._cached_print_pages = []
+            # 排版规划（预览、打印和导出共用，设置和图片不变时复用）
+            self._job_plan = None
+            self._job_plan_hash = None
+            self._render_plan = None
 
             # 设置配置监听器
             app_config.add_listener(self.on_config_changed)
@@ -249,19 +263,22 @@ class MainWindow(QMainWindow):
         import_btn.clicked.connect(self.import_images)
         layout.addWidget(import_btn)
 
-        # 图片列表
-        self.image_listbox = QListWidget()
-        self.image_listbox.itemSelectionChanged.connect(self.on_image_select)
+        # 图片列表（模型/视图：只为可见行异步生成缩略图）
+        self.image_list_model = ImageListModel(self.image_items, icon_size=48, parent=self)
+        self.image_listbox = QListView()
+        self.image_listbox.setModel(self.image_list_model)
+        self.image_listbox.selectionModel().currentRowChanged.connect(lambda *_: self.on_image_select())
 
         # 设置列表显示模式和样式
-        self.image_listbox.setViewMode(QListWidget.ViewMode.ListMode)  # 列表模式，显示图标和文字
+        self.image_listbox.setViewMode(QListView.ViewMode.ListMode)  # 列表模式，显示图标和文字
         self.image_listbox.setIconSize(QSize(48, 48))  # 设置图标大小
         self.image_listbox.setSpacing(2)  # 设置项目间距
         self.image_listbox.setUniformItemSizes(True)  # 统一项目大小
+        self.image_listbox.setLayoutMode(QListView.LayoutMode.Batched)  # 大量条目分批布局
 
         # 启用拖拽功能
         self.image_listbox.setAcceptDrops(True)
-        self.image_listbox.setDragDropMode(QListWidget.DragDropMode.DropOnly)
+        self.image_listbox.setDragDropMode(QListView.DragDropMode.DropOnly)
 
         # 重写拖拽事件处理
         self.setup_drag_drop()
@@ -387,6 +404,36 @@ class MainWindow(QMainWindow):
         self.layout_button_group.addButton(compact_radio)
         layout_mode_layout.addWidget(compact_radio)
 
+        mixed_radio = QRadioButton("混合尺寸")
+        mixed_radio.setToolTip("每个徽章按自己的尺寸排版（在图片编辑区设置单独尺寸）")
+        mixed_radio.setChecked(DEFAULT_LAYOUT == "mixed")
+        mixed_radio.toggled.connect(lambda: self.set_layout_mode("mixed"))
+        self.layout_button_group.addButton(mixed_radio)
+        layout_mode_layout.addWidget(mixed_radio)
+
+        group_designs_check = QCheckBox("相同图案集中排放")
+        group_designs_check.setToolTip("同一图案尽量排在同一页的相邻位置，便于裁切后分拣（不增加页数）")
+        group_designs_check.toggled.connect(self.set_group_designs)
+        layout_mode_layout.addWidget(group_designs_check)
+
+        # 纸张和分辨率
+        page_group = QGroupBox("纸张设置")
+        layout.addWidget(page_group)
+
+        page_layout = QHBoxLayout(page_group)
+
+        self.page_size_combo = QComboBox()
+        self.page_size_combo.addItems(list(PAGE_SIZES_MM))
+        self.page_size_combo.setCurrentText(app_config.page_spec.name)
+        self.page_size_combo.currentTextChanged.connect(self.on_page_spec_change)
+        page_layout.addWidget(self.page_size_combo)
+
+        self.page_dpi_combo = QComboBox()
+        self.page_dpi_combo.addItems([f"{dpi}dpi" for dpi in PAGE_DPI_OPTIONS])
+        self.page_dpi_combo.setCurrentText(f"{app_config.page_spec.dpi}dpi")
+        self.page_dpi_combo.currentTextChanged.connect(self.on_page_spec_change)
+        page_layout.addWidget(self.page_dpi_combo)
+
         # 间距控制
         spacing_group = QGroupBox("间距设置")
         layout.addWidget(spacing_group)
@@ -482,13 +529,48 @@ class MainWindow(QMainWindow):
         # 导出格式
         export_layout.addWidget(QLabel("输出格式:"))
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["pdf", "png", "jpg"])
+        self.format_combo.addItems(["pdf", "png", "jpg", "tiff"])
         # 设置默认选择
         default_index = self.format_combo.findText(DEFAULT_EXPORT_FORMAT.lower())
         if default_index >= 0:
             self.format_combo.setCurrentIndex(default_index)
         export_layout.addWidget(self.format_combo)
 
+        # 色彩阶段：输出色彩模式和输出（印刷机）ICC配置文件，用于PNG/JPG/多页TIFF（CMYK只支持JPG和TIFF）；
+        # 未选择配置文件时CMYK为不经过色彩管理的简单转换
+        export_layout.addWidget(QLabel("色彩模式:"))
+        self.color_mode_combo = QComboBox()
+        self.color_mode_combo.addItems(list(COLOR_MODES))
+        export_layout.addWidget(self.color_mode_combo)
+
+        profile_layout = QHBoxLayout()
+        self.output_profile_label = QLabel("输出配置文件: 无")
+        profile_layout.addWidget(self.output_profile_label, 1)
+        self.output_profile_btn = QPushButton("选择ICC")
+        self.output_profile_btn.clicked.connect(self.choose_output_profile)
+        profile_layout.addWidget(self.output_profile_btn)
+        self.clear_profile_btn = QPushButton("清除")
+        self.clear_profile_btn.clicked.connect(lambda: self.set_output_profile(None))
+        profile_layout.addWidget(self.clear_profile_btn)
+        export_layout.addLayout(profile_layout)
+
+        # 色彩设置只对使用色彩阶段的格式可用
+        self.format_combo.currentTextChanged.connect(self.on_export_format_change)
+        self.on_export_format_change(self.format_combo.currentText())
+
+        # 切割机裁切文件（与导出文件一起逐页生成）
+        export_layout.addWidget(QLabel("裁切文件:"))
+        self.cut_file_combo = QComboBox()
+        self.cut_file_combo.addItem("不生成", None)
+        for file_format in CUT_FILE_WRITERS:
+            self.cut_file_combo.addItem(file_format, file_format)
+        export_layout.addWidget(self.cut_file_combo)
+
+        # 增量导出图片：只重新生成内容有变化的页面
+        self.incremental_export_check = QCheckBox("增量导出（跳过未变化的页面）")
+        self.incremental_export_check.setToolTip("PNG/JPG导出时在输出文件旁保存页面清单，再次导出只重新生成有变化的页面")
+        export_layout.addWidget(self.incremental_export_check)
+
         # 自动排版按钮
         auto_layout_btn = QPushButton("自动排版")
         auto_layout_btn.clicked.connect(self.auto_layout)
@@ -611,6 +693,21 @@ class MainWindow(QMainWindow):
 
         parent_layout.addLayout(quantity_input_layout)
 
+        # 单独尺寸（仅混合尺寸模式生效，0表示使用全局徽章尺寸）
+        item_size_layout = QHBoxLayout()
+        item_size_label = QLabel("单独尺寸:")
+        item_size_label.setStyleSheet("font-weight: bold; margin-top: 5px;")
+        item_size_layout.addWidget(item_size_label)
+
+        self.item_size_spinbox = QSpinBox()
+        self.item_size_spinbox.setRange(0, 200)
+        self.item_size_spinbox.setSuffix(" mm")
+        self.item_size_spinbox.setSpecialValueText("默认")
+        self.item_size_spinbox.setToolTip("混合尺寸模式下该图片的徽章直径（不含出血），默认使用全局徽章尺寸")
+        self.item_size_spinbox.valueChanged.connect(self.on_item_size_change)
+        item_size_layout.addWidget(self.item_size_spinbox)
+        parent_layout.addLayout(item_size_layout)
+
         # 操作按钮（直接添加，无框框）
         btn_layout = QHBoxLayout()
 
@@ -675,7 +772,8 @@ class MainWindow(QMainWindow):
                 for url in urls:
                     if url.isLocalFile():
                         file_path = url.toLocalFile()
-                        if self.file_handler.validate_image_file(file_path):
+                        # 只按扩展名筛选，内容验证由并行探测完成
+                        if os.path.splitext(file_path.lower())[1] in self.file_handler.supported_formats:
                             file_paths.append(file_path)
 
                 if file_paths:
@@ -697,39 +795,14 @@ class MainWindow(QMainWindow):
     def import_images(self):
         """导入图片"""
         try:
-            # 选择图片文件
-            file_paths = self.file_handler.select_images(self)
+            # 选择图片文件（并行验证，同时得到元数据和缩略图）
+            probes = self.file_handler.select_image_probes(self)
 
-            if not file_paths:
-                return
-
-            # 检查图片数量限制
-            total_count = len(self.image_items) + len(file_paths)
-            if total_count > MAX_IMAGE_COUNT:
-                QMessageBox.warning(
-                    self,
-                    "数量限制",
-                    f"最多只能导入{MAX_IMAGE_COUNT}张图片，当前已有{len(self.image_items)}张"
-                )
+            if not probes:
                 return
 
-            # 添加图片到列表
-            added_count = 0
-            for file_path in file_paths:
-                try:
-                    # 移除重复检查，允许同一文件多次导入
-                    # 创建图片项
-                    image_item = ImageItem(file_path)
-                    self.image_items.append(image_item)
-
-                    # 添加到界面列表（带缩略图）
-                    self.add_image_item_to_list(image_item)
-
-                    added_count += 1
-
-                except Exception as e:
-                    print(f"添加图片失败 {file_path}: {e}")
-                    continue
+            # 添加图片到列表（移除重复检查，允许同一文件多次导入）
+            added_count = self.add_probed_images(probes)
 
             # 清除预览缓存
             self._preview_cache_valid = False
@@ -740,7 +813,7 @@ class MainWindow(QMainWindow):
                 # 选中最后一个添加的项
                 if self.image_items:
                     last_index = len(self.image_items) - 1
-                    self.image_listbox.setCurrentRow(last_index)
+                    self._set_current_row(last_index)
 
                 # 自动处理新导入的图片（应用最佳参数）
                 self.auto_process_new_images()
@@ -768,7 +841,8 @@ class MainWindow(QMainWindow):
             for image_item in self.image_items:
                 if not image_item.is_processed:
                     # 计算最佳缩放
-                    optimal_scale = self.image_processor.get_optimal_scale(image_item.file_path)
+                    optimal_scale = self.image_processor.get_optimal_scale(
+                        image_item.file_path, (image_item.info or {}).get('size'))
 
                     # 应用最佳参数
                     image_item.scale = optimal_scale
@@ -791,32 +865,21 @@ class MainWindow(QMainWindow):
             if not file_paths:
                 return
 
-            # 检查图片数量限制
-            total_count = len(self.image_items) + len(file_paths)
-            if total_count > MAX_IMAGE_COUNT:
+            # 并行验证拖入的文件（单次打开同时提取元数据和缩略图）
+            probes = self.file_handler.probe_images(file_paths)
+            invalid_files = [os.path.basename(probe.file_path) for probe in probes if not probe.valid]
+            if invalid_files:
                 QMessageBox.warning(
                     self,
-                    "数量限制",
-                    f"最多只能导入{MAX_IMAGE_COUNT}张图片，当前已有{len(self.image_items)}张"
+                    "文件格式警告",
+                    "以下文件格式不支持或文件损坏：\n" + "\n".join(invalid_files)
                 )
+            probes = [probe for probe in probes if probe.valid]
+            if not probes:
                 return
 
             # 添加图片到列表
-            added_count = 0
-            for file_path in file_paths:
-                try:
-                    # 创建图片项
-                    image_item = ImageItem(file_path)
-                    self.image_items.append(image_item)
-
-                    # 添加到界面列表（带缩略图）
-                    self.add_image_item_to_list(image_item)
-
-                    added_count += 1
-
-                except Exception as e:
-                    print(f"添加图片失败 {file_path}: {e}")
-                    continue
+            added_count = self.add_probed_images(probes)
 
             # 更新状态
             if added_count > 0:
@@ -824,7 +887,7 @@ class MainWindow(QMainWindow):
                 # 选中最后一个添加的项
                 if self.image_items:
                     last_index = len(self.image_items) - 1
-                    self.image_listbox.setCurrentRow(last_index)
+                    self._set_current_row(last_index)
 
                 # 自动处理新导入的图片（应用最佳参数）
                 self.auto_process_new_images()
@@ -853,6 +916,47 @@ class MainWindow(QMainWindow):
         """导出PNG"""
         self.export_file_with_format('png')
 
+    def on_export_format_change(self, format_type):
+        """导出格式变化：色彩模式只对JPG/TIFF可用，输出配置文件对PNG/JPG/TIFF可用（矢量PDF不经过色彩阶段）"""
+        format_type = format_type.lower()
+        self.color_mode_combo.setEnabled(format_type in self.CMYK_FORMATS)
+        color_stage = format_type in self.COLOR_STAGE_FORMATS
+        self.output_profile_btn.setEnabled(color_stage)
+        self.clear_profile_btn.setEnabled(color_stage)
+
+    def choose_output_profile(self):
+        """选择输出（印刷机）ICC配置文件"""
+        from PySide6.QtWidgets import QFileDialog
+        profile_path, _ = QFileDialog.getOpenFileName(
+            self, "选择输出ICC配置文件", "", "ICC配置文件 (*.icc *.icm)"
+        )
+        if not profile_path:
+            return
+        try:
+            load_profile(profile_path)
+        except Exception as e:
+            QMessageBox.warning(self, "无效的配置文件", f"无法读取ICC配置文件：{str(e)}")
+            return
+        self.set_output_profile(profile_path)
+
+    def set_output_profile(self, profile_path):
+        """设置输出ICC配置文件，None为不使用（RGB输出sRGB）"""
+        self.output_profile_path = profile_path
+        name = os.path.basename(profile_path) if profile_path else "无"
+        self.output_profile_label.setText(f"输出配置文件: {name}")
+        self.output_profile_label.setToolTip(profile_path or "")
+
+    def get_export_color_settings(self, format_type):
+        """
+        导出格式对应的色彩阶段设置（ColorSettings）
+        PNG只输出RGB；矢量PDF不经过色彩阶段，返回None
+        """
+        format_type = format_type.lower()
+        if format_type not in self.COLOR_STAGE_FORMATS:
+            return None
+        color_mode = self.color_mode_combo.currentText() if format_type in self.CMYK_FORMATS else 'RGB'
+        return ColorSettings(color_mode, self.output_profile_path)
+
     def export_file(self):
         """导出文件"""
         format_type = self.format_combo.currentText()
@@ -861,11 +965,13 @@ class MainWindow(QMainWindow):
     def export_file_with_format(self, format_type):
         """
         导出文件（通用方法）
-        参数: format_type - 文件格式 ('pdf', 'png', 'jpg')
+        参数: format_type - 文件格式 ('pdf', 'png', 'jpg', 'tiff')
         """
         try:
-            # 获取展开后的图片列表
-            expanded_images = self.get_expanded_image_list()
+            # 获取展开后的图片列表和排版规划（与预览相同时直接复用）
+            project = self.build_project()
+            expanded_images = self.get_expanded_image_list(project)
+            job_plan = self.get_job_plan(project)
 
             # 验证导出设置
             is_valid, error_msg = self.export_manager.validate_export_settings(expanded_images, "temp")
@@ -887,6 +993,9 @@ class MainWindow(QMainWindow):
             elif format_type.lower() == 'png':
                 file_filter = "PNG文件 (*.png)"
                 default_ext = ".png"
+            elif format_type.lower() == 'tiff':
+                file_filter = "多页TIFF文件 (*.tiff)"
+                default_ext = ".tiff"
             else:  # jpg
                 file_filter = "JPEG文件 (*.jpg)"
                 default_ext = ".jpg"
@@ -909,30 +1018,59 @@ class MainWindow(QMainWindow):
             # 显示进度提示
             self.status_bar.showMessage(f"正在导出{format_type.upper()}文件...")
 
-            # 执行导出
+            # 在工作线程中执行导出，进度对话框显示进度和剩余时间，可随时取消
+            title = f"正在导出{format_type.upper()}文件"
+            color = self.get_export_color_settings(format_type)
             if format_type.lower() == 'pdf':
-                success, count = self.export_manager.export_to_pdf(
-                    expanded_images, output_path, layout_type, spacing_mm, margin_mm
+                success, count, job = run_export_with_progress(
+                    self, title, self.export_manager.export_to_pdf,
+                    expanded_images, output_path, layout_type, spacing_mm, margin_mm, plan=job_plan
+                )
+            elif format_type.lower() == 'tiff':
+                # 所有页面依次写入同一个多页TIFF（LZW压缩）
+                success, count, job = run_export_with_progress(
+                    self, title, self.export_manager.export_raster_document,
+                    expanded_images, output_path, 'tiff', layout_type, spacing_mm, margin_mm, plan=job_plan,
+                    color=color
                 )
             else:
                 # 使用kwargs方式传递参数给export_to_image
-                success, count = self.export_manager.export_to_image(
+                success, count, job = run_export_with_progress(
+                    self, title, self.export_manager.export_to_image,
                     expanded_images, output_path,
                     format_type=format_type.upper(),
                     layout_type=layout_type,
                     spacing_mm=spacing_mm,
-                    margin_mm=margin_mm
+                    margin_mm=margin_mm,
+                    plan=job_plan,
+                    incremental=self.incremental_export_check.isChecked(),
+                    color=color
                 )
 
+            if job.cancelled:
+                self.status_bar.showMessage(f"{format_type.upper()}导出已取消（已处理 {count} 个徽章）")
+                return
+
             if success:
+                result_note = ""
+                report = self.export_manager.last_incremental_report
+                if format_type.lower() != 'pdf' and report:
+                    result_note += f"\n增量导出：跳过未变化的页面{report['skipped']}页，重新生成{report['written']}页"
+
+                # 切割机裁切文件与导出文件使用同一份排版规划
+                cut_file = self.cut_file_combo.currentData()
+                if cut_file:
+                    cut_paths = self.export_manager.export_cut_files(job_plan, output_path, cut_file)
+                    result_note += f"\n裁切文件：{len(cut_paths)}个（{os.path.basename(cut_paths[0])}…）"
+
                 self.status_bar.showMessage(f"{format_type.upper()}导出成功")
                 QMessageBox.information(
                     self,
                     "导出成功",
                     f"成功导出{count}张图片到{format_type.upper()}文件！\n\n"
                     f"文件路径：{output_path}\n"
-                    f"布局模式：{'网格排列' if layout_type == 'grid' else '紧密排列'}\n"
-                    f"图片数量：{count}张"
+                    f"布局模式：{LAYOUT_MODE_NAMES.get(layout_type, layout_type)}\n"
+                    f"图片数量：{count}张{result_note}"
                 )
 
                 # 询问是否打开文件夹
@@ -973,15 +1111,14 @@ class MainWindow(QMainWindow):
                 QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                self.image_items.clear()
-                self.image_listbox.clear()
+                self.image_list_model.clear()
                 self.current_selection = None
                 self.current_editor = None
                 self.status_bar.showMessage("已清空图片列表")
         
     def copy_selected(self):
         """复制选中项"""
-        current_row = self.image_listbox.currentRow()
+        current_row = self._current_row()
         if current_row >= 0 and current_row < len(self.image_items):
             try:
                 # 获取选中的图片项
@@ -992,13 +1129,13 @@ class MainWindow(QMainWindow):
 
                 # 插入到选中项的下一位
                 insert_index = current_row + 1
-                self.image_items.insert(insert_index, copied_item)
+                self.image_list_model.insert_item(insert_index, copied_item)
 
-                # 更新界面列表显示
-                self.update_image_list_display()
+                # 同一文件的实例序号可能变化，刷新所有行的文本
+                self.image_list_model.refresh_all()
 
                 # 选中新复制的项
-                self.image_listbox.setCurrentRow(insert_index)
+                self._set_current_row(insert_index)
 
                 # 更新预览
                 self.update_layout_preview()
@@ -1012,16 +1149,16 @@ class MainWindow(QMainWindow):
 
     def delete_selected(self):
         """删除选中项"""
-        current_row = self.image_listbox.currentRow()
+        current_row = self._current_row()
         if current_row >= 0 and current_row < len(self.image_items):
-            # 删除数据
-            deleted_item = self.image_items.pop(current_row)
-            # 删除界面项
-            self.image_listbox.takeItem(current_row)
-            # 清除选择
+            # 清除选择（删除行时视图会移动当前行，先断开再恢复）
+            self.image_listbox.selectionModel().clearCurrentIndex()
             self.current_selection = None
             self.current_editor = None
 
+            # 删除数据和界面项
+            deleted_item = self.image_list_model.remove_row(current_row)
+
             # 清除预览缓存
             self._preview_cache_valid = False
 
@@ -1030,15 +1167,25 @@ class MainWindow(QMainWindow):
             # 如果还有项目，选中相邻的项
             if self.image_items:
                 new_index = min(current_row, len(self.image_items) - 1)
-                self.image_listbox.setCurrentRow(new_index)
+                self._set_current_row(new_index)
 
             # 更新预览
             self.update_layout_preview()
         
 
+    def _current_row(self):
+        """当前选中行，未选中时返回-1"""
+        return self.image_listbox.currentIndex().row()
+
+    def _set_current_row(self, row):
+        """选中指定行并滚动到可见位置"""
+        index = self.image_list_model.index(row)
+        self.image_listbox.setCurrentIndex(index)
+        self.image_listbox.scrollTo(index)
+
     def on_image_select(self):
         """图片选择事件"""
-        current_row = self.image_listbox.currentRow()
+        current_row = self._current_row()
         if current_row >= 0 and current_row < len(self.image_items):
             self.current_selection = self.image_items[current_row]
             item_info = f"已选择: {self.current_selection.get_display_name()} " \
@@ -1047,6 +1194,9 @@ class MainWindow(QMainWindow):
 
             # 更新数量控制
             self.quantity_spinbox.setValue(self.current_selection.quantity)
+            self.item_size_spinbox.blockSignals(True)
+            self.item_size_spinbox.setValue(int(self.current_selection.badge_size_mm or 0))
+            self.item_size_spinbox.blockSignals(False)
 
             # 加载图片编辑器
             self.load_image_editor()
@@ -1054,11 +1204,23 @@ class MainWindow(QMainWindow):
             self.current_selection = None
             self.current_editor = None
             self.quantity_spinbox.setValue(1)
-            
+            self.item_size_spinbox.blockSignals(True)
+            self.item_size_spinbox.setValue(0)
+            self.item_size_spinbox.blockSignals(False)
+
     def set_layout_mode(self, mode):
         """设置布局模式"""
         self.layout_mode = mode
-        self.status_bar.showMessage(f"布局模式: {'网格排列' if mode == 'grid' else '紧密排列'}")
+        self.status_bar.showMessage(f"布局模式: {LAYOUT_MODE_NAMES.get(mode, mode)}")
+
+        # 更新布局预览
+        self.layout_preview_timer.stop()
+        self.layout_preview_timer.start(self.layout_debounce_delay)
+
+    def set_group_designs(self, enabled):
+        """设置是否将相同图案集中排放"""
+        self.group_designs = enabled
+        self.status_bar.showMessage("相同图案集中排放" if enabled else "按图片顺序排放")
 
         # 更新布局预览
         self.layout_preview_timer.stop()
@@ -1258,6 +1420,12 @@ class MainWindow(QMainWindow):
         self.layout_preview_timer.stop()
         self.layout_preview_timer.start(self.debounce_delay)
 
+    def on_page_spec_change(self, _text=None):
+        """纸张或分辨率改变事件（通过配置监听器刷新预览）"""
+        dpi = int(self.page_dpi_combo.currentText().replace('dpi', ''))
+        app_config.page_spec = PageSpec.preset(self.page_size_combo.currentText(), dpi)
+        self.status_bar.showMessage(f"页面规格: {app_config.page_spec.label}")
+
     def on_preview_scale_changed(self, scale):
         """处理多页面预览组件的缩放变化"""
         # 更新缩放倍率显示
@@ -1279,23 +1447,57 @@ class MainWindow(QMainWindow):
         self.layout_preview_timer.stop()
         self.layout_preview_timer.start(self.debounce_delay)
 
-    def get_expanded_image_list(self):
-        """获取展开后的图片列表（根据数量复制）"""
-        expanded_list = []
-        for image_item in self.image_items:
-            for _ in range(image_item.quantity):
-                expanded_list.append(image_item)
-        return expanded_list
+    def build_project(self):
+        """将当前图片列表整理为列式项目数据（排版、预览、导出按索引区间读取）"""
+        return BadgeProject.from_items(self.image_items)
+
+    def get_expanded_image_list(self, project=None):
+        """获取展开后的图片序列（根据数量展开的只读视图，切片时才构建对应区间）"""
+        if project is None:
+            project = self.build_project()
+        return project.expanded()
 
-    def _calculate_preview_hash(self):
+    def get_job_plan(self, project=None):
+        """
+        当前图片和设置下的排版规划（JobPlan）
+        预览、打印和导出共用同一份规划；图片和排版设置不变时直接复用
+        """
+        if project is None:
+            project = self.build_project()
+        plan_hash = self._calculate_preview_hash(project)
+        if self._job_plan is None or plan_hash != self._job_plan_hash:
+            self._job_plan = self.layout_engine.plan_job(
+                project.expanded(), self.layout_mode, self.spacing_value, self.margin_value,
+                group_designs=self.group_designs
+            )
+            self._job_plan_hash = plan_hash
+        return self._job_plan
+
+    def get_render_plan(self, project=None):
+        """
+        当前排版规划对应的渲染计划（RenderPlan）
+        预览、打印共用同一份渲染计划和图块缓存，预览过的徽章打印和导出时不再重新裁剪
+        """
+        if project is None:
+            project = self.build_project()
+        job_plan = self.get_job_plan(project)
+        if self._render_plan is None or self._render_plan.job_plan is not job_plan:
+            self._render_plan = self.layout_engine.build_render_plan(job_plan, project.expanded())
+        return self._render_plan
+
+    def _calculate_preview_hash(self, project=None):
         """计算当前预览状态的哈希值，用于判断是否需要重新生成预览"""
         import hashlib
 
+        if project is None:
+            project = self.build_project()
+
         # 收集影响预览的所有参数
         hash_data = []
 
         # 布局参数
         hash_data.append(f"layout:{self.layout_mode}")
+        hash_data.append(f"group:{self.group_designs}")
         hash_data.append(f"spacing:{self.spacing_value}")
         hash_data.append(f"margin:{self.margin_value}")
         hash_data.append(f"preview_scale:{self.preview_scale_value}")
@@ -1305,19 +1507,23 @@ class MainWindow(QMainWindow):
         hash_data.append(f"bleed_size:{app_config.bleed_size_mm}")
         hash_data.append(f"badge_diameter:{app_config.badge_diameter_mm}")
 
-        # 图片参数
-        for item in self.image_items:
-            hash_data.append(f"img:{item.file_path}:{item.quantity}:{item.scale}:{item.offset_x}:{item.offset_y}")
+        # 页面规格（纸张尺寸和分辨率）
+        hash_data.append(f"page:{app_config.page_spec}")
+
+        # 图片参数（列式数据直接按字节哈希）
+        hash_data.append(f"images:{project.fingerprint()}")
 
         # 计算哈希
         hash_string = "|".join(hash_data)
         return hashlib.md5(hash_string.encode()).hexdigest()
 
     def update_layout_preview(self):
-        """更新A4排版预览（支持多页面）"""
+        """更新A4排版预览（支持多页面，只渲染滚动到可见区域的页面）"""
         try:
+            project = self.build_project()
+
             # 计算当前状态哈希
-            current_hash = self._calculate_preview_hash()
+            current_hash = self._calculate_preview_hash(project)
 
             # 检查是否需要重新生成预览
             if self._preview_cache_valid and current_hash == self._last_preview_hash:
@@ -1326,36 +1532,33 @@ class MainWindow(QMainWindow):
 
             # 获取当前设置
             layout_type = self.layout_mode
-            spacing_mm = self.spacing_value
-            margin_mm = self.margin_value
+            preview_scale = self.preview_scale_value
 
-            # 获取展开后的图片列表
-            expanded_images = self.get_expanded_image_list()
+            # 获取展开后的图片序列
+            expanded_images = self.get_expanded_image_list(project)
 
-            # 计算多页面布局
-            multi_layout = self.layout_engine.calculate_multi_page_layout(
-                len(expanded_images), layout_type, spacing_mm, margin_mm
-            )
+            # 排版规划和渲染计划
+            render_plan = self.get_render_plan(project)
+            job_plan = render_plan.job_plan
+            total_pages = render_plan.total_pages
+            max_per_page = job_plan.max_per_page
+            utilization = job_plan.utilization
 
-            # 创建多页面预览
-            page_previews = self.layout_engine.create_multi_page_preview(
-                expanded_images, layout_type, spacing_mm, margin_mm,
-                preview_scale=self.preview_scale_value
-            )
-
-            # 同时生成高分辨率打印版本（用于打印）
-            self._cached_print_pages = self._generate_high_res_print_pages(
-                expanded_images, layout_type, spacing_mm, margin_mm
-            )
+            def render_page(page_index):
+                """按页码渲染预览（图块来自共享图块缓存）"""
+                try:
+                    page_img = self.layout_engine.render_page_image(render_plan.pages[page_index], preview_scale)
+                except Exception as e:
+                    logger.error(f"渲染第{page_index + 1}页预览失败: {e}", exc_info=True)
+                    return None
+                return self._pil_to_qpixmap(page_img)
 
             # 更新多页面预览显示
-            self.multi_page_preview.set_page_pixmaps(page_previews)
+            self.multi_page_preview.set_page_provider(total_pages, render_page)
 
             # 更新布局信息
             total_images = len(expanded_images)
             unique_images = len(self.image_items)
-            total_pages = multi_layout['total_pages']
-            max_per_page = multi_layout['max_per_page']
 
             if not self.image_items:
                 # 没有图片时显示布局容量信息
@@ -1367,7 +1570,10 @@ class MainWindow(QMainWindow):
                     info_text = f"可放置: {max_per_page}个 | 总数: {total_images}个 | 种类: {unique_images}个"
                 else:
                     info_text = f"共{total_pages}页 | 每页{max_per_page}个 | 总数: {total_images}个 | 种类: {unique_images}个"
-                self.status_bar.showMessage(f"排版预览已更新 - {layout_type}模式，共{total_pages}页，{total_images}个图片")
+                if layout_type == 'mixed':
+                    info_text += f" | 利用率: {utilization:.1%}"
+                self.status_bar.showMessage(f"排版预览已更新 - {LAYOUT_MODE_NAMES.get(layout_type, layout_type)}，"
+                                            f"共{total_pages}页，{total_images}个图片，面积利用率{utilization:.1%}")
 
             self.layout_info_label.setText(info_text)
 
@@ -1379,33 +1585,6 @@ class MainWindow(QMainWindow):
             print(f"更新排版预览失败: {e}")
             self.show_layout_hint()
             self._preview_cache_valid = False
-            self._cached_print_pages = []  # 清空打印缓存
-
-    def _generate_high_res_print_pages(self, expanded_images, layout_type, spacing_mm, margin_mm):
-        """
-        生成高分辨率打印页面（用于实际打印）
-        使用与预览相同的布局引擎，确保一致性
-        """
-        try:
-            if not expanded_images:
-                return []
-
-            print("生成高分辨率打印页面...")
-
-            # 使用layout_engine的多页面预览功能，但设置为1.0比例（全分辨率）
-            # 这确保了与预览使用完全相同的布局逻辑和图像处理流程
-            print_pages = self.layout_engine.create_multi_page_preview(
-                expanded_images, layout_type, spacing_mm, margin_mm,
-                preview_scale=1.0  # 使用全分辨率，确保与预览逻辑一致
-            )
-
-            print(f"高分辨率打印页面生成完成，共{len(print_pages)}页")
-            return print_pages
-
-        except Exception as e:
-            print(f"生成高分辨率打印页面失败: {e}")
-            traceback.print_exc()
-            return []
 
     def auto_layout(self):
         """自动排版（为所有图片应用最佳参数）"""
@@ -1418,7 +1597,8 @@ class MainWindow(QMainWindow):
             for image_item in self.image_items:
                 if not image_item.is_processed:
                     # 计算最佳缩放
-                    optimal_scale = self.image_processor.get_optimal_scale(image_item.file_path)
+                    optimal_scale = self.image_processor.get_optimal_scale(
+                        image_item.file_path, (image_item.info or {}).get('size'))
 
                     # 应用最佳参数
                     image_item.scale = optimal_scale
@@ -1454,6 +1634,16 @@ class MainWindow(QMainWindow):
             self.layout_preview_timer.stop()
             self.layout_preview_timer.start(self.quantity_debounce_delay)
 
+    def on_item_size_change(self, value):
+        """单独尺寸改变事件（0表示使用全局设置，仅混合尺寸模式影响排版）"""
+        if self.current_selection:
+            self.current_selection.badge_size_mm = float(value) if value else None
+            self.status_bar.showMessage(f"已设置单独尺寸: {value}mm" if value else "已恢复为全局徽章尺寸")
+
+            if self.layout_mode == 'mixed':
+                self.layout_preview_timer.stop()
+                self.layout_preview_timer.start(self.quantity_debounce_delay)
+
     def set_quantity(self, quantity):
         """设置数量"""
         if self.current_selection:
@@ -1465,44 +1655,24 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "提示", "请先选择一张图片")
 
-    def add_image_item_to_list(self, image_item):
-        """添加图片项到列表（带缩略图）"""
-        try:
-            # 创建缩略图
-            thumbnail = image_item.create_thumbnail((48, 48))
-
-            # 创建显示文本
-            display_text = f"{image_item.get_display_name()}\n({image_item.get_size_text()}) [×{image_item.quantity}]"
-
-            # 创建列表项
-            list_item = QListWidgetItem()
-            list_item.setText(display_text)
-
-            # 设置图标（缩略图）
-            if thumbnail:
-                list_item.setIcon(QIcon(thumbnail))
-
-            # 添加到列表
-            self.image_listbox.addItem(list_item)
-
-        except Exception as e:
-            print(f"添加图片项到列表失败: {e}")
-            # 降级处理：只添加文本
-            display_text = f"{image_item.get_display_name()} ({image_item.get_size_text()}) [×{image_item.quantity}]"
-            self.image_listbox.addItem(display_text)
+    def add_probed_images(self, probes):
+        """
+        根据探测结果批量创建图片项并添加到列表（缩略图由列表模型按需异步生成）
+        返回: int - 添加的数量
+        """
+        new_items = []
+        for probe in probes:
+            try:
+                # 复用探测结果，不再重新打开文件
+                new_items.append(ImageItem(probe.file_path, probe=probe))
+            except Exception as e:
+                print(f"添加图片失败 {probe.file_path}: {e}")
+        self.image_list_model.append_items(new_items)
+        return len(new_items)
 
     def update_image_list_display(self):
         """更新图片列表显示"""
-        current_row = self.image_listbox.currentRow()
-
-        # 重新构建列表显示
-        self.image_listbox.clear()
-        for image_item in self.image_items:
-            self.add_image_item_to_list(image_item)
-
-        # 恢复选择
-        if current_row >= 0 and current_row < len(self.image_items):
-            self.image_listbox.setCurrentRow(current_row)
+        self.image_list_model.refresh_all()
 
     def update_edit_preview(self):
         """更新编辑预览（兼容性方法）"""
@@ -1533,15 +1703,10 @@ class MainWindow(QMainWindow):
     def update_current_item_display(self):
         """更新当前选中项的显示（轻量级操作）"""
         try:
-            current_row = self.image_listbox.currentRow()
+            current_row = self._current_row()
             if current_row >= 0 and current_row < len(self.image_items):
-                image_item = self.image_items[current_row]
-
                 # 更新当前项的文本
-                display_text = f"{image_item.get_display_name()}\n({image_item.get_size_text()}) [×{image_item.quantity}]"
-                current_item = self.image_listbox.item(current_row)
-                if current_item:
-                    current_item.setText(display_text)
+                self.image_list_model.refresh_row(current_row)
         except Exception as e:
             print(f"更新当前项显示失败: {e}")
 
@@ -1664,6 +1829,12 @@ class MainWindow(QMainWindow):
             self.layout_preview_timer.stop()
             self.layout_preview_timer.start(self.layout_debounce_delay)
 
+        elif key == 'page_spec':
+            # 页面比例变化时调整预览页面框，布局按新规格重新计算（缓存键包含页面规格）
+            self.multi_page_preview.set_page_spec(new_value)
+            self.layout_preview_timer.stop()
+            self.layout_preview_timer.start(self.layout_debounce_delay)
+
     def clear_all_caches(self):
         """清理所有缓存，释放内存"""
         try:
@@ -1682,7 +1853,8 @@ class MainWindow(QMainWindow):
             # 清理A4预览缓存
             self._last_preview_hash = None
             self._preview_cache_valid = False
-            self._cached_print_pages.clear()
+            self._job_plan = None
+            self._render_plan = None
 
             logger.info("所有缓存已清理")
 
@@ -1742,6 +1914,9 @@ class MainWindow(QMainWindow):
     def _execute_custom_print(self, settings, expanded_images):
         """执行简化的打印"""
         try:
+            # 打印支持模块只在实际打印时加载，缩短启动时间
+            from PySide6.QtPrintSupport import QPrinter
+
             # 获取选中的打印机
             printer_info = settings['printer']
             if not printer_info:
@@ -1795,10 +1970,13 @@ class MainWindow(QMainWindow):
             # 启用全页模式，使用整个纸张区域
             printer.setFullPage(True)
 
-            # 设置高分辨率
-            printer.setResolution(300)
+            # 纸张尺寸和分辨率与当前页面规格一致
+            spec = self.layout_engine.page_spec
+            printer.setPageSize(QPageSize(QSizeF(spec.width_mm, spec.height_mm),
+                                          QPageSize.Unit.Millimeter, spec.name))
+            printer.setResolution(spec.dpi)
 
-            print("打印机配置完成：零页边距、全页模式、300DPI")
+            print(f"打印机配置完成：零页边距、全页模式、{spec.label}")
 
         except Exception as e:
             print(f"配置打印机失败: {e}")
@@ -1807,6 +1985,8 @@ class MainWindow(QMainWindow):
     def _simple_print_to_printer(self, printer, expanded_images):
         """简单的打印实现 - 使用与导出功能完全相同的逻辑"""
         try:
+            from PySide6.QtPrintSupport import QPrinter
+
             print("开始打印，使用与导出相同的逻辑...")
 
             # 创建QPainter
@@ -1815,23 +1995,18 @@ class MainWindow(QMainWindow):
                 raise Exception("无法初始化打印机")
 
             try:
-                # 计算多页面布局（与导出功能完全相同）
-                multi_layout = self.layout_engine.calculate_multi_page_layout(
-                    len(expanded_images), self.layout_mode, self.spacing_value, self.margin_value
-                )
+                # 渲染计划（与预览、导出共用同一份规划和图块缓存）
+                render_plan = self.get_render_plan()
+                total_pages = render_plan.total_pages
 
-                print(f"打印{multi_layout['total_pages']}页内容...")
-                image_index = 0
+                print(f"打印{total_pages}页内容...")
 
                 # 为每个页面打印
-                for page_info in multi_layout['pages']:
-                    print(f"打印第{page_info['page_index'] + 1}页...")
+                for page in render_plan.pages:
+                    print(f"打印第{page.page_index + 1}页...")
 
-                    # 获取当前页面的图片
-                    page_images = expanded_images[image_index:image_index + page_info['images_on_page']]
-
-                    # 使用与导出功能完全相同的方法生成页面图片
-                    page_pixmap = self._generate_print_page_like_export(page_images, page_info)
+                    # 使用与导出功能完全相同的合成器生成页面图片
+                    page_pixmap = self._generate_print_page_like_export(page)
 
                     if page_pixmap and not page_pixmap.isNull():
                         # 获取打印区域
@@ -1845,19 +2020,16 @@ class MainWindow(QMainWindow):
                             int(page_rect_f.height()),
                             page_pixmap
                         )
-                        print(f"第{page_info['page_index'] + 1}页已发送到打印机")
+                        print(f"第{page.page_index + 1}页已发送到打印机")
                     else:
-                        print(f"第{page_info['page_index'] + 1}页生成失败，跳过")
-
-                    # 更新图片索引
-                    image_index += page_info['images_on_page']
+                        print(f"第{page.page_index + 1}页生成失败，跳过")
 
                     # 如果不是最后一页，添加新页面
-                    if page_info['page_index'] < multi_layout['total_pages'] - 1:
+                    if page.page_index < total_pages - 1:
                         if not printer.newPage():
                             raise Exception("无法创建新页面")
 
-                print(f"打印完成，共{multi_layout['total_pages']}页")
+                print(f"打印完成，共{total_pages}页")
 
             finally:
                 painter.end()
@@ -1866,49 +2038,10 @@ class MainWindow(QMainWindow):
             print(f"打印失败: {e}")
             raise
 
-    def _generate_print_page_like_export(self, page_images, page_info):
-        """使用与导出功能完全相同的逻辑生成页面图片"""
+    def _generate_print_page_like_export(self, page):
+        """使用与导出功能完全相同的合成器生成页面图片"""
         try:
-            from core.image_processor import ImageProcessor
-
-            # 创建图片处理器
-            image_processor = ImageProcessor()
-
-            # 创建A4画布（与导出功能完全相同）
-            canvas_img = Image.new('RGB',
-                                 (self.layout_engine.a4_width_px, self.layout_engine.a4_height_px),
-                                 (255, 255, 255))
-
-            # 处理当前页面的每个图片（与导出功能完全相同）
-            positions = page_info['positions']
-            for i, image_item in enumerate(page_images):
-                if i >= len(positions):
-                    break
-
-                try:
-                    # 获取圆形图片（与导出功能完全相同）
-                    circle_img = image_processor.create_circular_crop(
-                        image_item.file_path,
-                        image_item.scale,
-                        image_item.offset_x,
-                        image_item.offset_y,
-                        image_item.rotation
-                    )
-
-                    # 计算粘贴位置（与导出功能完全相同）
-                    center_x, center_y = positions[i]
-                    paste_x = center_x - self.layout_engine.badge_radius_px
-                    paste_y = center_y - self.layout_engine.badge_radius_px
-
-                    # 粘贴到画布（与导出功能完全相同）
-                    if circle_img.mode == 'RGBA':
-                        canvas_img.paste(circle_img, (paste_x, paste_y), circle_img)
-                    else:
-                        canvas_img.paste(circle_img, (paste_x, paste_y))
-
-                except Exception as e:
-                    print(f"处理图片失败 {image_item.filename}: {e}")
-                    continue
+            canvas_img, _ = self.layout_engine.compositor.compose(page)
 
             # 转换PIL图像为QPixmap
             return self._pil_to_qpixmap(canvas_img)
@@ -1,13 +1,21 @@
 """
-多页面A4预览组件
-在同一个预览窗口中显示多个A4画布，保持正确的A4比例
+多页面预览组件
+在同一个预览窗口中显示多个页面画布，保持当前页面规格的比例（默认A4）
 """
 
+from collections import OrderedDict
+
 from PySide6.QtWidgets import QWidget
-from PySide6.QtCore import Qt, QPoint, Signal, QRect, QSize
+from PySide6.QtCore import Qt, QPoint, Signal, QRect, QSize, QTimer
 from PySide6.QtGui import QPainter, QPixmap, QPen, QColor
 
 
+# 按需渲染模式下保留的已渲染页面数量（超出后释放最久未绘制且不可见的页面）
+MAX_RENDERED_PAGES = 24
+# 每次重绘最多新渲染的页面数，其余页面在后续重绘中逐步生成，保持界面响应
+PAGES_RENDERED_PER_PAINT = 2
+
+
 class MultiPagePreviewWidget(QWidget):
     """多页面A4预览组件 - 在同一个画布上绘制多个A4页面"""
 
@@ -17,14 +25,17 @@ class MultiPagePreviewWidget(QWidget):
     def __init__(self):
         super().__init__()
 
-        # A4基础尺寸（保持正确的A4比例）
-        self.a4_base_width = 210   # A4宽度（毫米）
-        self.a4_base_height = 297  # A4高度（毫米）
-        self.a4_ratio = self.a4_base_height / self.a4_base_width  # A4比例 ≈ 1.414
+        # 页面基础尺寸（默认A4，纸张规格变化时由 set_page_spec 更新）
+        self.a4_base_width = 210   # 页面宽度（毫米）
+        self.a4_base_height = 297  # 页面高度（毫米）
+        self.a4_ratio = self.a4_base_height / self.a4_base_width  # 页面高宽比（A4 ≈ 1.414）
 
         # 页面数据
         self.page_pixmaps = []  # 页面内容列表
         self.page_count = 0
+        self.page_provider = None  # 按需渲染回调 page_provider(page_index) -> QPixmap
+        self._rendered_pages = OrderedDict()  # 按需渲染模式下已渲染的页面（LRU）
+        self._render_budget = 0  # 本次重绘剩余的渲染配额
 
         # 显示参数
         self.current_scale = 1.0  # 当前缩放比例
@@ -45,6 +56,8 @@ class MultiPagePreviewWidget(QWidget):
 
     def set_page_pixmaps(self, pixmaps):
         """设置所有页面的内容"""
+        self.page_provider = None
+        self._rendered_pages.clear()
         self.page_pixmaps = pixmaps if pixmaps else []
         self.page_count = len(self.page_pixmaps)
 
@@ -53,6 +66,61 @@ class MultiPagePreviewWidget(QWidget):
 
         self.update()
 
+    def set_page_spec(self, page_spec):
+        """按页面规格（PageSpec）更新页面比例"""
+        self.a4_base_width, self.a4_base_height = page_spec.size_mm
+        self.a4_ratio = page_spec.aspect_ratio
+        self.update()
+
+    def set_page_provider(self, page_count, provider):
+        """
+        设置按需渲染的页面：只有绘制到可见区域的页面才会调用provider生成，
+        页数很多时只保留最近绘制的MAX_RENDERED_PAGES页
+        参数:
+            page_count: 总页数
+            provider: 回调 provider(page_index) -> QPixmap
+        """
+        self.page_provider = provider
+        self._rendered_pages.clear()
+        self.page_pixmaps = [None] * page_count
+        self.page_count = page_count
+
+        # 重置偏移，确保页面居中显示
+        self.canvas_offset = QPoint(0, 0)
+
+        self.update()
+
+    def _get_page_pixmap(self, page_index):
+        """获取页面内容，按需渲染模式下首次绘制时生成（受本次重绘的配额限制）"""
+        if page_index >= len(self.page_pixmaps):
+            return None
+
+        pixmap = self.page_pixmaps[page_index]
+        if self.page_provider is None:
+            return pixmap
+
+        if pixmap is None:
+            if self._render_budget <= 0:
+                return None
+            self._render_budget -= 1
+            pixmap = self.page_provider(page_index)
+            if pixmap is None:
+                pixmap = QPixmap()  # 渲染失败时记为空页面，避免反复重试
+            self.page_pixmaps[page_index] = pixmap
+        self._rendered_pages[page_index] = True
+        self._rendered_pages.move_to_end(page_index)
+        return pixmap
+
+    def _evict_rendered_pages(self, visible_pages):
+        """释放最久未绘制的页面，当前可见的页面始终保留"""
+        limit = max(MAX_RENDERED_PAGES, len(visible_pages))
+        for page_index in list(self._rendered_pages):
+            if len(self._rendered_pages) <= limit:
+                break
+            if page_index not in visible_pages:
+                del self._rendered_pages[page_index]
+                self.page_pixmaps[page_index] = None
+
     def set_page_count(self, count):
         """设置页面数量（用于兼容性）"""
         if count != self.page_count:
@@ -184,9 +252,20 @@ class MultiPagePreviewWidget(QWidget):
         # 绘制背景
         painter.fillRect(self.rect(), QColor(64, 64, 64))
 
-        # 绘制每个页面
+        # 绘制每个页面（跳过不在重绘区域内的页面）
+        visible_rect = event.rect()
+        visible_pages = set()
+        self._render_budget = PAGES_RENDERED_PER_PAINT
         for i in range(self.page_count):
-            self.draw_page(painter, i)
+            if self.get_page_rect(i).intersects(visible_rect):
+                visible_pages.add(i)
+                self.draw_page(painter, i)
+
+        if self.page_provider is not None:
+            self._evict_rendered_pages(visible_pages)
+            # 仍有可见页面未渲染时，在下一轮事件循环中继续
+            if any(self.page_pixmaps[i] is None for i in visible_pages):
+                QTimer.singleShot(0, self.update)
 
     def draw_page(self, painter, page_index):
         """绘制单个页面"""
@@ -210,11 +289,8 @@ class MultiPagePreviewWidget(QWidget):
         painter.drawRect(page_rect)
 
         # 绘制页面内容
-        if (page_index < len(self.page_pixmaps) and
-            self.page_pixmaps[page_index] and
-            not self.page_pixmaps[page_index].isNull()):
-
-            pixmap = self.page_pixmaps[page_index]
+        pixmap = self._get_page_pixmap(page_index)
+        if pixmap and not pixmap.isNull():
 
             # 缩放内容以适应页面
             scaled_pixmap = pixmap.scaled(
@@ -4,14 +4,12 @@
 """
 
 from PySide6.QtWidgets import (
-    QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, 
-    QListWidget, QListWidgetItem
+    QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, QListView
 )
 from PySide6.QtCore import Qt, QSize, Signal
-from PySide6.QtGui import QIcon
 
 from common.error_handler import logger, show_error_message
-from common.constants import MAX_IMAGE_COUNT
+from ui.image_list_model import ImageListModel
 
 
 class ImageListPanel(QGroupBox):
@@ -40,16 +38,19 @@ class ImageListPanel(QGroupBox):
         self.import_btn = QPushButton("导入图片")
         layout.addWidget(self.import_btn)
         
-        # 图片列表
-        self.image_listbox = QListWidget()
-        self.image_listbox.setViewMode(QListWidget.ViewMode.ListMode)
+        # 图片列表（缩略图由模型按可见行异步生成）
+        self.image_list_model = ImageListModel(self.image_items, icon_size=48, parent=self)
+        self.image_listbox = QListView()
+        self.image_listbox.setModel(self.image_list_model)
+        self.image_listbox.setViewMode(QListView.ViewMode.ListMode)
         self.image_listbox.setIconSize(QSize(48, 48))
         self.image_listbox.setSpacing(2)
         self.image_listbox.setUniformItemSizes(True)
+        self.image_listbox.setLayoutMode(QListView.LayoutMode.Batched)
         
         # 启用拖拽功能
         self.image_listbox.setAcceptDrops(True)
-        self.image_listbox.setDragDropMode(QListWidget.DragDropMode.DropOnly)
+        self.image_listbox.setDragDropMode(QListView.DragDropMode.DropOnly)
         
         layout.addWidget(self.image_listbox)
         
@@ -73,7 +74,7 @@ class ImageListPanel(QGroupBox):
         self.copy_btn.clicked.connect(self.copy_selected)
         self.delete_btn.clicked.connect(self.delete_selected)
         self.clear_btn.clicked.connect(self.clear_all)
-        self.image_listbox.itemSelectionChanged.connect(self.on_selection_changed)
+        self.image_listbox.selectionModel().currentRowChanged.connect(lambda *_: self.on_selection_changed())
     
     def import_images(self):
         """导入图片"""
@@ -87,15 +88,6 @@ class ImageListPanel(QGroupBox):
             )
             
             if file_paths:
-                # 检查数量限制
-                total_count = len(self.image_items) + len(file_paths)
-                if total_count > MAX_IMAGE_COUNT:
-                    show_error_message(
-                        "导入失败", 
-                        f"图片总数不能超过{MAX_IMAGE_COUNT}个，当前已有{len(self.image_items)}个"
-                    )
-                    return
-                
                 self.images_imported.emit(file_paths)
                 logger.info(f"导入了{len(file_paths)}个图片文件")
                 
@@ -123,10 +115,9 @@ class ImageListPanel(QGroupBox):
     
     def on_selection_changed(self):
         """选择变化事件"""
-        current_item = self.image_listbox.currentItem()
-        if current_item:
+        row = self.image_listbox.currentIndex().row()
+        if row >= 0:
             # 获取对应的ImageItem对象
-            row = self.image_listbox.row(current_item)
             if 0 <= row < len(self.image_items):
                 self.current_selection = self.image_items[row]
                 self.image_selected.emit(self.current_selection)
@@ -136,38 +127,21 @@ class ImageListPanel(QGroupBox):
     
     def add_image_item(self, image_item):
         """添加图片项"""
-        self.image_items.append(image_item)
-        self.refresh_list()
+        self.image_list_model.append_items([image_item])
     
     def remove_image_item(self, image_item):
         """移除图片项"""
         if image_item in self.image_items:
-            self.image_items.remove(image_item)
-            self.refresh_list()
+            self.image_list_model.remove_row(self.image_items.index(image_item))
     
     def clear_items(self):
         """清空所有项"""
-        self.image_items.clear()
+        self.image_list_model.clear()
         self.current_selection = None
-        self.refresh_list()
     
     def refresh_list(self):
         """刷新列表显示"""
-        self.image_listbox.clear()
-        
-        for i, item in enumerate(self.image_items):
-            list_item = QListWidgetItem()
-            
-            # 设置显示文本
-            filename = item.filename if hasattr(item, 'filename') else f"图片{i+1}"
-            quantity_text = f" (x{item.quantity})" if hasattr(item, 'quantity') and item.quantity > 1 else ""
-            list_item.setText(f"{filename}{quantity_text}")
-            
-            # 设置缩略图图标
-            if hasattr(item, 'thumbnail') and item.thumbnail:
-                list_item.setIcon(QIcon(item.thumbnail))
-            
-            self.image_listbox.addItem(list_item)
+        self.image_list_model.refresh_all()
     
     def get_selected_item(self):
         """获取当前选中的图片项"""
@@ -180,4 +154,4 @@ class ImageListPanel(QGroupBox):
     def set_items(self, items):
         """设置图片项列表"""
         self.image_items = items.copy()
-        self.refresh_list()
+        self.image_list_model.set_items(self.image_items)
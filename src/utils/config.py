@@ -6,6 +6,7 @@
 # 导入常量
 from common.constants import *
 from common.error_handler import logger
+from core.page_spec import DEFAULT_PAGE_SPEC
 
 # 动态配置管理类
 class AppConfig:
@@ -20,6 +21,9 @@ class AppConfig:
         self._outside_opacity = DEFAULT_OUTSIDE_OPACITY
         self._bleed_opacity = DEFAULT_BLEED_OPACITY
 
+        # 输出页面规格（纸张尺寸 + DPI）
+        self._page_spec = DEFAULT_PAGE_SPEC
+
         self._listeners = []  # 配置变化监听器
 
     @property
@@ -89,9 +93,22 @@ class AppConfig:
             self._bleed_opacity = value
             self._notify_listeners('bleed_opacity', old_value, value)
 
+    @property
+    def page_spec(self):
+        """输出页面规格（PageSpec）"""
+        return self._page_spec
+
+    @page_spec.setter
+    def page_spec(self, value):
+        """设置输出页面规格"""
+        if value != self._page_spec:
+            old_value = self._page_spec
+            self._page_spec = value
+            self._notify_listeners('page_spec', old_value, value)
+
     @property
     def badge_diameter_px(self):
-        """总直径（像素）"""
+        """总直径（PRINT_DPI下的像素，编辑参数以此为基准）"""
         return mm_to_pixels(self.badge_diameter_mm)
 
     @property
@@ -3,33 +3,62 @@
 处理图片文件的导入、验证和管理
 """
 
+import heapq
+import itertools
 import os
 import sys
-import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 from PIL import Image
-from PySide6.QtGui import QPixmap
-from io import BytesIO
 
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.config import SUPPORTED_IMAGE_FORMATS, MAX_IMAGE_COUNT
+from utils.config import SUPPORTED_IMAGE_FORMATS, SUPPORTED_IMAGE_EXTENSIONS
 from common.error_handler import logger, show_error_message, error_handler, resource_manager, ImageProcessingError
+from common.qt_adapter import pil_to_qpixmap, create_blank_pixmap
+from common.constants import PYRAMID_LEVELS
+from utils.thumbnail_cache import get_thumbnail_cache
+from core.source_cache import exif_orientation, oriented_size, normalize_orientation
 
 # 本地常量
 MAX_IMAGE_SIZE_MB = 50  # 最大图片文件大小（MB）
 THUMBNAIL_SIZE = 100    # 缩略图尺寸
+# 导入以I/O等待为主（网络共享盘），线程数可以多于CPU核心数
+IMPORT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+@dataclass
+class ImageProbe:
+    """单次解码得到的图片导入结果：验证状态、元数据和缩略图"""
+    file_path: str
+    valid: bool
+    info: Optional[dict] = None
+    thumbnail: Optional[Image.Image] = None  # PIL缩略图（Qt转换需在界面线程进行）
+    error: Optional[str] = None
+
 
 class FileHandler:
     """文件处理类"""
     
-    def __init__(self):
-        self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff']
+    def __init__(self, use_disk_cache=True):
+        self.supported_formats = list(SUPPORTED_IMAGE_EXTENSIONS)
+        # 持久化缩略图/元数据缓存（不可用时为None，退化为直接解码）
+        self.disk_cache = get_thumbnail_cache() if use_disk_cache else None
         
-    @error_handler("选择图片文件失败", show_error=False, default_return=[])
     def select_images(self, parent=None):
         """
         选择图片文件
-        返回: 选中的文件路径列表
+        返回: 选中的有效文件路径列表
+        """
+        return [probe.file_path for probe in self.select_image_probes(parent)]
+
+    @error_handler("选择图片文件失败", show_error=False, default_return=[])
+    def select_image_probes(self, parent=None):
+        """
+        选择图片文件并并行探测
+        返回: list[ImageProbe] - 有效图片的探测结果（可直接传给create_image_items）
         """
         from PySide6.QtWidgets import QFileDialog, QMessageBox
 
@@ -49,21 +78,9 @@ class FileHandler:
         if not file_paths:
             return []
 
-        # 验证文件
-        valid_files = []
-        invalid_files = []
-
-        for file_path in file_paths:
-            try:
-                if self.validate_image_file(file_path):
-                    valid_files.append(file_path)
-                    logger.debug(f"验证通过: {os.path.basename(file_path)}")
-                else:
-                    invalid_files.append(os.path.basename(file_path))
-                    logger.warning(f"文件验证失败: {os.path.basename(file_path)}")
-            except Exception as e:
-                invalid_files.append(os.path.basename(file_path))
-                logger.error(f"验证文件时出错 {os.path.basename(file_path)}: {e}")
+        # 并行验证文件（单次打开同时提取元数据和缩略图）
+        probes = self.probe_images(file_paths)
+        invalid_files = [os.path.basename(probe.file_path) for probe in probes if not probe.valid]
 
         # 显示无效文件警告
         if invalid_files and parent:
@@ -73,9 +90,10 @@ class FileHandler:
                 f"以下文件格式不支持或文件损坏：\n" + "\n".join(invalid_files)
             )
 
-        logger.info(f"选择了 {len(valid_files)} 个有效图片文件")
-        return valid_files
-    
+        valid_probes = [probe for probe in probes if probe.valid]
+        logger.info(f"选择了 {len(valid_probes)} 个有效图片文件")
+        return valid_probes
+
     def validate_image_file(self, file_path):
         """
         验证图片文件是否有效
@@ -83,21 +101,9 @@ class FileHandler:
         返回: bool - 是否有效
         """
         try:
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
-                logger.debug(f"文件不存在: {file_path}")
-                return False
-
-            # 检查文件扩展名
-            _, ext = os.path.splitext(file_path.lower())
-            if ext not in self.supported_formats:
-                logger.debug(f"不支持的文件格式: {ext}")
-                return False
-
-            # 检查文件大小
-            file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-            if file_size_mb > MAX_IMAGE_SIZE_MB:
-                logger.warning(f"文件过大 ({file_size_mb:.1f}MB): {os.path.basename(file_path)}")
+            error = self._check_file(file_path)
+            if error:
+                logger.debug(f"{error}: {os.path.basename(file_path)}")
                 return False
 
             # 尝试打开图片验证格式
@@ -110,6 +116,107 @@ class FileHandler:
             logger.debug(f"图片验证失败 {os.path.basename(file_path)}: {e}")
             return False
     
+    def _check_file(self, file_path):
+        """
+        检查文件是否存在、扩展名和大小（不打开文件）
+        返回: str - 错误原因，通过检查时返回None
+        """
+        if not os.path.exists(file_path):
+            return "文件不存在"
+
+        _, ext = os.path.splitext(file_path.lower())
+        if ext not in self.supported_formats:
+            return f"不支持的文件格式 {ext}"
+
+        file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        if file_size_mb > MAX_IMAGE_SIZE_MB:
+            return f"文件过大 ({file_size_mb:.1f}MB)"
+
+        return None
+
+    def probe_image(self, file_path, thumbnail_size=(THUMBNAIL_SIZE, THUMBNAIL_SIZE)):
+        """
+        打开一次图片，同时完成验证、元数据提取和缩略图生成
+        参数:
+            file_path: 文件路径
+            thumbnail_size: 缩略图尺寸
+        返回: ImageProbe - 文件损坏或不支持时valid为False
+        """
+        error = self._check_file(file_path)
+        if error:
+            logger.debug(f"图片验证失败 {os.path.basename(file_path)}: {error}")
+            return ImageProbe(file_path, False, error=error)
+
+        # 磁盘缓存命中时无需打开图片
+        if self.disk_cache is not None:
+            cached = self.disk_cache.get(file_path)
+            if cached and cached[1] is not None and cached[1].size == tuple(thumbnail_size):
+                return ImageProbe(file_path, True, info=cached[0], thumbnail=cached[1])
+
+        try:
+            with Image.open(file_path) as img:
+                # 尺寸、缩略图和缩小图层级都是按EXIF方向摆正后的结果（与圆形裁剪的源图片一致）
+                orientation = exif_orientation(img)
+                info = {
+                    'path': file_path,
+                    'filename': os.path.basename(file_path),
+                    'size': oriented_size(img.size, orientation),
+                    'format': img.format,
+                    'mode': img.mode,
+                    'file_size': os.path.getsize(file_path),
+                    'orientation': orientation,
+                }
+                # 缩略图解码即完整性验证：截断或损坏的文件会在这里抛出异常
+                if self.disk_cache is not None:
+                    levels = self._build_levels(img, orientation)
+                    if levels:
+                        thumbnail = self._build_thumbnail(levels[min(levels)], thumbnail_size)
+                    else:
+                        thumbnail = self._build_thumbnail(img, thumbnail_size, orientation)
+                else:
+                    levels = None
+                    thumbnail = self._build_thumbnail(img, thumbnail_size, orientation)
+        except Exception as e:
+            logger.debug(f"图片验证失败 {os.path.basename(file_path)}: {e}")
+            return ImageProbe(file_path, False, error=str(e))
+
+        if self.disk_cache is not None:
+            try:
+                self.disk_cache.put(file_path, info, thumbnail, levels)
+            except Exception as e:
+                logger.warning(f"写入磁盘缓存失败 {os.path.basename(file_path)}: {e}")
+
+        return ImageProbe(file_path, True, info=info, thumbnail=thumbnail)
+
+    def probe_images(self, file_paths, thumbnail_size=(THUMBNAIL_SIZE, THUMBNAIL_SIZE),
+                     workers=IMPORT_WORKERS):
+        """
+        并行探测多个图片文件
+        参数:
+            file_paths: 文件路径列表
+            thumbnail_size: 缩略图尺寸
+            workers: 线程数（解码在PIL内部释放GIL，I/O等待可以重叠）
+        返回: list[ImageProbe] - 与输入顺序一致（重复的路径共用同一探测结果）
+        """
+        file_paths = list(file_paths)
+        unique_paths = list(dict.fromkeys(file_paths))
+        if workers <= 1 or len(unique_paths) <= 1:
+            results = [self.probe_image(path, thumbnail_size) for path in unique_paths]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(unique_paths))) as executor:
+                results = list(executor.map(lambda path: self.probe_image(path, thumbnail_size), unique_paths))
+
+        by_path = dict(zip(unique_paths, results))
+        probes = [by_path[path] for path in file_paths]
+
+        valid_count = sum(1 for probe in probes if probe.valid)
+        logger.info(f"探测图片 {len(probes)} 个，有效 {valid_count} 个")
+        return probes
+
+    def create_image_items(self, probes):
+        """根据探测结果创建图片项（跳过无效文件，不再重新打开文件）"""
+        return [ImageItem(probe.file_path, probe=probe) for probe in probes if probe.valid]
+
     @error_handler("获取图片信息失败", show_error=False)
     def get_image_info(self, file_path):
         """
@@ -120,14 +227,21 @@ class FileHandler:
         if not os.path.exists(file_path):
             raise ImageProcessingError(f"图片文件不存在: {file_path}")
 
+        if self.disk_cache is not None:
+            info = self.disk_cache.get_info(file_path)
+            if info is not None:
+                return info
+
         with resource_manager(Image.open(file_path)) as img:
+            orientation = exif_orientation(img)
             info = {
                 'path': file_path,
                 'filename': os.path.basename(file_path),
-                'size': img.size,
+                'size': oriented_size(img.size, orientation),
                 'format': img.format,
                 'mode': img.mode,
-                'file_size': os.path.getsize(file_path)
+                'file_size': os.path.getsize(file_path),
+                'orientation': orientation,
             }
             logger.debug(f"获取图片信息: {info['filename']} ({info['size'][0]}x{info['size'][1]})")
             return info
@@ -139,66 +253,121 @@ class FileHandler:
         返回: QPixmap - 缩略图对象
         """
         try:
-            with Image.open(file_path) as img:
-                # 转换为RGB模式（确保兼容性）
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+            return pil_to_qpixmap(self.create_thumbnail_image(file_path, size))
 
-                # 创建缩略图（保持比例）
-                img.thumbnail(size, Image.Resampling.LANCZOS)
+        except Exception as e:
+            logger.error(f"创建缩略图失败 {os.path.basename(file_path)}: {e}", exc_info=True)
+            # 创建错误占位图
+            return create_blank_pixmap(size[0], size[1])
 
-                # 创建正方形背景
-                thumbnail = Image.new('RGB', size, (240, 240, 240))
+    def create_thumbnail_image(self, file_path, size=(THUMBNAIL_SIZE, THUMBNAIL_SIZE)):
+        """
+        创建缩略图（纯PIL实现，不依赖Qt）
+        参数: file_path - 文件路径, size - 缩略图尺寸
+        返回: PIL.Image - 居中放在浅灰色正方形背景上的缩略图
+        """
+        if self.disk_cache is not None:
+            if tuple(size) == (THUMBNAIL_SIZE, THUMBNAIL_SIZE):
+                cached = self.disk_cache.get(file_path)
+                if cached and cached[1] is not None:
+                    return cached[1]
+            level = self.disk_cache.get_level(file_path, max(size))
+            if level is not None:
+                return self._build_thumbnail(level, size)
+
+        with Image.open(file_path) as img:
+            return self._build_thumbnail(img, size, exif_orientation(img))
+
+    @staticmethod
+    def _build_levels(img, orientation=1):
+        """
+        从已打开的图片生成缩小图层级（JPEG按最大层级的尺寸draft解码，解码后按EXIF方向摆正）
+        返回: {长边像素: PIL图片}，原图不大于某层级时不生成该层级
+        """
+        largest = max(PYRAMID_LEVELS)
+        img.draft('RGB', (largest, largest))
+        current = img.convert('RGB') if img.mode != 'RGB' else img.copy()
+        current = normalize_orientation(current, orientation)
+
+        levels = {}
+        for max_side in sorted(PYRAMID_LEVELS, reverse=True):
+            if max(current.size) > max_side:
+                current = current.copy()
+                current.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                levels[max_side] = current
+        return levels
+
+    @staticmethod
+    def _build_thumbnail(img, size, orientation=1):
+        """
+        从已打开的图片生成居中放在浅灰色正方形背景上的缩略图
+        orientation: 图片的EXIF方向（缩小图层级已摆正，为1）；draft解码后只做转置摆正
+        """
+        # JPEG按缩小比例直接解码（对其他格式无效果），保留2倍余量给LANCZOS
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
 
-                # 计算居中位置
-                x = (size[0] - img.width) // 2
-                y = (size[1] - img.height) // 2
+        # 转换为RGB模式（确保兼容性）
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img = normalize_orientation(img, orientation)
 
-                # 粘贴图片到背景
-                thumbnail.paste(img, (x, y))
+        # 创建缩略图（保持比例）
+        img.thumbnail(size, Image.Resampling.LANCZOS)
 
-                # 转换为QPixmap
-                buffer = BytesIO()
-                try:
-                    thumbnail.save(buffer, format='PNG')
-                    buffer.seek(0)
+        # 创建正方形背景
+        thumbnail = Image.new('RGB', size, (240, 240, 240))
 
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(buffer.getvalue())
-                    return pixmap
-                finally:
-                    # 确保释放内存
-                    buffer.close()
-                    del thumbnail
+        # 计算居中位置
+        x = (size[0] - img.width) // 2
+        y = (size[1] - img.height) // 2
 
-        except Exception as e:
-            logger.error(f"创建缩略图失败 {os.path.basename(file_path)}: {e}", exc_info=True)
-            # 创建错误占位图
-            error_pixmap = QPixmap(size[0], size[1])
-            error_pixmap.fill()  # 填充为白色
-            return error_pixmap
+        # 粘贴图片到背景
+        thumbnail.paste(img, (x, y))
+        return thumbnail
 
-class ImageItem:
-    """图片项目类，用于管理单个图片的信息和状态"""
+class SourceFile:
+    """同一源文件的共享数据：路径、元数据、导入缩略图和实例计数"""
 
-    # 类变量：用于跟踪同一文件的实例数量
-    _file_instance_counters = {}
+    __slots__ = ('file_path', 'filename', 'info', 'thumbnail_image', 'thumbnail',
+                 'live_count', 'next_instance', 'free_instances', '__weakref__')
 
     def __init__(self, file_path):
         self.file_path = file_path
         self.filename = os.path.basename(file_path)
-        self.thumbnail = None
         self.info = None
-        self.is_processed = False
+        self.thumbnail_image = None  # 导入时生成的PIL缩略图
+        self.thumbnail = None        # QPixmap缩略图（按需创建）
+        self.live_count = 0          # 当前存活的图片项数量
+        self.next_instance = 0       # 已分配的最大实例序号
+        self.free_instances = []     # 已删除图片项归还的实例序号（最小堆）
+
+
+class ImageItem:
+    """图片项目类，用于管理单个图片的信息和状态"""
+
+    __slots__ = ('source', 'unique_id', 'instance_number', 'is_processed',
+                 'scale', 'offset_x', 'offset_y', 'rotation', 'quantity', 'badge_size_mm')
 
-        # 生成唯一标识
-        self.unique_id = str(uuid.uuid4())
+    # 源文件注册表：没有图片项引用时自动回收（实例计数随之重置）
+    _sources = weakref.WeakValueDictionary()
+    # 整数唯一标识
+    _id_counter = itertools.count(1)
 
-        # 为同一文件分配实例序号
-        if file_path not in ImageItem._file_instance_counters:
-            ImageItem._file_instance_counters[file_path] = 0
-        ImageItem._file_instance_counters[file_path] += 1
-        self.instance_number = ImageItem._file_instance_counters[file_path]
+    def __init__(self, file_path, probe=None):
+        source = ImageItem._sources.get(file_path)
+        if source is None:
+            source = SourceFile(file_path)
+            ImageItem._sources[file_path] = source
+
+        # 加载图片信息（已有探测结果或同一文件已加载过时不再打开文件）
+        if probe is not None and probe.valid:
+            source.info = probe.info
+            source.thumbnail_image = probe.thumbnail
+        self._register(source)
+        if source.info is None or 'error' in source.info:
+            self.load_info()
+
+        self.is_processed = False
 
         # 编辑参数
         self.scale = 1.0      # 缩放比例
@@ -208,10 +377,52 @@ class ImageItem:
 
         # 排版参数
         self.quantity = 1     # 在画布上出现的数量
+        self.badge_size_mm = None  # 单独的徽章直径（不含出血），None表示使用全局设置
+
+    def _register(self, source):
+        """绑定源文件并分配唯一标识和实例序号"""
+        self.source = source
+        self.unique_id = next(ImageItem._id_counter)
+        source.live_count += 1
+        if source.free_instances:
+            # 优先复用已归还的最小序号
+            self.instance_number = heapq.heappop(source.free_instances)
+        else:
+            source.next_instance += 1
+            self.instance_number = source.next_instance
+
+    def __del__(self):
+        # 删除图片项时归还实例计数和序号（解释器退出时属性可能已不存在）
+        source = getattr(self, 'source', None)
+        if source is not None:
+            source.live_count -= 1
+            heapq.heappush(source.free_instances, self.instance_number)
+
+    # 共享数据通过源文件访问
+    @property
+    def file_path(self):
+        return self.source.file_path
+
+    @property
+    def filename(self):
+        return self.source.filename
+
+    @property
+    def info(self):
+        return self.source.info
+
+    @info.setter
+    def info(self, value):
+        self.source.info = value
+
+    @property
+    def thumbnail_image(self):
+        return self.source.thumbnail_image
+
+    @property
+    def thumbnail(self):
+        return self.source.thumbnail
 
-        # 加载图片信息
-        self.load_info()
-    
     def load_info(self):
         """加载图片信息"""
         try:
@@ -226,16 +437,23 @@ class ImageItem:
             }
     
     def create_thumbnail(self, size=(THUMBNAIL_SIZE, THUMBNAIL_SIZE)):
-        """创建缩略图"""
-        if not self.thumbnail:
-            file_handler = FileHandler()
-            self.thumbnail = file_handler.create_thumbnail(self.file_path, size)
-        return self.thumbnail
+        """创建缩略图（同一文件的所有图片项共享）"""
+        source = self.source
+        if not source.thumbnail:
+            if source.thumbnail_image is not None:
+                image = source.thumbnail_image
+                if image.size != tuple(size):
+                    image = image.resize(size, Image.Resampling.LANCZOS)
+                source.thumbnail = pil_to_qpixmap(image)
+            else:
+                file_handler = FileHandler()
+                source.thumbnail = file_handler.create_thumbnail(self.file_path, size)
+        return source.thumbnail
     
     def get_display_name(self):
         """获取显示名称"""
         # 如果同一文件有多个实例，显示序号
-        if ImageItem._file_instance_counters.get(self.file_path, 1) > 1:
+        if self.source.live_count > 1:
             name, ext = os.path.splitext(self.filename)
             return f"{name}#{self.instance_number}{ext}"
         return self.filename
@@ -267,9 +485,9 @@ class ImageItem:
         self.is_processed = False
 
     def copy(self):
-        """创建当前图片项的副本"""
-        # 创建新的ImageItem实例
-        new_item = ImageItem(self.file_path)
+        """创建当前图片项的副本（共享源文件数据，不读取磁盘）"""
+        new_item = ImageItem.__new__(ImageItem)
+        new_item._register(self.source)
 
         # 复制编辑参数
         new_item.scale = self.scale
@@ -277,6 +495,7 @@ class ImageItem:
         new_item.offset_y = self.offset_y
         new_item.rotation = self.rotation
         new_item.quantity = self.quantity
+        new_item.badge_size_mm = self.badge_size_mm
         new_item.is_processed = self.is_processed
 
         return new_item
@@ -0,0 +1,124 @@
+"""
+批量任务清单模块
+从文件夹或清单文件（CSV/JSON）读取徽章条目，供命令行批量导出使用
+不依赖任何GUI组件
+"""
+
+import csv
+import json
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from common.constants import SUPPORTED_IMAGE_EXTENSIONS
+from common.error_handler import logger, ConfigError
+
+
+@dataclass
+class BadgeEntry:
+    """清单中的单个徽章条目（与ImageItem的编辑参数字段保持一致）"""
+    file_path: str
+    quantity: int = 1
+    scale: Optional[float] = None  # None表示自动计算最佳缩放
+    offset_x: int = 0
+    offset_y: int = 0
+    rotation: int = 0
+    is_processed: bool = True
+    badge_size_mm: Optional[float] = None  # 单独的徽章直径，None表示使用全局设置
+
+    @property
+    def filename(self):
+        """文件名"""
+        return os.path.basename(self.file_path)
+
+
+# 清单字段 -> 类型转换
+_FIELD_TYPES = {
+    'quantity': int,
+    'scale': float,
+    'offset_x': int,
+    'offset_y': int,
+    'rotation': int,
+    'badge_size_mm': float,
+}
+
+
+def _entry_from_record(record, base_dir):
+    """将清单中的一条记录转换为BadgeEntry"""
+    path = (record.get('path') or record.get('file_path') or '').strip()
+    if not path:
+        raise ConfigError(f"清单记录缺少path字段: {record}")
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+
+    params = {}
+    for field, field_type in _FIELD_TYPES.items():
+        value = record.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        try:
+            params[field] = field_type(float(value)) if field_type is int else field_type(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"清单字段 {field} 的值无效: {value!r} ({path})")
+
+    entry = BadgeEntry(os.path.normpath(path), **params)
+    entry.quantity = max(0, entry.quantity)
+    return entry
+
+
+def load_manifest(manifest_path) -> List[BadgeEntry]:
+    """
+    读取清单文件
+    参数:
+        manifest_path: CSV或JSON文件路径
+            CSV: 表头包含 path, quantity, scale, offset_x, offset_y, rotation, badge_size_mm（除path外均可省略）
+            JSON: 上述字段组成的对象列表，或 {"items": [...]}
+    返回: list[BadgeEntry] - 相对路径按清单所在目录解析
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    _, ext = os.path.splitext(manifest_path.lower())
+
+    if ext == '.json':
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        records = data.get('items', []) if isinstance(data, dict) else data
+    elif ext == '.csv':
+        with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+            records = list(csv.DictReader(f))
+    else:
+        raise ConfigError(f"不支持的清单格式: {ext}（仅支持 .csv 和 .json）")
+
+    entries = [_entry_from_record(record, base_dir) for record in records]
+    logger.info(f"读取清单 {os.path.basename(manifest_path)}: {len(entries)} 个条目")
+    return entries
+
+
+def scan_folder(folder_path) -> List[BadgeEntry]:
+    """
+    扫描文件夹中所有支持的图片（不递归，按文件名排序）
+    返回: list[BadgeEntry] - 每张图片数量为1，缩放自动计算
+    """
+    entries = []
+    for name in sorted(os.listdir(folder_path)):
+        _, ext = os.path.splitext(name.lower())
+        full_path = os.path.join(folder_path, name)
+        if ext in SUPPORTED_IMAGE_EXTENSIONS and os.path.isfile(full_path):
+            entries.append(BadgeEntry(full_path))
+
+    logger.info(f"扫描文件夹 {folder_path}: {len(entries)} 张图片")
+    return entries
+
+
+def load_entries(source) -> List[BadgeEntry]:
+    """根据来源类型（文件夹或清单文件）读取徽章条目"""
+    if os.path.isdir(source):
+        return scan_folder(source)
+    return load_manifest(source)
+
+
+def expand_entries(entries) -> List[BadgeEntry]:
+    """按数量展开条目列表（与MainWindow.get_expanded_image_list一致）"""
+    expanded = []
+    for entry in entries:
+        expanded.extend([entry] * entry.quantity)
+    return expanded
@@ -0,0 +1,298 @@
+"""
+磁盘缩略图缓存模块
+将图片元数据、100px缩略图和小尺寸缩小图层级保存在单个SQLite文件中，
+以 (路径, 文件大小, 修改时间) 作为有效性判断，重新打开项目时无需再次解码图片
+"""
+
+import atexit
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+from common.constants import DISK_CACHE_MAX_MB, DISK_CACHE_FILENAME
+from common.error_handler import logger
+from common.path_utils import get_cache_dir
+
+# 缓存表结构版本，结构或内容变化时提升版本号即可丢弃旧数据
+# （2：尺寸、缩略图和层级按EXIF方向摆正）
+SCHEMA_VERSION = 2
+# 缩略图与层级图的编码参数（JPEG体积约为PNG的1/5）
+BLOB_FORMAT = 'JPEG'
+BLOB_QUALITY = 85
+# 淘汰时清理到上限的比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+# 命中时的访问时间先记在内存中，累计到一定数量再批量写回
+ACCESS_FLUSH_THRESHOLD = 256
+
+
+def _encode_image(image):
+    """将PIL图片编码为缓存用的字节串"""
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, BLOB_FORMAT, quality=BLOB_QUALITY)
+    return buffer.getvalue()
+
+
+def _decode_image(data):
+    """从缓存字节串解码PIL图片"""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+class ThumbnailCache:
+    """基于SQLite的持久化缩略图/元数据缓存（线程安全）"""
+
+    def __init__(self, cache_path=None, max_bytes=DISK_CACHE_MAX_MB * 1024 * 1024):
+        """
+        参数:
+            cache_path: SQLite文件路径，默认位于用户缓存目录
+            max_bytes: 缓存内容总字节上限，超出后按最近访问时间淘汰
+        """
+        if cache_path is None:
+            cache_path = os.path.join(get_cache_dir(), DISK_CACHE_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+
+        self.cache_path = str(cache_path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._touched = {}  # 路径 -> 最近访问时间（尚未写回）
+        self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    def _create_tables(self):
+        """创建缓存表（版本不一致时重建）"""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS levels")
+            self._conn.execute("DROP TABLE IF EXISTS entries")
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                file_size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                info TEXT NOT NULL,
+                thumbnail BLOB,
+                bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS levels (
+                path TEXT NOT NULL,
+                max_side INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (path, max_side)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def _file_key(file_path):
+        """
+        计算缓存键
+        返回: (规范化路径, 文件大小, 修改时间ns)，文件不存在时返回None
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return os.path.normcase(os.path.abspath(file_path)), stat.st_size, stat.st_mtime_ns
+
+    def _lookup(self, file_path, columns):
+        """查询有效条目并刷新访问时间，文件已变化时返回None"""
+        key = self._file_key(file_path)
+        if key is None:
+            return None
+        path, file_size, mtime_ns = key
+
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT file_size, mtime_ns, {columns} FROM entries WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] != file_size or row[1] != mtime_ns:
+                self._delete(path)
+                self._conn.commit()
+                return None
+            self._touched[path] = time.time()
+            if len(self._touched) >= ACCESS_FLUSH_THRESHOLD:
+                self._flush_access()
+                self._conn.commit()
+        return row[2:]
+
+    def _flush_access(self):
+        """将内存中的访问时间批量写回（调用方需持有锁）"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE path = ?",
+                [(access, path) for path, access in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def get(self, file_path):
+        """
+        读取图片的缓存元数据和缩略图
+        返回: (info, thumbnail) - info为dict，thumbnail为PIL图片；未命中返回None
+        """
+        row = self._lookup(file_path, "info, thumbnail")
+        if row is None:
+            return None
+
+        info = json.loads(row[0])
+        info['size'] = tuple(info['size'])
+        # 缓存中的路径为规范化路径，返回调用方传入的路径
+        info['path'] = file_path
+        thumbnail = _decode_image(row[1]) if row[1] else None
+        return info, thumbnail
+
+    def get_info(self, file_path):
+        """只读取缓存的元数据，未命中返回None"""
+        row = self._lookup(file_path, "info")
+        if row is None:
+            return None
+        info = json.loads(row[0])
+        info['size'] = tuple(info['size'])
+        info['path'] = file_path
+        return info
+
+    def get_level(self, file_path, min_side):
+        """
+        读取长边不小于min_side的最小缩小图层级
+        返回: PIL图片，没有合适层级时返回None
+        """
+        if self._lookup(file_path, "1") is None:
+            return None
+        path = self._file_key(file_path)[0]
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM levels WHERE path = ? AND max_side >= ? ORDER BY max_side LIMIT 1",
+                (path, min_side)
+            ).fetchone()
+        return _decode_image(row[0]) if row else None
+
+    def put(self, file_path, info, thumbnail=None, levels=None):
+        """
+        写入图片的元数据、缩略图和缩小图层级
+        参数:
+            file_path: 图片路径
+            info: 元数据字典（需可JSON序列化）
+            thumbnail: PIL缩略图
+            levels: {长边像素: PIL图片}
+        """
+        key = self._file_key(file_path)
+        if key is None:
+            return
+        path, file_size, mtime_ns = key
+
+        info_text = json.dumps(info, ensure_ascii=False)
+        thumbnail_blob = _encode_image(thumbnail) if thumbnail is not None else None
+        level_blobs = [(max_side, _encode_image(image)) for max_side, image in (levels or {}).items()]
+        size = (len(info_text.encode('utf-8')) + len(thumbnail_blob or b'')
+                + sum(len(blob) for _, blob in level_blobs))
+
+        with self._lock:
+            self._delete(path)
+            self._conn.execute(
+                "INSERT INTO entries (path, file_size, mtime_ns, info, thumbnail, bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, file_size, mtime_ns, info_text, thumbnail_blob, size, time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO levels (path, max_side, data) VALUES (?, ?, ?)",
+                [(path, max_side, blob) for max_side, blob in level_blobs]
+            )
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _delete(self, path):
+        """删除条目（调用方需持有锁）"""
+        row = self._conn.execute("SELECT bytes FROM entries WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM levels WHERE path = ?", (path,))
+        self._total_bytes -= row[0]
+
+    def _evict(self):
+        """按最近访问时间淘汰旧条目，直到低于上限的90%（调用方需持有锁）"""
+        self._flush_access()
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        evicted = 0
+        rows = self._conn.execute("SELECT path, bytes FROM entries ORDER BY last_access").fetchall()
+        for path, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM levels WHERE path = ?", (path,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.debug(f"磁盘缓存淘汰 {evicted} 个条目，当前 {self._total_bytes / 1024 / 1024:.1f}MB")
+
+    @property
+    def total_bytes(self):
+        """缓存内容总字节数"""
+        return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM levels")
+            self._conn.commit()
+            self._touched.clear()
+            self._total_bytes = 0
+
+    def close(self):
+        """写回访问时间并关闭数据库连接"""
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    """
+    获取全局共享的磁盘缓存
+    返回: ThumbnailCache，缓存目录不可用时返回None（调用方退化为直接解码）
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = ThumbnailCache()
+                atexit.register(_shared_cache.close)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"磁盘缩略图缓存不可用: {e}")
+                _shared_cache = False
+        return _shared_cache or None
+
+
+def reset_thumbnail_cache():
+    """关闭全局共享的磁盘缓存；下次 get_thumbnail_cache() 时按当前缓存目录重新打开（如修改了 BADGEPATTERN_CACHE_DIR）"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache:
+            atexit.unregister(_shared_cache.close)
+            _shared_cache.close()
+        _shared_cache = None
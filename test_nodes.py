@@ -14,7 +14,7 @@ from PIL import Image
 import os
 
 # 导入节点
-from nodes import CircularCropNode, BadgeLayoutNode, AutoOptimizeBadgeNode
+from nodes import CircularCropNode, BadgeLayoutNode, AutoOptimizeBadgeNode, BadgeCapacityNode, BadgeCutFileNode
 
 
 def create_test_image(width=800, height=600, color=(100, 150, 200)):
@@ -209,6 +209,80 @@ def test_badge_layout():
     return True
 
 
+def test_capacity_table():
+    """测试排版容量表节点"""
+    print("\n=== 测试排版容量表节点 ===")
+
+    node = BadgeCapacityNode()
+    report, max_diameter = node.calculate(
+        diameter_min_mm=50.0,
+        diameter_max_mm=60.0,
+        diameter_step_mm=5.0,
+        layout_type="全部",
+        spacing_mm=5.0,
+        margin_mm=10.0,
+        target_count=12,
+        dpi=300
+    )
+    print(report)
+
+    # 3个直径 × 2种模式，加表头
+    assert len(report.split("\n\n")[0].splitlines()) == 7, "容量表行数不正确"
+    assert 55.0 <= max_diameter < 100.0, "反查的最大直径不合理"
+
+    # 反查得到的直径在排版节点中确实能放下12个
+    from core.layout_cache import get_layout
+    layout = get_layout(
+        "compact", 2480, 3507, int(max_diameter / 25.4 * 300), int(5 / 25.4 * 300), int(10 / 25.4 * 300), 300
+    )
+    assert layout.max_count >= 12, "反查直径下排版数量不足"
+    print(f"  ✓ 每页12个的最大直径: {max_diameter}mm")
+
+    print("✅ 排版容量表节点测试通过！")
+    return True
+
+
+def test_cut_file():
+    """测试切割机裁切文件节点"""
+    print("\n=== 测试切割机裁切文件节点 ===")
+
+    import tempfile
+    import xml.etree.ElementTree as ET
+
+    node = BadgeCutFileNode()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 不在ComfyUI中运行时输出到当前目录下的output
+        os.chdir(temp_dir)
+        try:
+            paths, page_count = node.generate(
+                diameter_mm=58.0,
+                bleed_mm=2.0,
+                layout_type="网格",
+                spacing_mm=5.0,
+                margin_mm=10.0,
+                badge_count=15,
+                file_format="svg",
+                filename_prefix="test",
+                dpi=300
+            )
+            paths = paths.splitlines()
+            assert page_count == 2 == len(paths), "页数不正确"
+
+            # A4网格每页12个，第2页只有3个裁切圆
+            root = ET.parse(paths[1]).getroot()
+            cut_layer = root.find("{http://www.w3.org/2000/svg}g[@id='CUT']")
+            circles = cut_layer.findall("{http://www.w3.org/2000/svg}circle")
+            assert len(circles) == 3, "第2页裁切圆数量不正确"
+            assert float(circles[0].get("r")) == 27.0, "裁切圆半径不正确"
+            print(f"  ✓ {page_count}页: {[os.path.basename(path) for path in paths]}")
+        finally:
+            os.chdir(cwd)
+
+    print("✅ 切割机裁切文件节点测试通过！")
+    return True
+
+
 def test_integration():
     """集成测试：完整工作流"""
     print("\n=== 集成测试：完整工作流 ===")
@@ -273,6 +347,8 @@ def main():
         test_circular_crop()
         test_auto_optimize()
         test_badge_layout()
+        test_capacity_table()
+        test_cut_file()
         test_integration()
         
         print("\n" + "=" * 60)
@@ -15,6 +15,7 @@ sys.path.insert(0, str(project_root / "src"))
 from core.image_processor import ImageProcessor
 from core.layout_engine import LayoutEngine
 from core.export_manager import ExportManager
+from core.project_model import BadgeProject
 from utils.config import app_config
 
 
@@ -63,6 +64,37 @@ class TestImageProcessor(unittest.TestCase):
         # 测试内存限制
         self.assertGreater(self.processor._cache_memory_limit, 0)
 
+    def test_exif_orientation(self):
+        """测试EXIF方向在解码时摆正：裁剪结果与摆正后的原图一致，源图片只解码一次"""
+        import tempfile
+        from PIL import Image
+        from core.source_cache import shared_source_cache, source_size
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # 左半红、右半蓝的横图，EXIF方向6（显示时顺时针旋转90度）
+            raw = Image.new('RGB', (400, 200), 'red')
+            raw.paste(Image.new('RGB', (200, 200), 'blue'), (200, 0))
+            oriented_path = os.path.join(temp_dir, "phone.png")
+            exif = Image.Exif()
+            exif[0x0112] = 6
+            raw.save(oriented_path, exif=exif)
+            upright_path = os.path.join(temp_dir, "upright.png")
+            raw.transpose(Image.Transpose.ROTATE_270).save(upright_path)
+
+            self.assertEqual(source_size(oriented_path), (200, 400))
+            shared_source_cache.clear()
+            crops = [self.processor.create_circular_crop(path, scale=1.0, dpi=150, diameter_mm=30, use_cache=False)
+                     for path in (oriented_path, upright_path)]
+            self.assertEqual(list(crops[0].getdata()), list(crops[1].getdata()))
+            # 摆正后上半部分为红色、下半部分为蓝色
+            center = crops[0].size[0] // 2
+            self.assertEqual(crops[0].getpixel((center, center - 20))[:3], (255, 0, 0))
+            self.assertEqual(crops[0].getpixel((center, center + 20))[:3], (0, 0, 255))
+
+            self.processor.create_circular_crop(oriented_path, scale=0.8, dpi=150, diameter_mm=30, use_cache=False)
+            info = shared_source_cache.info()
+            self.assertEqual((info['misses'], info['hits']), (2, 1))
+
 
 class TestLayoutEngine(unittest.TestCase):
     """排版引擎测试"""
@@ -114,6 +146,37 @@ class TestLayoutEngine(unittest.TestCase):
             cache_info = self.engine.get_cache_info()
             self.assertIsInstance(cache_info, dict)
 
+    def test_shared_layout_cache(self):
+        """测试共享排版缓存：不可变结果、完整参数键、LRU淘汰"""
+        from core.layout_cache import LayoutCache, LayoutKey, get_layout
+
+        first = self.engine.get_layout_result('compact', 3, 6)
+        self.assertIs(self.engine.get_layout_result('compact', 3, 6), first)
+        self.assertEqual(hash(first), hash(self.engine.get_layout_result('compact', 3, 6)))
+
+        # 调用方修改返回的字典不影响缓存
+        layout = self.engine.calculate_compact_layout(3, 6)
+        layout['positions'].clear()
+        self.assertEqual(len(self.engine.calculate_compact_layout(3, 6)['positions']), first.max_count)
+
+        # 节点使用相同的像素参数即命中同一条目；DPI不同则是不同条目
+        key = first.key
+        self.assertIs(get_layout('compact', key.page_width, key.page_height, key.diameter,
+                                 key.spacing, key.margin, key.dpi), first)
+        self.assertIsNot(get_layout('compact', key.page_width, key.page_height, key.diameter,
+                                    key.spacing, key.margin, 150), first)
+
+        cache = LayoutCache(max_size=2)
+        keys = [LayoutKey('grid', 2480, 3508, 300, diameter, 35, 71) for diameter in (400, 500, 600)]
+        cache.get(keys[0])
+        cache.get(keys[1])
+        cache.get(keys[0])
+        cache.get(keys[2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.info()['hits'], 1)
+        cache.get(keys[1])
+        self.assertEqual(cache.info()['misses'], 4)  # keys[1]最久未使用，已被淘汰
+
     def test_layout_performance(self):
         """测试布局性能"""
         import time
@@ -130,6 +193,258 @@ class TestLayoutEngine(unittest.TestCase):
         # 5次布局计算应该在1秒内完成
         self.assertLess(total_time, 1.0)
 
+    def test_compact_packing_search(self):
+        """测试紧密排列在多种排列中取最优且不重叠"""
+        import math
+        from itertools import combinations
+        from core.packing import optimize_packing
+
+        # 58mm徽章、3mm间距、6mm边距（约300dpi像素），旧的六边形列排法只能放12个
+        result = optimize_packing(2480, 3508, 685, 35, 71)
+        self.assertGreaterEqual(result.count, 13)
+        self.assertEqual(result.count, max(count for _, count in result.candidates))
+
+        radius = 685 / 2
+        for x, y in result.positions:
+            self.assertGreaterEqual(x - radius, 71 - 1)
+            self.assertLessEqual(x + radius, 2480 - 71 + 1)
+            self.assertGreaterEqual(y - radius, 71 - 1)
+            self.assertLessEqual(y + radius, 3508 - 71 + 1)
+        min_distance = min(math.dist(a, b) for a, b in combinations(result.positions, 2))
+        self.assertGreaterEqual(min_distance, result.center_distance - 1.5)
+
+        # 相同参数直接返回缓存结果
+        self.assertIs(optimize_packing(2480, 3508, 685, 35, 71), result)
+
+        # 紧密排列不少于网格排列
+        original_diameter = app_config.badge_diameter_mm
+        try:
+            for diameter_mm in (25, 32, 44, 58, 75):
+                app_config.badge_diameter_mm = diameter_mm
+                compact = self.engine.calculate_compact_layout(spacing_mm=3, margin_mm=6)
+                grid = self.engine.calculate_grid_layout(spacing_mm=3, margin_mm=6)
+                self.assertGreaterEqual(compact['max_count'], grid['max_count'])
+        finally:
+            app_config.badge_diameter_mm = original_diameter
+
+    def test_capacity_sweep(self):
+        """测试容量表参数扫描与最大直径反查"""
+        from core.capacity import float_range
+
+        table = self.engine.capacity_table(float_range(30, 70, 5), (2, 3), (6,), bleed_mm=0)
+        self.assertEqual(len(table), 2 * 9 * 2)
+        for layout_type in ('grid', 'compact'):
+            counts = [e.count for e in table if e.layout_type == layout_type and e.spacing_mm == 3]
+            # 直径越大每页数量越少
+            self.assertEqual(counts, sorted(counts, reverse=True))
+
+        entry = self.engine.max_diameter_for_count(12, 'compact', 3, 6, bleed_mm=0)
+        self.assertGreaterEqual(entry.count, 12)
+        bigger = self.engine.capacity_table([entry.diameter_mm + 0.1], (3,), (6,), ('compact',), bleed_mm=0)
+        self.assertLess(bigger[0].count, 12)
+        self.assertIsNone(self.engine.max_diameter_for_count(10000, 'compact', 3, 6, bleed_mm=0))
+
+    def test_capacity_matches_layout_at_boundary(self):
+        """测试容量表与实际排版在徽章放不下的边界处一致（不放置被裁切的徽章）"""
+        diameter = app_config.badge_diameter_mm
+        # 页边距越大可用区域越小，直到放不下一个徽章
+        for margin in (6, 70, 71, 72, 100):
+            layouts = {'grid': self.engine.calculate_grid_layout(3, margin),
+                       'compact': self.engine.calculate_compact_layout(3, margin)}
+            for layout_type, layout in layouts.items():
+                with self.subTest(margin=margin, layout_type=layout_type):
+                    entry = self.engine.capacity_table([diameter], (3,), (margin,), (layout_type,), bleed_mm=0)[0]
+                    self.assertEqual(layout['max_count'], entry.count)
+                    self.assertEqual(len(layout['positions']), entry.count)
+
+        # 放不下时多页排版只有一个空白页（不再因每页数量为0而出错）
+        multi = self.engine.calculate_multi_page_layout(5, 'grid', 3, 100)
+        self.assertEqual((multi['total_pages'], multi['max_per_page']), (1, 0))
+        self.assertEqual(multi['pages'][0]['images_on_page'], 0)
+
+    def test_vectorized_positions_and_validation(self):
+        """测试坐标数组生成与布局校验（含无NumPy时的纯Python实现）"""
+        from unittest import mock
+        from common.imports import OptionalImport
+        from core import lattice
+
+        for layout_type in ('grid', 'compact'):
+            layout = self.engine._get_layout(layout_type, 3, 6)
+            positions = self.engine.get_positions_array(layout)
+            self.assertEqual(positions.shape, (layout['max_count'], 2))
+            self.assertEqual([tuple(p) for p in positions.tolist()], layout['positions'])
+            self.assertTrue(self.engine.validate_layout(layout).valid)
+
+        # 重叠和超出页边距都能被检出
+        result = lattice.validate_positions([(100, 100), (150, 100), (1000, 1000)], 80, 90, (2480, 3508), 10)
+        self.assertFalse(result.valid)
+        self.assertEqual(result.overlap_count, 1)
+        self.assertEqual(result.outside_count, 0)
+        self.assertEqual(result.min_distance, 50)
+        result = lattice.validate_positions([(20, 20)], 80, 90, (2480, 3508), 10)
+        self.assertEqual(result.outside_count, 1)
+
+        # 桌面版打包不含NumPy，纯Python实现需给出相同结果
+        layout = self.engine._get_layout('compact', 3, 6)
+        expected = self.engine.validate_layout(layout)
+        with mock.patch.object(lattice, 'np', OptionalImport('numpy_not_installed')):
+            self.assertEqual(self.engine.get_positions_array(layout), layout['positions'])
+            self.assertEqual(self.engine.validate_layout(layout), expected)
+
+    def test_page_spec_layouts(self):
+        """测试不同纸张和分辨率的排版（缓存按页面规格区分）"""
+        from core.page_spec import PageSpec, parse_page_spec
+
+        sra3 = parse_page_spec("SRA3@600")
+        self.assertEqual((sra3.name, sra3.dpi), ("SRA3", 600))
+        self.assertEqual(parse_page_spec("330x1000", 300).size_mm, (330.0, 1000.0))
+        with self.assertRaises(ValueError):
+            parse_page_spec("B9")
+
+        a4 = self.engine.get_layout_result('compact', 3, 6)
+        proof = self.engine.get_layout_result('compact', 3, 6, PageSpec.preset("A4", 150))
+        press = self.engine.get_layout_result('compact', 3, 6, sra3)
+        self.assertEqual((proof.key.page_width, proof.key.dpi), (1240, 150))
+        self.assertEqual(press.key.page_width, sra3.width_px)
+        self.assertGreater(press.max_count, a4.max_count)
+        self.assertIsNot(proof, a4)
+        self.assertIs(self.engine.get_layout_result('compact', 3, 6, sra3), press)
+        self.assertTrue(self.engine.validate_layout(press.to_dict()).valid)
+
+        # 引擎默认跟随全局配置
+        original = app_config.page_spec
+        try:
+            app_config.page_spec = sra3
+            self.assertEqual(self.engine.a4_width_px, sra3.width_px)
+            self.assertEqual(self.engine.calculate_compact_layout(3, 6)['max_count'], press.max_count)
+        finally:
+            app_config.page_spec = original
+
+    def test_mixed_diameter_layout(self):
+        """测试混合尺寸排版（单一尺寸时与紧凑点阵数量一致，混合时各页均有效）"""
+        from core.mixed_packing import pack_page
+        from core.project_model import BadgeProject
+
+        uniform = self.engine.get_layout_result('compact', 2, 5)
+        page = pack_page([uniform.key.diameter] * 40, uniform.key.page_width, uniform.key.page_height,
+                         uniform.key.spacing, uniform.key.margin)
+        self.assertEqual(page.count, uniform.max_count)
+
+        project = BadgeProject()
+        project.add("big.png", quantity=10, badge_size_mm=58)
+        project.add("small.png", quantity=40, badge_size_mm=32)
+        project.add("default.png", quantity=5)
+        expanded = project.expanded()
+
+        job = self.engine.calculate_job_layout(expanded, 'mixed', 2, 5)
+        placed = [i for page_info in job['pages'] for i in page_info['item_indices']]
+        self.assertEqual(sorted(placed), list(range(len(expanded))))
+        self.assertLess(job['total_pages'], self.engine.calculate_job_layout(expanded, 'compact', 2, 5)['total_pages'])
+        self.assertGreater(job['utilization'], 0)
+        for page_info in job['pages']:
+            self.assertTrue(self.engine.validate_layout(page_info).valid)
+            for badge, diameter_mm in zip(self.engine.page_images(expanded, page_info), page_info['diameters_mm']):
+                self.assertAlmostEqual(diameter_mm, self.engine.get_item_diameter_mm(badge))
+
+    def test_job_plan_grouping(self):
+        """测试整批规划：页数最少，相同图案集中时不拆散能放进一页的图案"""
+        from core.job_planner import design_key
+        from core.project_model import BadgeProject
+
+        capacity = self.engine.get_layout_result('compact', 2, 5).max_count
+        project = BadgeProject()
+        for i, quantity in enumerate([capacity - 1, 3, capacity + 2, 2, 1, 4]):
+            project.add(f"design{i % 4}.png", quantity=quantity)
+        expanded = project.expanded()
+
+        ordered = self.engine.plan_job(expanded, 'compact', 2, 5)
+        grouped = self.engine.plan_job(expanded, 'compact', 2, 5, group_designs=True)
+        self.assertEqual(ordered.total_pages, -(-len(expanded) // capacity))
+        self.assertEqual(grouped.total_pages, ordered.total_pages)
+
+        def split_designs(plan):
+            pages = {}
+            for page in plan.pages:
+                self.assertLessEqual(page.count, capacity)
+                for i in page.item_indices:
+                    pages.setdefault(design_key(expanded[i]), set()).add(page.page_index)
+            return sum(len(page_set) - 1 for page_set in pages.values())
+
+        placed = sorted(i for page in grouped.pages for i in page.item_indices)
+        self.assertEqual(placed, list(range(len(expanded))))
+        self.assertLess(split_designs(grouped), split_designs(ordered))
+
+        # 规划转换为布局字典后，页面图片与规划一致
+        multi_layout = grouped.to_dict()
+        self.assertIs(multi_layout['plan'], grouped)
+        for page_info, page in zip(multi_layout['pages'], grouped.pages):
+            self.assertEqual(len(self.engine.page_images(expanded, page_info)), page.count)
+
+    def test_overlay_geometry(self):
+        """测试叠加层几何：同一排版只计算一次，未放满的页面只含已放置的位置"""
+        import io
+        from core.overlay import OverlayOptions, page_overlay, layout_overlay, write_svg, write_dxf
+        from core.project_model import BadgeProject
+
+        capacity = self.engine.get_layout_result('grid', 5, 10).max_count
+        project = BadgeProject()
+        project.add("design.png", quantity=capacity * 2 + 3)
+        plan = self.engine.plan_job(project.expanded(), 'grid', 5, 10)
+        self.assertEqual(plan.total_pages, 3)
+
+        layout_overlay.cache_clear()
+        diameter_mm = app_config.badge_diameter_mm
+        bleed_mm = app_config.bleed_size_mm
+        pages = [page_overlay(page, plan.page_spec, diameter_mm, bleed_mm) for page in plan.pages]
+        self.assertEqual(layout_overlay.cache_info().misses, 1)
+        self.assertIs(pages[0], pages[1])
+        self.assertEqual(len(pages[2].cut_circles), 3)
+        self.assertEqual(len(pages[0].bleed_circles), capacity)
+        self.assertEqual(len(pages[0].registration_marks), 4)
+        self.assertAlmostEqual(pages[0].cut_circles[0][2], app_config.badge_size_mm / 2)
+        self.assertAlmostEqual(pages[0].bleed_circles[0][2], diameter_mm / 2)
+
+        # 切割机文件：只含裁切线和套准标记
+        cutter = page_overlay(plan.pages[2], plan.page_spec, diameter_mm, bleed_mm,
+                              OverlayOptions(bleed=False))
+        svg = io.StringIO()
+        write_svg(cutter, svg)
+        self.assertEqual(svg.getvalue().count('<circle'), 3 + 4)
+        dxf = io.StringIO()
+        write_dxf(cutter, dxf)
+        self.assertEqual(dxf.getvalue().count('CIRCLE\n8\nCUT\n'), 3)
+        self.assertTrue(dxf.getvalue().endswith('EOF\n'))
+
+    def test_cut_files_from_multi_page_layout(self):
+        """测试由多页面布局逐页生成切割机裁切文件"""
+        import tempfile
+        import xml.etree.ElementTree as ET
+        from core.overlay import iter_cut_files, write_cut_files
+
+        capacity = self.engine.get_layout_result('compact', 5, 10).max_count
+        multi_layout = self.engine.calculate_multi_page_layout(capacity + 2, 'compact', 5, 10)
+        diameter_mm = app_config.badge_diameter_mm
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, 'job.pdf')
+            paths = write_cut_files(multi_layout, output_path, diameter_mm, app_config.bleed_size_mm)
+            self.assertEqual([os.path.basename(path) for path in paths], ['job_cut_第1页.svg', 'job_cut_第2页.svg'])
+
+            namespace = '{http://www.w3.org/2000/svg}'
+            counts = [len(ET.parse(path).getroot().find(f"{namespace}g[@id='CUT']").findall(f'{namespace}circle'))
+                      for path in paths]
+            self.assertEqual(counts, [capacity, 2])
+
+            # 生成器逐页写入：取出第一页时第二页还未生成
+            pages = iter_cut_files(multi_layout, os.path.join(temp_dir, 'lazy'), diameter_mm, file_format='dxf')
+            first = next(pages)
+            self.assertTrue(os.path.exists(first))
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, 'lazy_cut_第2页.dxf')))
+            self.assertEqual(len(list(pages)), 1)
+
+            with self.assertRaises(ValueError):
+                write_cut_files(multi_layout, output_path, diameter_mm, file_format='eps')
+
 
 class TestExportManager(unittest.TestCase):
     """导出管理器测试"""
@@ -168,6 +483,399 @@ class TestExportManager(unittest.TestCase):
         self.assertFalse(valid)
         self.assertIn("请指定输出文件路径", error)
 
+    def test_render_plan_tile_reuse(self):
+        """测试预览后导出直接复用共享图块缓存中的圆形裁剪"""
+        import tempfile
+        from PIL import Image
+        from core.project_model import BadgeProject
+        from core.render_plan import TileCache, PageCompositor
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project = BadgeProject()
+            for i, color in enumerate(['red', 'green', 'blue']):
+                path = os.path.join(temp_dir, f"design{i}.png")
+                Image.new('RGB', (400, 300), color=color).save(path)
+                project.add(path, quantity=5)
+            expanded = project.expanded()
+
+            engine = self.manager.layout_engine
+            engine.compositor = PageCompositor(TileCache())
+            tile_cache = engine.compositor.tile_cache
+            render_plan = engine.build_render_plan(engine.plan_job(expanded, 'grid', 5, 10), expanded)
+            self.assertEqual(sum(page.count for page in render_plan.pages), len(expanded))
+            self.assertEqual(len(render_plan.unique_tiles()), 3)
+
+            # 预览：每个图案只裁剪一次，预览图块由输出分辨率的图块缩小得到
+            for page in render_plan.pages:
+                engine.render_page_image(page, 0.25)
+            full_tiles = {key for key in tile_cache._tiles if key.dpi == render_plan.page_spec.dpi}
+            self.assertEqual(full_tiles, render_plan.unique_tiles())
+            misses = tile_cache.info()['misses']
+
+            # 导出：全部命中，不再裁剪
+            success, count = self.manager.export_multi_page_to_images(
+                expanded, os.path.join(temp_dir, "out"), 'PNG', 'grid', 5, 10, plan=render_plan.job_plan
+            )
+            self.assertTrue(success)
+            self.assertEqual(count, len(expanded))
+            self.assertEqual(tile_cache.info()['misses'], misses)
+
+    def test_vector_pdf_export(self):
+        """测试矢量PDF：每个源图片只嵌入一次，打不开的源图片改用位图图块"""
+        import tempfile
+        from PIL import Image
+        from core.project_model import BadgeProject
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project = BadgeProject()
+            for i, color in enumerate(['red', 'green', 'blue']):
+                path = os.path.join(temp_dir, f"design{i}.png")
+                Image.new('RGB', (400, 300), color=color).save(path)
+                project.add(path, quantity=5, rotation=30 * i, offset_x=10 * i)
+            expanded = project.expanded()
+
+            output_path = os.path.join(temp_dir, "vector.pdf")
+            success, count = self.manager.export_multi_page_to_pdf(
+                expanded, output_path, 'grid', 5, 10, pdf_mode='vector', overlay=True, cut_file='svg'
+            )
+            self.assertTrue(success)
+            self.assertEqual(count, len(expanded))
+            with open(output_path, 'rb') as f:
+                data = f.read()
+            self.assertEqual(data.count(b'/Subtype /Image'), 3)
+            self.assertIn(b'/CutContour', data)
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, "vector_cut_第1页.svg")))
+
+            # 源图片无法嵌入（如文件已被删除）时，使用位图图块兜底
+            os.remove(os.path.join(temp_dir, "design2.png"))
+            success, count = self.manager.export_multi_page_to_pdf(
+                expanded, output_path, 'grid', 5, 10, pdf_mode='vector'
+            )
+            self.assertTrue(success)
+            self.assertEqual(count, len(expanded))
+
+            success, _ = self.manager.export_multi_page_to_pdf(expanded, output_path, pdf_mode='unknown')
+            self.assertFalse(success)
+
+    def test_pdf_source_embedding(self):
+        """测试不超过目标有效分辨率的JPEG原样嵌入，超出的只缩小一次"""
+        import tempfile
+        from PIL import Image
+        from core.project_model import BadgeProject
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            small_path = os.path.join(temp_dir, "small.jpg")
+            large_path = os.path.join(temp_dir, "large.jpg")
+            Image.effect_noise((800, 800), 64).convert('RGB').save(small_path, quality=90)
+            Image.effect_noise((3000, 2000), 64).convert('RGB').save(large_path, quality=90)
+
+            project = BadgeProject()
+            project.add(small_path, quantity=3, scale=1.0)     # 有效分辨率300dpi
+            project.add(large_path, quantity=3, scale=0.25)    # 有效分辨率1200dpi
+            expanded = project.expanded()
+
+            output_path = os.path.join(temp_dir, "embed.pdf")
+            success, count = self.manager.export_multi_page_to_pdf(expanded, output_path, 'grid', 5, 10)
+            self.assertTrue(success)
+            self.assertEqual(count, 6)
+            report = self.manager.last_pdf_report
+            self.assertEqual((report['sources'], report['passthrough'], report['downsampled']), (2, 1, 1))
+            self.assertGreater(report['saved_bytes'], 0)
+            with open(output_path, 'rb') as f:
+                self.assertEqual(f.read().count(b'/DCTDecode'), 2)
+
+            # 目标分辨率逐次可配置：降低后两个源图片都缩小
+            self.manager.export_multi_page_to_pdf(expanded, output_path, 'grid', 5, 10, target_dpi=150)
+            report = self.manager.last_pdf_report
+            self.assertEqual((report['passthrough'], report['downsampled']), (0, 2))
+
+    def test_pdf_oriented_jpeg(self):
+        """测试带EXIF方向的JPEG不直接嵌入，解码并摆正后嵌入"""
+        import tempfile
+        from PIL import Image
+        from core.project_model import BadgeProject
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "phone.jpg")
+            exif = Image.Exif()
+            exif[0x0112] = 6
+            Image.new('RGB', (800, 600), 'red').save(path, exif=exif)
+            project = BadgeProject()
+            project.add(path, quantity=2)
+
+            output_path = os.path.join(temp_dir, "oriented.pdf")
+            success, count = self.manager.export_multi_page_to_pdf(project.expanded(), output_path, 'grid', 5, 10)
+            self.assertTrue(success)
+            report = self.manager.last_pdf_report
+            self.assertEqual((report['sources'], report['passthrough'], report['decoded']), (1, 0, 1))
+            with open(output_path, 'rb') as f:
+                data = f.read()
+            self.assertIn(b'/Width 600', data)
+            self.assertIn(b'/Height 800', data)
+
+    def test_export_job_progress_and_cancel(self):
+        """测试导出任务：逐页进度和写入字节数，按徽章取消，按吞吐量估算剩余时间"""
+        import tempfile
+        from PIL import Image
+        from core.export_job import ExportJob
+        from core.project_model import BadgeProject
+
+        # 剩余时间按最近的吞吐量估算（可替换的计时函数）
+        now = [0.0]
+        job = ExportJob(clock=lambda: now[0])
+        job.start(2, 10)
+        self.assertIsNone(job.eta())
+        for _ in range(4):
+            now[0] += 0.5
+            job.badge_done()
+        self.assertAlmostEqual(job.eta(), 6 * 0.5)
+        self.assertAlmostEqual(job.progress().fraction, 0.4)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "design.png")
+            Image.new('RGB', (400, 300), color='red').save(path)
+            project = BadgeProject()
+            project.add(path, quantity=30)
+            expanded = project.expanded()
+            base_path = os.path.join(temp_dir, "job")
+
+            updates = []
+            job = ExportJob(progress_callback=updates.append, interval=0)
+            success, count = self.manager.export_multi_page_to_images(expanded, base_path, 'PNG', 'grid', 5, 10,
+                                                                      job=job)
+            self.assertTrue(success)
+            final = updates[-1]
+            self.assertEqual((final.pages_done, final.badges_done, final.eta), (final.total_pages, 30, 0.0))
+            self.assertEqual(final.bytes_written, sum(os.path.getsize(os.path.join(temp_dir, name))
+                                                      for name in os.listdir(temp_dir) if name.startswith("job")))
+
+            # 第5个徽章后取消：不再处理后续徽章，PDF不写出
+            def cancel_after_five(progress):
+                if progress.badges_done >= 5:
+                    job.cancel()
+
+            for export in (
+                lambda: self.manager.export_multi_page_to_images(expanded, base_path, 'PNG', 'grid', 5, 10, job=job),
+                lambda: self.manager.export_multi_page_to_pdf(expanded, base_path + ".pdf", 'grid', 5, 10, job=job),
+            ):
+                job = ExportJob(progress_callback=cancel_after_five, interval=0)
+                success, count = export()
+                self.assertFalse(success)
+                self.assertTrue(job.cancelled)
+                self.assertEqual(job.badges_done, 5)
+            self.assertFalse(os.path.exists(base_path + ".pdf"))
+
+    def test_incremental_image_export(self):
+        """测试增量导出：只重新写入内容有变化的页面，中断后从未完成的页面继续"""
+        import json
+        import tempfile
+        from PIL import Image
+        from core.export_job import ExportJob
+        from core.project_model import BadgeProject
+
+        capacity = self.manager.layout_engine.get_layout_result('grid', 5, 10).max_count
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path_a = os.path.join(temp_dir, "a.png")
+            path_b = os.path.join(temp_dir, "b.png")
+            Image.new('RGB', (400, 300), color='red').save(path_a)
+            Image.new('RGB', (400, 300), color='green').save(path_b)
+            project = BadgeProject()
+            project.add(path_a, quantity=capacity * 2)
+            project.add(path_b, quantity=3)
+            expanded = project.expanded()
+            base_path = os.path.join(temp_dir, "job")
+
+            def export(job=None):
+                return self.manager.export_multi_page_to_images(expanded, base_path, 'PNG', 'grid', 5, 10,
+                                                                job=job, incremental=True)
+
+            self.assertEqual(export(), (True, len(expanded)))
+            self.assertEqual(self.manager.last_incremental_report, {'skipped': 0, 'written': 3})
+            with open(base_path + ".pages.json", encoding='utf-8') as f:
+                self.assertEqual(len(json.load(f)['pages']), 3)
+
+            # 未改动：全部跳过
+            self.assertEqual(export(), (True, len(expanded)))
+            self.assertEqual(self.manager.last_incremental_report, {'skipped': 3, 'written': 0})
+
+            # 源图片内容变化：只重新写入用到它的第3页，且页面内容是新的源图片（不是缓存中的旧图块）
+            Image.new('RGB', (400, 300), color='blue').save(path_b)
+            self.assertEqual(export(), (True, len(expanded)))
+            self.assertEqual(self.manager.last_incremental_report, {'skipped': 2, 'written': 1})
+            render_plan = self.manager._build_render_plan(expanded, 'grid', 5, 10, None, False)
+            slot = next(slot for slot in render_plan.pages[2].filled_slots if slot.tile.file_path == path_b)
+            with Image.open(base_path + "_第3页.png") as page:
+                self.assertEqual(page.convert('RGB').getpixel((slot.x, slot.y)), (0, 0, 255))
+
+            # 中断后继续：清单在每页写完后保存，再次导出从未完成的页面继续
+            os.remove(base_path + ".pages.json")
+            job = ExportJob(progress_callback=lambda progress: progress.pages_done and job.cancel())
+            success, _ = export(job)
+            self.assertFalse(success)
+            self.assertEqual(export(), (True, len(expanded)))
+            self.assertEqual(self.manager.last_incremental_report, {'skipped': 1, 'written': 2})
+            self.assertFalse([name for name in os.listdir(temp_dir) if name.endswith('.tmp')])
+
+    def test_raster_document_export(self):
+        """测试整页位图文档：多页TIFF和整页位图PDF逐页流式写入，CMYK转换的颜色变换只构建一次"""
+        import tempfile
+        from PIL import Image, PdfParser
+        from core.color_management import ColorSettings, get_transform, SRGB_PROFILE
+        from core.export_job import ExportJob
+        from core.project_model import BadgeProject
+
+        capacity = self.manager.layout_engine.get_layout_result('grid', 5, 10).max_count
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path_a = os.path.join(temp_dir, "a.png")
+            Image.new('RGB', (400, 300), color='red').save(path_a)
+            project = BadgeProject()
+            project.add(path_a, quantity=capacity * 2 + 1)
+            expanded = project.expanded()
+
+            # 多页TIFF：每页一个IFD，LZW压缩，CMYK；逐页报告的写入字节数累计为文件大小
+            tiff_path = os.path.join(temp_dir, "job.tiff")
+            page_bytes = {}
+            job = ExportJob(progress_callback=lambda progress: page_bytes.setdefault(progress.pages_done,
+                                                                                      progress.bytes_written),
+                            interval=0)
+            self.assertEqual(self.manager.export_raster_document(expanded, tiff_path, 'tiff', 'grid', 5, 10,
+                                                                 color=ColorSettings('CMYK'), job=job),
+                             (True, len(expanded)))
+            self.assertEqual(page_bytes[3], os.path.getsize(tiff_path))
+            sizes = [page_bytes[page] - page_bytes[page - 1] for page in (1, 2, 3)]
+            self.assertGreater(min(sizes), max(sizes) // 2)
+            with Image.open(tiff_path) as tiff:
+                self.assertEqual(tiff.n_frames, 3)
+                for frame in range(tiff.n_frames):
+                    tiff.seek(frame)
+                    self.assertEqual(tiff.mode, 'CMYK')
+                    self.assertEqual(tiff.info['compression'], 'tiff_lzw')
+
+            # 整页位图PDF：经色彩管理（sRGB -> sRGB），颜色变换只构建一次
+            get_transform.cache_clear()
+            pdf_path = os.path.join(temp_dir, "job.pdf")
+            self.assertEqual(self.manager.export_multi_page_to_pdf(expanded, pdf_path, 'grid', 5, 10,
+                                                                   pdf_mode='page',
+                                                                   color=ColorSettings(output_profile=SRGB_PROFILE)),
+                             (True, len(expanded)))
+            self.assertEqual(get_transform.cache_info().misses, 1)
+            pdf = PdfParser.PdfParser(pdf_path)
+            self.assertEqual(len(pdf.pages), 3)
+            pdf.close()
+
+            # 取消时不留下不完整的文件
+            job = ExportJob(progress_callback=lambda progress: progress.pages_done and job.cancel())
+            success, _ = self.manager.export_raster_document(expanded, tiff_path + "2", 'tiff', 'grid', 5, 10,
+                                                             job=job)
+            self.assertFalse(success)
+            self.assertFalse(os.path.exists(tiff_path + "2"))
+
+    def test_color_stage_per_unique_tile(self):
+        """测试色彩阶段：每个不同的图块只转换一次，嵌入的源配置文件参与转换，输出配置文件嵌入图片"""
+        import io
+        import tempfile
+        from PIL import Image, ImageCms
+        from core.color_management import ColorSettings, get_transform, load_profile, SRGB_PROFILE
+        from core.project_model import BadgeProject
+
+        srgb_bytes = load_profile(SRGB_PROFILE).tobytes()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path_a = os.path.join(temp_dir, "a.png")
+            path_b = os.path.join(temp_dir, "b.jpg")
+            Image.new('RGB', (400, 300), color='red').save(path_a, icc_profile=srgb_bytes)
+            Image.new('RGB', (400, 300), color='green').save(path_b)
+            project = BadgeProject()
+            project.add(path_a, quantity=8)
+            project.add(path_b, quantity=5)
+            expanded = project.expanded()
+
+            color = ColorSettings(output_profile=SRGB_PROFILE)
+            get_transform.cache_clear()
+            base_path = os.path.join(temp_dir, "job")
+            self.assertEqual(self.manager.export_multi_page_to_images(expanded, base_path, 'JPEG', 'grid', 5, 10,
+                                                                      color=color),
+                             (True, len(expanded)))
+
+            # 两个图块各转换一次（嵌入的配置文件和默认sRGB各一个变换），13个副本共用转换结果
+            tile_cache = self.manager.layout_engine.compositor.tile_cache
+            plan = self.manager._build_render_plan(expanded, 'grid', 5, 10, None, False)
+            unique_tiles = plan.unique_tiles()
+            self.assertEqual(len(unique_tiles), 2)
+            for key in unique_tiles:
+                self.assertIn((key, color), tile_cache)
+            self.assertEqual(get_transform.cache_info().misses, 2)
+
+            with Image.open(base_path + "_第1页.jpeg") as page:
+                self.assertEqual(page.mode, 'RGB')
+                embedded = ImageCms.ImageCmsProfile(io.BytesIO(page.info['icc_profile']))
+                self.assertEqual(ImageCms.getProfileName(embedded), ImageCms.getProfileName(load_profile(SRGB_PROFILE)))
+
+            # PNG不支持CMYK
+            self.assertEqual(self.manager.export_multi_page_to_images(expanded, base_path, 'PNG', 'grid', 5, 10,
+                                                                      color=ColorSettings('CMYK')),
+                             (False, 0))
+
+
+class TestBadgeProject(unittest.TestCase):
+    """列式项目数据模型测试"""
+
+    def setUp(self):
+        self.project = BadgeProject()
+        for i in range(10000):
+            self.project.add(f"img_{i % 7}.png", quantity=(i % 3) + 1, scale=0.5 + i * 1e-4,
+                             offset_x=i % 11, is_processed=True)
+
+    def test_shared_sources(self):
+        """测试同一源文件只登记一次"""
+        self.assertEqual(len(self.project), 10000)
+        self.assertEqual(len(self.project.sources), 7)
+        self.assertEqual(self.project.row(8).file_path, "img_1.png")
+
+    def test_expanded_index_ranges(self):
+        """测试按数量展开后的区间访问与逐项展开一致"""
+        expanded = self.project.expanded()
+        reference = [i for i in range(10000) for _ in range((i % 3) + 1)]
+        self.assertEqual(len(expanded), len(reference))
+
+        for start, stop in [(0, 5), (1234, 1250), (len(reference) - 3, len(reference) + 10)]:
+            self.assertEqual([badge.index for badge in expanded[start:stop]], reference[start:stop])
+        self.assertEqual(expanded[-1].index, reference[-1])
+        self.assertEqual([b.index for b in expanded.page(3, 12)], reference[36:48])
+
+    def test_fingerprint_tracks_params(self):
+        """测试参数变化会改变内容指纹，数量变化会更新展开长度"""
+        before = self.project.fingerprint()
+        total = self.project.total_badges
+        self.project.set_params(42, quantity=10)
+        self.assertNotEqual(self.project.fingerprint(), before)
+        self.assertEqual(self.project.total_badges, total - 1 + 10)
+
+    def test_fingerprint_tracks_source_files(self):
+        """测试磁盘上的源图片被修改后内容指纹随之变化"""
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "design.png")
+            with open(path, 'wb') as f:
+                f.write(b"before")
+            project = BadgeProject()
+            project.add(path)
+            before = project.fingerprint()
+            self.assertEqual(project.fingerprint(), before)
+
+            with open(path, 'wb') as f:
+                f.write(b"after edit")
+            self.assertNotEqual(project.fingerprint(), before)
+
+    def test_export_pages_from_project(self):
+        """测试导出直接使用展开视图，页面切片与布局一致"""
+        layout_engine = LayoutEngine()
+        expanded = self.project.expanded()
+        plan = layout_engine.plan_job(expanded, 'grid', 5, 10)
+        render_plan = layout_engine.build_render_plan(plan, expanded)
+        self.assertEqual(render_plan.total_pages, plan.total_pages)
+        self.assertEqual(sum(page.count for page in render_plan.pages), len(expanded))
+
 
 class TestConfig(unittest.TestCase):
     """配置管理测试"""
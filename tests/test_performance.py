@@ -4,6 +4,10 @@
 """
 
 import unittest
+import importlib.util
+import json
+import os
+import subprocess
 import sys
 import time
 import tempfile
@@ -247,6 +251,54 @@ class TestMemoryManagement(unittest.TestCase):
         # 内存使用应该被重置
         self.assertEqual(processor._current_memory_usage, 0)
 
+    # 每个图片项（含编辑参数）允许占用的内存上限（字节）
+    IMAGE_ITEM_BYTES_BUDGET = 400
+
+    def test_image_item_memory_benchmark(self):
+        """测试10000个图片项的内存占用，复制不读取磁盘，删除后回收实例计数"""
+        import gc
+        import tracemalloc
+        from utils.file_handler import ImageProbe
+
+        path = "benchmark_source.png"
+        probe = ImageProbe(path, True, info={'size': (800, 600)}, thumbnail=Image.new('RGB', (100, 100)))
+        source_item = ImageItem(path, probe=probe)
+
+        tracemalloc.start()
+        try:
+            start_time = time.perf_counter()
+            with patch('utils.file_handler.FileHandler.get_image_info', side_effect=AssertionError("复制不应读取磁盘")):
+                items = [source_item.copy() for _ in range(10000)]
+            for i, item in enumerate(items):
+                item.scale = 0.5 + i * 1e-4
+                item.offset_x = i % 100
+            elapsed = time.perf_counter() - start_time
+            current_bytes, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        bytes_per_item = current_bytes / len(items)
+        print(f"10000个图片项: {bytes_per_item:.0f} 字节/项, 用时 {elapsed * 1000:.1f}ms")
+        self.assertLess(bytes_per_item, self.IMAGE_ITEM_BYTES_BUDGET)
+
+        # 所有副本共享同一份元数据，序号为整数
+        self.assertIs(items[-1].info, source_item.info)
+        self.assertIsInstance(items[-1].unique_id, int)
+        self.assertEqual(items[-1].get_display_name(), "benchmark_source#10001.png")
+
+        # 删除副本后实例计数和序号被回收，新副本复用最小的空闲序号，删除全部后源文件记录被释放
+        del items, item
+        gc.collect()
+        self.assertEqual(source_item.source.live_count, 1)
+        self.assertEqual(source_item.get_display_name(), path)
+        copy = source_item.copy()
+        self.assertEqual(copy.get_display_name(), "benchmark_source#2.png")
+        del copy
+        gc.collect()
+        del source_item
+        gc.collect()
+        self.assertNotIn(path, ImageItem._sources)
+
 
 class TestPerformanceBenchmarks(unittest.TestCase):
     """性能基准测试"""
@@ -289,5 +341,95 @@ class TestPerformanceBenchmarks(unittest.TestCase):
         self.assertEqual(len(operations), 10)
 
 
+def measure_import_time(statement):
+    """
+    在独立进程中用 python -X importtime 执行导入语句
+    返回: dict - {模块名: 累计导入耗时(微秒)}
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=str(project_root / "src"), capture_output=True, text=True, timeout=60
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        timings[parts[2].strip()] = int(parts[1])
+    return timings
+
+
+class TestImportTime(unittest.TestCase):
+    """核心模块导入耗时测试（防止无界面环境重新引入Qt依赖）"""
+
+    CORE_MODULES = ("core.layout_engine", "core.image_processor", "core.export_manager")
+    # 核心模块累计导入耗时上限（秒），加载PySide6会明显超出
+    CORE_IMPORT_BUDGET = 1.0
+
+    def test_core_import_does_not_load_qt(self):
+        """测试导入核心模块不会加载PySide6"""
+        timings = measure_import_time("import " + ", ".join(self.CORE_MODULES))
+
+        qt_modules = [name for name in timings if name.startswith("PySide6")]
+        self.assertEqual(qt_modules, [], f"核心模块导入时加载了Qt: {qt_modules}")
+
+    def test_core_import_defers_reportlab(self):
+        """测试导入导出模块不会立即加载reportlab"""
+        timings = measure_import_time("import core.export_manager")
+
+        self.assertFalse(any(name.startswith("reportlab") for name in timings))
+
+    def test_core_import_time_budget(self):
+        """测试核心模块导入耗时在预算内"""
+        timings = measure_import_time("import " + ", ".join(self.CORE_MODULES))
+
+        total_seconds = sum(timings.get(name, 0) for name in self.CORE_MODULES) / 1e6
+        self.assertLess(total_seconds, self.CORE_IMPORT_BUDGET)
+
+
+# 冷启动到显示第一个窗口的测量脚本（在独立进程中执行）
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+from common.imports import QApplication
+app = QApplication(sys.argv)
+window = main.MainWindow()
+window.show()
+app.processEvents()
+elapsed = time.perf_counter() - start
+deferred = [m for m in sys.modules if m.startswith('reportlab') or m == 'PySide6.QtPrintSupport']
+print('STARTUP ' + json.dumps({'elapsed': elapsed, 'deferred_loaded': deferred}))
+"""
+
+
+@unittest.skipUnless(importlib.util.find_spec("PySide6"), "PySide6 not available")
+class TestStartupTime(unittest.TestCase):
+    """冷启动耗时回归测试"""
+
+    # 从导入main.py到显示主窗口的耗时上限（秒）
+    STARTUP_BUDGET = 5.0
+
+    def test_cold_start_to_first_window(self):
+        """测试冷启动到第一个窗口的耗时，且未加载reportlab和打印支持模块"""
+        env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            cwd=str(project_root / "src"), env=env, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        report_line = [line for line in result.stdout.splitlines() if line.startswith("STARTUP ")][-1]
+        report = json.loads(report_line[len("STARTUP "):])
+
+        self.assertEqual(report['deferred_loaded'], [], "启动时加载了应延迟导入的模块")
+        self.assertLess(report['elapsed'], self.STARTUP_BUDGET)
+
+
 if __name__ == '__main__':
     unittest.main()
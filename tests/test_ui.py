@@ -128,6 +128,60 @@ class TestInteractivePreviewLabel(unittest.TestCase):
         self.assertLessEqual(self.preview.scale_factor, 1.0)
 
 
+@unittest.skipUnless(PYSIDE6_AVAILABLE, "PySide6 not available")
+class TestImageListModel(unittest.TestCase):
+    """虚拟化图片列表模型测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        """设置测试类"""
+        if not QApplication.instance():
+            cls.app = QApplication([])
+        else:
+            cls.app = QApplication.instance()
+
+    def test_lazy_async_thumbnails(self):
+        """测试图标按需异步生成：先返回占位图标，生成后通过信号更新"""
+        import time
+        from PIL import Image
+        from ui.image_list_model import ImageListModel
+        from utils.file_handler import ImageItem, ImageProbe
+
+        items = []
+        for i in range(3):
+            path = f"virtual_{i}.png"
+            probe = ImageProbe(path, True, info={'size': (100, 100)},
+                               thumbnail=Image.new('RGB', (100, 100), (i * 80, 0, 0)))
+            items.append(ImageItem(path, probe=probe))
+
+        model = ImageListModel([], icon_size=48)
+        model.append_items(items * 1000)
+        self.assertEqual(model.rowCount(), 3000)
+
+        # 只请求前两行的图标，未访问的行不生成缩略图
+        placeholder = model.data(model.index(0), Qt.ItemDataRole.DecorationRole)
+        model.data(model.index(1), Qt.ItemDataRole.DecorationRole)
+        self.assertEqual(len(model._pending), 2)
+
+        changed = []
+        model.dataChanged.connect(lambda *args: changed.append(args))
+        deadline = time.time() + 5
+        while model._pending and time.time() < deadline:
+            model.loader.wait_for_done(100)
+            self.app.processEvents()
+
+        self.assertFalse(model._pending)
+        self.assertTrue(changed)
+        self.assertEqual(len(model._icons), 2)
+        icon = model.data(model.index(3), Qt.ItemDataRole.DecorationRole)
+        self.assertIsNot(icon, placeholder)
+
+        model.remove_row(0)
+        self.assertEqual(model.rowCount(), 2999)
+        model.clear()
+        self.assertEqual(model.rowCount(), 0)
+
+
 @unittest.skipUnless(PYSIDE6_AVAILABLE, "PySide6 not available")
 class TestMainWindowComponents(unittest.TestCase):
     """主窗口组件测试"""
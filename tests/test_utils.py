@@ -15,6 +15,30 @@ sys.path.insert(0, str(project_root / "src"))
 
 from utils.file_handler import FileHandler, ImageItem
 from utils.config import mm_to_pixels, PRINT_DPI, A4_WIDTH_MM, A4_HEIGHT_MM
+from utils.manifest import load_manifest, scan_folder, expand_entries
+from utils.thumbnail_cache import ThumbnailCache, reset_thumbnail_cache
+
+
+_cache_dir = None
+_previous_cache_dir = None
+
+
+def setUpModule():
+    """FileHandler和ImageItem默认使用共享磁盘缓存：指向临时目录，不写入用户的缓存目录"""
+    global _cache_dir, _previous_cache_dir
+    _cache_dir = tempfile.TemporaryDirectory()
+    _previous_cache_dir = os.environ.get("BADGEPATTERN_CACHE_DIR")
+    os.environ["BADGEPATTERN_CACHE_DIR"] = _cache_dir.name
+    reset_thumbnail_cache()
+
+
+def tearDownModule():
+    reset_thumbnail_cache()
+    if _previous_cache_dir is None:
+        os.environ.pop("BADGEPATTERN_CACHE_DIR", None)
+    else:
+        os.environ["BADGEPATTERN_CACHE_DIR"] = _previous_cache_dir
+    _cache_dir.cleanup()
 
 
 class TestFileHandler(unittest.TestCase):
@@ -43,6 +67,38 @@ class TestFileHandler(unittest.TestCase):
         finally:
             os.unlink(temp_path)
 
+    def test_probe_images(self):
+        """测试并行探测：一次打开得到元数据、方向和缩略图，损坏文件被识别"""
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            good_path = os.path.join(temp_dir, "good.jpg")
+            exif = Image.Exif()
+            exif[0x0112] = 6
+            Image.new('RGB', (400, 200), (10, 120, 200)).save(good_path, exif=exif)
+
+            broken_path = os.path.join(temp_dir, "broken.png")
+            with open(broken_path, 'wb') as f:
+                f.write(b"\x89PNG\r\n\x1a\n not an image")
+
+            probes = self.handler.probe_images([good_path, broken_path, "missing.png"], workers=4)
+            self.assertEqual([p.file_path for p in probes], [good_path, broken_path, "missing.png"])
+            self.assertEqual([p.valid for p in probes], [True, False, False])
+
+            info = probes[0].info
+            # 尺寸和缩略图按EXIF方向摆正（方向6：宽高互换）
+            self.assertEqual(info['size'], (200, 400))
+            self.assertEqual(info['format'], 'JPEG')
+            self.assertEqual(info['orientation'], 6)
+            thumbnail = probes[0].thumbnail
+            self.assertEqual(thumbnail.size, (100, 100))
+            self.assertEqual(thumbnail.getpixel((5, 50)), (240, 240, 240))
+            self.assertNotEqual(thumbnail.getpixel((50, 5)), (240, 240, 240))
+
+            items = self.handler.create_image_items(probes)
+            self.assertEqual(len(items), 1)
+            self.assertIs(items[0].info, info)
+
 
 class TestImageItem(unittest.TestCase):
     """图片项目测试"""
@@ -68,6 +124,85 @@ class TestImageItem(unittest.TestCase):
             os.unlink(temp_path)
 
 
+class TestThumbnailCache(unittest.TestCase):
+    """磁盘缩略图缓存测试"""
+
+    def setUp(self):
+        from PIL import Image
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ThumbnailCache(os.path.join(self.temp_dir.name, "cache.sqlite3"))
+        self.image_path = os.path.join(self.temp_dir.name, "photo.jpg")
+        Image.new('RGB', (1200, 800), (200, 80, 40)).save(self.image_path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_probe_uses_cache(self):
+        """测试第二次探测直接命中缓存，不再打开图片"""
+        from unittest import mock
+        from PIL import Image
+
+        real_open = Image.open
+
+        def open_blobs_only(fp, *args, **kwargs):
+            # 缓存中的缩略图从内存字节解码，原图路径不允许再被打开
+            if isinstance(fp, str):
+                raise AssertionError("不应重新解码原图")
+            return real_open(fp, *args, **kwargs)
+
+        handler = FileHandler(use_disk_cache=False)
+        handler.disk_cache = self.cache
+
+        first = handler.probe_image(self.image_path)
+        self.assertTrue(first.valid)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get_level(self.image_path, 300).size, (512, 341))
+
+        with mock.patch('utils.file_handler.Image.open', side_effect=open_blobs_only):
+            second = handler.probe_image(self.image_path)
+            info = handler.get_image_info(self.image_path)
+        self.assertTrue(second.valid)
+        self.assertEqual(second.info['size'], (1200, 800))
+        self.assertEqual(second.thumbnail.size, (100, 100))
+        self.assertEqual(info['format'], 'JPEG')
+
+    def test_invalidated_when_file_changes(self):
+        """测试文件修改后缓存失效"""
+        from PIL import Image
+
+        self.cache.put(self.image_path, {'size': (1200, 800)}, Image.new('RGB', (100, 100)))
+        self.assertIsNotNone(self.cache.get(self.image_path))
+
+        stat = os.stat(self.image_path)
+        os.utime(self.image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(self.cache.get(self.image_path))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_size_based_eviction(self):
+        """测试超过容量上限时淘汰最久未访问的条目"""
+        from PIL import Image
+
+        noise = Image.effect_noise((100, 100), 64).convert('RGB')
+        paths = []
+        for i in range(6):
+            path = os.path.join(self.temp_dir.name, f"img{i}.png")
+            open(path, 'wb').close()
+            paths.append(path)
+
+        self.cache.put(paths[0], {'size': (1, 1)}, noise)
+        entry_bytes = self.cache.total_bytes
+        self.cache.max_bytes = entry_bytes * 3
+
+        for path in paths[1:]:
+            self.cache.put(path, {'size': (1, 1)}, noise)
+
+        self.assertLessEqual(self.cache.total_bytes, self.cache.max_bytes)
+        self.assertIsNone(self.cache.get(paths[0]))
+        self.assertIsNotNone(self.cache.get(paths[-1]))
+
+
 class TestConfigUtils(unittest.TestCase):
     """配置工具测试"""
     
@@ -97,5 +232,102 @@ class TestConfigUtils(unittest.TestCase):
         self.assertAlmostEqual(original_mm, back_to_mm, places=1)
 
 
+class TestManifest(unittest.TestCase):
+    """批量清单测试"""
+
+    def setUp(self):
+        from PIL import Image
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = self.temp_dir.name
+        for name in ("a.png", "b.jpg"):
+            Image.new('RGB', (300, 200), 'red').save(os.path.join(self.folder, name))
+        with open(os.path.join(self.folder, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_scan_folder(self):
+        """测试扫描文件夹只返回支持的图片"""
+        entries = scan_folder(self.folder)
+        self.assertEqual([e.filename for e in entries], ["a.png", "b.jpg"])
+        self.assertIsNone(entries[0].scale)
+
+    def test_csv_manifest(self):
+        """测试CSV清单解析与数量展开"""
+        manifest = os.path.join(self.folder, "job.csv")
+        with open(manifest, "w", encoding="utf-8") as f:
+            f.write("path,quantity,scale,offset_x,rotation\n")
+            f.write("a.png,3,0.5,10,90\n")
+            f.write("b.jpg,2,,,\n")
+
+        entries = load_manifest(manifest)
+        self.assertEqual(entries[0].file_path, os.path.join(self.folder, "a.png"))
+        self.assertEqual((entries[0].quantity, entries[0].scale, entries[0].offset_x, entries[0].rotation),
+                         (3, 0.5, 10, 90))
+        self.assertIsNone(entries[1].scale)
+        self.assertEqual(len(expand_entries(entries)), 5)
+
+    def test_json_manifest(self):
+        """测试JSON清单解析"""
+        import json
+        manifest = os.path.join(self.folder, "job.json")
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump({"items": [{"path": "b.jpg", "quantity": 4, "offset_y": -5}]}, f)
+
+        entries = load_manifest(manifest)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual((entries[0].quantity, entries[0].offset_y), (4, -5))
+
+    def test_cli_export_png(self):
+        """测试命令行批量导出"""
+        from cli import main
+        output = os.path.join(self.folder, "out", "sheet.png")
+        code = main(["export", self.folder, "-o", output, "-f", "png", "-j", "2", "-q"])
+        self.assertEqual(code, 0)
+        self.assertTrue(os.path.exists(output))
+
+        # 扩展名由输出格式决定，stdout列出实际写出的文件
+        import io
+        from contextlib import redirect_stdout
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            code = main(["export", self.folder, "-o", os.path.join(self.folder, "out", "x.pdf"), "-f", "png", "-q"])
+        self.assertEqual(code, 0)
+        png_path = os.path.join(self.folder, "out", "x.png")
+        self.assertEqual(stdout.getvalue().splitlines(), [png_path])
+        self.assertTrue(os.path.exists(png_path))
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "out", "x.pdf")))
+
+    def test_cli_capacity(self):
+        """测试命令行容量表与最大直径反查"""
+        import io
+        from contextlib import redirect_stdout
+        from cli import main
+
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            code = main(["capacity", "-d", "30:60:10", "-l", "grid", "compact", "--bleed", "0", "--csv"])
+        self.assertEqual(code, 0)
+        rows = buffer.getvalue().strip().splitlines()
+        self.assertEqual(rows[0].split(',')[0], "layout")
+        self.assertEqual(len(rows), 1 + 2 * 4)
+
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            code = main(["capacity", "-n", "12", "-l", "compact", "--bleed", "0"])
+        self.assertEqual(code, 0)
+        self.assertIn("每页12个时最大直径", buffer.getvalue())
+
+        # 纸张越大每页越多
+        counts = {}
+        for page in ("A4", "SRA3@600"):
+            buffer = io.StringIO()
+            with redirect_stdout(buffer):
+                main(["capacity", "-d", "58", "-l", "compact", "--page", page, "--csv"])
+            counts[page] = int(buffer.getvalue().strip().splitlines()[1].split(',')[5])
+        self.assertGreater(counts["SRA3@600"], counts["A4"])
+
+
 if __name__ == '__main__':
     unittest.main()